@@ -1,11 +1,33 @@
 ##########settings.py: [配置管理模块] ##################
 # 变更记录: [2024-12-19 14:30] @李祥光 [初始创建]########
+# 变更记录: [2026-10-17 09:40] @李祥光 [补充模块级config实例，修复message_sender导入失败]########
+# 变更记录: [2026-10-17 10:20] @李祥光 [新增contacts.autosave_delay配置项]########
+# 变更记录: [2026-10-17 11:00] @李祥光 [新增contacts.storage和journal_compact_threshold配置项]########
+# 变更记录: [2026-10-17 11:45] @李祥光 [新增SQLite存储相关配置项]########
+# 变更记录: [2026-10-17 12:30] @李祥光 [新增contacts.backup备份保留策略配置项]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [配置文件改为原子写入]########
+# 变更记录: [2026-10-17 16:50] @李祥光 [新增好友分块采集配置项]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [新增数据文件格式和压缩方式配置项]########
+# 变更记录: [2026-10-17 18:30] @李祥光 [新增message.outbox_dir发送任务目录配置项]########
+# 变更记录: [2026-10-17 19:10] @李祥光 [新增message.rate_limit自适应限速配置项]########
+# 变更记录: [2026-10-17 19:50] @李祥光 [新增message.retry失败重试退避配置项]########
+# 变更记录: [2026-10-17 20:30] @李祥光 [新增message.ledger_file发送账本和dedupe_window_hours去重窗口配置项]########
+# 变更记录: [2026-10-17 21:50] @李祥光 [新增message.schedule定时发送时段和免打扰配置项]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [新增wechat.transport微信传输层和wechat.fake模拟客户端配置项]########
+# 变更记录: [2026-10-17 23:10] @李祥光 [新增wechat.accounts多账号发送配置项]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [新增message.dry_run发送预估假定参数]########
+# 变更记录: [2026-10-18 09:30] @李祥光 [新增message.schedule.poll_interval调度器扫描间隔]########
+# 变更记录: [2026-10-18 10:10] @李祥光 [新增contacts.lock_timeout数据目录锁等待时间]########
+# 变更记录: [2026-10-18 13:10] @李祥光 [新增message.ledger_keep_days发送账本保留天数]########
+# 变更记录: [2026-10-18 17:20] @李祥光 [说明ledger_keep_days只清理无活动ID的记录]########
+# 变更记录: [2026-10-18 18:00] @李祥光 [新增contacts.columnar列式内存模式配置项]########
 # 输入: 无 | 输出: 配置对象###############
 
 import os
 import json
 from pathlib import Path
 from typing import Dict, Any, Optional
+from utils.atomic_file import atomic_write_json
 
 ###########################文件下的所有函数###########################
 """
@@ -91,18 +113,82 @@ class Config:
                 "name": "微信标签联系人消息发送器",
                 "version": "1.0.0"
             },
+            "wechat": {
+                "transport": "wxauto",  # 微信传输层: wxauto 真实客户端（优先wxautox），fake 模拟客户端（压测和调试）
+                "fake": {
+                    "friend_count": 1000,  # 模拟好友数量
+                    "latency": 0.2,  # 每次发送的模拟耗时（秒）
+                    "failure_rate": 0.0,  # 发送随机失败的概率
+                    "unknown_recipient": "raise",  # 未知收件人: raise 抛出异常, fail 返回失败, accept 正常发送
+                    "rate_limit_per_minute": 0  # 每分钟超过该条数时返回限流，0表示不限制
+                },
+                # 多账号发送，为空时只使用一个账号。每项如 {"name": "客服1", "client": {"nickname": "客服1"}, "send_interval": 2}，
+                # transport 默认同上，fake 账号的模拟参数写在 "fake" 中
+                "accounts": [],
+                "account_failure_threshold": 5,  # 账号连续发送失败达到该次数时停用，剩余收件人转交其他账号
+                "account_assignments_file": "data/account_assignments.json"  # 联系人与发送账号的固定分配
+            },
             "message": {
-                "send_interval": 2,  # 发送间隔（秒）
+                "send_interval": 2,  # 基础发送间隔（秒），实际等待会扣除发送本身的耗时
+                "rate_limit": {
+                    "burst": 1,  # 允许连续发送的条数
+                    "per_minute": 0,  # 每分钟最多发送条数，0表示不限制
+                    "per_hour": 0,  # 每小时最多发送条数，0表示不限制
+                    "jitter": 0.2,  # 随机抖动比例，等待时额外增加0~jitter*间隔秒
+                    "max_interval": 60,  # 自动降速后的最大间隔（秒）
+                    "failure_threshold": 0.3,  # 最近发送失败率超过该值时降速
+                    "latency_threshold": 0  # 最近平均发送耗时超过该秒数时降速，0表示不按耗时降速
+                },
                 "retry_count": 3,    # 失败重试次数
-                "confirm_send": True  # 发送前确认
+                "retry": {
+                    "base_delay": 5,  # 第一次重试前等待秒数，之后每次翻倍
+                    "max_delay": 300,  # 最长重试等待秒数
+                    "jitter": 0.5  # 重试等待的随机抖动比例
+                },
+                "confirm_send": True,  # 发送前确认
+                "outbox_dir": "data/outbox",  # 发送任务目录，崩溃后可从断点继续发送
+                "ledger_file": "data/send_ledger.db",  # 发送账本，记录已成功发送的收件人和内容，防止重复发送
+                "dedupe_window_hours": 24,  # 该时间内不向同一收件人重复发送相同内容，0表示只按活动去重
+                "ledger_keep_days": 90,  # 发送账本保留天数，打开账本时清理更早的无活动ID记录（不短于去重窗口，活动记录永久保留）
+                "schedule": {
+                    "dir": "data/schedule",  # 定时发送活动目录，程序重启后继续执行
+                    "windows": [],  # 允许发送的时段，如 ["09:00-12:00", "14:00-21:00"]，为空表示全天
+                    "quiet_hours": ["22:00-08:00"],  # 免打扰时段，定时发送在该时段内暂停
+                    "weekdays": [],  # 允许发送的星期（0为星期一），为空表示每天
+                    "poll_interval": 60  # 调度器空闲时重新扫描活动目录的间隔（秒），可看到其他进程添加或取消的活动
+                },
+                "dry_run": {
+                    "latency": 1.0,  # 预估发送时假定每条消息的发送耗时（秒）
+                    "failure_rate": 0.0  # 预估发送时假定的发送失败率
+                }
             },
             "contacts": {
                 "data_file": "data/contacts.json",
                 "backup_dir": "data/backups",
-                "auto_backup": True
+                "auto_backup": True,
+                "backup": {
+                    "compress": False,  # 备份是否gzip压缩
+                    "keep_last": 20,    # 保留最近N个备份
+                    "keep_hourly": 24,  # 保留最近N小时每小时最新的备份
+                    "keep_daily": 30    # 保留最近N天每天最新的备份
+                },
+                "autosave_delay": 0,  # 延迟合并写入间隔（秒），0表示每次修改立即写入
+                "storage": "json",  # 存储后端: json 每次重写快照, journal 追加日志, sqlite 数据库
+                "format": "json",  # 快照格式: json 原有格式, binary 紧凑二进制格式（加载时自动识别）
+                "compression": "none",  # 快照压缩: none, gzip, zstd（需安装zstandard）
+                "journal_compact_threshold": 10000,  # 日志达到该行数时压缩为快照
+                "sqlite_file": "",  # 为空时使用数据目录下的 biaoqian.db
+                "lock_timeout": 30,  # 其他进程正在读写数据目录时最多等待的秒数
+                "columnar": False  # 内存中只保存列式表，联系人字典按需生成（大量联系人时节省内存，SQLite后端不适用）
             },
             "friend_details": {
-                "data_file": "data/friend_details.json"
+                "data_file": "data/friend_details.json",
+                "storage": "json",  # 存储后端: json 或 sqlite
+                "format": "json",  # 数据文件格式: json 或 binary（加载时自动识别）
+                "compression": "none",  # 数据文件压缩: none, gzip, zstd（需安装zstandard）
+                "sqlite_file": "",  # 为空时使用数据目录下的 biaoqian.db
+                "harvest_chunk_size": 200,  # 分块采集每块好友数
+                "harvest_max_retries": 3  # 每块获取失败的重试次数
             },
             "logging": {
                 "level": "INFO",
@@ -123,12 +209,9 @@ class Config:
         """
         config_path = Path(self._config_file)
         
-        # 确保目录存在
-        config_path.parent.mkdir(parents=True, exist_ok=True)
-        
         try:
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(self._config_data, f, ensure_ascii=False, indent=2)
+            # 先写临时文件再替换，崩溃时不会留下写了一半的配置文件
+            atomic_write_json(config_path, self._config_data)
             print(f"配置已保存到: {config_path}")
             return True
         except Exception as e:
@@ -173,4 +256,7 @@ class Config:
         config[parts[-1]] = value
         
         # 保存配置
-        return self.save()
\ No newline at end of file
+        return self.save()
+
+# 全局配置实例，供其他模块通过 from config.settings import config 使用
+config = Config()
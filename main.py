@@ -2,6 +2,9 @@
 # 变更记录: [2024-12-19 14:30] @李祥光 [初始创建]########
 # 变更记录: [2024-12-19 19:15] @李祥光 [修复wxauto V2 API兼容性，添加手动添加联系人功能]########
 # 变更记录: [2025-06-30 10:30] @李祥光 [添加获取好友详细信息功能]########
+# 变更记录: [2026-10-17 21:50] @李祥光 [按标签发送支持输入计划发送时间，保存为定时发送活动]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [移除未使用的wxautox导入，微信调用统一通过utils.transport传输层]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [按标签发送前可先预估发送耗时、每小时发送量和完成时间（不发送）]########
 # 输入: 命令行参数或交互式输入 | 输出: 发送结果状态###############
 
 import sys
@@ -9,18 +12,19 @@ import os
 import json
 from datetime import datetime
 from typing import List, Dict, Optional
-from wxautox import WeChat
-from config.settings import Config
+from config.settings import Config, config
 from utils.logger import Logger
 from utils.contact_manager import ContactManager
 from utils.message_sender import MessageSender
 from utils.friend_details import FriendDetailsManager
+from utils.campaign_scheduler import CampaignScheduler, SendingWindows
 
 ###########################文件下的所有函数###########################
 """
 main：程序主入口函数
 show_menu：显示交互菜单
 handle_send_by_tag：处理按标签发送消息
+show_dry_run_report：显示预估发送结果
 handle_list_contacts：处理列出联系人
 handle_manage_tags：处理标签管理
 handle_add_contact：处理手动添加联系人
@@ -47,6 +51,9 @@ flowchart TD
     F -->|6| P[handle_get_friend_details]
     F -->|0| J[退出程序]
     G --> K[MessageSender.send_by_tag]
+    G -->|输入了计划时间| K2[CampaignScheduler.schedule]
+    G -->|先预估| K3[MessageSender.simulate_send]
+    K3 --> K4[show_dry_run_report]
     H --> L[ContactManager.list_contacts]
     I --> M[ContactManager.manage_tags]
     P --> Q[FriendDetailsManager.get_friend_details]
@@ -76,7 +83,7 @@ def handle_send_by_tag():
     输入: 用户交互输入 | 输出: 发送结果状态
     """
     try:
-        tag = input("请输入要发送的标签名: ").strip()
+        tag = input("请输入要发送的标签名或标签表达式(如: VIP AND 上海 AND NOT 已退订): ").strip()
         if not tag:
             print("标签名不能为空！")
             return
@@ -86,6 +93,24 @@ def handle_send_by_tag():
             print("消息内容不能为空！")
             return
         
+        run_at = input("请输入计划发送时间(如: 2026-10-18 09:00，留空立即发送): ").strip()
+        
+        if input("是否先预估发送耗时（不发送）？(y/N): ").strip().lower() == 'y':
+            # 定时发送按发送时段预估，立即发送不受发送时段限制
+            start = datetime.fromisoformat(run_at) if run_at else None
+            windows = SendingWindows.from_config(config) if run_at else None
+            show_dry_run_report(MessageSender().simulate_send(tag, message, start=start, windows=windows))
+            if input("是否继续发送？(y/N): ").strip().lower() != 'y':
+                return
+        
+        if run_at:
+            scheduler = CampaignScheduler(None, config.get('message.schedule.dir', 'data/schedule'),
+                                          SendingWindows.from_config(config))
+            campaign = scheduler.schedule(tag, message, datetime.fromisoformat(run_at))
+            print(f"✅ 已添加定时发送活动 {campaign['schedule_id']}，计划时间 {campaign['run_at']}")
+            print("   请运行 python -m utils.campaign_scheduler run 执行定时发送")
+            return
+        
         sender = MessageSender()
         result = sender.send_by_tag(tag, message)
         
@@ -98,3 +123,32 @@ def handle_send_by_tag():
             
     except Exception as e:
         print(f"❌ 发送过程中出现错误: {str(e)}")
+
+def show_dry_run_report(result: Dict) -> None:
+    """
+    show_dry_run_report 功能说明:
+    显示预估发送结果：收件人数量、消息检查结果、预计耗时、完成时间和每小时发送量
+    输入: result (Dict) MessageSender.simulate_send 的结果 | 输出: 无
+    """
+    if 'estimate' not in result:
+        print(f"❌ 预估失败: {result.get('error', '未知错误')}")
+        return
+    
+    estimate = result['estimate']
+    print(f"\n📋 预估结果（未发送）：共 {result['total']} 个联系人，将发送 {result['to_send']} 个，"
+          f"已发送过跳过 {result['skipped_count']} 个")
+    if result['render_errors']:
+        print(f"⚠️ {len(result['render_errors'])} 个联系人的消息无法生成，如: "
+              f"{next(iter(result['render_errors'].values()))}")
+    if result['empty_messages'] or result['long_messages']:
+        print(f"⚠️ 空消息 {result['empty_messages']} 条，超过1000字的消息 {result['long_messages']} 条")
+    for sample in result['samples']:
+        print(f"   示例 {sample['name']}: {sample['message']}")
+    print(f"⏱️ 预计耗时 {estimate['duration'] / 3600:.2f} 小时"
+          f"（其中发送时段外暂停 {estimate['paused_seconds'] / 3600:.2f} 小时）")
+    print(f"   开始时间 {estimate['start_at']}，预计完成时间 {estimate['finish_at']}")
+    print(f"   每小时最多发送 {estimate['peak_per_hour']} 条，预计失败 {estimate['expected_failed']} 条")
+    for item in estimate['hourly'][:24]:
+        print(f"   {item['hour']}  {item['count']}")
+    if len(estimate['hourly']) > 24:
+        print(f"   ... 共 {len(estimate['hourly'])} 个小时")
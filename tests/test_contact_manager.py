@@ -0,0 +1,976 @@
+##########test_contact_manager.py: 联系人管理模块测试 ##################
+# 变更记录: [2026-10-17 09:10] @李祥光 [初始创建，覆盖标签倒排索引]########
+# 变更记录: [2026-10-17 09:40] @李祥光 [新增标签布尔表达式测试]########
+# 变更记录: [2026-10-17 10:20] @李祥光 [新增批量事务和延迟写入测试]########
+# 变更记录: [2026-10-17 11:00] @李祥光 [新增追加日志存储测试]########
+# 变更记录: [2026-10-17 11:45] @李祥光 [新增SQLite存储和迁移测试]########
+# 变更记录: [2026-10-17 12:30] @李祥光 [新增备份去重和保留策略测试]########
+# 变更记录: [2026-10-17 13:10] @李祥光 [新增批量导入测试]########
+# 变更记录: [2026-10-17 13:50] @李祥光 [新增搜索索引测试]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [新增原子写入、进程锁和损坏恢复测试]########
+# 变更记录: [2026-10-17 15:10] @李祥光 [新增列式联系人表测试]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [新增数据文件序列化格式测试]########
+# 变更记录: [2026-10-18 10:10] @李祥光 [新增管理器打开期间其他进程可读写数据目录的测试]########
+# 变更记录: [2026-10-18 11:50] @李祥光 [新增列式表增量更新测试]########
+# 变更记录: [2026-10-18 12:30] @李祥光 [新增SQLite后端按需查询与内存索引结果一致的测试]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [新增两个管理器交替写入同一数据文件时双方修改都保留的测试]########
+# 变更记录: [2026-10-18 14:40] @李祥光 [新增含运算符字符的标签按字面匹配的回归测试]########
+# 变更记录: [2026-10-18 16:40] @李祥光 [SQLite按需查询测试新增视图只读的断言]########
+# 变更记录: [2026-10-18 18:00] @李祥光 [新增列式模式与字典模式结果一致的测试，make_manager支持管理器参数]########
+# 变更记录: [2026-10-18 18:40] @李祥光 [新增后台备份不等待管理器锁、读取期间文件被替换时重读的测试]########
+# 输入: 测试用例 | 输出: 测试结果###############
+
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.contact_manager import ContactManager
+from utils.tag_query import TagQuery, TagQueryError
+from utils.sqlite_store import SQLiteFriendStore, migrate_json_to_sqlite
+from utils.backup_manager import BackupManager
+from utils import contact_search
+from utils.atomic_file import FileLock, atomic_write_json
+from utils.contact_table import ContactTable
+from utils import serializer
+from utils.contact_store import create_contact_store
+
+###########################文件下的所有函数###########################
+"""
+make_manager：在临时目录中创建联系人管理器
+TestContactIndex.test_tag_lookup_matches_scan：测试标签索引与顺序扫描结果一致
+TestContactIndex.test_index_follows_mutations：测试增删标签后索引同步更新
+TestTagQuery.test_boolean_query：测试标签布尔表达式查询
+TestTagQuery.test_plain_tag_and_errors：测试单标签兼容和语法错误
+TestTagQuery.test_tags_that_look_like_operators：测试含运算符字符的标签按字面匹配
+TestBatchWrites.test_batch_writes_once：测试批量事务只写入一次
+TestBatchWrites.test_autosave_coalesces_writes：测试延迟写入合并多次修改
+TestJournalStore.test_replay_and_torn_write：测试日志重放和末尾不完整记录的截断
+TestJournalStore.test_compaction：测试日志达到阈值后压缩为快照
+TestSQLiteStore.test_migrate_and_mutate：测试JSON迁移到SQLite后的修改和重新加载
+TestSQLiteStore.test_queries_on_demand：测试SQLite后端不整体加载联系人，查询结果与内存索引一致，视图只读
+TestBackups.test_dedupe_and_retention：测试备份内容去重、压缩和保留策略
+TestBackups.test_manager_backs_up_in_background：测试联系人保存后在后台备份
+TestBackups.test_backup_does_not_wait_for_manager_lock：测试后台备份读取文件时不等待管理器的锁
+TestBackups.test_backup_rereads_replaced_file：测试读取期间文件被原子替换时重新读取
+TestImport.test_import_csv_and_jsonl：测试CSV和JSONL批量导入的统计结果
+TestSearch.test_ranking_and_updates：测试搜索结果排序和索引增量更新
+TestSearch.test_pinyin_match：测试拼音全拼和首字母匹配
+TestDurability.test_atomic_write_keeps_old_file：测试写入失败时保留原文件
+TestDurability.test_lock_blocks_other_process：测试数据目录锁阻止其他进程
+TestDurability.test_open_manager_allows_other_process：测试管理器打开期间其他进程仍可读写
+TestDurability.test_two_managers_keep_both_writes：测试两个管理器交替写入同一数据文件时双方的修改都保留
+TestDurability.test_recover_from_backup：测试数据文件损坏时从备份恢复
+TestContactTable.test_round_trip：测试列式表还原的字典与原字典一致
+TestContactTable.test_filter_matches_scan：测试向量化筛选与逐个判断结果一致
+TestContactTable.test_columnar_manager：测试列式模式只保存列式表，查询和修改结果与字典模式一致
+TestContactTable.test_incremental_update：测试联系人修改后列式表增量更新而不是重建
+TestSerializer.test_round_trip_and_detect：测试各格式读写一致、自动识别和损坏检测
+TestSerializer.test_store_reads_any_format：测试存储后端按配置格式写入并能读取任意格式
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[unittest.main] --> B[TestContactIndex]
+    A --> E[TestTagQuery]
+    A --> F[TestBatchWrites]
+    A --> G[TestJournalStore]
+    A --> H[TestSQLiteStore]
+    A --> I[TestBackups]
+    A --> J[TestImport]
+    A --> K[TestSearch]
+    A --> L[TestDurability]
+    A --> M[TestContactTable]
+    A --> N[TestSerializer]
+    F --> C
+    B --> C[make_manager]
+    E --> C
+    C --> D[ContactManager]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+def make_manager(test_case: unittest.TestCase, contacts: list, **options) -> ContactManager:
+    """
+    make_manager 功能说明:
+    在临时目录中写入联系人数据并创建联系人管理器，测试结束后自动清理
+    输入: test_case (TestCase) 当前测试, contacts (list) 初始联系人, options 其他管理器参数（如 columnar） |
+          输出: ContactManager 联系人管理器
+    """
+    temp_dir = Path(tempfile.mkdtemp())
+    test_case.addCleanup(shutil.rmtree, temp_dir, True)
+    data_file = temp_dir / 'contacts.json'
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump({'contacts': contacts}, f, ensure_ascii=False)
+    manager = ContactManager(str(data_file), **options)
+    # 清理临时目录前等待后台备份完成
+    test_case.addCleanup(manager.backups.wait)
+    return manager
+
+class TestContactIndex(unittest.TestCase):
+    """
+    TestContactIndex 功能说明:
+    测试联系人姓名索引和标签倒排索引
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        contacts = [
+            {'name': f'联系人{i}', 'type': 'friend', 'tags': ['全部'] + (['VIP'] if i % 3 == 0 else [])}
+            for i in range(30)
+        ]
+        self.manager = make_manager(self, contacts)
+
+    def test_tag_lookup_matches_scan(self):
+        """
+        test_tag_lookup_matches_scan 功能说明:
+        测试按标签查询的结果与顺序扫描的结果完全一致（包括顺序）
+        输入: 无 | 输出: 断言结果
+        """
+        for tag in ['VIP', '全部', '不存在']:
+            expected = [c for c in self.manager.contacts if tag in c.get('tags', [])]
+            self.assertEqual(self.manager.get_contacts_by_tag(tag), expected)
+        self.assertEqual(self.manager.get_all_tags(), {'VIP', '全部'})
+
+    def test_index_follows_mutations(self):
+        """
+        test_index_follows_mutations 功能说明:
+        测试添加联系人、添加和移除标签后索引同步更新
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertTrue(self.manager.add_contact('新联系人', tags=['新标签']))
+        self.assertTrue(self.manager.add_tag('联系人1', '新标签'))
+        names = [c['name'] for c in self.manager.get_contacts_by_tag('新标签')]
+        self.assertEqual(names, ['联系人1', '新联系人'])
+
+        self.assertTrue(self.manager.remove_tag('联系人1', '新标签'))
+        self.assertTrue(self.manager.remove_tag('新联系人', '新标签'))
+        self.assertNotIn('新标签', self.manager.get_all_tags())
+        self.assertFalse(self.manager.has_tag('联系人1', '新标签'))
+        self.assertFalse(self.manager.add_tag('不存在的人', 'VIP'))
+
+class TestTagQuery(unittest.TestCase):
+    """
+    TestTagQuery 功能说明:
+    测试标签布尔表达式的解析和集合运算
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        contacts = [
+            {'name': '张三', 'tags': ['VIP', '上海']},
+            {'name': '李四', 'tags': ['VIP', '上海', '已退订']},
+            {'name': '王五', 'tags': ['VIP', '北京']},
+            {'name': '赵六', 'tags': ['上海']},
+            {'name': '钱七', 'tags': ['老客户 重点']},
+        ]
+        self.manager = make_manager(self, contacts)
+
+    def names(self, expression: str) -> list:
+        return [c['name'] for c in self.manager.query_contacts(expression)]
+
+    def test_boolean_query(self):
+        """
+        test_boolean_query 功能说明:
+        测试 AND / OR / NOT、括号和优先级，结果去重且保持原有顺序
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertEqual(self.names('VIP AND 上海 AND NOT 已退订'), ['张三'])
+        self.assertEqual(self.names('北京 OR 上海 OR VIP'), ['张三', '李四', '王五', '赵六'])
+        self.assertEqual(self.names('(北京 OR 上海) AND NOT VIP'), ['赵六'])
+        self.assertEqual(self.names('NOT VIP'), ['赵六', '钱七'])
+        self.assertEqual(self.names('VIP & ! 上海'), ['王五'])
+        self.assertEqual(self.names('"老客户 重点" OR 北京'), ['王五', '钱七'])
+
+    def test_plain_tag_and_errors(self):
+        """
+        test_plain_tag_and_errors 功能说明:
+        测试不含运算符的表达式按单个标签处理，以及语法错误的提示
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertEqual(self.names('老客户 重点'), ['钱七'])
+        self.assertTrue(TagQuery('VIP').is_simple())
+        for expression in ['VIP AND', '(VIP OR 上海', 'VIP 上海 AND 北京', '']:
+            with self.assertRaises(TagQueryError):
+                TagQuery(expression)
+
+    def test_tags_that_look_like_operators(self):
+        """
+        test_tags_that_look_like_operators 功能说明:
+        测试标签名中含有 &、!、小写 not 等字符时按字面匹配，不被当成运算符或报语法错误
+        输入: 无 | 输出: 断言结果
+        """
+        for name, tag in [('孙八', 'R&D'), ('周九', 'Not interested'), ('吴十', 'VIP!'), ('郑十一', 'Q&A 群')]:
+            self.manager.add_contact(name, tags=[tag])
+
+        self.assertEqual(self.names('R&D'), ['孙八'])
+        self.assertEqual(self.names('Not interested'), ['周九'])
+        self.assertEqual(self.names('VIP!'), ['吴十'])
+        self.assertEqual(self.names('Q&A 群'), ['郑十一'])
+        # 不存在的同名标签也不会被拆开解析
+        for expression in ['X&Y', 'not sure', 'Hi!', 'A&B 群']:
+            self.assertTrue(TagQuery(expression).is_simple())
+        # 组合查询中仍可直接引用这些标签，大写关键字和独立符号照常生效
+        self.assertEqual(self.names('R&D OR VIP!'), ['孙八', '吴十'])
+        self.assertEqual(self.names('VIP AND NOT 上海'), ['王五'])
+        self.assertEqual(self.names('"Q&A 群" | 北京'), ['王五', '郑十一'])
+
+class TestBatchWrites(unittest.TestCase):
+    """
+    TestBatchWrites 功能说明:
+    测试批量事务和延迟合并写入
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        contacts = [{'name': f'联系人{i}', 'tags': []} for i in range(100)]
+        self.manager = make_manager(self, contacts)
+
+    def test_batch_writes_once(self):
+        """
+        test_batch_writes_once 功能说明:
+        测试批量事务和批量打标签接口只写入一次文件，且写入内容完整
+        输入: 无 | 输出: 断言结果
+        """
+        names = [f'联系人{i}' for i in range(100)]
+        with mock.patch.object(self.manager, 'save_contacts', wraps=self.manager.save_contacts) as save:
+            with self.manager.batch():
+                for name in names[:50]:
+                    self.manager.add_tag(name, '活动A')
+                self.manager.add_contact('新联系人', tags=['活动A'])
+            self.assertEqual(save.call_count, 1)
+
+            result = self.manager.add_tags(names + ['不存在'], '活动B')
+            self.assertEqual(save.call_count, 2)
+        self.assertEqual(result, {'added': 100, 'existing': 0, 'missing': 1})
+
+        with open(self.manager.data_file, 'r', encoding='utf-8') as f:
+            saved = json.load(f)['contacts']
+        self.assertEqual(sum('活动A' in c['tags'] for c in saved), 51)
+        self.assertEqual(sum('活动B' in c['tags'] for c in saved), 100)
+
+    def test_autosave_coalesces_writes(self):
+        """
+        test_autosave_coalesces_writes 功能说明:
+        测试开启延迟写入后多次修改合并为一次写入
+        输入: 无 | 输出: 断言结果
+        """
+        self.manager.enable_autosave(0.05)
+        self.addCleanup(self.manager.enable_autosave, 0)
+        with mock.patch.object(self.manager, 'save_contacts', wraps=self.manager.save_contacts) as save:
+            for i in range(20):
+                self.manager.add_tag(f'联系人{i}', '延迟')
+            self.assertEqual(save.call_count, 0)
+            time.sleep(0.3)
+            self.assertEqual(save.call_count, 1)
+
+class TestJournalStore(unittest.TestCase):
+    """
+    TestJournalStore 功能说明:
+    测试快照 + 追加日志存储后端
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.data_file = self.temp_dir / 'contacts.json'
+        with open(self.data_file, 'w', encoding='utf-8') as f:
+            json.dump({'contacts': [{'name': '张三', 'tags': []}]}, f, ensure_ascii=False)
+
+    def open_manager(self) -> ContactManager:
+        manager = ContactManager(str(self.data_file), autosave_delay=0, storage='journal')
+        self.addCleanup(manager.backups.wait)
+        return manager
+
+    def test_replay_and_torn_write(self):
+        """
+        test_replay_and_torn_write 功能说明:
+        测试修改只追加日志不重写快照，重新加载后状态一致；末尾写了一半的记录被丢弃
+        输入: 无 | 输出: 断言结果
+        """
+        manager = self.open_manager()
+        snapshot_before = self.data_file.read_bytes()
+        manager.add_contact('李四', tags=['VIP'])
+        manager.add_tag('张三', 'VIP')
+        manager.remove_tag('李四', 'VIP')
+        manager.update_contact('张三', last_contact='2026-10-17T10:00:00')
+        self.assertEqual(self.data_file.read_bytes(), snapshot_before)
+
+        with open(manager.store.journal_file, 'ab') as f:
+            f.write(b'{"op":"tag","name":"\xe5\xbc\xa0')
+
+        reloaded = self.open_manager()
+        self.assertEqual(reloaded.contacts, manager.contacts)
+        self.assertEqual([c['name'] for c in reloaded.get_contacts_by_tag('VIP')], ['张三'])
+        self.assertTrue(manager.store.journal_file.read_bytes().endswith(b'\n'))
+
+    def test_compaction(self):
+        """
+        test_compaction 功能说明:
+        测试日志行数达到阈值时写入快照并清空日志，重新加载后数据完整
+        输入: 无 | 输出: 断言结果
+        """
+        manager = self.open_manager()
+        manager.store.compact_threshold = 10
+        for i in range(25):
+            manager.add_contact(f'联系人{i}', tags=['批量'])
+
+        self.assertLess(manager.store.journal_file.stat().st_size, 10 * 400)
+        reloaded = self.open_manager()
+        self.assertEqual(len(reloaded.get_contacts_by_tag('批量')), 25)
+        self.assertEqual(reloaded.contacts, manager.contacts)
+
+class TestSQLiteStore(unittest.TestCase):
+    """
+    TestSQLiteStore 功能说明:
+    测试SQLite存储后端和JSON迁移工具
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_migrate_and_mutate(self):
+        """
+        test_migrate_and_mutate 功能说明:
+        测试迁移JSON数据后，在SQLite后端上修改联系人并重新加载，结果与修改后的内存状态一致
+        输入: 无 | 输出: 断言结果
+        """
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        contacts_file = temp_dir / 'contacts.json'
+        friends_file = temp_dir / 'friend_details.json'
+        db_file = temp_dir / 'biaoqian.db'
+        with open(contacts_file, 'w', encoding='utf-8') as f:
+            json.dump({'contacts': [{'name': '张三', 'type': 'friend', 'tags': ['VIP', '上海']},
+                                    {'name': '李四', 'type': 'friend', 'tags': ['上海']}]}, f, ensure_ascii=False)
+        with open(friends_file, 'w', encoding='utf-8') as f:
+            json.dump({'friend_details': [{'昵称': '张三', '微信号': 'zhangsan', '备注': '老张'}]}, f, ensure_ascii=False)
+
+        result = migrate_json_to_sqlite(str(contacts_file), str(friends_file), str(db_file))
+        self.assertEqual(result, {'contacts': 2, 'friends': 1})
+
+        manager = ContactManager(str(contacts_file), autosave_delay=0, storage='sqlite')
+        self.addCleanup(manager.store.conn.close)
+        self.addCleanup(manager.backups.wait)
+        with manager.batch():
+            manager.add_contact('王五', tags=['VIP'])
+            manager.remove_tag('张三', '上海')
+            manager.add_tag('李四', 'VIP')
+
+        reloaded = ContactManager(str(contacts_file), autosave_delay=0, storage='sqlite')
+        self.addCleanup(reloaded.store.conn.close)
+        self.addCleanup(reloaded.backups.wait)
+        self.assertEqual(reloaded.list_contacts(), manager.list_contacts())
+        self.assertEqual(reloaded.store.names_by_tag('VIP'), ['张三', '李四', '王五'])
+
+        friend_store = SQLiteFriendStore(db_file)
+        self.addCleanup(friend_store.conn.close)
+        self.assertEqual(friend_store.find_by_name('老张')[0]['微信号'], 'zhangsan')
+
+    def test_queries_on_demand(self):
+        """
+        test_queries_on_demand 功能说明:
+        测试SQLite后端加载时不读取全部联系人，标签查询、表达式查询、筛选和修改后的结果
+        与JSON后端的内存索引一致
+        输入: 无 | 输出: 断言结果
+        """
+        contacts = [{'name': f'联系人{i}', 'type': 'group' if i % 4 == 0 else 'friend',
+                     'tags': (['VIP'] if i % 2 == 0 else []) + (['已退订'] if i % 5 == 0 else []),
+                     'last_contact': None, 'created_at': f'2026-01-{i % 28 + 1:02d}T08:00:00',
+                     'updated_at': f'2026-02-{i % 28 + 1:02d}T09:30:00.{i:06d}'} for i in range(1, 40)]
+        contacts.append({'name': '旧数据', 'tags': [], 'updated_at': '2026-02-15T00:00:00+08:00'})
+        memory = make_manager(self, contacts)
+        contacts_file = memory.data_file
+        migrate_json_to_sqlite(str(contacts_file), None, str(contacts_file.parent / 'biaoqian.db'))
+        with mock.patch('utils.sqlite_store.SQLiteContactStore.load', side_effect=AssertionError('整体加载')):
+            manager = ContactManager(str(contacts_file), autosave_delay=0, storage='sqlite')
+        self.addCleanup(manager.store.conn.close)
+        self.addCleanup(manager.backups.wait)
+
+        with mock.patch('utils.contact_manager.datetime') as clock:
+            clock.now.return_value = datetime(2026, 2, 18, 12, 0)
+            for current in (memory, manager):
+                current.add_tag('联系人1', 'VIP')
+                current.remove_tag('联系人2', 'VIP')
+                current.update_contact('联系人3', type='group', updated_at='2026-02-12T00:00:00')
+                current.add_contact('新联系人', 'friend', ['VIP'])
+
+        self.assertEqual(manager.get_contact_count(), memory.get_contact_count())
+        self.assertEqual(manager.get_contact('联系人1'), memory.get_contact('联系人1'))
+        self.assertIsNone(manager.get_contact('不存在'))
+        self.assertEqual(manager.get_all_tags(), memory.get_all_tags())
+        self.assertTrue(manager.has_tag('联系人1', 'VIP'))
+        self.assertFalse(manager.has_tag('联系人2', 'VIP'))
+        self.assertEqual(manager.get_contacts_by_tag('VIP'), memory.get_contacts_by_tag('VIP'))
+        self.assertEqual(manager.query_contacts('VIP AND NOT 已退订'), memory.query_contacts('VIP AND NOT 已退订'))
+        conditions = [
+            {'tags': ['VIP'], 'exclude_tags': ['已退订'], 'types': ['friend']},
+            {'any_tags': ['VIP', '已退订'], 'since': '2026-02-10', 'until': '2026-02-20'},
+            {'any_tags': [], 'types': ['group']},
+            {'since': datetime(2026, 1, 10), 'date_field': 'created_at'},
+        ]
+        for condition in conditions:
+            expected = memory.filter_contacts(**condition)
+            self.assertEqual(manager.filter_contacts(**condition), expected, condition)
+        self.assertTrue(memory.filter_contacts(**conditions[1]))
+        self.assertEqual(manager.list_contacts(), memory.list_contacts())
+
+        # 视图只读：绕过 ContactManager 的修改直接报错，而不是静默丢弃
+        with self.assertRaises(AttributeError):
+            manager.contacts.append({'name': '直接追加', 'tags': []})
+        with self.assertRaises(AttributeError):
+            manager._tag_index.setdefault('VIP', set())
+        with self.assertRaises(TypeError):
+            del manager._tag_index['VIP']
+        with self.assertRaises(TypeError):
+            manager._by_name['直接追加'] = {'name': '直接追加'}
+        self.assertNotIn('直接追加', manager._by_name)
+
+class TestBackups(unittest.TestCase):
+    """
+    TestBackups 功能说明:
+    测试备份管理器
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_dedupe_and_retention(self):
+        """
+        test_dedupe_and_retention 功能说明:
+        测试内容未变化时不重复备份，压缩备份可还原，超出保留数量的旧备份被清理
+        输入: 无 | 输出: 断言结果
+        """
+        source = self.temp_dir / 'contacts.json'
+        backups = BackupManager(self.temp_dir / 'backups', compress=True,
+                                keep_last=3, keep_hourly=0, keep_daily=0)
+
+        source.write_bytes(b'version-0')
+        first = backups.backup_now(source)
+        self.assertIsNotNone(first)
+        self.assertIsNone(backups.backup_now(source))
+        self.assertEqual(backups.read_backup(first), b'version-0')
+
+        for i in range(1, 6):
+            source.write_bytes(f'version-{i}'.encode())
+            backups.backup_now(source)
+
+        kept = backups.list_backups()
+        self.assertEqual([backups.read_backup(p) for p in kept], [b'version-5', b'version-4', b'version-3'])
+
+    def test_manager_backs_up_in_background(self):
+        """
+        test_manager_backs_up_in_background 功能说明:
+        测试联系人管理器保存后提交后台备份，相同内容只备份一次
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, [{'name': '张三', 'tags': []}])
+        # 启动备份在后台执行，先等它读取加载时的文件再修改
+        manager.backups.wait()
+        manager.add_tag('张三', 'VIP')
+        manager.backups.wait()
+
+        contents = [json.loads(manager.backups.read_backup(p))['contacts'] for p in manager.backups.list_backups()]
+        self.assertEqual(len(contents), 2)
+        self.assertEqual(contents[0][0]['tags'], ['VIP'])
+        self.assertEqual(contents[1][0]['tags'], [])
+
+    def test_backup_does_not_wait_for_manager_lock(self):
+        """
+        test_backup_does_not_wait_for_manager_lock 功能说明:
+        测试其他线程持有管理器的锁时，后台备份仍能完成
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, [{'name': '张三', 'tags': []}])
+        manager.backups.wait()
+        manager.contacts[0]['tags'] = ['VIP']
+        manager.save_contacts()
+
+        waiter = threading.Thread(target=manager.backups.wait, daemon=True)
+        with manager._lock:
+            # 模拟修改联系人的线程长时间持有锁，备份线程不应被阻塞
+            manager.backup_data()
+            waiter.start()
+            waiter.join(timeout=5)
+            self.assertFalse(waiter.is_alive())
+        self.assertEqual(len(manager.backups.list_backups()), 2)
+
+    def test_backup_rereads_replaced_file(self):
+        """
+        test_backup_rereads_replaced_file 功能说明:
+        测试读取源文件期间文件被原子替换时，重新读取并备份新版本
+        输入: 无 | 输出: 断言结果
+        """
+        source = self.temp_dir / 'contacts.json'
+        source.write_bytes(b'version-0')
+        backups = BackupManager(self.temp_dir / 'backups')
+        original_read = Path.read_bytes
+        replaced = []
+
+        def read_then_replace(path):
+            data = original_read(path)
+            if not replaced:
+                replaced.append(path)
+                staged = self.temp_dir / 'contacts.json.tmp'
+                staged.write_bytes(b'version-1-longer')
+                staged.replace(source)
+            return data
+
+        with mock.patch.object(Path, 'read_bytes', read_then_replace):
+            backup = backups.backup_now(source)
+
+        self.assertEqual(replaced, [source])
+        self.assertEqual(backups.read_backup(backup), b'version-1-longer')
+
+class TestImport(unittest.TestCase):
+    """
+    TestImport 功能说明:
+    测试联系人批量导入
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_import_csv_and_jsonl(self):
+        """
+        test_import_csv_and_jsonl 功能说明:
+        测试导入时合并重复行、跳过空姓名、已有联系人只合并新标签，且整个导入只写入一次
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, [{'name': '张三', 'type': 'friend', 'tags': ['VIP']}])
+        csv_file = manager.data_file.parent / 'import.csv'
+        csv_file.write_text(
+            '姓名,标签,微信号\n'
+            '张三,VIP，上海,zhangsan\n'
+            '李四,上海;北京,lisi\n'
+            '李四,深圳,\n'
+            ',无名,\n',
+            encoding='utf-8'
+        )
+
+        with mock.patch.object(manager, 'save_contacts', wraps=manager.save_contacts) as save:
+            result = manager.import_contacts(str(csv_file), extra_tags=['导入'])
+            self.assertEqual(save.call_count, 1)
+
+        self.assertTrue(result['success'])
+        self.assertEqual((result['inserted'], result['updated'], result['skipped']), (1, 1, 2))
+        self.assertEqual(manager.get_contact('张三')['tags'], ['VIP', '上海', '导入'])
+        self.assertEqual(manager.get_contact('李四')['tags'], ['上海', '北京', '深圳', '导入'])
+        self.assertEqual(manager.get_contact('李四')['wxid'], 'lisi')
+
+        jsonl_file = manager.data_file.parent / 'import.jsonl'
+        jsonl_file.write_text('{"name": "王五", "tags": ["VIP"]}\n{"name": "张三", "tags": ["VIP"]}\n',
+                              encoding='utf-8')
+        result = manager.import_contacts(str(jsonl_file))
+        self.assertEqual((result['inserted'], result['updated'], result['skipped']), (1, 0, 1))
+        self.assertEqual(len(manager.get_contacts_by_tag('VIP')), 2)
+
+class TestSearch(unittest.TestCase):
+    """
+    TestSearch 功能说明:
+    测试联系人搜索索引
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.manager = make_manager(self, [
+            {'name': '老张三', 'type': 'friend', 'tags': ['同事']},
+            {'name': '李四', 'type': 'friend', 'tags': ['张三的朋友']},
+            {'name': '张三丰', 'type': 'friend', 'tags': []},
+            {'name': '张三', 'type': 'friend', 'tags': ['VIP']},
+            {'name': 'Alice', 'type': 'friend', 'tags': ['vip']},
+        ])
+
+    def names(self, keyword: str, limit=None) -> list:
+        return [c['name'] for c in self.manager.search_contacts(keyword, limit)]
+
+    def test_ranking_and_updates(self):
+        """
+        test_ranking_and_updates 功能说明:
+        测试结果与原有子串匹配的集合一致，并按 完全匹配 > 前缀 > 包含 > 标签 排序；
+        新增联系人和修改标签后无需重建即可搜到
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertEqual(self.names('张三'), ['张三', '张三丰', '老张三', '李四'])
+        self.assertEqual(self.names('张三', limit=2), ['张三', '张三丰'])
+        self.assertEqual(self.names(' VIP '), ['张三', 'Alice'])
+        self.assertEqual(self.names('ALI'), ['Alice'])
+        self.assertEqual(self.names('不存在'), [])
+        self.assertEqual(self.names(''), [])
+
+        self.manager.add_contact('王五', tags=['张三介绍'])
+        self.manager.add_tag('Alice', '张三')
+        self.manager.remove_tag('李四', '张三的朋友')
+        self.assertEqual(self.names('张三'), ['张三', '张三丰', '老张三', 'Alice', '王五'])
+
+    @unittest.skipIf(contact_search.lazy_pinyin is None, '未安装 pypinyin')
+    def test_pinyin_match(self):
+        """
+        test_pinyin_match 功能说明:
+        测试拼音首字母和全拼匹配
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertEqual(self.names('zs')[:2], ['张三', '张三丰'])
+        self.assertIn('李四', self.names('lisi'))
+        self.assertEqual(self.names('zhangsanf'), ['张三丰'])
+
+class TestDurability(unittest.TestCase):
+    """
+    TestDurability 功能说明:
+    测试原子写入、进程锁和损坏恢复
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_atomic_write_keeps_old_file(self):
+        """
+        test_atomic_write_keeps_old_file 功能说明:
+        测试替换文件前失败时原文件内容不变，且不留下临时文件
+        输入: 无 | 输出: 断言结果
+        """
+        target = self.temp_dir / 'data.json'
+        atomic_write_json(target, {'version': 1})
+        with mock.patch('os.replace', side_effect=OSError('磁盘已满')):
+            with self.assertRaises(OSError):
+                atomic_write_json(target, {'version': 2})
+        self.assertEqual(json.loads(target.read_text(encoding='utf-8')), {'version': 1})
+        self.assertEqual(sorted(p.name for p in self.temp_dir.iterdir()), ['data.json'])
+
+    def test_lock_blocks_other_process(self):
+        """
+        test_lock_blocks_other_process 功能说明:
+        测试同一进程可重复获取锁，另一个进程在锁释放前无法获取
+        输入: 无 | 输出: 断言结果
+        """
+        lock_file = self.temp_dir / '.biaoqian.lock'
+        script = (
+            'import sys; sys.path.insert(0, sys.argv[1])\n'
+            'from utils.atomic_file import FileLock, FileLockError\n'
+            'try:\n    FileLock(sys.argv[2]).acquire()\nexcept FileLockError:\n    sys.exit(3)\n'
+        )
+
+        def try_in_other_process() -> int:
+            return subprocess.run([sys.executable, '-c', script, str(project_root), str(lock_file)]).returncode
+
+        first, second = FileLock(lock_file).acquire(), FileLock(lock_file).acquire()
+        self.assertEqual(try_in_other_process(), 3)
+        first.release()
+        self.assertEqual(try_in_other_process(), 3)
+        second.release()
+        self.assertEqual(try_in_other_process(), 0)
+
+    def test_open_manager_allows_other_process(self):
+        """
+        test_open_manager_allows_other_process 功能说明:
+        测试联系人和好友详细信息管理器只在读写期间持有数据目录锁：打开期间另一个进程可以加载并写入，
+        另一个进程持有锁时，写入等待到锁释放
+        输入: 无 | 输出: 断言结果
+        """
+        from utils.friend_details import FriendDetailsManager
+
+        manager = make_manager(self, [{'name': '张三', 'tags': []}])
+        friends = FriendDetailsManager(str(manager.data_file.with_name('friend_details.json')), storage='json')
+        self.addCleanup(friends.close)
+        script = (
+            'import sys; sys.path.insert(0, sys.argv[1])\n'
+            'from utils.contact_manager import ContactManager\n'
+            'manager = ContactManager(sys.argv[2])\n'
+            'manager.add_tag("张三", "外部进程")\n'
+            'manager.close()\n'
+        )
+        completed = subprocess.run([sys.executable, '-c', script, str(project_root), str(manager.data_file)],
+                                   capture_output=True, cwd=str(self.temp_dir))
+        self.assertEqual(completed.returncode, 0, completed.stderr.decode('utf-8', 'replace'))
+        reloaded = ContactManager(str(manager.data_file))
+        self.addCleanup(reloaded.close)
+        self.assertIn('外部进程', reloaded.get_contact('张三')['tags'])
+
+        # 另一个进程持有锁时写入等待，锁释放后继续
+        holder = subprocess.Popen(
+            [sys.executable, '-c', 'import sys, time; sys.path.insert(0, sys.argv[1])\n'
+             'from utils.atomic_file import FileLock\n'
+             'lock = FileLock(sys.argv[2]).acquire(); print("locked", flush=True); time.sleep(1)',
+             str(project_root), str(manager.data_file.with_name('.biaoqian.lock'))],
+            stdout=subprocess.PIPE)
+        self.addCleanup(holder.wait)
+        self.assertEqual(holder.stdout.readline().strip(), b'locked')
+        holder.stdout.close()
+        started = time.monotonic()
+        self.assertTrue(manager.add_tag('张三', 'VIP'))
+        self.assertGreater(time.monotonic() - started, 0.3)
+        self.assertIn('VIP', json.loads(manager.data_file.read_text(encoding='utf-8'))['contacts'][0]['tags'])
+
+    def test_two_managers_keep_both_writes(self):
+        """
+        test_two_managers_keep_both_writes 功能说明:
+        测试两个管理器（模拟两个进程）打开同一数据文件后交替修改，JSON和日志后端都保留双方的修改；
+        两个好友详细信息管理器分别合并不同好友时也不会互相覆盖
+        输入: 无 | 输出: 断言结果
+        """
+        from utils.friend_details import FriendDetailsManager
+
+        for storage in ('json', 'journal'):
+            with self.subTest(storage=storage):
+                data_file = self.temp_dir / storage / 'contacts.json'
+                data_file.parent.mkdir()
+                atomic_write_json(data_file, {'contacts': [{'name': '张三', 'tags': []}, {'name': '李四', 'tags': []}]})
+                first = ContactManager(str(data_file), autosave_delay=0, storage=storage)
+                second = ContactManager(str(data_file), autosave_delay=0, storage=storage)
+                self.addCleanup(first.backups.wait)
+                self.addCleanup(second.backups.wait)
+
+                self.assertTrue(first.add_tag('张三', 'A进程'))
+                self.assertTrue(second.add_tag('张三', 'B进程'))
+                with first.batch():
+                    first.add_tag('李四', 'A进程')
+                    first.add_contact('王五', tags=['A进程'])
+                self.assertTrue(second.remove_tag('张三', 'A进程'))
+
+                self.assertEqual(second.get_contact('李四')['tags'], ['A进程'])
+                reloaded = ContactManager(str(data_file), autosave_delay=0, storage=storage)
+                self.addCleanup(reloaded.backups.wait)
+                self.assertEqual(reloaded.get_contact('张三')['tags'], ['B进程'])
+                self.assertEqual(reloaded.get_contact('李四')['tags'], ['A进程'])
+                self.assertEqual(reloaded.get_contact('王五')['tags'], ['A进程'])
+
+        friends_file = self.temp_dir / 'friend_details.json'
+        first = FriendDetailsManager(str(friends_file), storage='json')
+        second = FriendDetailsManager(str(friends_file), storage='json')
+        first.merge_friend_details([{'昵称': '张三', '微信号': 'zhangsan'}], full=False)
+        second.merge_friend_details([{'昵称': '李四', '微信号': 'lisi'}], full=False)
+        reloaded = FriendDetailsManager(str(friends_file), storage='json')
+        self.assertEqual(sorted(f['微信号'] for f in reloaded.friend_details), ['lisi', 'zhangsan'])
+        self.assertFalse(first.save_friend_details())
+
+    def test_recover_from_backup(self):
+        """
+        test_recover_from_backup 功能说明:
+        测试数据文件被截断后，加载时保留损坏文件并从最新有效备份恢复
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, [{'name': '张三', 'tags': []}])
+        manager.add_tag('张三', 'VIP')
+        manager.close()
+
+        data_file = manager.data_file
+        data_file.write_bytes(data_file.read_bytes()[:20])
+        recovered = ContactManager(str(data_file))
+        self.addCleanup(recovered.close)
+
+        self.assertEqual(recovered.get_contact('张三')['tags'], ['VIP'])
+        self.assertEqual(len(list(data_file.parent.glob('contacts.json.corrupt_*'))), 1)
+        self.assertEqual(json.loads(data_file.read_text(encoding='utf-8'))['contacts'][0]['tags'], ['VIP'])
+
+class TestContactTable(unittest.TestCase):
+    """
+    TestContactTable 功能说明:
+    测试列式联系人表
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.contacts = [
+            {'name': f'联系人{i}', 'type': 'group' if i % 4 == 0 else 'friend',
+             'tags': (['VIP'] if i % 2 == 0 else []) + (['已退订'] if i % 5 == 0 else []),
+             'last_contact': None, 'created_at': f'2026-01-{i % 28 + 1:02d}T08:00:00',
+             'updated_at': f'2026-02-{i % 28 + 1:02d}T09:30:00.{i:06d}'}
+            for i in range(1, 60)
+        ]
+        self.contacts.append({'name': '旧数据', 'updated_at': '2026-01-01T00:00:00+08:00', 'wxid': 'old'})
+        self.contacts.append({'name': '非法日期', 'type': 'friend', 'tags': ['VIP'], 'created_at': '2026-02-30T00:00:00'})
+
+    def test_round_trip(self):
+        """
+        test_round_trip 功能说明:
+        测试还原的字典与原字典完全一致，包括 None、缺失字段、带时区和非法的时间字符串
+        输入: 无 | 输出: 断言结果
+        """
+        table = ContactTable.from_contacts(self.contacts)
+        self.assertEqual(table.to_contacts(), self.contacts)
+        self.assertEqual(table.row(0).tags, [])
+        self.assertEqual(table.row(1).type, 'friend')
+        self.assertEqual(table.row(len(self.contacts) - 2).get('wxid'), 'old')
+        self.assertEqual(table.tag_counts(), {'VIP': 30, '已退订': 11})
+
+    def test_filter_matches_scan(self):
+        """
+        test_filter_matches_scan 功能说明:
+        测试组合条件筛选与逐个判断的结果一致，联系人修改后重新筛选能看到变化
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, self.contacts)
+        result = manager.filter_contacts(tags=['VIP'], exclude_tags=['已退订'], types=['friend'],
+                                         since='2026-02-10', until='2026-02-20')
+        expected = [c for c in self.contacts
+                    if 'VIP' in c.get('tags', []) and '已退订' not in c['tags'] and c.get('type') == 'friend'
+                    and '2026-02-10' <= c.get('updated_at', '') < '2026-02-20']
+        self.assertTrue(expected)
+        self.assertEqual(result, expected)
+
+        self.assertEqual(len(manager.filter_contacts(any_tags=['VIP', '已退订'])), 36)
+        manager.add_tag('联系人1', 'VIP')
+        self.assertEqual(len(manager.filter_contacts(any_tags=['VIP', '已退订'])), 37)
+        self.assertEqual(manager.filter_contacts(any_tags=['不存在']), [])
+
+    def test_incremental_update(self):
+        """
+        test_incremental_update 功能说明:
+        测试打标签、移除标签、更新字段和新增联系人后列式表增量更新（不再调用 from_contacts 重建），
+        结果与重新构建的表一致
+        输入: 无 | 输出: 断言结果
+        """
+        manager = make_manager(self, self.contacts)
+        table = manager.get_table()
+        with mock.patch.object(ContactTable, 'from_contacts', side_effect=AssertionError('列式表被重建')):
+            manager.add_tag('联系人1', '新标签')
+            manager.remove_tag('联系人2', 'VIP')
+            manager.update_contact('联系人3', type='group', last_contact='2026-03-01T10:00:00')
+            manager.update_contact('旧数据', updated_at='2026-03-02T00:00:00', wxid='new')
+            manager.update_contact('非法日期', created_at='2026-03-03T00:00:00+08:00')
+            manager.add_contact('新联系人', 'friend', ['新标签', 'VIP'])
+            self.assertEqual([c['name'] for c in manager.filter_contacts(tags=['新标签'])], ['联系人1', '新联系人'])
+            manager.add_tag('联系人5', '新标签')
+            manager.remove_tag('新联系人', '新标签')
+            self.assertEqual([c['name'] for c in manager.filter_contacts(tags=['新标签'])], ['联系人1', '联系人5'])
+            self.assertEqual(manager.filter_contacts(since='2026-03-01', date_field='last_contact'),
+                             [manager.get_contact('联系人3')])
+            self.assertIs(manager.get_table(), table)
+            self.assertEqual(table.to_contacts(), manager.list_contacts())
+
+        rebuilt = ContactTable.from_contacts(manager.list_contacts())
+        self.assertEqual(table.tag_counts(), rebuilt.tag_counts())
+        for tags in (['VIP'], ['已退订'], ['新标签']):
+            self.assertEqual(list(table.filter(any_tags=tags)), list(rebuilt.filter(any_tags=tags)))
+
+    def test_columnar_manager(self):
+        """
+        test_columnar_manager 功能说明:
+        测试列式模式加载后不保留联系人字典，视图只读；打标签、更新、新增后的查询、筛选、搜索结果
+        和写入的数据文件都与字典模式一致
+        输入: 无 | 输出: 断言结果
+        """
+        memory = make_manager(self, self.contacts)
+        columnar = make_manager(self, self.contacts, columnar=True)
+        self.assertIsInstance(memory.contacts, list)
+        self.assertNotIsInstance(columnar.contacts, list)
+        self.assertEqual(len(columnar._by_name._cache), 0)
+        self.assertEqual(columnar.list_contacts(), memory.list_contacts())
+        # 遍历全部联系人不会把字典留在缓存中
+        self.assertEqual(len(columnar._by_name._cache), 0)
+
+        with mock.patch('utils.contact_manager.datetime') as clock:
+            clock.now.return_value = datetime(2026, 2, 18, 12, 0)
+            for current in (memory, columnar):
+                current.add_tag('联系人1', 'VIP')
+                current.remove_tag('联系人2', 'VIP')
+                current.add_tags(['联系人3', '联系人4', '不存在'], '活动A')
+                current.update_contact('联系人5', type='group', updated_at='2026-02-12T00:00:00')
+                current.add_contact('新联系人', 'friend', ['VIP', '活动A'])
+
+        self.assertEqual(columnar.get_contact_count(), memory.get_contact_count())
+        self.assertEqual(columnar.get_contact('新联系人'), memory.get_contact('新联系人'))
+        self.assertIsNone(columnar.get_contact('不存在'))
+        self.assertEqual(columnar.get_all_tags(), memory.get_all_tags())
+        self.assertTrue(columnar.has_tag('联系人1', 'VIP'))
+        self.assertFalse(columnar.has_tag('联系人2', 'VIP'))
+        for tag in ('VIP', '活动A', '不存在'):
+            self.assertEqual(columnar.get_contacts_by_tag(tag), memory.get_contacts_by_tag(tag))
+        self.assertEqual(columnar.query_contacts('活动A OR 已退订 AND NOT VIP'),
+                         memory.query_contacts('活动A OR 已退订 AND NOT VIP'))
+        condition = {'any_tags': ['VIP', '活动A'], 'since': '2026-02-10', 'until': '2026-02-20'}
+        self.assertEqual(columnar.filter_contacts(**condition), memory.filter_contacts(**condition))
+        self.assertEqual(columnar.search_contacts('联系人1'), memory.search_contacts('联系人1'))
+        self.assertEqual(columnar.list_contacts(), memory.list_contacts())
+        with open(columnar.data_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['contacts'], memory.list_contacts())
+
+        with self.assertRaises(AttributeError):
+            columnar.contacts.append({'name': '直接追加'})
+        with self.assertRaises(TypeError):
+            columnar._by_name['直接追加'] = {'name': '直接追加'}
+
+class TestSerializer(unittest.TestCase):
+    """
+    TestSerializer 功能说明:
+    测试数据文件的JSON/二进制格式和压缩方式
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.document = {
+            'contacts': [{'name': f'联系人{i}', 'type': 'friend', 'tags': ['VIP'] if i % 2 else [],
+                          'last_contact': None, 'wxid': f'wxid_{i}'} for i in range(50)],
+            'last_updated': '2026-10-17T17:50:00',
+            'version': '1.0.0'
+        }
+
+    def test_round_trip_and_detect(self):
+        """
+        test_round_trip_and_detect 功能说明:
+        测试所有可用的格式和压缩组合读回的数据一致且能自动识别，JSON格式与原有文件内容一致，
+        二进制文件被截断时抛出 ValueError
+        输入: 无 | 输出: 断言结果
+        """
+        compressions = ['none', 'gzip'] + (['zstd'] if serializer.zstandard is not None else [])
+        sizes = {}
+        for fmt in serializer.FORMATS:
+            for compression in compressions:
+                data = serializer.dumps_document(self.document, 'contacts', fmt, compression)
+                self.assertEqual(serializer.detect_format(data), (fmt, compression))
+                self.assertEqual(serializer.loads_document(data), self.document)
+                sizes[fmt, compression] = len(data)
+
+        original = json.dumps(self.document, ensure_ascii=False, indent=2).encode('utf-8')
+        self.assertEqual(serializer.dumps_document(self.document, 'contacts'), original)
+        self.assertLess(sizes['binary', 'none'], sizes['json', 'none'])
+        self.assertLess(sizes['binary', 'gzip'], sizes['binary', 'none'])
+
+        binary = serializer.dumps_document(self.document, 'contacts', 'binary')
+        for broken in (binary[:len(binary) // 2], binary[:7], serializer.dumps_document(self.document, 'contacts', 'binary', 'gzip')[:30]):
+            with self.assertRaises(ValueError):
+                serializer.loads_document(broken)
+        with self.assertRaises(ValueError):
+            serializer.dumps_document(self.document, 'contacts', 'xml')
+
+    def test_store_reads_any_format(self):
+        """
+        test_store_reads_any_format 功能说明:
+        测试存储后端按指定格式写入快照，默认JSON存储和联系人管理器能直接加载二进制压缩文件，
+        命令行可将其导出回JSON
+        输入: 无 | 输出: 断言结果
+        """
+        data_file = self.temp_dir / 'contacts.json'
+        store = create_contact_store('journal', data_file, file_format='binary', compression='gzip')
+        store.save_snapshot(self.document['contacts'])
+        self.assertEqual(serializer.detect_format(data_file.read_bytes()), ('binary', 'gzip'))
+
+        contacts, ops = create_contact_store('json', data_file).load()
+        self.assertEqual((contacts, ops), (self.document['contacts'], []))
+
+        manager = ContactManager(str(data_file))
+        self.addCleanup(manager.close)
+        self.assertEqual(len(manager.get_contacts_by_tag('VIP')), 25)
+
+        exported = self.temp_dir / 'export.json'
+        with mock.patch('builtins.print'):
+            self.assertEqual(serializer.main(['convert', str(data_file), str(exported)]), 0)
+        self.assertEqual(json.loads(exported.read_text(encoding='utf-8'))['contacts'], self.document['contacts'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,377 @@
+##########test_friend_details.py: 好友详细信息模块测试 ##################
+# 变更记录: [2026-10-17 15:40] @李祥光 [初始创建，覆盖好友批量同步到联系人]########
+# 变更记录: [2026-10-17 16:20] @李祥光 [新增增量刷新和变更日志测试]########
+# 变更记录: [2026-10-17 16:50] @李祥光 [新增分块断点续传采集测试]########
+# 变更记录: [2026-10-17 17:20] @李祥光 [新增好友索引查询测试]########
+# 变更记录: [2026-10-18 15:20] @李祥光 [新增微信数据源分块读取总量为线性的测试]########
+# 输入: 测试用例 | 输出: 测试结果###############
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.contact_manager import ContactManager
+from utils.friend_details import FriendDetailsManager
+from utils.sqlite_store import SQLiteFriendStore
+from utils.friend_harvester import FriendHarvester, WeChatFriendSource
+
+###########################文件下的所有函数###########################
+"""
+make_managers：在临时目录中创建好友详细信息管理器和联系人管理器
+TestSyncToContacts.test_bulk_upsert：测试批量同步的新增/更新/未变化统计且只写入一次
+FakeWeChat.GetFriendDetails：按脚本依次返回好友快照
+TestIncrementalRefresh.test_merge_and_diff：测试增量合并统计、变更日志和diff_since
+TestIncrementalRefresh.test_sqlite_touches_changed_rows：测试SQLite只写入有变化的好友
+FlakyFriendSource.fetch：模拟缓慢且会失败的分块获取
+TestHarvester.test_retry_and_progress：测试失败重试和吞吐量/ETA
+TestHarvester.test_resume_after_crash：测试中断后从断点继续且不重复获取
+TestHarvester.test_wechat_source_reads_linearly：测试微信数据源的读取总量与好友数成线性关系
+TestFriendLookup.test_lookup_by_nickname_remark_id：测试按昵称/备注/微信号查询和重名处理
+TestFriendLookup.test_index_follows_refresh：测试刷新后索引同步更新
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[unittest.main] --> B[TestSyncToContacts]
+    A --> F[TestIncrementalRefresh]
+    F --> G[FakeWeChat]
+    A --> H[TestHarvester]
+    H --> I[FlakyFriendSource]
+    A --> J[TestFriendLookup]
+    B --> C[make_managers]
+    C --> D[FriendDetailsManager]
+    C --> E[ContactManager]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+def make_managers(test_case: unittest.TestCase, contacts: list, friends: list):
+    """
+    make_managers 功能说明:
+    在临时目录中写入联系人和好友数据并创建两个管理器，测试结束后自动清理
+    输入: test_case (TestCase) 当前测试, contacts (list) 初始联系人, friends (list) 初始好友 | 输出: (FriendDetailsManager, ContactManager)
+    """
+    temp_dir = Path(tempfile.mkdtemp())
+    test_case.addCleanup(shutil.rmtree, temp_dir, True)
+    with open(temp_dir / 'contacts.json', 'w', encoding='utf-8') as f:
+        json.dump({'contacts': contacts}, f, ensure_ascii=False)
+    with open(temp_dir / 'friend_details.json', 'w', encoding='utf-8') as f:
+        json.dump({'friend_details': friends}, f, ensure_ascii=False)
+
+    contact_manager = ContactManager(str(temp_dir / 'contacts.json'))
+    test_case.addCleanup(contact_manager.close)
+    friend_manager = FriendDetailsManager(str(temp_dir / 'friend_details.json'), storage='json')
+    return friend_manager, contact_manager
+
+class TestSyncToContacts(unittest.TestCase):
+    """
+    TestSyncToContacts 功能说明:
+    测试好友详细信息批量同步到联系人
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_bulk_upsert(self):
+        """
+        test_bulk_upsert 功能说明:
+        测试按微信号匹配已有联系人（昵称变化也能匹配）、保留原有标签、统计新增/更新/未变化，
+        且整个同步只写入一次；再次同步时全部未变化
+        输入: 无 | 输出: 断言结果
+        """
+        contacts = [
+            {'name': '张三', 'type': 'friend', 'tags': ['VIP'], 'wxid': 'wx_zhang', 'nickname': '张三'},
+            {'name': '李四', 'type': 'friend', 'tags': ['微信好友'], 'wxid': 'wx_li', 'nickname': '李四'},
+        ]
+        friends = [
+            {'NickName': '张三丰', 'UserName': 'wx_zhang', 'Remark': '老张'},
+            {'NickName': '李四', 'UserName': 'wx_li'},
+            {'NickName': '王五', 'UserName': 'wx_wang'},
+            {'NickName': '', 'UserName': 'wx_empty'},
+        ]
+        friend_manager, contact_manager = make_managers(self, contacts, friends)
+
+        with mock.patch.object(contact_manager, 'save_contacts', wraps=contact_manager.save_contacts) as save:
+            result = friend_manager.sync_to_contacts(contact_manager)
+            self.assertEqual(save.call_count, 1)
+
+        self.assertTrue(result['success'])
+        self.assertEqual((result['inserted'], result['updated'], result['unchanged']), (1, 1, 1))
+        self.assertEqual(result['count'], 2)
+
+        zhang = contact_manager.get_contact('张三')
+        self.assertEqual(zhang['tags'], ['VIP', '微信好友'])
+        self.assertEqual((zhang['nickname'], zhang['remark']), ('张三丰', '老张'))
+        self.assertIsNone(contact_manager.get_contact('张三丰'))
+        self.assertEqual(contact_manager.get_contact('王五')['wxid'], 'wx_wang')
+
+        result = friend_manager.sync_to_contacts(contact_manager)
+        self.assertEqual((result['inserted'], result['updated'], result['unchanged']), (0, 0, 3))
+
+class FakeWeChat:
+    """
+    FakeWeChat 功能说明:
+    模拟微信客户端，GetFriendDetails 按顺序返回预先设定的好友快照
+    输入: snapshots (list) 好友快照列表 | 输出: 模拟客户端
+    """
+
+    def __init__(self, snapshots: list):
+        self.snapshots = list(snapshots)
+        self.calls = []
+
+    def GetFriendDetails(self, n=None, timeout=None):
+        self.calls.append(n)
+        return [dict(friend) for friend in self.snapshots.pop(0)]
+
+class TestIncrementalRefresh(unittest.TestCase):
+    """
+    TestIncrementalRefresh 功能说明:
+    测试好友详细信息增量刷新和变更追踪
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    SNAPSHOTS = [
+        [{'NickName': '张三', 'UserName': 'wx_zhang', 'Remark': ''},
+         {'NickName': '李四', 'UserName': 'wx_li', 'Remark': '同事'}],
+        [{'NickName': '张三', 'UserName': 'wx_zhang', 'Remark': '老张'},
+         {'NickName': '王五', 'UserName': 'wx_wang'}],
+    ]
+
+    def make_manager(self, storage: str, wechat: FakeWeChat) -> FriendDetailsManager:
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        db_file = str(temp_dir / 'friends.db')
+        with mock.patch('utils.friend_details.config.get',
+                        side_effect=lambda key, default=None: db_file if key == 'friend_details.sqlite_file' else default):
+            return FriendDetailsManager(str(temp_dir / 'friend_details.json'), storage=storage, wechat=wechat)
+
+    def test_merge_and_diff(self):
+        """
+        test_merge_and_diff 功能说明:
+        测试第二次刷新只记录变化的字段、新增和删除，变化的好友刷新 updated_at，
+        diff_since 只返回指定时间之后的变化
+        输入: 无 | 输出: 断言结果
+        """
+        manager = self.make_manager('json', FakeWeChat(self.SNAPSHOTS))
+        result = manager.refresh_friend_details()
+        self.assertEqual((result['added'], result['changed'], result['removed']), (2, 0, 0))
+        first_seen = {f['NickName']: f['updated_at'] for f in manager.friend_details}
+
+        time.sleep(0.01)
+        checkpoint = datetime.now()
+        time.sleep(0.01)
+        result = manager.refresh_friend_details()
+        self.assertEqual((result['added'], result['changed'], result['removed'], result['unchanged']), (1, 1, 1, 0))
+        self.assertEqual([f['NickName'] for f in manager.friend_details], ['张三', '王五'])
+        self.assertNotEqual(manager.friend_details[0]['updated_at'], first_seen['张三'])
+
+        changes = manager.diff_since(checkpoint)
+        self.assertEqual([(c['key'], c['change']) for c in changes],
+                         [('id:wx_zhang', 'changed'), ('id:wx_wang', 'added'), ('id:wx_li', 'removed')])
+        self.assertEqual(changes[0]['fields'], {'Remark': ['', '老张']})
+        self.assertEqual(changes[2]['friend']['Remark'], '同事')
+        self.assertEqual(len(manager.diff_since('2000-01-01T00:00:00')), 5)
+
+        reloaded = FriendDetailsManager(str(manager.data_file), storage='json')
+        self.assertEqual(reloaded.friend_details, manager.friend_details)
+
+    def test_sqlite_touches_changed_rows(self):
+        """
+        test_sqlite_touches_changed_rows 功能说明:
+        测试SQLite存储只写入新增和变化的好友，部分获取（max_count）时不判定删除
+        输入: 无 | 输出: 断言结果
+        """
+        snapshots = self.SNAPSHOTS + [[{'NickName': '王五', 'UserName': 'wx_wang', 'Remark': '新朋友'}]]
+        wechat = FakeWeChat(snapshots)
+        manager = self.make_manager('sqlite', wechat)
+        manager.refresh_friend_details()
+
+        with mock.patch.object(SQLiteFriendStore, 'save_all') as save_all, \
+                mock.patch.object(SQLiteFriendStore, 'apply_changes', autospec=True,
+                                  side_effect=SQLiteFriendStore.apply_changes) as apply_changes:
+            manager.refresh_friend_details()
+            upserts, removed = apply_changes.call_args[0][1:]
+            self.assertEqual([f['NickName'] for f in upserts], ['张三', '王五'])
+            self.assertEqual(removed, ['id:wx_li'])
+
+            result = manager.refresh_friend_details(max_count=1)
+            self.assertEqual((result['changed'], result['removed']), (1, 0))
+            save_all.assert_not_called()
+
+        self.assertEqual(wechat.calls, [None, None, 1])
+        stored = {f['NickName']: f.get('Remark') for f in manager.store.load()}
+        self.assertEqual(stored, {'张三': '老张', '王五': '新朋友'})
+
+class FlakyFriendSource:
+    """
+    FlakyFriendSource 功能说明:
+    模拟本地好友数据源：每次获取推进虚拟时钟 latency 秒，failures 指定各偏移量需要先失败的次数
+    输入: count (int) 好友总数, failures (dict) 偏移量 -> 失败次数, latency (float) 每次获取耗时 | 输出: 模拟数据源
+    """
+
+    def __init__(self, count: int, failures: dict = None, latency: float = 2.0):
+        self.friends = [{'NickName': f'好友{i}', 'UserName': f'wx_{i}'} for i in range(count)]
+        self.failures = dict(failures or {})
+        self.latency = latency
+        self.now = 0.0
+        self.calls = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def fetch(self, offset: int, limit: int) -> list:
+        self.calls.append(offset)
+        self.now += self.latency
+        if self.failures.get(offset, 0) > 0:
+            self.failures[offset] -= 1
+            raise TimeoutError('获取超时')
+        return [dict(friend) for friend in self.friends[offset:offset + limit]]
+
+class TestHarvester(unittest.TestCase):
+    """
+    TestHarvester 功能说明:
+    测试好友详细信息分块断点续传采集
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_retry_and_progress(self):
+        """
+        test_retry_and_progress 功能说明:
+        测试单块失败后按指数退避重试成功，进度回调给出吞吐量和ETA
+        输入: 无 | 输出: 断言结果
+        """
+        source = FlakyFriendSource(25, failures={10: 2})
+        sleeps, progress = [], []
+        harvester = FriendHarvester(source.fetch, self.temp_dir / 'harvest.json', chunk_size=10, retry_delay=1.0,
+                                    total=25, progress=progress.append, sleep=sleeps.append, clock=source.clock)
+        result = harvester.run()
+
+        self.assertTrue(result['complete'])
+        self.assertEqual(len(result['friends']), 25)
+        self.assertEqual(sleeps, [1.0, 2.0])
+        self.assertEqual(source.calls, [0, 10, 10, 10, 20])
+        self.assertEqual([p['offset'] for p in progress], [10, 20, 25])
+        self.assertEqual(progress[0]['rate'], 5.0)
+        self.assertEqual(progress[0]['eta'], 3.0)
+
+    def test_resume_after_crash(self):
+        """
+        test_resume_after_crash 功能说明:
+        测试重试用尽后中断并保留断点，再次采集从断点继续（断点之后多写入的数据被丢弃），
+        完成后合并到好友数据并删除断点
+        输入: 无 | 输出: 断言结果
+        """
+        manager = FriendDetailsManager(str(self.temp_dir / 'friend_details.json'), storage='json')
+        source = FlakyFriendSource(25, failures={20: 99})
+        with mock.patch('time.sleep'):
+            result = manager.harvest_friend_details(chunk_size=10, source=source)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['harvested'], 20)
+        checkpoint = self.temp_dir / 'friend_harvest.json'
+        self.assertTrue(checkpoint.exists())
+
+        # 模拟写入数据后、更新断点前崩溃：数据文件多出一行
+        with open(self.temp_dir / 'friend_harvest.jsonl', 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'NickName': '多余', 'UserName': 'wx_extra'}, ensure_ascii=False) + '\n')
+
+        source.failures.clear()
+        source.calls.clear()
+        result = manager.harvest_friend_details(chunk_size=10, source=source)
+        self.assertTrue(result['success'])
+        self.assertEqual((result['resumed_from'], result['added']), (20, 25))
+        self.assertEqual(source.calls, [20])
+        self.assertEqual([f['UserName'] for f in manager.friend_details], [f'wx_{i}' for i in range(25)])
+        self.assertFalse(checkpoint.exists())
+
+    def test_wechat_source_reads_linearly(self):
+        """
+        test_wechat_source_reads_linearly 功能说明:
+        测试 GetFriendDetails 只能从开头读取时，分块采集按翻倍数量读取，
+        调用次数为对数级、读取总量不超过好友数的4倍，结果与一次性读取一致
+        输入: 无 | 输出: 断言结果
+        """
+        friends = [{'NickName': f'好友{i}', 'UserName': f'wx_{i}'} for i in range(1000)]
+        wechat = mock.Mock()
+        wechat.GetFriendDetails.side_effect = lambda n, timeout: [dict(f) for f in friends[:n]]
+        harvester = FriendHarvester(WeChatFriendSource(wechat).fetch, self.temp_dir / 'harvest.json', chunk_size=10)
+        result = harvester.run()
+
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['friends'], friends)
+        requested = [call.kwargs['n'] for call in wechat.GetFriendDetails.call_args_list]
+        self.assertEqual(requested, [10, 20, 40, 80, 160, 320, 640, 1280])
+        self.assertLessEqual(sum(min(n, len(friends)) for n in requested), 4 * len(friends))
+
+class TestFriendLookup(unittest.TestCase):
+    """
+    TestFriendLookup 功能说明:
+    测试好友详细信息的索引查询
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    FRIENDS = [
+        {'NickName': '小明', 'UserName': 'wx_ming1', 'Remark': '同学小明'},
+        {'NickName': '小明', 'UserName': 'wx_ming2', 'Remark': ''},
+        {'昵称': '老王', '微信号': 'wx_wang', '备注': '隔壁老王'},
+    ]
+
+    def setUp(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        with open(temp_dir / 'friend_details.json', 'w', encoding='utf-8') as f:
+            json.dump({'friend_details': self.FRIENDS}, f, ensure_ascii=False)
+        self.manager = FriendDetailsManager(str(temp_dir / 'friend_details.json'), storage='json',
+                                            wechat=FakeWeChat([]))
+
+    def test_lookup_by_nickname_remark_id(self):
+        """
+        test_lookup_by_nickname_remark_id 功能说明:
+        测试加载后即可按昵称、备注、微信号（含中文字段名）查询，重名时全部返回，批量查询结果与单个查询一致
+        输入: 无 | 输出: 断言结果
+        """
+        self.assertEqual([f['UserName'] for f in self.manager.find_friends_by_name('小明')], ['wx_ming1', 'wx_ming2'])
+        self.assertEqual(self.manager.get_friend_by_name('小明')['UserName'], 'wx_ming1')
+        self.assertEqual(self.manager.get_friend_by_name('同学小明')['UserName'], 'wx_ming1')
+        self.assertEqual(self.manager.get_friend_by_name('wx_ming2')['UserName'], 'wx_ming2')
+        self.assertEqual(self.manager.get_friend_by_name('隔壁老王')['微信号'], 'wx_wang')
+
+        result = self.manager.get_friends(['老王', 'wx_ming1', '不存在'])
+        self.assertEqual(result['老王']['微信号'], 'wx_wang')
+        self.assertEqual(result['wx_ming1']['Remark'], '同学小明')
+        self.assertIsNone(result['不存在'])
+
+    def test_index_follows_refresh(self):
+        """
+        test_index_follows_refresh 功能说明:
+        测试增量刷新后，改名、删除和新增的好友在索引中同步更新
+        输入: 无 | 输出: 断言结果
+        """
+        self.manager.wechat.snapshots.append([
+            {'NickName': '大明', 'UserName': 'wx_ming1', 'Remark': '同学小明'},
+            {'NickName': '小明', 'UserName': 'wx_ming2', 'Remark': ''},
+            {'NickName': '小红', 'UserName': 'wx_hong'},
+        ])
+        self.manager.refresh_friend_details()
+
+        self.assertEqual([f['UserName'] for f in self.manager.find_friends_by_name('小明')], ['wx_ming2'])
+        self.assertEqual(self.manager.get_friend_by_name('大明')['UserName'], 'wx_ming1')
+        self.assertEqual(self.manager.get_friend_by_name('同学小明')['NickName'], '大明')
+        self.assertIsNone(self.manager.get_friend_by_name('隔壁老王'))
+        self.assertIsNone(self.manager.get_friend_by_name('wx_wang'))
+        self.assertEqual(self.manager.get_friend_by_name('小红')['UserName'], 'wx_hong')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
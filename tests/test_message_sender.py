@@ -0,0 +1,1166 @@
+##########test_message_sender.py: 消息发送模块测试 ##################
+# 变更记录: [2026-10-17 18:30] @李祥光 [初始创建，覆盖持久化发送任务和断点续发]########
+# 变更记录: [2026-10-17 19:10] @李祥光 [新增自适应限速测试]########
+# 变更记录: [2026-10-17 19:50] @李祥光 [新增失败重试测试，模拟客户端支持按收件人注入失败]########
+# 变更记录: [2026-10-17 20:30] @李祥光 [新增发送账本去重测试，发送账本保存在临时任务目录]########
+# 变更记录: [2026-10-17 21:10] @李祥光 [新增消息模板测试]########
+# 变更记录: [2026-10-17 21:50] @李祥光 [新增定时发送和发送时段测试]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [新增传输层和模拟微信客户端测试]########
+# 变更记录: [2026-10-17 23:10] @李祥光 [新增多账号分发发送测试]########
+# 变更记录: [2026-10-17 23:50] @李祥光 [新增异步发送接口测试]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [新增发送活动预估测试]########
+# 变更记录: [2026-10-18 09:30] @李祥光 [新增调度器看到其他进程添加和取消活动的测试]########
+# 变更记录: [2026-10-18 10:50] @李祥光 [新增含花括号的纯文本消息回归测试]########
+# 变更记录: [2026-10-18 11:20] @李祥光 [新增模板渲染失败重试时重新渲染的回归测试]########
+# 变更记录: [2026-10-18 13:10] @李祥光 [新增发送账本延迟打开和过期清理测试，make_sender不再需要替换SendLedger]########
+# 变更记录: [2026-10-18 16:00] @李祥光 [新增多账号发送时真实客户端调用都在界面自动化线程串行执行的测试]########
+# 变更记录: [2026-10-18 17:20] @李祥光 [发送账本清理过期记录时保留活动记录]########
+# 输入: 测试用例 | 输出: 测试结果###############
+
+import asyncio
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.message_sender import MessageSender
+from utils.outbox import Outbox
+from utils.rate_limiter import RateLimiter
+from utils.retry_scheduler import RetryScheduler, PermanentSendError, TransientSendError, classify_error
+from utils.send_ledger import SendLedger, content_hash
+from utils.message_template import MessageTemplate, TemplateError, build_context
+from utils.campaign_scheduler import CampaignScheduler, SendingWindows, COMPLETED, PAUSED, SCHEDULED
+from utils import transport as transport_module
+from utils.transport import FakeWeChatTransport, WxautoTransport, create_transport
+from utils.retry_scheduler import RateLimitedError
+from utils.account_dispatcher import AccountDispatcher, SenderAccount
+from utils.async_sender import AsyncMessageSender
+from utils.campaign_simulator import CampaignSimulator
+from config.settings import config
+
+###########################文件下的所有函数###########################
+"""
+FakeClient.SendMsg：记录发送的消息，按设置返回失败或模拟进程崩溃
+make_sender：创建使用临时任务目录和模拟微信客户端的消息发送器
+TestOutbox.test_resume_after_crash：测试崩溃后续发只发送未处理的收件人
+TestOutbox.test_replay_torn_log_and_failed：测试状态日志截断、失败记录和重发失败的收件人
+VirtualClock：可手动推进的虚拟时钟
+TestRateLimiter.test_wait_excludes_send_time：测试等待时间扣除发送耗时，以及每分钟上限
+TestRateLimiter.test_adaptive_slowdown：测试失败率和耗时升高时降速、恢复后回到基础间隔
+TestRateLimiter.test_batch_uses_limiter：测试批量发送通过限速器等待并记录发送结果
+TestRetry.test_backoff_and_classification：测试退避时间翻倍封顶和失败分类
+TestRetry.test_retries_interleave_with_batch：测试暂时性失败到期后穿插在新收件人之间重发，永久失败不重试
+TestRetry.test_retry_failed_sends_uses_stored_message：测试手动重试使用失败记录中保存的消息内容
+TestRetry.test_retry_rerenders_failed_template：测试模板渲染失败的收件人重试时重新渲染，不发送未渲染的模板
+TestSendLedger.test_campaign_and_window：测试同一活动永久去重、去重窗口过期后允许再次发送
+TestSendLedger.test_ledger_opened_on_first_use：测试发送账本在首次使用时打开并清理过期记录
+TestSendLedger.test_rerun_skips_delivered：测试重复运行同一活动只发送上次未成功的收件人
+TestMessageTemplate.test_compile_and_render：测试占位符、默认值、条件块、花括号转义和语法错误
+TestMessageTemplate.test_validate_before_first_send：测试缺少字段时一条都不发送，字段齐全时逐个渲染发送
+TestMessageTemplate.test_plain_message_with_braces：测试含花括号的纯文本消息原样发送
+VirtualDateClock：可手动推进的虚拟本地时间
+TestCampaignScheduler.test_sending_windows：测试发送时段、免打扰时段、星期限制和跨午夜时段
+TestCampaignScheduler.test_pause_at_window_close_and_resume：测试窗口关闭时暂停、下一个窗口续发，活动在重启后保留
+TestCampaignScheduler.test_sees_campaigns_from_other_processes：测试运行中的调度器看到其他进程添加和取消的活动
+TestTransport.test_fake_transport_behaviors：测试模拟客户端的延迟、未知收件人、随机失败、限流和好友/会话列表
+TestTransport.test_wxauto_adapter_is_lazy：测试真实客户端适配器首次使用时才导入自动化库
+TestTransport.test_rate_limit_response_slows_sender：测试收到限流响应时发送器降速并在退避后重发成功
+make_account：创建使用独立虚拟时钟和模拟客户端的发送账号
+TestAccountDispatcher.test_throughput_scales_with_accounts：测试吞吐量随账号数量线性增长，每个收件人只发送一次
+TestAccountDispatcher.test_sticky_owner_after_unknown_recipient：测试账号找不到联系人时转交其他账号，并记住成功的账号
+TestAccountDispatcher.test_rebalance_when_account_fails：测试账号连接失败或连续发送失败时剩余收件人转交其他账号
+TestAccountDispatcher.test_real_clients_share_ui_thread：测试多账号发送时真实客户端调用都在同一个界面自动化线程串行执行
+GatedClient.SendMsg：第 N 次发送阻塞到测试放行
+TestAsyncSender.test_events_while_loop_stays_responsive：测试进度事件流，发送阻塞时事件循环仍可运行其他任务
+TestAsyncSender.test_pause_and_resume：测试暂停后只续发剩余收件人，进度连续
+TestAsyncSender.test_cancel_interrupts_wait：测试取消立即打断限速等待，未发送的收件人在发送任务中保持待发送
+TestCampaignSimulator.test_pacing_and_hourly_volume：测试按发送间隔预估耗时和每小时发送量
+TestCampaignSimulator.test_quiet_hours_push_finish_time：测试发送时段关闭时暂停到下一个时段，完成时间顺延
+TestCampaignSimulator.test_accounts_run_in_parallel：测试多个账号并行发送，失败按重试退避重发
+TestCampaignSimulator.test_send_by_tag_dry_run：测试预估模式渲染检查所有消息、扣除已发送的收件人且不调用微信
+TestCampaignSimulator.test_million_recipients_in_seconds：测试百万收件人的预估在数秒内完成
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[unittest.main] --> B[TestOutbox]
+    B --> C[make_sender]
+    C --> D[MessageSender]
+    C --> E[FakeClient]
+    B --> F[Outbox]
+    A --> G[TestRateLimiter]
+    G --> H[VirtualClock]
+    G --> C
+    A --> I[TestRetry]
+    I --> C
+    I --> H
+    A --> J[TestSendLedger]
+    J --> K[SendLedger]
+    J --> C
+    A --> L[TestMessageTemplate]
+    L --> M[MessageTemplate]
+    L --> C
+    A --> N[TestCampaignScheduler]
+    N --> O[CampaignScheduler]
+    N --> P[VirtualDateClock]
+    N --> C
+    A --> Q[TestTransport]
+    Q --> R[FakeWeChatTransport]
+    Q --> C
+    A --> S[TestAccountDispatcher]
+    S --> T[make_account]
+    T --> R
+    S --> U[AccountDispatcher]
+    S --> C
+    A --> V[TestAsyncSender]
+    V --> W[GatedClient]
+    V --> X[AsyncMessageSender]
+    V --> C
+    A --> Y[TestCampaignSimulator]
+    Y --> Z[CampaignSimulator]
+    Y --> C
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class SimulatedCrash(BaseException):
+    """
+    SimulatedCrash 功能说明:
+    模拟进程在发送过程中被终止（不会被发送逻辑中的 except Exception 捕获）
+    输入: 无 | 输出: 异常对象
+    """
+
+class FakeClient:
+    """
+    FakeClient 功能说明:
+    模拟微信客户端，记录每次发送，可设置返回失败的收件人、抛出的异常和第几次发送时崩溃
+    输入: fail (set/dict, 可选) 总是失败的收件人，或 收件人 -> 前几次失败, errors (dict, 可选) 收件人 -> 抛出的异常,
+          crash_at (int, 可选) 第几次发送时崩溃 | 输出: 模拟客户端
+    """
+
+    def __init__(self, fail=None, errors=None, crash_at=None, clock=None):
+        self.fail = fail if isinstance(fail, dict) else {name: float('inf') for name in fail or ()}
+        self.errors = errors or {}
+        self.crash_at = crash_at
+        self.clock = clock
+        self.sent = []
+        self.times = []
+
+    def SendMsg(self, message, who, exact=True):
+        if self.crash_at is not None and len(self.sent) + 1 == self.crash_at:
+            raise SimulatedCrash()
+        self.sent.append((who, message))
+        self.times.append(self.clock() if self.clock else None)
+        if who in self.errors:
+            raise self.errors[who]
+        if self.fail.get(who, 0) > 0:
+            self.fail[who] -= 1
+            return False
+        return True
+
+class VirtualClock:
+    """
+    VirtualClock 功能说明:
+    虚拟时钟，sleep 只推进时间不真正等待
+    输入: 无 | 输出: 时钟对象
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def make_sender(test_case: unittest.TestCase, client: FakeClient, contacts=None, outbox_dir=None) -> MessageSender:
+    """
+    make_sender 功能说明:
+    创建消息发送器：联系人管理器替换为返回指定联系人的模拟对象，发送任务和发送账本保存在临时目录，
+    限速和重试等待使用虚拟时钟（客户端未指定时钟时新建一个）
+    输入: test_case (TestCase) 当前测试, client (FakeClient) 模拟客户端, contacts (list, 可选) 标签查询结果,
+          outbox_dir (Path, 可选) 任务目录 | 输出: MessageSender 消息发送器
+    """
+    if outbox_dir is None:
+        outbox_dir = Path(tempfile.mkdtemp())
+        test_case.addCleanup(shutil.rmtree, outbox_dir, True)
+    with mock.patch('utils.message_sender.ContactManager') as manager_class:
+        manager_class.return_value.query_contacts.return_value = contacts or []
+        manager_class.return_value.get_contact.side_effect = {c['name']: c for c in contacts or []}.get
+        sender = MessageSender()
+    sender.ledger = SendLedger(Path(outbox_dir) / 'send_ledger.db')
+    test_case.addCleanup(sender.ledger.close)
+    clock = client.clock or VirtualClock()
+    sender.wx = client
+    sender.rate_limiter = RateLimiter(interval=0, clock=clock, sleep=clock.sleep)
+    sender.retry_jitter = 0
+    sender.outbox = Outbox(outbox_dir)
+    return sender
+
+class TestOutbox(unittest.TestCase):
+    """
+    TestOutbox 功能说明:
+    测试持久化发送任务和断点续发
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.outbox_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.outbox_dir, True)
+        self.contacts = [{'name': f'客户{i}'} for i in range(6)]
+        patcher = mock.patch('builtins.input', return_value='y')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resume_after_crash(self):
+        """
+        test_resume_after_crash 功能说明:
+        测试发送第3个收件人时进程崩溃，续发只发送剩下的收件人，任务完成后不再有待发送的收件人
+        输入: 无 | 输出: 断言结果
+        """
+        client = FakeClient(crash_at=3)
+        sender = make_sender(self, client, self.contacts, self.outbox_dir)
+        with self.assertRaises(SimulatedCrash):
+            sender.send_by_tag('VIP', '双十一活动通知')
+
+        (summary,) = Outbox(self.outbox_dir).unfinished_jobs()
+        self.assertEqual((summary['sent'], summary['pending'], summary['status']), (2, 4, 'active'))
+
+        resumed_client = FakeClient()
+        resumed = make_sender(self, resumed_client, outbox_dir=self.outbox_dir)
+        result = resumed.resume_job(summary['job_id'])
+        self.assertTrue(result['success'])
+        self.assertEqual([who for who, _ in resumed_client.sent], ['客户2', '客户3', '客户4', '客户5'])
+        self.assertEqual({message for _, message in resumed_client.sent}, {'双十一活动通知'})
+        self.assertEqual(result['job']['sent'], 6)
+        self.assertEqual(Outbox(self.outbox_dir).unfinished_jobs(), [])
+
+        again = resumed.resume_job(summary['job_id'])
+        self.assertEqual(again['count'], 0)
+        self.assertEqual(len(resumed_client.sent), 4)
+
+    def test_replay_torn_log_and_failed(self):
+        """
+        test_replay_torn_log_and_failed 功能说明:
+        测试失败的收件人记录原因，状态日志末尾不完整的行被截断后该收件人仍待发送，
+        include_failed 时重发失败的收件人
+        输入: 无 | 输出: 断言结果
+        """
+        client = FakeClient(fail={'客户1', '客户4'})
+        sender = make_sender(self, client, self.contacts, self.outbox_dir)
+        result = sender.send_by_tag('VIP', '通知')
+        self.assertEqual((result['count'], result['failed_count']), (4, 2))
+
+        job = Outbox(self.outbox_dir).load_job(result['job_id'])
+        self.assertEqual(job.summary()['status'], 'completed')
+        self.assertEqual([item['name'] for item in job.failed_contacts()], ['客户1', '客户4'])
+
+        # 模拟写入最后一行（重试用尽后最后确定结果的客户4）时崩溃：删除最后一行的换行符
+        content = job.log_file.read_bytes()
+        job.log_file.write_bytes(content[:-1])
+        job = Outbox(self.outbox_dir).load_job(result['job_id'])
+        self.assertEqual(job.pending(), [(4, '客户4')])
+        self.assertEqual(job.log_file.read_bytes(), content[:content.rstrip(b'\n').rfind(b'\n') + 1])
+
+        retry_client = FakeClient()
+        retried = make_sender(self, retry_client, outbox_dir=self.outbox_dir)
+        result = retried.resume_job(result['job_id'], include_failed=True)
+        self.assertTrue(result['success'])
+        self.assertEqual([who for who, _ in retry_client.sent], ['客户1', '客户4'])
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    TestRateLimiter 功能说明:
+    测试自适应发送限速器
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def make_limiter(self, **options) -> RateLimiter:
+        self.clock = VirtualClock()
+        return RateLimiter(clock=self.clock, sleep=self.clock.sleep, **options)
+
+    def test_wait_excludes_send_time(self):
+        """
+        test_wait_excludes_send_time 功能说明:
+        测试第一条立即发送，发送耗时1.5秒后只需再等0.5秒；每分钟上限用满后等到最早一条移出窗口
+        输入: 无 | 输出: 断言结果
+        """
+        limiter = self.make_limiter(interval=2.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.clock.now += 1.5
+        self.assertAlmostEqual(limiter.acquire(), 0.5)
+        self.clock.now += 5.0
+        self.assertEqual(limiter.acquire(), 0.0)
+
+        limiter = self.make_limiter(interval=0, per_minute=3)
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(), 0.0)
+            self.clock.now += 1.0
+        self.assertAlmostEqual(limiter.acquire(), 57.0)
+        self.assertEqual(limiter.stats()['sent_last_minute'], 3)
+
+        limiter = self.make_limiter(interval=2.0, jitter=0.5)
+        waits = [limiter.acquire() for _ in range(50)][1:]
+        self.assertTrue(all(2.0 <= wait <= 3.0 for wait in waits))
+        self.assertGreater(len(set(waits)), 1)
+
+    def test_adaptive_slowdown(self):
+        """
+        test_adaptive_slowdown 功能说明:
+        测试连续失败后发送间隔翻倍且不超过最大间隔，平均耗时超过阈值时降速，
+        之后连续成功逐步恢复到基础间隔
+        输入: 无 | 输出: 断言结果
+        """
+        limiter = self.make_limiter(interval=1.0, max_interval=3.0, window=4, min_samples=4, latency_threshold=5.0)
+        for _ in range(4):
+            limiter.record(False)
+        self.assertEqual(limiter.interval, 2.0)
+        for _ in range(8):
+            limiter.record(False)
+        self.assertEqual(limiter.interval, 3.0)
+
+        for _ in range(30):
+            limiter.record(True, 0.2)
+        self.assertEqual(limiter.interval, 1.0)
+
+        # 窗口内 [0.2, 8, 8, 8] 平均耗时超过5秒
+        for _ in range(3):
+            limiter.record(True, 8.0)
+        self.assertEqual(limiter.interval, 2.0)
+
+    def test_batch_uses_limiter(self):
+        """
+        test_batch_uses_limiter 功能说明:
+        测试批量发送每条消息前都经过限速器，发送结果交给限速器统计
+        输入: 无 | 输出: 断言结果
+        """
+        sender = make_sender(self, FakeClient(fail={'客户1'}))
+        sender.max_retry = 0
+        sender.rate_limiter = mock.Mock(wraps=RateLimiter(interval=0))
+        with mock.patch('builtins.print'):
+            result = sender.send_batch_messages([{'name': f'客户{i}'} for i in range(3)], '通知')
+        self.assertEqual(result['failed_count'], 1)
+        self.assertEqual(sender.rate_limiter.acquire.call_count, 3)
+        self.assertEqual([c.args[0] for c in sender.rate_limiter.record.call_args_list], [True, False, True])
+
+class TestRetry(unittest.TestCase):
+    """
+    TestRetry 功能说明:
+    测试发送失败重试
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        patcher = mock.patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backoff_and_classification(self):
+        """
+        test_backoff_and_classification 功能说明:
+        测试退避时间按次数翻倍且不超过上限，超时等失败可重试，联系人不存在等失败不重试
+        输入: 无 | 输出: 断言结果
+        """
+        scheduler = RetryScheduler(max_retries=2, base_delay=5, max_delay=30, jitter=0)
+        self.assertEqual([scheduler.delay(n) for n in range(1, 6)], [5, 10, 20, 30, 30])
+        jittered = RetryScheduler(base_delay=5, jitter=0.5).delay(1)
+        self.assertTrue(5 <= jittered <= 7.5)
+
+        self.assertTrue(classify_error(TimeoutError('发送超时')))
+        self.assertTrue(classify_error(TransientSendError('窗口未响应')))
+        self.assertTrue(classify_error('微信发送接口返回失败'))
+        self.assertFalse(classify_error(PermanentSendError('联系人状态异常')))
+        self.assertFalse(classify_error('发送异常: 未找到联系人 张三'))
+
+        self.assertTrue(scheduler.schedule('张三', '超时'))
+        self.assertTrue(scheduler.schedule('张三', '超时'))
+        self.assertFalse(scheduler.schedule('张三', '超时'))
+        self.assertFalse(scheduler.schedule('李四', '联系人不存在'))
+
+    def test_retries_interleave_with_batch(self):
+        """
+        test_retries_interleave_with_batch 功能说明:
+        测试间隔1秒、首次退避10秒时，失败两次的收件人在第10秒后穿插在新收件人之间重发，
+        第二次重试在主流程结束后等待到期再发送；抛出永久失败异常的收件人只发送一次
+        输入: 无 | 输出: 断言结果
+        """
+        clock = VirtualClock()
+        client = FakeClient(fail={'客户1': 2}, errors={'客户3': PermanentSendError('该联系人不是好友')}, clock=clock)
+        sender = make_sender(self, client)
+        sender.rate_limiter = RateLimiter(interval=1.0, failure_threshold=1.0, clock=clock, sleep=clock.sleep)
+        sender.retry_base_delay = 10
+        result = sender.send_batch_messages([{'name': f'客户{i}'} for i in range(15)], '通知')
+
+        names = [who for who, _ in client.sent]
+        self.assertEqual(names.count('客户1'), 3)
+        self.assertEqual(names.count('客户3'), 1)
+        first_retry = names.index('客户1', 2)
+        self.assertEqual(names[first_retry - 1:first_retry + 2], ['客户10', '客户1', '客户11'])
+        self.assertEqual(client.times[first_retry], 11.0)
+        self.assertEqual(client.times[-1], 31.0)
+
+        self.assertEqual((result['success_count'], result['failed_count'], result['retry_count']), (14, 1, 2))
+        (failed,) = result['failed_contacts']
+        self.assertEqual((failed['name'], failed['retryable'], failed['attempts'], failed['message']),
+                         ('客户3', False, 1, '通知'))
+
+    def test_retry_failed_sends_uses_stored_message(self):
+        """
+        test_retry_failed_sends_uses_stored_message 功能说明:
+        测试重试次数用尽的收件人记录了消息内容，手动重试时用原消息重发，永久失败默认跳过
+        输入: 无 | 输出: 断言结果
+        """
+        client = FakeClient(fail={'客户2'}, errors={'客户4': PermanentSendError('已被拉黑')})
+        sender = make_sender(self, client)
+        sender.max_retry = 1
+        result = sender.send_batch_messages([{'name': f'客户{i}'} for i in range(5)], '周末活动')
+        self.assertEqual([(f['name'], f['attempts']) for f in result['failed_contacts']], [('客户4', 1), ('客户2', 2)])
+
+        client.fail.clear()
+        client.sent.clear()
+        retry = sender.retry_failed_sends()
+        self.assertEqual(client.sent, [('客户2', '周末活动')])
+        self.assertEqual(retry['retry_count'], 1)
+        self.assertEqual([f['name'] for f in retry['still_failed']], ['客户4'])
+
+    def test_retry_rerenders_failed_template(self):
+        """
+        test_retry_rerenders_failed_template 功能说明:
+        测试模板渲染失败的收件人记录模板原文，包含永久失败重试时按联系人当前字段重新渲染，
+        字段仍缺失时再次记为失败而不是发送未渲染的模板
+        输入: 无 | 输出: 断言结果
+        """
+        contacts = [{'name': '客户0', 'remark': '老王'}, {'name': '客户1'}]
+        client = FakeClient()
+        sender = make_sender(self, client, contacts)
+        result = sender.send_batch_messages(contacts, MessageTemplate('{remark}您好'))
+        (failed,) = result['failed_contacts']
+        self.assertEqual((failed['name'], failed['retryable'], failed['message'], failed['template']),
+                         ('客户1', False, None, '{remark}您好'))
+
+        client.sent.clear()
+        retry = sender.retry_failed_sends(include_permanent=True)
+        self.assertEqual(client.sent, [])
+        self.assertEqual([f['name'] for f in retry['still_failed']], ['客户1'])
+
+        contacts[1]['remark'] = '小李'
+        retry = sender.retry_failed_sends(include_permanent=True)
+        self.assertEqual(client.sent, [('客户1', '小李您好')])
+        self.assertEqual((retry['retry_count'], retry['still_failed']), (1, []))
+
+class TestSendLedger(unittest.TestCase):
+    """
+    TestSendLedger 功能说明:
+    测试发送账本去重
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        for target, value in (('builtins.input', 'y'), ('builtins.print', None)):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_campaign_and_window(self):
+        """测试同一活动永久去重（清理过期记录时也保留）、去重窗口过期后允许再次发送"""
+        clock = VirtualClock()
+        clock.now = 1000000.0
+        ledger = SendLedger(self.data_dir / 'ledger.db', window_hours=24, clock=clock)
+        digest = content_hash('新品上市')
+        self.assertEqual(digest, content_hash('  新品上市\n'))
+        self.assertFalse(ledger.already_sent('张三', digest, 'spring'))
+
+        ledger.record('张三', digest, 'spring')
+        self.assertTrue(ledger.already_sent('张三', digest, 'spring'))
+        # 其他活动在窗口内发送相同内容也会被拦截，不同内容或不同收件人不受影响
+        self.assertTrue(ledger.already_sent('张三', digest, 'summer'))
+        self.assertFalse(ledger.already_sent('张三', content_hash('另一条消息'), 'summer'))
+        self.assertFalse(ledger.already_sent('李四', digest, 'spring'))
+        ledger.close()
+
+        # 重新打开后记录仍在；窗口过期后只有同一活动仍视为已发送
+        clock.now += 25 * 3600
+        ledger = SendLedger(self.data_dir / 'ledger.db', window_hours=24, clock=clock)
+        self.addCleanup(ledger.close)
+        self.assertTrue(ledger.already_sent('张三', digest, 'spring'))
+        self.assertFalse(ledger.already_sent('张三', digest, 'summer'))
+        self.assertFalse(ledger.already_sent('张三', digest))
+
+        # 按保留期清理只删除不属于任何活动的记录，同一活动隔多久重新运行都不会重发
+        ledger.record('王五', digest)
+        clock.now += 100 * 86400
+        self.assertEqual(ledger.prune(keep_days=90), 1)
+        self.assertTrue(ledger.already_sent('张三', digest, 'spring'))
+        self.assertFalse(ledger.already_sent('王五', digest))
+
+    def test_ledger_opened_on_first_use(self):
+        """测试创建发送器时不创建账本文件，首次使用时在配置的路径打开并按保留天数清理过期记录"""
+        ledger_file = self.data_dir / 'ledger' / 'send_ledger.db'
+        settings = {'message.ledger_file': str(ledger_file), 'message.ledger_keep_days': 30}
+        get = config.get
+        with mock.patch('utils.message_sender.ContactManager'), \
+                mock.patch.object(config, 'get', side_effect=lambda key, default=None: settings.get(key, get(key, default))):
+            sender = MessageSender()
+            self.assertFalse(ledger_file.parent.exists())
+            with mock.patch.object(SendLedger, 'prune', autospec=True, return_value=0) as prune:
+                ledger = sender.ledger
+        self.addCleanup(ledger.close)
+        self.assertTrue(ledger_file.exists())
+        self.assertIs(sender.ledger, ledger)
+        prune.assert_called_once_with(ledger, 30)
+
+    def test_rerun_skips_delivered(self):
+        """测试重复运行同一活动只发送上次未成功的收件人"""
+        contacts = [{'name': f'客户{i}'} for i in range(5)]
+        first = FakeClient(fail={'客户2'})
+        sender = make_sender(self, first, contacts, outbox_dir=self.data_dir)
+        sender.max_retry = 0
+        result = sender.send_by_tag('VIP', '新品上市', campaign_id='spring')
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(result['skipped_count'], 0)
+
+        # 第二次运行同一活动：已成功的4人跳过，只发送上次失败的客户2
+        second = FakeClient()
+        sender = make_sender(self, second, contacts, outbox_dir=self.data_dir)
+        result = sender.send_by_tag('VIP', '新品上市', campaign_id='spring')
+        self.assertEqual([who for who, _ in second.sent], ['客户2'])
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['skipped_count'], 4)
+        self.assertTrue(result['success'])
+        job = Outbox(self.data_dir).load_job(result['job_id'])
+        self.assertEqual(job.summary()['skipped'], 4)
+        self.assertEqual(job.summary()['sent'], 1)
+        job.close()
+
+class TestMessageTemplate(unittest.TestCase):
+    """
+    TestMessageTemplate 功能说明:
+    测试消息模板
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_compile_and_render(self):
+        """测试占位符、默认值、条件块、花括号转义和语法错误"""
+        template = MessageTemplate('{remark|朋友}您好，{#if 地区}{地区}的{#else}各位{/if}新品{{到店}}，{name}专享 {x')
+        self.assertEqual(template.fields, {'remark', '地区', 'name'})
+        # 有默认值的 remark 和条件块内的 地区 都不是必填字段
+        self.assertEqual(template.required, {'name'})
+        self.assertEqual(template.render({'name': '张三', '地区': '上海'}), '朋友您好，上海的新品{到店}，张三专享 {x')
+        self.assertEqual(template.render({'name': '李四', 'remark': '小李'}), '小李您好，各位新品{到店}，李四专享 {x')
+        with self.assertRaises(TemplateError):
+            template.render({'remark': '小李'})
+
+        negated = MessageTemplate('{#if !remark}请补充备注{#else}{remark}{/if}')
+        self.assertEqual(negated.required, set())
+        self.assertEqual(negated.render({}), '请补充备注')
+        self.assertEqual(negated.render({'remark': '老王'}), '老王')
+
+        static = MessageTemplate('双十一活动通知')
+        self.assertTrue(static.is_static)
+        self.assertEqual(static.render({}), '双十一活动通知')
+
+        for source in ('{#if vip}尊敬的', '结束{/if}', '{#else}'):
+            with self.assertRaises(TemplateError):
+                MessageTemplate(source)
+
+        context = build_context({'name': '王五', 'tags': ['VIP', '上海']}, {'Remark': '老王', '地区': '上海'})
+        self.assertEqual(context['remark'], '老王')
+        self.assertEqual(context['tags'], 'VIP、上海')
+
+    def test_validate_before_first_send(self):
+        """测试缺少字段时一条都不发送，字段齐全时逐个渲染发送"""
+        contacts = [{'name': '客户0', 'remark': '老客户'}, {'name': '客户1'}, {'name': '客户2', 'remark': '新客户'}]
+        friends = {'客户0': {'地区': '上海'}, '客户2': {'地区': '北京'}}
+        client = FakeClient()
+        sender = make_sender(self, client, contacts)
+        sender.friend_details = mock.Mock()
+        sender.friend_details.get_friend_by_name.side_effect = friends.get
+        with mock.patch('builtins.input', return_value='y'), mock.patch('builtins.print'):
+            result = sender.send_by_tag('VIP', '{remark}您好')
+            self.assertFalse(result['success'])
+            self.assertEqual(result['missing_fields'], {'remark': ['客户1']})
+            self.assertEqual(client.sent, [])
+
+            result = sender.send_by_tag('VIP', '{remark|朋友}您好{#if 地区}，{地区}门店已开业{/if}')
+        self.assertTrue(result['success'])
+        self.assertEqual(client.sent, [
+            ('客户0', '老客户您好，上海门店已开业'),
+            ('客户1', '朋友您好'),
+            ('客户2', '新客户您好，北京门店已开业')
+        ])
+
+    def test_plain_message_with_braces(self):
+        """测试未知字段的花括号和JSON文本按原文发送，不要求字段；{{ }} 转义在纯文本消息中同样生效"""
+        for source in ('优惠码{ABC123}', '配置 {"a": 1, "b": {"c": 2}}', '{ 空格 }和{'):
+            template = MessageTemplate(source)
+            self.assertTrue(template.is_static)
+            self.assertEqual(template.render({}), source)
+        self.assertEqual(MessageTemplate('{职位|}您好').fields, {'职位'})
+
+        client = FakeClient()
+        sender = make_sender(self, client, [{'name': '客户0'}])
+        sender.rate_limiter = RateLimiter(interval=0)
+        with mock.patch('builtins.print'):
+            self.assertTrue(sender.send_by_tag('VIP', '优惠码{ABC123}', confirm=False)['success'])
+            result = sender.send_by_tag('VIP', '回复{{1}}领取', confirm=False)
+        self.assertTrue(result['success'])
+        self.assertEqual(client.sent, [('客户0', '优惠码{ABC123}'), ('客户0', '回复{1}领取')])
+
+        # 续发纯文本任务时同样发送转义后的文本
+        job = sender.outbox.create_job(['客户0'], '回复{{2}}领取', 'VIP', meta=sender.job_meta(MessageTemplate('回复{{2}}领取'), None))
+        with mock.patch('builtins.print'):
+            self.assertTrue(sender.resume_job(job.job_id)['success'])
+        self.assertEqual(client.sent[-1], ('客户0', '回复{2}领取'))
+
+class VirtualDateClock:
+    """
+    VirtualDateClock 功能说明:
+    虚拟本地时间，wait 只推进时间不真正等待
+    输入: now (datetime) 初始时间 | 输出: 时钟对象
+    """
+
+    def __init__(self, now: datetime):
+        self.now = now
+        self.waits = []
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        self.now += timedelta(seconds=timeout)
+
+class TestCampaignScheduler(unittest.TestCase):
+    """
+    TestCampaignScheduler 功能说明:
+    测试定时发送调度器
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        patcher = mock.patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sending_windows(self):
+        """测试发送时段、免打扰时段、星期限制和跨午夜时段"""
+        windows = SendingWindows(['09:00-12:00', '14:00-21:00'], ['20:00-08:00'], weekdays=[0, 1, 2, 3, 4])
+        self.assertEqual(windows.intervals, [(540, 720), (840, 1200)])
+        monday = datetime(2026, 10, 19)
+        self.assertFalse(windows.is_open(monday.replace(hour=8, minute=59)))
+        self.assertTrue(windows.is_open(monday.replace(hour=9)))
+        self.assertEqual(windows.next_open(monday.replace(hour=12, minute=30)), monday.replace(hour=14))
+        self.assertEqual(windows.next_open(monday.replace(hour=20, minute=30)), monday.replace(day=20, hour=9))
+        self.assertEqual(windows.next_close(monday.replace(hour=10)), monday.replace(hour=12))
+        # 周五晚上之后的下一个发送时段是周一上午
+        self.assertEqual(windows.next_open(datetime(2026, 10, 23, 21)), monday.replace(day=26, hour=9))
+
+        overnight = SendingWindows(['22:00-02:00'])
+        self.assertTrue(overnight.is_open(monday.replace(hour=1)))
+        self.assertEqual(overnight.next_close(monday.replace(hour=23)), monday.replace(day=20, hour=2))
+        self.assertIsNone(SendingWindows().next_close(monday))
+        with self.assertRaises(ValueError):
+            SendingWindows(['9点-10点'])
+
+    def test_pause_at_window_close_and_resume(self):
+        """测试窗口关闭时暂停、下一个窗口续发，活动在重启后保留"""
+        clock = VirtualDateClock(datetime(2026, 10, 18, 20, 0))
+
+        class SlowClient(FakeClient):
+            # 每条消息耗时20分钟，使发送跨过时段结束
+            def SendMsg(self, message, who, exact=True):
+                clock.now += timedelta(minutes=20)
+                return super().SendMsg(message, who, exact)
+
+        client = SlowClient()
+        contacts = [{'name': f'客户{i}'} for i in range(5)]
+        sender = make_sender(self, client, contacts, outbox_dir=self.data_dir / 'outbox')
+        windows = SendingWindows(['09:00-10:00'])
+        scheduler = CampaignScheduler(sender, self.data_dir / 'schedule', windows, clock=clock, wait=clock.wait,
+                                      poll_interval=24 * 3600)
+        campaign = scheduler.schedule('VIP', '{name}您好', datetime(2026, 10, 19, 9, 0))
+
+        # 重启后活动仍在
+        restarted = CampaignScheduler(sender, self.data_dir / 'schedule', windows, clock=clock, wait=clock.wait)
+        self.assertEqual([c['status'] for c in restarted.list_campaigns()], [SCHEDULED])
+        self.assertEqual(restarted.next_run_at(), datetime(2026, 10, 19, 9, 0))
+
+        # 睡眠到第二天9点；发送3条后到10点窗口关闭暂停，再睡眠到第三天9点续发剩余2条
+        with mock.patch.object(scheduler, '_run', wraps=scheduler._run) as run:
+            scheduler.run_forever(until_idle=True)
+        self.assertEqual(clock.waits, [13 * 3600, 23 * 3600])
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual([who for who, _ in client.sent], [f'客户{i}' for i in range(5)])
+        self.assertEqual(client.sent[0][1], '客户0您好')
+
+        result = scheduler.list_campaigns()[0]
+        self.assertEqual(result['status'], COMPLETED)
+        self.assertEqual(result['sent'], 5)
+        self.assertEqual(result['schedule_id'], campaign['schedule_id'])
+        job = Outbox(self.data_dir / 'outbox').load_job(result['job_id'])
+        self.assertEqual(job.summary()['sent'], 5)
+        job.close()
+
+        # 发送中被中断的活动重启后恢复为暂停
+        scheduler.campaigns[campaign['schedule_id']]['status'] = 'running'
+        scheduler._save(scheduler.campaigns[campaign['schedule_id']])
+        restarted = CampaignScheduler(sender, self.data_dir / 'schedule', windows, clock=clock)
+        self.assertEqual(restarted.list_campaigns()[0]['status'], PAUSED)
+
+    def test_sees_campaigns_from_other_processes(self):
+        """测试运行中的调度器看到其他进程添加和取消的活动，发送中被取消时不覆盖取消状态"""
+        clock = VirtualDateClock(datetime(2026, 10, 19, 9, 0))
+        contacts = [{'name': f'客户{i}'} for i in range(4)]
+        client = FakeClient()
+        sender = make_sender(self, client, contacts, outbox_dir=self.data_dir / 'outbox')
+        daemon = CampaignScheduler(sender, self.data_dir / 'schedule', clock=clock, wait=clock.wait, poll_interval=30)
+        other = CampaignScheduler(None, self.data_dir / 'schedule', clock=clock)
+
+        # 守护进程空闲时最长等待 poll_interval，醒来后看到新活动
+        daemon.run_forever(until_idle=True)
+        first = other.schedule('VIP', '通知一')
+        cancelled = other.schedule('VIP', '通知二', datetime(2026, 10, 19, 10, 0))
+        self.assertEqual(daemon.next_run_at(), clock.now)
+        self.assertTrue(other.cancel(cancelled['schedule_id']))
+        self.assertEqual([c['schedule_id'] for c in daemon.run_pending()], [first['schedule_id']])
+        self.assertEqual(len(client.sent), 4)
+
+        # 发送第二条时其他进程取消，守护进程在下一个收件人前停止，保存时保留取消状态
+        third = other.schedule('VIP', '通知三')
+        client.sent.clear()
+
+        class CancelClient(FakeClient):
+            def SendMsg(self, message, who, exact=True):
+                if len(self.sent) == 1:
+                    other.cancel(third['schedule_id'])
+                return super().SendMsg(message, who, exact)
+
+        sender.wx = CancelClient()
+        daemon.run_pending()
+        self.assertEqual(len(sender.wx.sent), 2)
+        statuses = {c['schedule_id']: c['status'] for c in other.list_campaigns()}
+        self.assertEqual(statuses, {first['schedule_id']: COMPLETED, cancelled['schedule_id']: 'cancelled',
+                                    third['schedule_id']: 'cancelled'})
+
+        # 没有活动或下一个活动较晚时，每次最多等待 poll_interval 秒后重新扫描
+        def wait(timeout):
+            clock.wait(timeout)
+            if len(clock.waits) == 3:
+                daemon.stop()
+
+        clock.waits.clear()
+        daemon._wait = wait
+        other.schedule('VIP', '通知四', clock.now + timedelta(hours=1))
+        daemon.run_forever()
+        self.assertEqual(clock.waits, [30, 30, 30])
+
+class TestTransport(unittest.TestCase):
+    """
+    TestTransport 功能说明:
+    测试微信传输层和模拟微信客户端
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_fake_transport_behaviors(self):
+        """测试模拟客户端的延迟、未知收件人、随机失败、限流和好友/会话列表"""
+        clock = VirtualClock()
+        friends = [{'NickName': '张三', 'UserName': 'wx_zhang', 'Remark': '老张'}, {'NickName': '李四', 'UserName': 'wx_li'}]
+        fake = FakeWeChatTransport(friends, sessions=['产品群'], latency=0.5, rate_limit_per_minute=3,
+                                   clock=clock, sleep=clock.sleep)
+        self.assertTrue(fake.SendMsg('你好', '老张'))
+        self.assertTrue(fake.SendMsg('你好', '产品群'))
+        with self.assertRaises(PermanentSendError):
+            fake.SendMsg('你好', '王五')
+        self.assertFalse(classify_error(PermanentSendError('未找到联系人: 王五')))
+        # 每分钟第4条触发限流，一分钟后恢复
+        with self.assertRaises(RateLimitedError):
+            fake.SendMsg('你好', '李四')
+        clock.now += 60
+        self.assertTrue(fake.SendMsg('你好', '李四'))
+        self.assertEqual(clock.sleeps, [0.5] * 5)
+        self.assertEqual(fake.stats(), {'calls': 5, 'sent': 3, 'failed': 0, 'unknown': 1, 'rate_limited': 1})
+        self.assertEqual([item['who'] for item in fake.sent], ['老张', '产品群', '李四'])
+
+        self.assertEqual(len(fake.GetFriendDetails(n=1)), 1)
+        self.assertEqual(fake.GetSessionList(), ['老张', '李四', '产品群'])
+
+        flaky = FakeWeChatTransport(failure_rate=1.0, unknown_recipient='accept')
+        self.assertFalse(flaky.SendMsg('你好', '任何人'))
+        self.assertTrue(FakeWeChatTransport(friends, unknown_recipient='fail').SendMsg('你好', '张三'))
+        self.assertFalse(FakeWeChatTransport(friends, unknown_recipient='fail').SendMsg('你好', '王五'))
+
+    def test_wxauto_adapter_is_lazy(self):
+        """测试真实客户端适配器首次使用时才导入自动化库"""
+        adapter = WxautoTransport(modules=('no_such_wechat_module',))
+        self.assertIsNone(adapter.module_name)
+        with self.assertRaises(ImportError):
+            adapter.SendMsg('你好', '张三')
+        self.assertIsInstance(create_transport('fake', friend_count=3), FakeWeChatTransport)
+        with self.assertRaises(ValueError):
+            create_transport('unknown')
+
+    def test_rate_limit_response_slows_sender(self):
+        """测试收到限流响应时发送器降速并在退避后重发成功"""
+        clock = VirtualClock()
+        fake = FakeWeChatTransport(rate_limit_per_minute=3, unknown_recipient='accept', clock=clock, sleep=clock.sleep)
+        sender = make_sender(self, FakeClient(clock=clock))
+        sender.wx = fake
+        sender.retry_base_delay = 30
+        with mock.patch('builtins.print'):
+            result = sender.send_batch_messages([{'name': f'客户{i}'} for i in range(5)], '通知')
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(item['who'] for item in fake.sent), [f'客户{i}' for i in range(5)])
+        self.assertGreaterEqual(fake.stats()['rate_limited'], 1)
+        self.assertGreater(sender.rate_limiter.interval, sender.rate_limiter.base_interval)
+
+def make_account(name: str, friends=None, interval: float = 2.0, **options) -> SenderAccount:
+    """
+    make_account 功能说明:
+    创建发送账号：模拟客户端每次发送耗时0.5秒，限速器和客户端共用该账号自己的虚拟时钟
+    输入: name (str) 账号名称, friends (list, 可选) 好友列表, interval (float) 发送间隔,
+          options 模拟客户端其他参数（failure_threshold 为账号停用阈值） | 输出: SenderAccount 发送账号
+    """
+    clock = VirtualClock()
+    threshold = options.pop('failure_threshold', 5)
+    transport = FakeWeChatTransport(friends, latency=0.5, clock=clock, sleep=clock.sleep, seed=1, **options)
+    return SenderAccount(name, transport, RateLimiter(interval=interval, clock=clock, sleep=clock.sleep), threshold)
+
+class TestAccountDispatcher(unittest.TestCase):
+    """
+    TestAccountDispatcher 功能说明:
+    测试多账号分发发送
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        self.sender = make_sender(self, FakeClient(), outbox_dir=self.data_dir)
+        self.sender.retry_base_delay = 10
+
+    def dispatch(self, accounts, contacts, message='通知', **kwargs):
+        dispatcher = AccountDispatcher(self.sender, accounts, self.data_dir / 'assignments.json')
+        with mock.patch('builtins.print'):
+            return dispatcher, dispatcher.dispatch(contacts, message, **kwargs)
+
+    def test_throughput_scales_with_accounts(self):
+        """测试吞吐量随账号数量线性增长，每个收件人只发送一次"""
+        contacts = [{'name': f'客户{i}'} for i in range(90)]
+        elapsed = {}
+        for count in (1, 3):
+            # 换一组账号时清除上一组的固定分配
+            (self.data_dir / 'assignments.json').unlink(missing_ok=True)
+            accounts = [make_account(f'账号{i}') for i in range(count)]
+            _, result = self.dispatch(accounts, contacts, message=f'通知{count}')
+            self.assertTrue(result['success'])
+            self.assertEqual(result['success_count'], 90)
+            delivered = [item['who'] for account in accounts for item in account.transport.sent]
+            self.assertEqual(sorted(delivered), sorted(contact['name'] for contact in contacts))
+            self.assertEqual({name: stats['sent'] for name, stats in result['accounts'].items()},
+                             {account.name: 90 // count for account in accounts})
+            # 各账号并行发送，活动总耗时取最慢的账号
+            elapsed[count] = max(account.rate_limiter.clock() for account in accounts)
+        self.assertAlmostEqual(elapsed[1] / elapsed[3], 3.0, delta=0.1)
+
+    def test_sticky_owner_after_unknown_recipient(self):
+        """测试账号找不到联系人时转交其他账号，并记住成功的账号"""
+        first = make_account('账号A', [{'NickName': '张三'}, {'NickName': '李四'}])
+        second = make_account('账号B', [{'NickName': '王五'}, {'NickName': '赵六'}])
+        contacts = [{'name': '王五'}, {'name': '张三'}, {'name': '赵六'}, {'name': '李四'},
+                    {'name': '钱七', 'account': '账号B'}]
+        second.transport.sessions.append('钱七')
+        second.transport.known.add('钱七')
+        job = self.sender.outbox.create_job([contact['name'] for contact in contacts], '通知')
+        dispatcher, result = self.dispatch([first, second], contacts, job=job)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['rerouted'], 4)
+        self.assertEqual(sorted(item['who'] for item in first.transport.sent), ['张三', '李四'])
+        self.assertEqual(sorted(item['who'] for item in second.transport.sent), ['王五', '赵六', '钱七'])
+        self.assertEqual(self.sender.outbox.load_job(job.job_id).summary()['sent'], 5)
+
+        # 再次发送新内容时直接由记住的账号发送，不再出现找不到联系人
+        reloaded = AccountDispatcher(self.sender, [first, second], self.data_dir / 'assignments.json')
+        self.assertEqual(reloaded.assignments['王五'], '账号B')
+        unknown = first.transport.stats()['unknown'] + second.transport.stats()['unknown']
+        with mock.patch('builtins.print'):
+            result = reloaded.dispatch(contacts, '第二条通知')
+        self.assertEqual(result['rerouted'], 0)
+        self.assertEqual(first.transport.stats()['unknown'] + second.transport.stats()['unknown'], unknown)
+
+    def test_rebalance_when_account_fails(self):
+        """测试账号连接失败或连续发送失败时剩余收件人转交其他账号"""
+        healthy = make_account('账号A')
+        broken = make_account('账号B', failure_rate=1.0, failure_threshold=2)
+        offline = make_account('账号C')
+        offline.transport.connect = mock.Mock(side_effect=RuntimeError('微信未登录'))
+        contacts = [{'name': f'客户{i}'} for i in range(12)]
+        _, result = self.dispatch([healthy, broken, offline], contacts)
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(item['who'] for item in healthy.transport.sent),
+                         sorted(contact['name'] for contact in contacts))
+        self.assertFalse(result['accounts']['账号B']['healthy'])
+        self.assertIn('微信未登录', result['accounts']['账号C']['error'])
+        self.assertEqual(result['accounts']['账号A']['sent'], 12)
+
+        # 没有可用账号时收件人记为失败，发送任务中保持待发送
+        job = self.sender.outbox.create_job(['客户0'], '新通知')
+        _, result = self.dispatch([broken], [{'name': '客户0'}], message='新通知', job=job)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['failed_contacts'][0]['name'], '客户0')
+        self.assertEqual(self.sender.outbox.load_job(job.job_id).summary()['pending'], 1)
+
+    def test_real_clients_share_ui_thread(self):
+        """测试多账号发送时真实客户端的连接和发送都在同一个界面自动化线程中执行，且不会同时进行"""
+        calls, overlaps = [], []
+        busy = threading.Lock()
+
+        class WeChat:
+            def __init__(self, nickname):
+                self.nickname = nickname
+                calls.append(('connect', threading.get_ident()))
+
+            def SendMsg(self, msg, who, exact=True):
+                if not busy.acquire(blocking=False):
+                    overlaps.append(who)
+                    return False
+                try:
+                    calls.append((who, threading.get_ident()))
+                    time.sleep(0.002)
+                    return True
+                finally:
+                    busy.release()
+
+        module = mock.Mock(WeChat=WeChat)
+        accounts = [SenderAccount(f'账号{i}', WxautoTransport(modules=('fake_wxauto',), nickname=f'账号{i}'),
+                                  RateLimiter(interval=0)) for i in range(3)]
+        contacts = [{'name': f'客户{i}'} for i in range(30)]
+        with mock.patch.dict(sys.modules, {'fake_wxauto': module}):
+            _, result = self.dispatch(accounts, contacts)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(overlaps, [])
+        self.assertEqual(sorted(who for who, _ in calls if who != 'connect'), sorted(c['name'] for c in contacts))
+        self.assertEqual(len({ident for _, ident in calls}), 1)
+        self.assertEqual(calls[0][1], transport_module.ui_thread._ident)
+
+class GatedClient(FakeClient):
+    """
+    GatedClient 功能说明:
+    模拟客户端，第 gate_at 次发送阻塞到 gate 被放行（超时5秒），用于控制发送线程的进度
+    输入: gate_at (int) 第几次发送时阻塞 | 输出: 模拟客户端
+    """
+
+    def __init__(self, gate_at: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.gate_at = gate_at
+        self.gate = threading.Event()
+        self.blocked = threading.Event()
+        self.thread_names = []
+
+    def SendMsg(self, message, who, exact=True):
+        self.thread_names.append(threading.current_thread().name)
+        if len(self.sent) + 1 == self.gate_at:
+            self.blocked.set()
+            if not self.gate.wait(5):
+                raise AssertionError('发送线程一直未被放行')
+        return super().SendMsg(message, who, exact)
+
+class TestAsyncSender(unittest.TestCase):
+    """
+    TestAsyncSender 功能说明:
+    测试异步发送接口
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def setUp(self):
+        self.contacts = [{'name': f'客户{i}'} for i in range(5)]
+
+    def run_campaign(self, client, control, start=None):
+        sender = make_sender(self, client, contacts=self.contacts)
+        api = AsyncMessageSender(sender)
+        self.addCleanup(api.close)
+
+        async def main():
+            campaign = start(api) if start else api.send_by_tag('VIP', '通知')
+            events = []
+            async for event in campaign:
+                events.append(event)
+                await control(campaign, event, client)
+            return events, await campaign
+        events, result = asyncio.run(main())
+        return sender, events, result
+
+    def test_events_while_loop_stays_responsive(self):
+        """测试进度事件流，发送阻塞时事件循环仍可运行其他任务"""
+        client = GatedClient(gate_at=2)
+
+        async def control(campaign, event, client):
+            if event['type'] == 'sent' and event['done'] == 1:
+                # 第二条发送阻塞在专用线程中，事件循环仍在运行，由这里放行
+                while not client.blocked.is_set():
+                    await asyncio.sleep(0.001)
+                client.gate.set()
+
+        sender, events, result = self.run_campaign(client, control)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['count'], 5)
+        self.assertEqual([event['type'] for event in events], ['started'] + ['sent'] * 5 + ['finished'])
+        self.assertEqual([event['done'] for event in events[1:6]], [1, 2, 3, 4, 5])
+        self.assertEqual(set(client.thread_names), {client.thread_names[0]})
+        self.assertNotEqual(client.thread_names[0], threading.current_thread().name)
+        self.assertEqual(sender.outbox.load_job(result['job_id']).summary()['sent'], 5)
+
+        # 收件人查询失败时活动直接以失败结果结束
+        sender.contact_manager.query_contacts.return_value = []
+
+        async def failing():
+            api = AsyncMessageSender(sender)
+            try:
+                events = [event async for event in api.send_by_tag('不存在', '通知')]
+            finally:
+                api.close()
+            return events
+        events = asyncio.run(failing())
+        self.assertEqual(len(events), 1)
+        self.assertFalse(events[0]['result']['success'])
+        self.assertIn('没有匹配的联系人', events[0]['result']['error'])
+
+    def test_pause_and_resume(self):
+        """测试暂停后只续发剩余收件人，进度连续"""
+        client = GatedClient(gate_at=2)
+
+        async def control(campaign, event, client):
+            if event['type'] == 'sent' and event['done'] == 1:
+                # 第二条正在发送时暂停，该条发送完成后暂停
+                while not client.blocked.is_set():
+                    await asyncio.sleep(0.001)
+                campaign.pause()
+                client.gate.set()
+            elif event['type'] == 'paused':
+                self.assertEqual(event['remaining'], 3)
+                self.assertEqual(len(client.sent), 2)
+                campaign.resume()
+
+        sender, events, result = self.run_campaign(client, control)
+        self.assertTrue(result['success'])
+        self.assertEqual([event['type'] for event in events],
+                         ['started', 'sent', 'sent', 'paused', 'resumed', 'sent', 'sent', 'sent', 'finished'])
+        self.assertEqual(events[-2]['done'], 5)
+        self.assertEqual([who for who, _ in client.sent], [contact['name'] for contact in self.contacts])
+
+    def test_cancel_interrupts_wait(self):
+        """测试取消立即打断限速等待，未发送的收件人在发送任务中保持待发送"""
+        client = GatedClient(gate_at=0)
+
+        async def control(campaign, event, client):
+            if event['type'] == 'sent':
+                campaign.cancel()
+
+        def start(api):
+            # 真实时钟，发送间隔30秒：第一条发送后进入限速等待
+            api.sender.rate_limiter = RateLimiter(interval=30)
+            job = api.sender.outbox.create_job([contact['name'] for contact in self.contacts], '通知')
+            return api.send_batch(self.contacts, '通知', job=job)
+
+        started = time.monotonic()
+        sender, events, result = self.run_campaign(client, control, start)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(result['cancelled'])
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['remaining'], ['客户1', '客户2', '客户3', '客户4'])
+        self.assertEqual(sender.outbox.load_job(result['job_id']).summary()['pending'], 4)
+
+class TestCampaignSimulator(unittest.TestCase):
+    """
+    TestCampaignSimulator 功能说明:
+    测试发送活动预估
+    输入: 测试用例 | 输出: 测试结果
+    """
+
+    def test_pacing_and_hourly_volume(self):
+        """测试按发送间隔预估耗时和每小时发送量，发送耗时计入间隔内"""
+        simulator = CampaignSimulator([RateLimiter(interval=2)], latency=0.5)
+        result = simulator.run([3600], datetime(2026, 10, 19, 10, 0))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['expected_sent'], 3600)
+        self.assertAlmostEqual(result['duration'], 3599 * 2 + 0.5)
+        self.assertEqual(result['finish_at'], '2026-10-19T11:59:58.500000')
+        self.assertEqual(result['hourly'], [{'hour': '2026-10-19 10:00', 'count': 1800},
+                                            {'hour': '2026-10-19 11:00', 'count': 1800}])
+        self.assertEqual(result['peak_per_hour'], 1800)
+
+    def test_quiet_hours_push_finish_time(self):
+        """测试发送时段关闭时暂停到下一个时段，完成时间顺延"""
+        simulator = CampaignSimulator([RateLimiter(interval=2)], SendingWindows(['09:00-10:00']))
+        result = simulator.run([3600], datetime(2026, 10, 19, 8, 30))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['start_at'], '2026-10-19T08:30:00')
+        self.assertEqual(result['finish_at'], '2026-10-20T09:59:58')
+        self.assertEqual(result['paused_seconds'], 1800 + 23 * 3600)
+        self.assertEqual([item['count'] for item in result['hourly']], [1800, 1800])
+        self.assertEqual(result['hourly'][1]['hour'], '2026-10-20 09:00')
+
+        closed = CampaignSimulator([RateLimiter(interval=2)], SendingWindows(['09:00-10:00'], ['08:00-11:00']))
+        self.assertFalse(closed.run([10], datetime(2026, 10, 19, 8, 30))['success'])
+
+    def test_accounts_run_in_parallel(self):
+        """测试多个账号并行发送，总耗时取最慢的账号，失败按重试退避重发"""
+        single = CampaignSimulator([RateLimiter(interval=2)], latency=0.5).run([300])
+        triple = CampaignSimulator([RateLimiter(interval=2) for _ in range(3)], latency=0.5).run([100, 100, 100])
+        self.assertAlmostEqual(single['duration'] / triple['duration'], 3.0, delta=0.05)
+        self.assertEqual(triple['expected_sent'], 300)
+
+        flaky = CampaignSimulator([RateLimiter(interval=2, failure_threshold=1.0)], max_retry=3,
+                                  latency=0.5, failure_rate=0.3, seed=7).run([1000])
+        account = flaky['accounts'][0]
+        self.assertEqual(flaky['expected_sent'] + flaky['expected_failed'], 1000)
+        self.assertGreater(flaky['expected_retries'], 200)
+        self.assertEqual(account['calls'], 1000 + account['retries'])
+
+    def test_send_by_tag_dry_run(self):
+        """测试预估模式渲染检查所有消息、扣除已发送的收件人且不调用微信"""
+        contacts = [{'name': f'客户{i}'} for i in range(5)]
+        client = FakeClient()
+        sender = make_sender(self, client, contacts)
+        sender.rate_limiter = RateLimiter(interval=2)
+        sender.ledger.record('客户0', content_hash('{name}您好，新品上市'), 'spring')
+        result = sender.send_by_tag('VIP', '{name}您好，新品上市', campaign_id='spring', dry_run=True)
+        self.assertTrue(result['success'])
+        self.assertTrue(result['dry_run'])
+        self.assertEqual((result['total'], result['to_send'], result['skipped_count']), (5, 4, 1))
+        self.assertEqual(result['samples'][0], {'name': '客户1', 'message': '客户1您好，新品上市'})
+        self.assertEqual(result['estimate']['expected_sent'], 4)
+        self.assertAlmostEqual(result['estimate']['duration'], 3 * 2 + 1.0)
+        self.assertEqual(client.sent, [])
+        self.assertEqual(list(sender.outbox.list_jobs()), [])
+
+    def test_million_recipients_in_seconds(self):
+        """测试百万收件人的预估在数秒内完成"""
+        simulator = CampaignSimulator([RateLimiter(interval=2, jitter=0.2)], latency=1.0, seed=1)
+        result = simulator.run([1_000_000], datetime(2026, 10, 19, 9, 0))
+        self.assertEqual(result['expected_sent'], 1_000_000)
+        self.assertGreater(result['duration'], 2_000_000)
+        self.assertLess(result['simulated_in'], 20)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
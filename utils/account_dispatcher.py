@@ -0,0 +1,511 @@
+##########account_dispatcher.py: [多账号分发发送模块] ##################
+# 变更记录: [2026-10-17 23:10] @李祥光 [初始创建，按好友归属把活动收件人分发到多个微信账号并行发送，每个账号独立限速，账号故障时转交其他账号]########
+# 变更记录: [2026-10-17 23:50] @李祥光 [dispatch支持进度回调和可打断的等待，转发给各账号的批量发送]########
+# 变更记录: [2026-10-18 11:20] @李祥光 [模板发送的失败记录保存模板原文，与单账号发送的失败记录格式一致]########
+# 变更记录: [2026-10-18 16:00] @李祥光 [更正说明：各账号线程只并行限速等待，真实客户端的界面自动化经ui_thread串行执行]########
+# 输入: 联系人列表、消息内容和多个微信账号 | 输出: 合并后的批量发送结果###############
+
+import copy
+import json
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+from .logger import Logger
+from .atomic_file import atomic_write_json
+from .message_template import MessageTemplate, CONTACT_FIELDS
+from .outbox import OutboxJob
+from .rate_limiter import RateLimiter, create_rate_limiter
+from .retry_scheduler import RateLimitedError, classify_error
+from .transport import WeChatTransport, create_transport
+
+###########################文件下的所有函数###########################
+"""
+SenderAccount.connect：连接该账号的微信客户端，失败时标记账号不可用
+SenderAccount.SendMsg：通过该账号发送消息并统计连续失败次数
+SenderAccount._record：记录发送结果，连续失败达到阈值时停用账号
+SenderAccount.mark_unhealthy：标记账号不可用，正在进行的发送在下一个收件人前暂停
+SenderAccount.stats：获取账号发送统计
+AccountDispatcher.from_config：根据配置 wechat.accounts 创建多账号分发器
+AccountDispatcher.owner：确定联系人由哪个账号发送（固定分配）
+AccountDispatcher.dispatch：把收件人分发到各账号并行发送，合并发送结果
+AccountDispatcher._submit：把一组收件人放入账号的发送队列
+AccountDispatcher._reroute：把收件人转交给其他可用账号
+AccountDispatcher._give_up：没有可用账号时把收件人记为失败
+AccountDispatcher._worker：账号发送线程，依次发送队列中的收件人
+AccountDispatcher._run_shard：用该账号的传输层和限速器发送一组收件人
+AccountDispatcher._load_assignments：加载联系人与账号的固定分配
+AccountDispatcher._save_assignments：保存联系人与账号的固定分配
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender.send_by_tag/resume_job] --> B[dispatch]
+    B --> C[owner 联系人指定账号 > 已保存的分配 > 当前负载最少的账号]
+    C --> D[_submit 放入账号发送队列]
+    D --> E[_worker 每个账号一个线程]
+    E --> F[_run_shard]
+    I --> UI[WxautoTransport 的调用经 ui_thread 串行执行]
+    F --> G[SenderAccount.connect]
+    F --> H[send_batch_messages 该账号的传输层和限速器]
+    H --> I[SenderAccount.SendMsg]
+    I -->|连续失败达到阈值| J[mark_unhealthy 暂停该账号]
+    J --> K[_reroute 未发送和等待重试的收件人]
+    H -->|该账号找不到联系人| K
+    K --> D
+    B --> L[_save_assignments 保存发送成功的账号]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class SenderAccount(WeChatTransport):
+    """
+    SenderAccount 功能说明:
+    一个已登录的微信账号：传输层、独立的限速器和健康状态。
+    作为传输层传给批量发送，记录连续失败次数（联系人不存在等永久失败和限流不计入），
+    达到阈值时标记为不可用，剩余收件人由分发器转交给其他账号
+    输入: name (str) 账号名称, transport (WeChatTransport) 传输层, rate_limiter (RateLimiter) 限速器,
+          failure_threshold (int) 连续失败多少次后停用 | 输出: 账号对象
+    """
+
+    def __init__(self, name: str, transport: WeChatTransport, rate_limiter: RateLimiter, failure_threshold: int = 5):
+        self.name = name
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.healthy = True
+        self.connected = False
+        self.error = ''
+        self.consecutive_failures = 0
+        self.counts = {'sent': 0, 'failed': 0, 'skipped': 0, 'rerouted': 0}
+        self._lock = threading.Lock()
+
+    def connect(self) -> None:
+        """
+        connect 功能说明:
+        连接该账号的微信客户端，失败时标记账号不可用并抛出异常
+        输入: 无 | 输出: 无
+        """
+        if self.connected:
+            return
+        try:
+            self.transport.connect()
+        except Exception as e:
+            self.mark_unhealthy(f'连接失败: {str(e)}')
+            raise
+        self.connected = True
+        Logger.info(f"账号 {self.name} 已连接")
+
+    def SendMsg(self, msg: str, who: str, exact: bool = True) -> bool:
+        try:
+            sent = self.transport.SendMsg(msg, who, exact=exact)
+        except Exception as e:
+            # 联系人不存在等是收件人的问题，限流只需降速，都不说明账号故障
+            if classify_error(e) and not isinstance(e, RateLimitedError):
+                self._record(False, str(e))
+            raise
+        self._record(bool(sent), '微信发送接口返回失败')
+        return sent
+
+    def GetFriendDetails(self, n: Optional[int] = None, timeout: int = 0xFFFFF) -> List[Dict]:
+        return self.transport.GetFriendDetails(n=n, timeout=timeout)
+
+    def GetSessionList(self) -> List[str]:
+        return self.transport.GetSessionList()
+
+    def _record(self, success: bool, error: str) -> None:
+        """
+        _record 功能说明:
+        记录一次发送结果，连续失败达到阈值时停用账号
+        输入: success (bool) 是否成功, error (str) 失败原因 | 输出: 无
+        """
+        with self._lock:
+            if success:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            reached = self.consecutive_failures >= self.failure_threshold
+        if reached and self.healthy:
+            self.mark_unhealthy(f'连续 {self.consecutive_failures} 次发送失败: {error}')
+
+    def mark_unhealthy(self, reason: str) -> None:
+        """
+        mark_unhealthy 功能说明:
+        标记账号不可用，该账号正在进行的批量发送在下一个收件人前暂停
+        输入: reason (str) 原因 | 输出: 无
+        """
+        self.healthy = False
+        self.error = reason
+        Logger.warning(f"账号 {self.name} 已停用: {reason}")
+
+    def stats(self) -> Dict:
+        """
+        stats 功能说明:
+        获取账号发送统计
+        输入: 无 | 输出: Dict 发送成功、失败、跳过、转出的收件人数和健康状态
+        """
+        with self._lock:
+            return {**self.counts, 'healthy': self.healthy, 'error': self.error,
+                    'interval': self.rate_limiter.interval}
+
+class _DispatchRun:
+    """
+    _DispatchRun 功能说明:
+    一次分发的共享状态：消息、发送任务、每个收件人已尝试的账号和合并结果
+    输入: dispatch 的参数 | 输出: 状态对象
+    """
+
+    def __init__(self, contacts: List[Dict], message, job, campaign_id, stop, progress=None, sleep=None):
+        self.by_name = {contact['name']: contact for contact in contacts}
+        self.message = message
+        self.job = job
+        self.campaign_id = campaign_id
+        self.stop = stop
+        self.progress = progress
+        self.sleep = sleep
+        self.tried: Dict[str, Set[str]] = {}
+        self.load: Dict[str, int] = {}
+        self.success = 0
+        self.skipped = 0
+        self.retries = 0
+        self.rerouted = 0
+        self.paused = False
+        self.failed_contacts: List[Dict] = []
+        self.remaining: List[str] = []
+        self.delivered: Dict[str, str] = {}
+        self.outstanding = 0
+        self.cond = threading.Condition()
+
+    def stopped(self) -> bool:
+        return self.stop is not None and self.stop()
+
+class AccountDispatcher:
+    """
+    AccountDispatcher 功能说明:
+    多账号分发发送器。每个账号一个发送线程、各自独立的限速器，同一活动的收件人分给多个账号并行发送。
+    真实客户端（WxautoTransport）的界面自动化调用由传输层提交到唯一的 ui_thread 串行执行，
+    各账号线程并行的是限速间隔等待；发送间隔远大于单次界面操作耗时时，吞吐量随账号数量近似线性增长，
+    上限为界面自动化线程的处理能力。联系人固定由同一个账号发送：联系人记录中的 account 字段优先，
+    其次是上次发送成功的账号（持久化保存），新联系人分给当前负载最少的账号；
+    某个账号报告找不到联系人时改由其他账号发送，成功后记住该账号。
+    账号连接失败或连续发送失败达到阈值时停用，剩余收件人转交给其他可用账号。
+    发送本身复用 MessageSender.send_batch_messages，发送账本去重、消息模板、失败重试和发送任务状态与单账号一致
+    输入: sender (MessageSender) 消息发送器, accounts (List[SenderAccount]) 账号列表,
+          assignments_file (str/Path, 可选) 固定分配保存文件 | 输出: 分发器对象
+    """
+
+    def __init__(self, sender, accounts: List[SenderAccount], assignments_file=None):
+        if not accounts:
+            raise ValueError('至少需要一个微信账号')
+        names = [account.name for account in accounts]
+        if len(set(names)) != len(names):
+            raise ValueError(f'账号名称重复: {names}')
+        self.sender = sender
+        self.accounts: Dict[str, SenderAccount] = {account.name: account for account in accounts}
+        self.assignments_file = Path(assignments_file) if assignments_file else None
+        self.assignments: Dict[str, str] = self._load_assignments()
+
+    @classmethod
+    def from_config(cls, sender, settings, specs: Optional[List[Dict]] = None) -> 'AccountDispatcher':
+        """
+        from_config 功能说明:
+        根据配置 wechat.accounts 创建分发器。每个账号可指定 name、transport（默认 wechat.transport）、
+        send_interval（默认 message.send_interval）、client（真实客户端的 WeChat 参数，如 nickname）和 fake（模拟客户端参数）
+        输入: sender (MessageSender) 消息发送器, settings 配置对象, specs (List[Dict], 可选) 账号配置 | 输出: AccountDispatcher 分发器
+        """
+        specs = specs if specs is not None else settings.get('wechat.accounts', [])
+        threshold = settings.get('wechat.account_failure_threshold', 5)
+        accounts = []
+        for index, spec in enumerate(specs):
+            name = spec.get('name') or f'账号{index + 1}'
+            transport_name = spec.get('transport') or settings.get('wechat.transport', 'wxauto')
+            options = spec.get('fake', {}) if transport_name == 'fake' else spec.get('client', {})
+            accounts.append(SenderAccount(
+                name,
+                create_transport(transport_name, **options),
+                create_rate_limiter(settings, spec.get('send_interval')),
+                spec.get('failure_threshold', threshold)
+            ))
+        return cls(sender, accounts, settings.get('wechat.account_assignments_file', 'data/account_assignments.json'))
+
+    def owner(self, contact: Dict, exclude: Optional[Set[str]] = None, load: Optional[Dict[str, int]] = None) -> Optional[str]:
+        """
+        owner 功能说明:
+        确定联系人由哪个账号发送：联系人记录中的 account 字段 > 上次发送成功的账号 > 负载最少的可用账号，
+        指定的账号不可用或已尝试过时同样改用负载最少的账号
+        输入: contact (Dict) 联系人, exclude (Set[str], 可选) 已尝试过的账号, load (Dict[str, int], 可选) 本次各账号已分配数 |
+              输出: Optional[str] 账号名称，没有可用账号时为 None
+        """
+        exclude = exclude or set()
+        available = [name for name, account in self.accounts.items() if account.healthy and name not in exclude]
+        if not available:
+            return None
+        for name in (contact.get('account'), self.assignments.get(contact['name'])):
+            if name in available:
+                return name
+        load = load or {}
+        return min(available, key=lambda name: load.get(name, 0))
+
+    def dispatch(self, contacts: List[Dict], message: Union[str, MessageTemplate], job: Optional[OutboxJob] = None,
+                 campaign_id: Optional[str] = None, stop: Optional[Callable[[], bool]] = None,
+                 progress: Optional[Callable[[Dict], None]] = None,
+                 sleep: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        dispatch 功能说明:
+        把收件人分发到各账号并行发送，参数和返回值与 send_batch_messages 一致，另外返回各账号统计和转交次数。
+        stop 返回 True 时所有账号暂停，未发送的收件人在发送任务中保持待发送状态；
+        progress 和 sleep 转发给每个账号的批量发送，progress 会在各账号的发送线程中被调用
+        输入: contacts (List[Dict]) 联系人列表, message (str/MessageTemplate) 消息内容或已编译的模板,
+              job (OutboxJob, 可选) 发送任务, campaign_id (str, 可选) 活动ID, stop (Callable, 可选) 暂停判断,
+              progress (Callable, 可选) 进度回调, sleep (Callable, 可选) 可打断的等待函数 |
+              输出: Dict[str, Any] 批量发送结果
+        """
+        started = datetime.now()
+        run = _DispatchRun(contacts, message, job, campaign_id, stop, progress, sleep)
+        # 好友详细信息在启动发送线程前加载，所有账号共用
+        if isinstance(message, MessageTemplate) and not message.fields <= CONTACT_FIELDS:
+            self.sender._get_friend_details()
+
+        shards: Dict[str, List[Dict]] = {}
+        for contact in contacts:
+            name = self.owner(contact, load=run.load)
+            if name is None:
+                self._give_up(run, [contact['name']], '没有可用的微信账号')
+                continue
+            run.load[name] = run.load.get(name, 0) + 1
+            shards.setdefault(name, []).append(contact)
+        Logger.info(f"多账号发送 {len(contacts)} 个收件人: " +
+                    ', '.join(f"{name} {len(shard)}个" for name, shard in shards.items()))
+
+        queues: Dict[str, queue.Queue] = {name: queue.Queue() for name in self.accounts}
+        threads = [threading.Thread(target=self._worker, args=(account, queues[name], run, queues),
+                                    name=f'sender-{name}', daemon=True)
+                   for name, account in self.accounts.items()]
+        for name, shard in shards.items():
+            self._submit(run, queues, name, shard)
+        for thread in threads:
+            thread.start()
+        with run.cond:
+            while run.outstanding:
+                run.cond.wait()
+        for name in self.accounts:
+            queues[name].put(None)
+        for thread in threads:
+            thread.join()
+
+        if job is not None:
+            job.finish()
+            job.close()
+        self.assignments.update(run.delivered)
+        self._save_assignments()
+
+        duration = (datetime.now() - started).total_seconds()
+        stats = {name: account.stats() for name, account in self.accounts.items()}
+        Logger.info(f"多账号发送完成 - 成功: {run.success}, 失败: {len(run.failed_contacts)}, 跳过: {run.skipped}, "
+                    f"转交: {run.rerouted}, 耗时: {duration:.1f}秒")
+        self.sender.send_statistics = {
+            'total': len(contacts),
+            'success': run.success,
+            'failed': len(run.failed_contacts),
+            'skipped': run.skipped,
+            'retries': run.retries,
+            'start_time': started,
+            'end_time': datetime.now(),
+            'failed_contacts': run.failed_contacts
+        }
+        return {
+            'success': not run.failed_contacts and not run.paused,
+            'paused': run.paused,
+            'total': len(contacts),
+            'success_count': run.success,
+            'failed_count': len(run.failed_contacts),
+            'skipped_count': run.skipped,
+            'retry_count': run.retries,
+            'failed_contacts': run.failed_contacts,
+            'remaining': run.remaining,
+            'rerouted': run.rerouted,
+            'accounts': stats,
+            'duration': duration
+        }
+
+    def _submit(self, run: _DispatchRun, queues: Dict[str, queue.Queue], name: str, contacts: List[Dict]) -> None:
+        """
+        _submit 功能说明:
+        把一组收件人放入账号的发送队列，所有队列都发送完成后 dispatch 才返回
+        输入: run (_DispatchRun) 分发状态, queues (Dict) 各账号发送队列, name (str) 账号名称,
+              contacts (List[Dict]) 联系人 | 输出: 无
+        """
+        with run.cond:
+            run.outstanding += 1
+        queues[name].put(contacts)
+
+    def _reroute(self, run: _DispatchRun, queues: Dict[str, queue.Queue], source: SenderAccount,
+                 names: List[str], reason: str, failures: Optional[Dict[str, Dict]] = None) -> None:
+        """
+        _reroute 功能说明:
+        把收件人转交给没有尝试过的可用账号（按负载最少分配），没有可用账号时记为失败（保留原账号的失败记录）
+        输入: run (_DispatchRun) 分发状态, queues (Dict) 各账号发送队列, source (SenderAccount) 原账号,
+              names (List[str]) 收件人, reason (str) 转交原因,
+              failures (Dict[str, Dict], 可选) 收件人在原账号的失败记录 | 输出: 无
+        """
+        failures = failures or {}
+        targets: Dict[str, List[Dict]] = {}
+        with run.cond:
+            for contact_name in names:
+                tried = run.tried.setdefault(contact_name, set())
+                tried.add(source.name)
+                target = self.owner(run.by_name[contact_name], exclude=tried, load=run.load)
+                if target is None:
+                    if contact_name in failures:
+                        run.failed_contacts.append(failures[contact_name])
+                    else:
+                        self._give_up(run, [contact_name], reason)
+                    continue
+                run.load[target] = run.load.get(target, 0) + 1
+                run.rerouted += 1
+                source.counts['rerouted'] += 1
+                targets.setdefault(target, []).append(run.by_name[contact_name])
+        for target, contacts in targets.items():
+            Logger.info(f"{len(contacts)} 个收件人由账号 {source.name} 转交给 {target}（{reason}）")
+            self._submit(run, queues, target, contacts)
+
+    def _give_up(self, run: _DispatchRun, names: List[str], reason: str) -> None:
+        """
+        _give_up 功能说明:
+        没有可用账号时把收件人记为失败；发送任务中保持原状态，账号恢复后可续发
+        输入: run (_DispatchRun) 分发状态, names (List[str]) 收件人, reason (str) 原因 | 输出: 无
+        """
+        template = run.message if isinstance(run.message, MessageTemplate) else None
+        for contact_name in names:
+            # 与 send_batch_messages 的失败记录一致：模板发送另存模板原文，重试时重新渲染
+            failure = {
+                'name': contact_name,
+                'error': reason,
+                'message': None if template else run.message,
+                'attempts': len(run.tried.get(contact_name, ())),
+                'retryable': True,
+                'timestamp': datetime.now().isoformat()
+            }
+            if template is not None:
+                failure['template'] = template.source
+            run.failed_contacts.append(failure)
+
+    def _worker(self, account: SenderAccount, jobs: queue.Queue, run: _DispatchRun,
+                queues: Dict[str, queue.Queue]) -> None:
+        """
+        _worker 功能说明:
+        账号发送线程，依次发送队列中的每组收件人，收到 None 时退出。
+        线程中不直接操作微信界面：真实客户端的调用由传输层转到 ui_thread 执行
+        输入: account (SenderAccount) 账号, jobs (queue.Queue) 该账号的发送队列, run (_DispatchRun) 分发状态,
+              queues (Dict) 各账号发送队列 | 输出: 无
+        """
+        while True:
+            contacts = jobs.get()
+            if contacts is None:
+                return
+            try:
+                self._run_shard(account, contacts, run, queues)
+            except Exception as e:
+                Logger.error(f"账号 {account.name} 发送异常: {str(e)}")
+                account.mark_unhealthy(str(e))
+                with run.cond:
+                    unfinished = [contact['name'] for contact in contacts if contact['name'] not in run.delivered]
+                self._reroute(run, queues, account, unfinished, account.error)
+            finally:
+                with run.cond:
+                    run.outstanding -= 1
+                    run.cond.notify_all()
+
+    def _run_shard(self, account: SenderAccount, contacts: List[Dict], run: _DispatchRun,
+                   queues: Dict[str, queue.Queue]) -> None:
+        """
+        _run_shard 功能说明:
+        用该账号的传输层和限速器发送一组收件人：账号已停用或连接失败时整组转交；
+        账号中途停用时未发送和等待重试的收件人转交；该账号找不到的联系人（永久失败）转交给其他账号尝试
+        输入: account (SenderAccount) 账号, contacts (List[Dict]) 联系人, run (_DispatchRun) 分发状态,
+              queues (Dict) 各账号发送队列 | 输出: 无
+        """
+        names = [contact['name'] for contact in contacts]
+        if run.stopped():
+            with run.cond:
+                run.paused = True
+                run.remaining.extend(names)
+            return
+        if not account.healthy:
+            self._reroute(run, queues, account, names, account.error)
+            return
+        try:
+            account.connect()
+        except Exception:
+            self._reroute(run, queues, account, names, account.error)
+            return
+
+        # 浅拷贝发送器：共用联系人、账本、好友信息和发送任务，传输层和限速器换成该账号的
+        lane = copy.copy(self.sender)
+        lane.wx = account
+        lane.rate_limiter = account.rate_limiter
+        result = lane.send_batch_messages(contacts, run.message, job=run.job, campaign_id=run.campaign_id,
+                                          stop=lambda: not account.healthy or run.stopped(),
+                                          progress=run.progress, sleep=run.sleep)
+
+        reroute: List[str] = []
+        failures: Dict[str, Dict] = {}
+        with run.cond:
+            run.success += result['success_count']
+            run.skipped += result['skipped_count']
+            run.retries += result['retry_count']
+            account.counts['sent'] += result['success_count']
+            account.counts['skipped'] += result['skipped_count']
+            unfinished = set(result['remaining'])
+            for item in result['failed_contacts']:
+                unfinished.add(item['name'])
+                # 永久失败（该账号找不到联系人等）或账号已停用时由其他账号尝试
+                if not item.get('retryable', True) or not account.healthy:
+                    reroute.append(item['name'])
+                    failures[item['name']] = item
+                else:
+                    account.counts['failed'] += 1
+                    run.failed_contacts.append(item)
+            for contact_name in names:
+                if contact_name not in unfinished:
+                    run.delivered[contact_name] = account.name
+            if result['remaining']:
+                if account.healthy:
+                    run.paused = True
+                    run.remaining.extend(result['remaining'])
+                else:
+                    reroute.extend(result['remaining'])
+        if reroute:
+            self._reroute(run, queues, account, reroute, account.error or '该账号发送失败', failures)
+
+    def _load_assignments(self) -> Dict[str, str]:
+        """
+        _load_assignments 功能说明:
+        加载联系人与账号的固定分配，文件不存在或损坏时从空开始
+        输入: 无 | 输出: Dict[str, str] 联系人 -> 账号名称
+        """
+        if self.assignments_file is None or not self.assignments_file.exists():
+            return {}
+        try:
+            with open(self.assignments_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {str(name): str(account) for name, account in data.items()}
+        except Exception as e:
+            Logger.warning(f"加载账号分配文件失败，将重新分配: {str(e)}")
+            return {}
+
+    def _save_assignments(self) -> None:
+        """
+        _save_assignments 功能说明:
+        保存联系人与账号的固定分配，下次发送时同一联系人仍由同一账号发送
+        输入: 无 | 输出: 无
+        """
+        if self.assignments_file is None:
+            return
+        try:
+            self.assignments_file.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.assignments_file, self.assignments, indent=None)
+        except Exception as e:
+            Logger.error(f"保存账号分配文件失败: {str(e)}")
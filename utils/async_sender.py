@@ -0,0 +1,364 @@
+##########async_sender.py: [异步发送接口模块] ##################
+# 变更记录: [2026-10-17 23:50] @李祥光 [初始创建，asyncio发送活动接口：进度事件流、暂停/继续/取消，阻塞的微信调用在专用线程执行]########
+# 变更记录: [2026-10-18 16:00] @李祥光 [更正说明：界面自动化由传输层的ui_thread保证在同一线程，多账号发送同样适用]########
+# 输入: 标签表达式或联系人列表和消息内容 | 输出: 发送进度事件和发送结果###############
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+from .logger import Logger
+from .message_sender import MessageSender
+from .message_template import MessageTemplate
+from .outbox import OutboxJob
+from .rate_limiter import SendInterrupted
+
+###########################文件下的所有函数###########################
+"""
+CampaignControl.pause：请求暂停
+CampaignControl.resume：请求继续
+CampaignControl.cancel：请求取消
+CampaignControl.should_stop：发送循环的暂停判断
+CampaignControl.interruptible：生成收到暂停或取消时立即返回的等待函数
+Campaign.pause：暂停发送活动，正在等待的发送立即暂停
+Campaign.resume：继续已暂停的发送活动
+Campaign.cancel：取消发送活动，未发送的收件人在发送任务中保持待发送
+Campaign.events：逐个获取进度事件，直到 finished 事件
+Campaign._emit：从任意线程投递进度事件
+Campaign._progress：批量发送的进度回调，转到事件循环中处理
+Campaign._count：把批量发送的进度转换为整个活动的进度事件
+Campaign._run：在专用线程执行准备和批量发送，暂停时等待继续或取消
+Campaign._send：在专用线程执行一轮批量发送
+AsyncMessageSender.send_by_tag：启动按标签发送活动
+AsyncMessageSender.send_batch：启动发送给指定联系人的活动
+AsyncMessageSender.close：关闭专用线程
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[事件循环中的调用方] --> B[AsyncMessageSender.send_by_tag/send_batch]
+    B --> C[Campaign._run 任务]
+    C -->|专用线程| D[MessageSender.prepare_send + Outbox.create_job]
+    C -->|专用线程| E[_send: MessageSender._send_batch]
+    E --> F[progress 回调]
+    F --> G[_emit call_soon_threadsafe 投递到事件队列]
+    G --> H[async for event in campaign]
+    A --> I[pause/resume/cancel]
+    I --> J[CampaignControl]
+    J -->|should_stop| E
+    J -->|interruptible 等待中立即返回| E
+    E -->|暂停| K[paused 事件，等待 resume 或 cancel]
+    K -->|resume| E
+    K -->|cancel| L[finished 事件，未发送的收件人保持待发送]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+RUNNING = 'running'
+PAUSED = 'paused'
+CANCELLED = 'cancelled'
+
+class CampaignControl:
+    """
+    CampaignControl 功能说明:
+    暂停/继续/取消令牌，线程安全。发送线程通过 should_stop 在每个收件人前检查，
+    通过 interruptible 生成的等待函数在限速和重试等待中也能立即响应
+    输入: 无 | 输出: 令牌对象
+    """
+
+    def __init__(self):
+        self.state = RUNNING
+        self._cond = threading.Condition()
+
+    def _set(self, state: str) -> None:
+        with self._cond:
+            # 取消后不能再继续或暂停
+            if self.state != CANCELLED:
+                self.state = state
+            self._cond.notify_all()
+
+    def pause(self) -> None:
+        """
+        pause 功能说明:
+        请求暂停
+        输入: 无 | 输出: 无
+        """
+        self._set(PAUSED)
+
+    def resume(self) -> None:
+        """
+        resume 功能说明:
+        请求继续
+        输入: 无 | 输出: 无
+        """
+        self._set(RUNNING)
+
+    def cancel(self) -> None:
+        """
+        cancel 功能说明:
+        请求取消
+        输入: 无 | 输出: 无
+        """
+        self._set(CANCELLED)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.state == CANCELLED
+
+    def should_stop(self) -> bool:
+        """
+        should_stop 功能说明:
+        发送循环的暂停判断，已请求暂停或取消时返回 True
+        输入: 无 | 输出: bool 是否停止发送
+        """
+        return self.state != RUNNING
+
+    def interruptible(self, sleep: Callable[[float], None]) -> Callable[[float], None]:
+        """
+        interruptible 功能说明:
+        生成可打断的等待函数：真实等待（time.sleep）改为等待令牌状态变化，收到暂停或取消时立即抛出 SendInterrupted；
+        其他等待函数（如测试中的虚拟时钟）在等待前检查令牌
+        输入: sleep (Callable) 原等待函数 | 输出: Callable 可打断的等待函数
+        """
+        def wait(seconds: float) -> None:
+            if sleep is time.sleep:
+                with self._cond:
+                    interrupted = self._cond.wait_for(self.should_stop, timeout=seconds)
+            else:
+                interrupted = self.should_stop()
+                if not interrupted:
+                    sleep(seconds)
+            if interrupted:
+                raise SendInterrupted(self.state)
+        return wait
+
+class Campaign:
+    """
+    Campaign 功能说明:
+    一次异步发送活动。创建后立即在事件循环中开始执行，阻塞的准备和发送在专用线程执行，事件循环不会被阻塞。
+    用 async for event in campaign 获取进度事件，await campaign 获取最终结果；
+    事件类型: started、sent、failed、skipped、retry、paused、resumed、finished（带 result），
+    取消或暂停后未发送的收件人在发送任务中保持待发送状态，之后可用 MessageSender.resume_job 续发
+    输入: sender (MessageSender) 消息发送器, executor (ThreadPoolExecutor) 专用线程,
+          prepare (Callable) 在专用线程执行的准备函数，返回 prepare_send 格式的结果和发送任务 | 输出: 活动对象
+    """
+
+    def __init__(self, sender: MessageSender, executor: ThreadPoolExecutor, prepare: Callable[[], Dict],
+                 campaign_id: Optional[str] = None):
+        self.sender = sender
+        self.executor = executor
+        self.campaign_id = campaign_id
+        self.control = CampaignControl()
+        self.result: Optional[Dict[str, Any]] = None
+        self.done = 0
+        self.total = 0
+        self._prepare = prepare
+        self._loop = asyncio.get_running_loop()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._resumed = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def pause(self) -> None:
+        """
+        pause 功能说明:
+        暂停发送活动，正在进行的限速或重试等待立即暂停；可从任意线程调用
+        输入: 无 | 输出: 无
+        """
+        self.control.pause()
+        self._loop.call_soon_threadsafe(self._resumed.clear)
+
+    def resume(self) -> None:
+        """
+        resume 功能说明:
+        继续已暂停的发送活动；可从任意线程调用
+        输入: 无 | 输出: 无
+        """
+        self.control.resume()
+        self._loop.call_soon_threadsafe(self._resumed.set)
+
+    def cancel(self) -> None:
+        """
+        cancel 功能说明:
+        取消发送活动，正在发送的一条完成后停止；可从任意线程调用
+        输入: 无 | 输出: 无
+        """
+        self.control.cancel()
+        self._loop.call_soon_threadsafe(self._resumed.set)
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        events 功能说明:
+        逐个获取进度事件，收到 finished 事件后结束
+        输入: 无 | 输出: AsyncIterator[Dict] 进度事件
+        """
+        while True:
+            event = await self._events.get()
+            yield event
+            if event['type'] == 'finished':
+                return
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self.events()
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        """
+        _emit 功能说明:
+        投递进度事件，可在专用线程或多账号发送线程中调用
+        输入: event (Dict) 进度事件 | 输出: 无
+        """
+        self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+    def _progress(self, event: Dict[str, Any]) -> None:
+        """
+        _progress 功能说明:
+        批量发送的进度回调（在发送线程中调用），转到事件循环中计数
+        输入: event (Dict) 批量发送的进度事件 | 输出: 无
+        """
+        self._loop.call_soon_threadsafe(self._count, event)
+
+    def _count(self, event: Dict[str, Any]) -> None:
+        """
+        _count 功能说明:
+        把批量发送的进度转换为活动进度：done/total 按整个活动计算，暂停续发和多账号并行发送时也连续
+        输入: event (Dict) 批量发送的进度事件 | 输出: 无
+        """
+        if event['type'] != 'retry':
+            self.done += 1
+        self._events.put_nowait({**event, 'done': self.done, 'total': self.total})
+
+    def _send(self, contacts: List[Dict], message: Union[str, MessageTemplate], job: Optional[OutboxJob]) -> Dict:
+        """
+        _send 功能说明:
+        在专用线程执行一轮批量发送，限速和重试等待可被暂停或取消打断
+        输入: contacts (List[Dict]) 联系人, message (str/MessageTemplate) 发送内容, job (OutboxJob, 可选) 发送任务 |
+              输出: Dict 批量发送结果
+        """
+        return self.sender._send_batch(contacts, message, job=job, campaign_id=self.campaign_id,
+                                       stop=self.control.should_stop, progress=self._progress,
+                                       sleep=self.control.interruptible(self.sender.rate_limiter.sleep))
+
+    async def _run(self) -> Dict[str, Any]:
+        """
+        _run 功能说明:
+        在专用线程准备收件人并批量发送；暂停后等待继续或取消，继续时只发送剩余的收件人。
+        活动任务本身被取消（task.cancel）时等同于 cancel，等待正在发送的一条完成后再结束
+        输入: 无 | 输出: Dict[str, Any] 发送结果
+        """
+        totals = {'count': 0, 'failed_contacts': [], 'skipped_count': 0, 'retry_count': 0, 'duration': 0.0}
+        remaining: List[str] = []
+        job = None
+        try:
+            prepared = await self._loop.run_in_executor(self.executor, self._prepare)
+            if not prepared['success']:
+                self.result = prepared
+                return prepared
+            contacts, job = prepared['contacts'], prepared.get('job')
+            by_name = {contact['name']: contact for contact in contacts}
+            self.total = len(contacts)
+            self._emit({'type': 'started', 'total': self.total, 'job_id': job.job_id if job else None})
+
+            while True:
+                future = self._loop.run_in_executor(
+                    self.executor, functools.partial(self._send, contacts, prepared['payload'], job))
+                try:
+                    result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    self.control.cancel()
+                    await future
+                    raise
+                totals['count'] += result['success_count']
+                totals['failed_contacts'].extend(result['failed_contacts'])
+                totals['skipped_count'] += result['skipped_count']
+                totals['retry_count'] += result['retry_count']
+                totals['duration'] += result['duration']
+                remaining = result.get('remaining', [])
+                if not result['paused'] or self.control.cancelled:
+                    break
+                self._emit({'type': 'paused', 'done': self.done, 'total': self.total, 'remaining': len(remaining)})
+                Logger.info(f"发送活动已暂停，剩余 {len(remaining)} 个收件人")
+                await self._resumed.wait()
+                if self.control.cancelled:
+                    break
+                self._emit({'type': 'resumed', 'done': self.done, 'total': self.total, 'remaining': len(remaining)})
+                contacts = [by_name[name] for name in remaining]
+
+            cancelled = self.control.cancelled and bool(remaining)
+            if cancelled:
+                Logger.info(f"发送活动已取消，{len(remaining)} 个收件人未发送")
+            self.result = {
+                'success': not totals['failed_contacts'] and not remaining,
+                'cancelled': cancelled,
+                'job_id': job.job_id if job else None,
+                'total': self.total,
+                'remaining': remaining,
+                **totals,
+                'failed_count': len(totals['failed_contacts'])
+            }
+            return self.result
+        except Exception as e:
+            Logger.error(f"异步发送活动失败: {str(e)}")
+            self.result = {'success': False, 'error': str(e), 'count': totals['count']}
+            return self.result
+        finally:
+            if job is not None:
+                job.close()
+            if self.result is None:
+                self.result = {'success': False, 'cancelled': True, 'error': '发送活动已取消', 'count': totals['count']}
+            self._emit({'type': 'finished', 'result': self.result})
+
+class AsyncMessageSender:
+    """
+    AsyncMessageSender 功能说明:
+    MessageSender 的 asyncio 接口。阻塞的准备和发送（收件人查询、发送任务写入、限速等待和微信调用）在一个专用线程中执行，
+    事件循环不会被阻塞；调度、回复监控和界面等其他任务可以在同一事件循环中同时运行。
+    真实微信客户端的界面自动化由传输层统一提交到 transport.ui_thread，包括多账号发送在内都在同一线程串行执行
+    输入: sender (MessageSender, 可选) 消息发送器, executor (ThreadPoolExecutor, 可选) 专用线程 | 输出: 异步发送器
+    """
+
+    def __init__(self, sender: Optional[MessageSender] = None, executor: Optional[ThreadPoolExecutor] = None):
+        self.sender = sender or MessageSender()
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='wechat-sender')
+
+    def send_by_tag(self, tag: str, message: str, campaign_id: Optional[str] = None) -> Campaign:
+        """
+        send_by_tag 功能说明:
+        启动按标签发送活动（需在事件循环中调用）。不在终端确认，调用方应在启动前自行确认；
+        收件人查询或模板校验失败时活动直接以失败结果结束
+        输入: tag (str) 标签名或标签表达式, message (str) 消息内容或模板, campaign_id (str, 可选) 活动ID |
+              输出: Campaign 发送活动
+        """
+        def prepare() -> Dict:
+            prepared = self.sender.prepare_send(tag, message, confirm=False)
+            if prepared['success']:
+                prepared['job'] = self.sender.outbox.create_job(
+                    [contact['name'] for contact in prepared['contacts']], message, tag,
+                    meta=self.sender.job_meta(prepared['template'], campaign_id))
+            return prepared
+        return Campaign(self.sender, self.executor, prepare, campaign_id)
+
+    def send_batch(self, contacts: List[Dict], message: Union[str, MessageTemplate],
+                   job: Optional[OutboxJob] = None, campaign_id: Optional[str] = None) -> Campaign:
+        """
+        send_batch 功能说明:
+        启动发送给指定联系人的活动（需在事件循环中调用）
+        输入: contacts (List[Dict]) 联系人列表, message (str/MessageTemplate) 消息内容或已编译的模板,
+              job (OutboxJob, 可选) 发送任务, campaign_id (str, 可选) 活动ID | 输出: Campaign 发送活动
+        """
+        prepared = {'success': True, 'contacts': list(contacts), 'payload': message, 'job': job}
+        return Campaign(self.sender, self.executor, lambda: prepared, campaign_id)
+
+    def close(self) -> None:
+        """
+        close 功能说明:
+        关闭自己创建的专用线程，等待正在执行的发送完成
+        输入: 无 | 输出: 无
+        """
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,243 @@
+##########atomic_file.py: [原子写入和进程间文件锁模块] ##################
+# 变更记录: [2026-10-17 14:30] @李祥光 [初始创建，临时文件+fsync+重命名的原子写入和数据目录咨询锁]########
+# 变更记录: [2026-10-18 10:10] @李祥光 [数据目录锁改为只在读写期间持有，with 语句按 timeout 阻塞等待其他进程释放]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [新增file_generation，写入前判断数据文件是否已被其他进程修改]########
+# 输入: 需要写入的数据文件 | 输出: 完整写入的文件和进程间互斥锁###############
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if os.name == 'nt':
+    import msvcrt
+    fcntl = None
+else:
+    import fcntl
+    msvcrt = None
+
+###########################文件下的所有函数###########################
+"""
+atomic_write_bytes：原子写入二进制数据
+atomic_write_json：原子写入JSON数据
+_fsync_directory：同步目录项，保证重命名持久化
+FileLock.acquire：获取进程间咨询锁（同一进程内可重入）
+FileLock.release：释放进程间咨询锁
+FileLockError：锁已被其他进程持有时抛出的异常
+data_dir_lock：获取数据目录的进程锁对象（with 语句中加锁）
+file_generation：获取数据文件的版本标识（inode/修改时间/大小）
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[save_contacts/save_friend_details/Config.save] --> B[atomic_write_json]
+    B --> C[atomic_write_bytes]
+    C --> D[同目录临时文件写入并fsync]
+    D --> E[os.replace 原子替换]
+    E --> F[_fsync_directory]
+    G[ContactManager/FriendDetailsManager 加载和写入] --> H[with data_dir_lock]
+    H --> I[FileLock.acquire]
+    I --> J{同一进程已持有?}
+    J -->|是| K[引用计数+1]
+    J -->|否| L[fcntl.flock / msvcrt.locking 非阻塞加锁，失败时重试到 timeout]
+    L -->|超时| M[FileLockError]
+    H --> N[读写结束 FileLock.release]
+    H --> O[file_generation 写入前比较版本，其他进程写过时先重新加载]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+def _fsync_directory(directory: Path) -> None:
+    """
+    _fsync_directory 功能说明:
+    同步目录项，保证重命名在掉电后仍然有效（Windows不支持打开目录，直接跳过）
+    输入: directory (Path) 目录 | 输出: 无
+    """
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_bytes(path, data: bytes) -> None:
+    """
+    atomic_write_bytes 功能说明:
+    原子写入文件：先写入同目录下的临时文件并fsync，再用 os.replace 替换目标文件。
+    任何时刻崩溃，目标文件要么是旧内容要么是新内容，不会出现写了一半的文件
+    输入: path (str/Path) 目标文件, data (bytes) 文件内容 | 输出: 无
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+def atomic_write_json(path, data: Any, indent: Optional[int] = 2) -> None:
+    """
+    atomic_write_json 功能说明:
+    将数据序列化为JSON（保留中文）后原子写入文件
+    输入: path (str/Path) 目标文件, data (Any) 数据, indent (int, 可选) 缩进 | 输出: 无
+    """
+    atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8'))
+
+class FileLockError(RuntimeError):
+    """
+    FileLockError 功能说明:
+    锁文件已被其他进程持有时抛出
+    输入: 错误信息 | 输出: 异常对象
+    """
+
+class FileLock:
+    """
+    FileLock 功能说明:
+    基于锁文件的进程间咨询锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）。
+    同一进程内对同一锁文件的多次获取共享一个文件句柄并计数，
+    因此同一进程中的多个管理器可以同时使用同一数据目录。with 语句按 timeout 等待加锁
+    输入: path (str/Path) 锁文件路径, timeout (float) with 语句加锁时的等待秒数 | 输出: 锁对象
+    """
+
+    # 锁文件绝对路径 -> [文件描述符, 引用计数]，同一进程内共享
+    _held: Dict[str, List[int]] = {}
+    _held_lock = threading.Lock()
+
+    def __init__(self, path, timeout: float = 0.0):
+        """
+        __init__ 功能说明:
+        初始化锁对象，此时不加锁
+        输入: path (str/Path) 锁文件路径, timeout (float) with 语句加锁时的等待秒数 | 输出: 无
+        """
+        self.path = Path(path)
+        self._key = str(self.path.resolve())
+        self.timeout = timeout
+        self.locked = False
+
+    def acquire(self, timeout: float = 0.0) -> 'FileLock':
+        """
+        acquire 功能说明:
+        获取锁。timeout 秒内锁仍被其他进程持有时抛出 FileLockError，0 表示只尝试一次
+        输入: timeout (float) 等待秒数 | 输出: FileLock 自身
+        """
+        if self.locked:
+            return self
+        with FileLock._held_lock:
+            entry = FileLock._held.get(self._key)
+            if entry is not None:
+                entry[1] += 1
+                self.locked = True
+                return self
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    self._lock_fd(fd)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        raise FileLockError(
+                            f"数据目录正被其他进程使用（锁文件: {self.path}），请先关闭另一个正在运行的程序"
+                        )
+                    time.sleep(0.1)
+
+            # 写入当前进程号便于排查是谁持有锁
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode('ascii'))
+            FileLock._held[self._key] = [fd, 1]
+            self.locked = True
+            return self
+
+    @staticmethod
+    def _lock_fd(fd: int) -> None:
+        """
+        _lock_fd 功能说明:
+        对文件描述符加非阻塞排他锁，失败时抛出 OSError
+        输入: fd (int) 文件描述符 | 输出: 无
+        """
+        if msvcrt is not None:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def release(self) -> None:
+        """
+        release 功能说明:
+        释放锁，同一进程内最后一个持有者释放时才真正解锁并关闭锁文件
+        输入: 无 | 输出: 无
+        """
+        if not self.locked:
+            return
+        with FileLock._held_lock:
+            self.locked = False
+            entry = FileLock._held.get(self._key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del FileLock._held[self._key]
+            fd = entry[0]
+            try:
+                if msvcrt is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    def __enter__(self) -> 'FileLock':
+        return self.acquire(self.timeout)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+def data_dir_lock(directory, timeout: float = 0.0) -> FileLock:
+    """
+    data_dir_lock 功能说明:
+    获取数据目录的进程锁对象（锁文件为目录下的 .biaoqian.lock）。只应在读写数据文件期间持有：
+    with data_dir_lock(目录, timeout): ...，其他进程正在读写时最多等待 timeout 秒
+    输入: directory (str/Path) 数据目录, timeout (float) 等待秒数 | 输出: FileLock 锁对象
+    """
+    return FileLock(Path(directory) / '.biaoqian.lock', timeout)
+
+def file_generation(*paths) -> tuple:
+    """
+    file_generation 功能说明:
+    获取数据文件的版本标识。原子写入通过 os.replace 替换文件（inode 改变），追加写入改变大小和修改时间，
+    持有数据目录锁时与上次加载或写入后记录的值比较，即可判断期间是否有其他进程写过
+    输入: paths (str/Path) 数据文件 | 输出: tuple 每个文件的 (inode, 修改时间ns, 大小)，文件不存在时为 None
+    """
+    result = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            result.append(None)
+            continue
+        result.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(result)
@@ -0,0 +1,255 @@
+##########backup_manager.py: [数据文件备份管理模块] ##################
+# 变更记录: [2026-10-17 12:30] @李祥光 [初始创建，内容去重、可选gzip压缩、后台备份和保留策略]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [改用公共原子写入，新增find_valid_backup用于损坏恢复]########
+# 变更记录: [2026-10-18 18:40] @李祥光 [读取源文件不再持有写入方的锁，读取期间文件版本变化时重新读取]########
+# 输入: 需要备份的数据文件 | 输出: 备份目录中的备份文件###############
+
+import gzip
+import hashlib
+import queue
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Dict, Optional, Tuple
+from .logger import Logger
+from .atomic_file import atomic_write_bytes, file_generation
+
+###########################文件下的所有函数###########################
+"""
+BackupManager.__init__：初始化备份管理器
+BackupManager.submit：提交后台备份任务，不阻塞调用方
+BackupManager.backup_now：立即备份文件（内容未变化时跳过）
+BackupManager._read_source：不加锁读取源文件，读取期间文件变化时重新读取
+BackupManager.wait：等待所有后台备份任务完成
+BackupManager.list_backups：列出备份文件（从新到旧）
+BackupManager.read_backup：读取备份内容（自动解压）
+BackupManager.find_valid_backup：查找最新的有效备份
+BackupManager.prune：按保留策略清理旧备份
+BackupManager._worker：后台备份线程
+BackupManager._parse_name：从备份文件名解析时间和内容哈希
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactManager.save_contacts] --> B[BackupManager.submit]
+    B --> C[备份队列]
+    C --> D[_worker后台线程]
+    D --> E[backup_now]
+    E --> RS[_read_source 不加锁读取，前后版本不一致时重读]
+    RS --> F{内容哈希与最新备份相同?}
+    F -->|是| G[跳过]
+    F -->|否| H[写入备份文件 可选gzip]
+    H --> I[prune 保留最近N个/每小时/每天]
+    R[ContactManager加载失败] --> S[find_valid_backup]
+    S --> T[从新到旧 read_backup 并校验]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class BackupManager:
+    """
+    BackupManager 功能说明:
+    数据文件备份管理类。备份文件名包含微秒级时间戳和内容哈希，内容未变化时不重复备份；
+    备份在后台线程中完成，修改数据的调用方只需把任务放入队列
+    输入: 备份目录和保留策略 | 输出: 备份文件
+    """
+
+    def __init__(self, backup_dir: Path, prefix: str = 'contacts_backup', compress: bool = False,
+                 keep_last: int = 20, keep_hourly: int = 24, keep_daily: int = 30, read_attempts: int = 3):
+        """
+        __init__ 功能说明:
+        初始化备份管理器
+        输入: backup_dir (Path) 备份目录, prefix (str) 文件名前缀, compress (bool) 是否gzip压缩,
+              keep_last (int) 保留最近N个, keep_hourly (int) 保留最近N小时每小时最新一个,
+              keep_daily (int) 保留最近N天每天最新一个, read_attempts (int) 源文件持续变化时最多读取次数 | 输出: 无
+        """
+        self.backup_dir = Path(backup_dir)
+        self.prefix = prefix
+        self.compress = compress
+        self.keep_last = keep_last
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.read_attempts = max(1, int(read_attempts))
+        self._name_pattern = re.compile(
+            r'^' + re.escape(prefix) + r'_(\d{8}_\d{6})(?:_(\d{6}))?(?:_([0-9a-f]+))?\.json(\.gz)?$'
+        )
+        self._last_hash: Optional[str] = None
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, source: Path) -> None:
+        """
+        submit 功能说明:
+        提交后台备份任务并立即返回。后台线程读取源文件时不持有写入方的锁，不会阻塞修改数据的调用方
+        输入: source (Path) 源文件 | 输出: 无
+        """
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='backup-worker', daemon=True)
+                self._thread.start()
+        self._queue.put(Path(source))
+
+    def _worker(self) -> None:
+        """
+        _worker 功能说明:
+        后台备份线程，逐个处理备份任务
+        输入: 无 | 输出: 无
+        """
+        while True:
+            source = self._queue.get()
+            try:
+                self.backup_now(source)
+            except Exception as e:
+                Logger.error(f"后台备份失败: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def wait(self) -> None:
+        """
+        wait 功能说明:
+        等待所有已提交的后台备份任务完成
+        输入: 无 | 输出: 无
+        """
+        self._queue.join()
+
+    def backup_now(self, source: Path) -> Optional[Path]:
+        """
+        backup_now 功能说明:
+        立即备份文件：内容哈希与最新备份相同时跳过，否则写入新备份并按保留策略清理
+        输入: source (Path) 源文件 | 输出: Optional[Path] 新备份文件，跳过时返回None
+        """
+        data = self._read_source(Path(source))
+        if data is None:
+            return None
+
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        if self._last_hash is None:
+            latest = self.list_backups()
+            if latest:
+                self._last_hash = self._parse_name(latest[0].name)[1]
+        if digest == self._last_hash:
+            return None
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        suffix = '.json.gz' if self.compress else '.json'
+        backup_file = self.backup_dir / f"{self.prefix}_{timestamp}_{digest}{suffix}"
+        payload = gzip.compress(data) if self.compress else data
+
+        atomic_write_bytes(backup_file, payload)
+
+        self._last_hash = digest
+        Logger.info(f"数据已备份到: {backup_file}")
+        self.prune()
+        return backup_file
+
+    def _read_source(self, source: Path) -> Optional[bytes]:
+        """
+        _read_source 功能说明:
+        不持有写入方的锁读取源文件。数据文件通过原子替换写入，打开的文件总是某个完整版本；
+        读取前后文件版本（inode、修改时间、大小）不一致或读到的长度与文件大小不符时重新读取，
+        始终不一致时跳过本次备份（写入方保存后会再次提交备份）
+        输入: source (Path) 源文件 | 输出: Optional[bytes] 文件内容，文件不存在或持续变化时返回None
+        """
+        for _ in range(self.read_attempts):
+            before = file_generation(source)[0]
+            if before is None:
+                return None
+            try:
+                data = source.read_bytes()
+            except FileNotFoundError:
+                continue
+            if file_generation(source)[0] == before and len(data) == before[2]:
+                return data
+        Logger.warning(f"备份时 {source} 持续变化，跳过本次备份")
+        return None
+
+    def _parse_name(self, name: str) -> Tuple[Optional[datetime], Optional[str]]:
+        """
+        _parse_name 功能说明:
+        从备份文件名解析备份时间和内容哈希，兼容旧格式 contacts_backup_YYYYmmdd_HHMMSS.json
+        输入: name (str) 文件名 | 输出: Tuple[datetime, str] (备份时间, 内容哈希)，无法解析时为None
+        """
+        match = self._name_pattern.match(name)
+        if not match:
+            return None, None
+        stamp = match.group(1) + '_' + (match.group(2) or '000000')
+        return datetime.strptime(stamp, '%Y%m%d_%H%M%S_%f'), match.group(3)
+
+    def list_backups(self) -> List[Path]:
+        """
+        list_backups 功能说明:
+        列出备份目录中属于本前缀的备份文件，从新到旧排序
+        输入: 无 | 输出: List[Path] 备份文件列表
+        """
+        if not self.backup_dir.exists():
+            return []
+        backups = []
+        for path in self.backup_dir.iterdir():
+            created, _ = self._parse_name(path.name)
+            if created is not None:
+                backups.append((created, path))
+        backups.sort(key=lambda item: item[0], reverse=True)
+        return [path for _, path in backups]
+
+    def read_backup(self, backup_file: Path) -> bytes:
+        """
+        read_backup 功能说明:
+        读取备份内容，gzip压缩的备份自动解压
+        输入: backup_file (Path) 备份文件 | 输出: bytes 备份内容
+        """
+        data = Path(backup_file).read_bytes()
+        if str(backup_file).endswith('.gz'):
+            return gzip.decompress(data)
+        return data
+
+    def find_valid_backup(self, validate: Callable[[bytes], bool]) -> Optional[Tuple[Path, bytes]]:
+        """
+        find_valid_backup 功能说明:
+        从新到旧查找第一个通过校验的备份，读取失败或校验不通过的备份会被跳过
+        输入: validate (Callable[[bytes], bool]) 校验函数 | 输出: Optional[Tuple[Path, bytes]] (备份文件, 内容)，没有有效备份时返回None
+        """
+        for backup_file in self.list_backups():
+            try:
+                data = self.read_backup(backup_file)
+                if validate(data):
+                    return backup_file, data
+            except Exception as e:
+                Logger.warning(f"备份文件无法读取，已跳过: {backup_file} ({str(e)})")
+                continue
+            Logger.warning(f"备份文件内容无效，已跳过: {backup_file}")
+        return None
+
+    def prune(self) -> int:
+        """
+        prune 功能说明:
+        按保留策略清理旧备份：保留最近 keep_last 个，以及最近 keep_hourly 个小时、
+        keep_daily 天中每个时间段内最新的一个，其余删除
+        输入: 无 | 输出: int 删除的备份数量
+        """
+        backups = [(self._parse_name(path.name)[0], path) for path in self.list_backups()]
+        keep = set(path for _, path in backups[:self.keep_last])
+
+        for fmt, limit in (('%Y%m%d%H', self.keep_hourly), ('%Y%m%d', self.keep_daily)):
+            buckets: Dict[str, Path] = {}
+            for created, path in backups:
+                bucket = created.strftime(fmt)
+                if bucket not in buckets:
+                    if len(buckets) >= limit:
+                        break
+                    buckets[bucket] = path
+            keep.update(buckets.values())
+
+        removed = 0
+        for _, path in backups:
+            if path not in keep:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError as e:
+                    Logger.warning(f"删除旧备份失败: {path} ({str(e)})")
+        if removed:
+            Logger.info(f"已按保留策略清理 {removed} 个旧备份")
+        return removed
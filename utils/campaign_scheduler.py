@@ -0,0 +1,548 @@
+##########campaign_scheduler.py: [定时发送活动调度模块] ##################
+# 变更记录: [2026-10-17 21:50] @李祥光 [初始创建，定时发送、允许发送时段和免打扰时段、窗口关闭时暂停并在下一个窗口续发]########
+# 变更记录: [2026-10-18 09:30] @李祥光 [调度器每次执行前重新扫描活动目录，能看到其他进程添加和取消的活动；执行前和保存前重新读取活动状态；空闲等待改为定时唤醒]########
+# 输入: 标签、消息和计划发送时间 | 输出: 在允许的时段内自动执行的发送活动###############
+
+import argparse
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .logger import Logger
+from .atomic_file import atomic_write_json
+from .message_template import MessageTemplate
+
+###########################文件下的所有函数###########################
+"""
+parse_time_range：解析 "09:00-12:00" 形式的时段为分钟区间
+_merge：合并重叠的分钟区间
+SendingWindows.from_config：根据配置创建发送时段
+SendingWindows.is_open：判断某个时间是否允许发送
+SendingWindows.next_open：获取某个时间之后最近的允许发送时间
+SendingWindows.next_close：获取当前允许发送的时段何时结束
+SendingWindows._day_intervals：获取某一天允许发送的分钟区间
+CampaignScheduler.schedule：添加定时发送活动并保存
+CampaignScheduler.cancel：取消未完成的发送活动
+CampaignScheduler.list_campaigns：列出所有发送活动
+CampaignScheduler.next_run_at：计算最近一个活动可以开始或继续的时间
+CampaignScheduler.run_pending：执行所有已到期且处于发送时段内的活动
+CampaignScheduler.run_forever：循环执行，空闲时等待到下一个活动到期
+CampaignScheduler.stop：停止循环，正在发送的活动暂停
+CampaignScheduler._run：执行或续发单个活动
+CampaignScheduler._should_pause：发送中判断是否需要暂停（窗口关闭或停止）
+CampaignScheduler._load：重新扫描活动目录，中断的活动恢复为暂停
+CampaignScheduler._read：读取单个活动文件的最新内容
+CampaignScheduler._save：原子保存单个活动
+main：定时发送的命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[schedule 添加活动] --> B[_save 原子写入 活动ID.json]
+    A --> C[Event.set 唤醒等待]
+    D[run_forever] --> E[run_pending]
+    E --> E1[_load 重新扫描活动目录，包括其他进程添加或取消的活动]
+    E --> F{到期且 SendingWindows.is_open?}
+    F -->|是| G0[_read 重新读取活动状态，已被取消则跳过]
+    G0 --> G[_run]
+    G -->|首次| H[MessageSender.send_by_tag stop=_should_pause]
+    G -->|已暂停| I[MessageSender.resume_job stop=_should_pause]
+    H --> J{窗口关闭?}
+    I --> J
+    J -->|是| K[状态 paused，等待下一个窗口]
+    J -->|否| L[状态 completed]
+    G --> G1[_read 每个收件人前检查是否被其他进程取消，保存前保留取消状态]
+    D --> M[next_run_at 取 max 计划时间 与 next_open]
+    M --> N[Event.wait 睡眠到下一个活动到期，最长 poll_interval 秒，新增活动或 stop 时提前唤醒]
+    N --> E
+    O[程序重启] --> P[_load 中断的活动恢复为 paused]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+SCHEDULED = 'scheduled'
+RUNNING = 'running'
+PAUSED = 'paused'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# 仍需执行的活动状态
+ACTIVE_STATES = (SCHEDULED, RUNNING, PAUSED)
+# 可以开始或续发的活动状态（running 表示正在由其他进程发送）
+RUNNABLE_STATES = (SCHEDULED, PAUSED)
+
+DAY_MINUTES = 24 * 60
+
+def parse_time_range(text: str) -> List[Tuple[int, int]]:
+    """
+    parse_time_range 功能说明:
+    解析 "09:00-12:00" 形式的时段为当天的分钟区间 [开始, 结束)，
+    跨午夜的时段（如 "22:00-08:00"）拆分为两段，结束时间可以写 24:00
+    输入: text (str) 时段 | 输出: List[Tuple[int, int]] 分钟区间
+    """
+    try:
+        start_text, end_text = (part.strip() for part in text.split('-'))
+        start_h, start_m = (int(value) for value in start_text.split(':'))
+        end_h, end_m = (int(value) for value in end_text.split(':'))
+    except ValueError:
+        raise ValueError(f"时段格式错误，应为 HH:MM-HH:MM: {text}")
+    start, end = start_h * 60 + start_m, end_h * 60 + end_m
+    if not (0 <= start < DAY_MINUTES and 0 <= end <= DAY_MINUTES and 0 <= start_m < 60 and 0 <= end_m < 60):
+        raise ValueError(f"时段超出范围: {text}")
+    if start == end:
+        return [(0, DAY_MINUTES)]
+    if start < end:
+        return [(start, end)]
+    return [(start, DAY_MINUTES), (0, end)]
+
+def _merge(intervals: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    _merge 功能说明:
+    合并重叠或相邻的分钟区间
+    输入: intervals (Iterable[Tuple[int, int]]) 分钟区间 | 输出: List[Tuple[int, int]] 排序合并后的区间
+    """
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class SendingWindows:
+    """
+    SendingWindows 功能说明:
+    允许发送的时段：windows 为允许发送的时段（为空表示全天），减去 quiet_hours 免打扰时段，
+    weekdays 限制星期几（0 为星期一，为空表示每天）。时间使用本地时间，精确到分钟
+    输入: windows/quiet_hours (List[str]) 时段列表, weekdays (List[int]) 星期 | 输出: 发送时段对象
+    """
+
+    def __init__(self, windows: Optional[Iterable[str]] = None, quiet_hours: Optional[Iterable[str]] = None,
+                 weekdays: Optional[Iterable[int]] = None):
+        """
+        __init__ 功能说明:
+        解析并计算每天允许发送的分钟区间，时段格式错误时抛出 ValueError
+        输入: windows (List[str]) 允许发送时段, quiet_hours (List[str]) 免打扰时段, weekdays (List[int]) 允许的星期 | 输出: 无
+        """
+        allowed = _merge(interval for text in windows for interval in parse_time_range(text)) \
+            if windows else [(0, DAY_MINUTES)]
+        quiet = _merge(interval for text in quiet_hours or () for interval in parse_time_range(text))
+        # 允许时段减去免打扰时段
+        intervals = []
+        for start, end in allowed:
+            for quiet_start, quiet_end in quiet:
+                if quiet_end <= start or quiet_start >= end:
+                    continue
+                if quiet_start > start:
+                    intervals.append((start, quiet_start))
+                start = max(start, quiet_end)
+                if start >= end:
+                    break
+            if start < end:
+                intervals.append((start, end))
+        self.intervals: List[Tuple[int, int]] = intervals
+        self.weekdays = set(weekdays) if weekdays else set(range(7))
+
+    @classmethod
+    def from_config(cls, settings) -> 'SendingWindows':
+        """
+        from_config 功能说明:
+        读取 message.schedule 下的 windows/quiet_hours/weekdays 配置
+        输入: settings 配置对象 | 输出: SendingWindows 发送时段
+        """
+        return cls(settings.get('message.schedule.windows', []), settings.get('message.schedule.quiet_hours', []),
+                   settings.get('message.schedule.weekdays', []))
+
+    def _day_intervals(self, day: datetime) -> List[Tuple[int, int]]:
+        """
+        _day_intervals 功能说明:
+        获取某一天允许发送的分钟区间，该天星期不允许时为空
+        输入: day (datetime) 日期 | 输出: List[Tuple[int, int]] 分钟区间
+        """
+        return self.intervals if day.weekday() in self.weekdays else []
+
+    def is_open(self, now: datetime) -> bool:
+        """
+        is_open 功能说明:
+        判断某个时间是否处于允许发送的时段
+        输入: now (datetime) 时间 | 输出: bool 是否允许发送
+        """
+        minute = now.hour * 60 + now.minute
+        return any(start <= minute < end for start, end in self._day_intervals(now))
+
+    def next_open(self, now: datetime) -> Optional[datetime]:
+        """
+        next_open 功能说明:
+        获取 now 之后（含 now）最近的允许发送时间，从不允许发送时返回 None
+        输入: now (datetime) 时间 | 输出: Optional[datetime] 允许发送的时间
+        """
+        if self.is_open(now):
+            return now
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(8):
+            day = midnight + timedelta(days=offset)
+            for start, _ in self._day_intervals(day):
+                opens = day + timedelta(minutes=start)
+                if opens > now:
+                    return opens
+        return None
+
+    def next_close(self, now: datetime) -> Optional[datetime]:
+        """
+        next_close 功能说明:
+        获取当前允许发送的时段何时结束（跨午夜连续的时段合并计算），当前不允许发送时返回 now，全天都允许时返回 None
+        输入: now (datetime) 时间 | 输出: Optional[datetime] 时段结束时间
+        """
+        if not self.is_open(now):
+            return now
+        minute = now.hour * 60 + now.minute
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(8):
+            for start, end in self._day_intervals(day):
+                if start <= minute < end:
+                    if end < DAY_MINUTES:
+                        return day + timedelta(minutes=end)
+                    break
+            else:
+                return day
+            # 时段持续到午夜，检查第二天 00:00 是否接着允许发送
+            day += timedelta(days=1)
+            minute = 0
+        return None
+
+class CampaignScheduler:
+    """
+    CampaignScheduler 功能说明:
+    定时发送活动调度器。每个活动保存为数据目录下的一个JSON文件，程序重启后继续执行；
+    活动只在允许发送的时段内发送，发送中窗口关闭时暂停（剩余收件人保留在发送任务中），
+    下一个窗口打开时续发。活动文件是多个进程之间的共享状态：主程序或命令行添加、取消的活动，
+    运行中的调度器在下一次扫描时看到；空闲时用 Event.wait 睡眠到下一个活动到期，最长 poll_interval 秒；
+    时钟和等待函数可替换，便于测试
+    输入: sender (MessageSender) 消息发送器, directory (str/Path) 活动目录, windows (SendingWindows) 发送时段 | 输出: 调度器对象
+    """
+
+    def __init__(self, sender, directory, windows: Optional[SendingWindows] = None,
+                 clock: Optional[Callable[[], datetime]] = None,
+                 wait: Optional[Callable[[Optional[float]], object]] = None, poll_interval: float = 60.0):
+        """
+        __init__ 功能说明:
+        初始化调度器并加载保存的活动
+        输入: sender (MessageSender) 消息发送器, directory (str/Path) 活动目录,
+              windows (SendingWindows, 可选) 发送时段，默认全天, clock (可选) 返回当前本地时间的函数,
+              wait (可选) 等待函数，参数为最长等待秒数, poll_interval (float) 空闲时最长等待秒数，
+              到时重新扫描活动目录 | 输出: 无
+        """
+        self.sender = sender
+        self.directory = Path(directory)
+        self.windows = windows or SendingWindows()
+        self.clock = clock or datetime.now
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._wait = wait or self._wakeup.wait
+        self._stopping = False
+        self._lock = threading.RLock()
+        self.campaigns: Dict[str, Dict] = {}
+        # 本进程正在执行的活动，重新扫描时保留内存中的状态
+        self._running: set = set()
+        # 启动时状态为 running 的活动（上次运行被中断），按 paused 处理
+        self._interrupted: set = set()
+        self._load(startup=True)
+
+    def _read(self, schedule_id: str) -> Optional[Dict]:
+        """
+        _read 功能说明:
+        读取单个活动文件的最新内容（可能已被其他进程修改），启动时被中断的活动状态按 paused 返回
+        输入: schedule_id (str) 活动ID | 输出: Optional[Dict] 活动，文件不存在或损坏时返回 None
+        """
+        path = self.directory / f"{schedule_id}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                campaign = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            Logger.error(f"读取定时发送活动 {path.name} 失败: {str(e)}")
+            return None
+        if campaign.get('status') == RUNNING and schedule_id in self._interrupted:
+            campaign['status'] = PAUSED
+        return campaign
+
+    def _load(self, startup: bool = False) -> None:
+        """
+        _load 功能说明:
+        重新扫描活动目录，读取其他进程添加、取消或更新的活动；本进程正在执行的活动保留内存中的状态。
+        启动时状态仍为 running 的活动是上次运行被中断的，恢复为 paused 稍后续发
+        输入: startup (bool) 是否为启动时加载 | 输出: 无
+        """
+        if not self.directory.exists():
+            return
+        with self._lock:
+            campaigns = {schedule_id: self.campaigns[schedule_id] for schedule_id in self._running}
+            for path in sorted(self.directory.glob('*.json')):
+                if path.stem in campaigns:
+                    continue
+                campaign = self._read(path.stem)
+                if campaign is None:
+                    continue
+                if startup and campaign.get('status') == RUNNING:
+                    self._interrupted.add(path.stem)
+                    campaign['status'] = PAUSED
+                    Logger.warning(f"定时发送活动 {campaign['schedule_id']} 上次运行被中断，将在发送时段内续发")
+                campaigns[campaign['schedule_id']] = campaign
+            self.campaigns = campaigns
+
+    def _save(self, campaign: Dict) -> None:
+        """
+        _save 功能说明:
+        原子保存单个活动
+        输入: campaign (Dict) 活动 | 输出: 无
+        """
+        campaign['updated_at'] = self.clock().isoformat()
+        atomic_write_json(self.directory / f"{campaign['schedule_id']}.json", campaign)
+
+    def schedule(self, tag: str, message: str, run_at: Optional[datetime] = None,
+                 campaign_id: Optional[str] = None) -> Dict:
+        """
+        schedule 功能说明:
+        添加定时发送活动。消息模板语法在添加时检查；活动ID同时作为发送账本的活动ID，
+        重启后重新执行也不会向已成功的收件人重复发送
+        输入: tag (str) 标签或标签表达式, message (str) 消息内容或模板, run_at (datetime, 可选) 计划发送时间，默认立即,
+              campaign_id (str, 可选) 发送账本活动ID | 输出: Dict 活动信息
+        """
+        MessageTemplate(message)
+        now = self.clock()
+        schedule_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        campaign = {
+            'schedule_id': schedule_id,
+            'tag': tag,
+            'message': message,
+            'campaign_id': campaign_id or schedule_id,
+            'run_at': (run_at or now).isoformat(),
+            'status': SCHEDULED,
+            'job_id': None,
+            'created_at': now.isoformat()
+        }
+        with self._lock:
+            self._save(campaign)
+            self.campaigns[schedule_id] = campaign
+        Logger.info(f"已添加定时发送活动 {schedule_id}: 标签 '{tag}'，计划时间 {campaign['run_at']}")
+        self._wakeup.set()
+        return dict(campaign)
+
+    def cancel(self, schedule_id: str) -> bool:
+        """
+        cancel 功能说明:
+        取消未完成的活动（正在发送的活动在下一个收件人前暂停后不再续发）
+        输入: schedule_id (str) 活动ID | 输出: bool 是否取消成功
+        """
+        with self._lock:
+            self._load()
+            campaign = self.campaigns.get(schedule_id)
+            if campaign is None or campaign['status'] not in ACTIVE_STATES:
+                return False
+            campaign['status'] = CANCELLED
+            self._save(campaign)
+        Logger.info(f"已取消定时发送活动 {schedule_id}")
+        self._wakeup.set()
+        return True
+
+    def list_campaigns(self) -> List[Dict]:
+        """
+        list_campaigns 功能说明:
+        重新扫描活动目录，按计划时间列出所有活动
+        输入: 无 | 输出: List[Dict] 活动列表
+        """
+        with self._lock:
+            self._load()
+            return [dict(c) for c in sorted(self.campaigns.values(), key=lambda c: (c['run_at'], c['schedule_id']))]
+
+    def next_run_at(self) -> Optional[datetime]:
+        """
+        next_run_at 功能说明:
+        计算最近一个活动可以开始或继续的时间：计划时间之后最近的允许发送时间
+        输入: 无 | 输出: Optional[datetime] 时间，没有待执行的活动时返回 None
+        """
+        now = self.clock()
+        times = []
+        for campaign in self.list_campaigns():
+            if campaign['status'] in RUNNABLE_STATES:
+                opens = self.windows.next_open(max(now, datetime.fromisoformat(campaign['run_at'])))
+                if opens is not None:
+                    times.append(opens)
+        return min(times) if times else None
+
+    def run_pending(self) -> List[Dict]:
+        """
+        run_pending 功能说明:
+        重新扫描活动目录，按计划时间顺序执行所有已到期的活动；不在发送时段内或已停止时不执行，
+        正在由其他进程发送的活动跳过
+        输入: 无 | 输出: List[Dict] 本次执行的活动
+        """
+        executed = []
+        for campaign in self.list_campaigns():
+            if self._should_pause():
+                break
+            if campaign['status'] not in RUNNABLE_STATES or datetime.fromisoformat(campaign['run_at']) > self.clock():
+                continue
+            result = self._run(campaign['schedule_id'])
+            if result is not None:
+                executed.append(result)
+        return executed
+
+    def run_forever(self, until_idle: bool = False) -> None:
+        """
+        run_forever 功能说明:
+        循环执行到期的活动，空闲时用 Event.wait 睡眠到下一个活动可以执行的时间，最长 poll_interval 秒
+        （其他进程添加或取消的活动在醒来后重新扫描时看到），本进程添加/取消活动或 stop 时提前唤醒
+        输入: until_idle (bool) 没有待执行的活动时是否退出 | 输出: 无
+        """
+        self._stopping = False
+        Logger.info("定时发送调度器已启动")
+        while not self._stopping:
+            self._wakeup.clear()
+            self.run_pending()
+            next_at = self.next_run_at()
+            if next_at is None and until_idle:
+                break
+            timeout = self.poll_interval if next_at is None \
+                else min(self.poll_interval, max(0.0, (next_at - self.clock()).total_seconds()))
+            if timeout > 0:
+                self._wait(timeout)
+        Logger.info("定时发送调度器已停止")
+
+    def stop(self) -> None:
+        """
+        stop 功能说明:
+        停止 run_forever 循环，正在发送的活动在当前收件人之后暂停
+        输入: 无 | 输出: 无
+        """
+        self._stopping = True
+        self._wakeup.set()
+
+    def _should_pause(self) -> bool:
+        """
+        _should_pause 功能说明:
+        发送每个收件人之前调用，窗口关闭或调度器停止时返回 True
+        输入: 无 | 输出: bool 是否暂停
+        """
+        return self._stopping or not self.windows.is_open(self.clock())
+
+    def _run(self, schedule_id: str) -> Dict:
+        """
+        _run 功能说明:
+        执行单个活动：首次执行按标签发送，已暂停的活动通过发送任务续发；
+        执行前重新读取活动文件，已被取消或正由其他进程发送时不执行；发送中其他进程取消时在下一个收件人前停止。
+        窗口关闭暂停时保持 paused 状态，全部收件人处理完后为 completed
+        输入: schedule_id (str) 活动ID | 输出: Optional[Dict] 活动信息，未执行时返回 None
+        """
+        with self._lock:
+            campaign = self._read(schedule_id)
+            if campaign is None or campaign['status'] not in RUNNABLE_STATES:
+                return None
+            self._interrupted.discard(schedule_id)
+            campaign['status'] = RUNNING
+            self._save(campaign)
+            self.campaigns[schedule_id] = campaign
+            self._running.add(schedule_id)
+
+        def cancelled() -> bool:
+            if campaign['status'] == CANCELLED:
+                return True
+            stored = self._read(schedule_id)
+            return stored is not None and stored['status'] == CANCELLED
+
+        def should_pause() -> bool:
+            return self._should_pause() or cancelled()
+
+        Logger.info(f"开始执行定时发送活动 {schedule_id}")
+        try:
+            if campaign.get('job_id'):
+                result = self.sender.resume_job(campaign['job_id'], stop=should_pause)
+            else:
+                result = self.sender.send_by_tag(campaign['tag'], campaign['message'],
+                                                 campaign_id=campaign['campaign_id'], confirm=False, stop=should_pause)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        with self._lock:
+            self._running.discard(schedule_id)
+            campaign['job_id'] = result.get('job_id') or campaign.get('job_id')
+            campaign['sent'] = campaign.get('sent', 0) + result.get('count', 0)
+            if cancelled():
+                # 发送中被取消（本进程或其他进程），保存时保留取消状态
+                campaign['status'] = CANCELLED
+            elif result.get('paused'):
+                campaign['status'] = PAUSED
+                Logger.info(f"发送时段结束，活动 {schedule_id} 已暂停，将在下一个发送时段续发")
+            elif 'error' in result:
+                campaign['status'] = FAILED
+                campaign['error'] = result['error']
+                Logger.error(f"定时发送活动 {schedule_id} 失败: {result['error']}")
+            else:
+                campaign['status'] = COMPLETED
+                campaign['failed'] = result.get('failed_count', 0)
+                campaign['finished_at'] = self.clock().isoformat()
+                Logger.info(f"定时发送活动 {schedule_id} 已完成，成功 {campaign['sent']}，失败 {campaign['failed']}")
+            self._save(campaign)
+            return dict(campaign)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    main 功能说明:
+    命令行入口:
+    python -m utils.campaign_scheduler add 标签 消息 [--at "2026-10-18 09:00"]  添加定时发送活动
+    python -m utils.campaign_scheduler list                                 查看所有活动
+    python -m utils.campaign_scheduler cancel 活动ID                         取消活动
+    python -m utils.campaign_scheduler run [--until-idle]                   运行调度器
+    输入: argv (List[str], 可选) 命令行参数 | 输出: int 退出码
+    """
+    from config.settings import config
+
+    parser = argparse.ArgumentParser(description='定时发送活动工具')
+    parser.add_argument('--dir', default=config.get('message.schedule.dir', 'data/schedule'), help='活动目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add = subparsers.add_parser('add', help='添加定时发送活动')
+    add.add_argument('tag', help='标签名或标签表达式')
+    add.add_argument('message', help='消息内容或模板')
+    add.add_argument('--at', help='计划发送时间，如 "2026-10-18 09:00"，默认立即')
+    add.add_argument('--campaign-id', help='发送账本活动ID，默认使用活动ID')
+    subparsers.add_parser('list', help='查看所有活动')
+    cancel = subparsers.add_parser('cancel', help='取消活动')
+    cancel.add_argument('schedule_id', help='活动ID')
+    run = subparsers.add_parser('run', help='运行调度器，按计划时间和发送时段执行活动')
+    run.add_argument('--until-idle', action='store_true', help='没有待执行的活动时退出')
+    args = parser.parse_args(argv)
+
+    windows = SendingWindows.from_config(config)
+    sender = None
+    if args.command == 'run':
+        from .message_sender import MessageSender
+        sender = MessageSender()
+    scheduler = CampaignScheduler(sender, args.dir, windows,
+                                  poll_interval=config.get('message.schedule.poll_interval', 60))
+
+    if args.command == 'add':
+        run_at = datetime.fromisoformat(args.at) if args.at else None
+        campaign = scheduler.schedule(args.tag, args.message, run_at, args.campaign_id)
+        print(f"✅ 已添加定时发送活动 {campaign['schedule_id']}，计划时间 {campaign['run_at']}")
+    elif args.command == 'list':
+        for campaign in scheduler.list_campaigns():
+            print(f"{campaign['schedule_id']}  [{campaign['status']}]  {campaign['run_at']}  标签: {campaign['tag']}")
+    elif args.command == 'cancel':
+        if not scheduler.cancel(args.schedule_id):
+            print(f"❌ 活动不存在或已结束: {args.schedule_id}")
+            return 1
+        print(f"✅ 已取消活动 {args.schedule_id}")
+    else:
+        try:
+            scheduler.run_forever(until_idle=args.until_idle)
+        except KeyboardInterrupt:
+            scheduler.stop()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
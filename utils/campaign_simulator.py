@@ -0,0 +1,232 @@
+##########campaign_simulator.py: [发送活动预估模块] ##################
+# 变更记录: [2026-10-18 00:30] @李祥光 [初始创建，在虚拟时钟上模拟限速、失败重试和发送时段，预估发送耗时、每小时发送量和完成时间]########
+# 输入: 各账号的收件人数量和发送策略 | 输出: 预计耗时、每小时发送量和完成时间###############
+
+import heapq
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from .rate_limiter import RateLimiter
+from .retry_scheduler import RetryScheduler
+from .campaign_scheduler import SendingWindows
+
+###########################文件下的所有函数###########################
+"""
+SimulatedClock：虚拟时钟，sleep 只推进时间
+CampaignSimulator.from_sender：按消息发送器的限速、重试和多账号配置创建预估器
+CampaignSimulator.run：模拟整个活动（各账号并行），汇总预计耗时和每小时发送量
+CampaignSimulator._simulate_account：在虚拟时钟上模拟单个账号的发送节奏
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender.simulate_send] --> B[from_sender]
+    B --> C[RateLimiter.clone 每个账号一个虚拟时钟限速器]
+    A --> D[run 各账号收件人数量]
+    D --> E[_simulate_account]
+    E --> F{当前时间在发送时段内?}
+    F -->|否| G[跳到 SendingWindows.next_open]
+    F -->|是| H{有到期的重试?}
+    H -->|有| I[重发]
+    H -->|没有| J[下一个新收件人]
+    I --> K[RateLimiter.acquire 虚拟等待]
+    J --> K
+    K -->|等待期间时段关闭| F
+    K --> L[按假定耗时和失败率模拟发送]
+    L --> M[RateLimiter.record 自适应降速]
+    L -->|失败| N[RetryScheduler.delay 指数退避]
+    N --> H
+    L --> O[按小时累计发送量]
+    D --> P[汇总: 最慢账号的完成时间、每小时发送量]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class SimulatedClock:
+    """
+    SimulatedClock 功能说明:
+    虚拟时钟，sleep 只推进时间不真正等待
+    输入: 无 | 输出: 时钟对象
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+class CampaignSimulator:
+    """
+    CampaignSimulator 功能说明:
+    发送活动预估器。使用与真实发送相同的限速器（clone 到虚拟时钟）和重试退避参数，
+    按假定的单条发送耗时和失败率模拟每一次发送，发送时段关闭时跳到下一个允许发送的时间；
+    多个账号各自模拟后按并行发送汇总。不连接微信，百万收件人也只需数秒
+    输入: rate_limiters (List[RateLimiter]) 每个账号的限速器, windows (SendingWindows, 可选) 发送时段，为空表示全天,
+          max_retry/retry_base_delay/retry_max_delay/retry_jitter 重试参数,
+          latency (float) 假定每条发送耗时秒数, failure_rate (float) 假定发送失败率, seed (int, 可选) 随机数种子 |
+          输出: 预估器对象
+    """
+
+    def __init__(self, rate_limiters: List[RateLimiter], windows: Optional[SendingWindows] = None,
+                 max_retry: int = 3, retry_base_delay: float = 5.0, retry_max_delay: float = 300.0,
+                 retry_jitter: float = 0.5, latency: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        if not rate_limiters:
+            raise ValueError('至少需要一个账号的限速器')
+        self.rate_limiters = list(rate_limiters)
+        self.windows = windows
+        self.max_retry = max_retry
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_jitter = retry_jitter
+        self.latency = max(0.0, float(latency))
+        self.failure_rate = min(1.0, max(0.0, float(failure_rate)))
+        self.seed = seed
+
+    @classmethod
+    def from_sender(cls, sender, windows: Optional[SendingWindows] = None, **options) -> 'CampaignSimulator':
+        """
+        from_sender 功能说明:
+        按消息发送器当前的限速和重试配置创建预估器，配置了多个账号时每个账号使用各自的限速器
+        输入: sender (MessageSender) 消息发送器, windows (SendingWindows, 可选) 发送时段,
+              options latency/failure_rate/seed | 输出: CampaignSimulator 预估器
+        """
+        dispatcher = getattr(sender, 'dispatcher', None)
+        limiters = [account.rate_limiter for account in dispatcher.accounts.values()] if dispatcher \
+            else [sender.rate_limiter]
+        return cls(limiters, windows, sender.max_retry, sender.retry_base_delay, sender.retry_max_delay,
+                   sender.retry_jitter, **options)
+
+    def run(self, counts: List[int], start: Optional[datetime] = None) -> Dict:
+        """
+        run 功能说明:
+        模拟整个活动：counts 为各账号分到的收件人数量（与 rate_limiters 一一对应），各账号并行发送，
+        活动完成时间取最慢的账号；每小时发送量按各账号合计
+        输入: counts (List[int]) 各账号收件人数量, start (datetime, 可选) 开始时间，默认当前时间 | 输出: Dict 预估结果
+        """
+        started = time.perf_counter()
+        start = (start or datetime.now()).replace(microsecond=0)
+        if len(counts) != len(self.rate_limiters):
+            raise ValueError(f'收件人分组数 {len(counts)} 与账号数 {len(self.rate_limiters)} 不一致')
+        if self.windows is not None and any(counts) and self.windows.next_open(start) is None:
+            return {'success': False, 'error': '发送时段配置不允许任何时间发送'}
+
+        hourly: Counter = Counter()
+        accounts = [self._simulate_account(count, limiter, start, hourly, index)
+                    for index, (count, limiter) in enumerate(zip(counts, self.rate_limiters))]
+        duration = max((account['duration'] for account in accounts), default=0.0)
+        hour_base = start.replace(minute=0, second=0)
+        volume = [{'hour': (hour_base + timedelta(hours=hour)).strftime('%Y-%m-%d %H:00'), 'count': hourly[hour]}
+                  for hour in sorted(hourly)]
+        return {
+            'success': True,
+            'recipients': sum(counts),
+            'accounts': accounts,
+            'expected_sent': sum(account['sent'] for account in accounts),
+            'expected_failed': sum(account['failed'] for account in accounts),
+            'expected_retries': sum(account['retries'] for account in accounts),
+            'start_at': start.isoformat(),
+            'finish_at': (start + timedelta(seconds=duration)).isoformat(),
+            'duration': duration,
+            'paused_seconds': max((account['paused_seconds'] for account in accounts), default=0.0),
+            'hourly': volume,
+            'peak_per_hour': max((item['count'] for item in volume), default=0),
+            'simulated_in': time.perf_counter() - started
+        }
+
+    def _simulate_account(self, count: int, template: RateLimiter, start: datetime, hourly: Counter,
+                          index: int = 0) -> Dict:
+        """
+        _simulate_account 功能说明:
+        在虚拟时钟上模拟单个账号的发送：与 send_batch_messages 相同的顺序（到期的重试优先，其次新收件人），
+        每次发送前按限速器等待，发送耗时 latency 秒，按失败率失败后按重试退避排队；
+        发送时段关闭时暂停到下一个允许发送的时间
+        输入: count (int) 收件人数量, template (RateLimiter) 该账号的限速器, start (datetime) 开始时间,
+              hourly (Counter) 每小时发送量（按开始时间所在整点起的小时序号累计）, index (int) 账号序号 |
+              输出: Dict 该账号的预计耗时和发送结果
+        """
+        clock = SimulatedClock()
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        limiter = template.clone(clock=clock, sleep=clock.sleep, rng=rng)
+        backoff = RetryScheduler(self.max_retry, self.retry_base_delay, self.retry_max_delay, self.retry_jitter, rng=rng)
+        offset = start.minute * 60 + start.second
+        retries: List = []
+        attempts: Dict[int, int] = {}
+        sent = failed = retried = calls = 0
+        paused = 0.0
+        remaining = count
+        next_id = 0
+
+        # 发送时段：closes_at 为当前时段结束的虚拟时间，None 表示不会关闭
+        closes_at: Optional[float] = None
+        if self.windows is not None and count:
+            opens = self.windows.next_open(start)
+            paused = clock.now = (opens - start).total_seconds()
+            closes = self.windows.next_close(opens)
+            closes_at = None if closes is None else (closes - start).total_seconds()
+
+        while remaining or retries:
+            if closes_at is not None and clock.now >= closes_at:
+                # 时段关闭，跳到下一个允许发送的时间；暂停不影响已排队的重试
+                now = start + timedelta(seconds=clock.now)
+                opens = self.windows.next_open(now)
+                paused += (opens - now).total_seconds()
+                clock.now = (opens - start).total_seconds()
+                closes = self.windows.next_close(opens)
+                closes_at = None if closes is None else (closes - start).total_seconds()
+
+            # 与 RetryScheduler.pop_due 相同：赶得上下一个发送时机的重试优先
+            if retries and (retries[0][0] <= clock.now or retries[0][0] <= clock.now + limiter.next_delay()):
+                _, key = heapq.heappop(retries)
+                is_retry = True
+            elif remaining:
+                remaining -= 1
+                key = next_id
+                next_id += 1
+                is_retry = False
+            else:
+                clock.now = max(clock.now, retries[0][0])
+                continue
+
+            limiter.acquire()
+            if closes_at is not None and clock.now >= closes_at:
+                # 限速等待期间时段已关闭，放回队列，下一个时段再发送
+                if is_retry:
+                    heapq.heappush(retries, (clock.now, key))
+                else:
+                    remaining += 1
+                    next_id -= 1
+                continue
+            retried += is_retry
+            calls += 1
+            clock.now += self.latency
+            success = not self.failure_rate or rng.random() >= self.failure_rate
+            limiter.record(success, self.latency)
+            hourly[int((offset + clock.now) // 3600)] += 1
+            if success:
+                sent += 1
+                attempts.pop(key, None)
+                continue
+            attempt = attempts.get(key, 0) + 1
+            if attempt <= self.max_retry:
+                attempts[key] = attempt
+                heapq.heappush(retries, (clock.now + backoff.delay(attempt), key))
+            else:
+                attempts.pop(key, None)
+                failed += 1
+
+        return {
+            'sent': sent,
+            'failed': failed,
+            'retries': retried,
+            'calls': calls,
+            'duration': clock.now,
+            'paused_seconds': paused,
+            'final_interval': limiter.interval
+        }
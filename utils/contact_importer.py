@@ -0,0 +1,154 @@
+##########contact_importer.py: [联系人批量导入模块] ##################
+# 变更记录: [2026-10-17 13:10] @李祥光 [初始创建，支持CSV/XLSX/JSONL分块导入]########
+# 输入: CSV/XLSX/JSONL联系人文件 | 输出: 规范化、去重后的联系人记录###############
+
+import argparse
+import re
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator, Tuple
+import pandas as pd
+
+###########################文件下的所有函数###########################
+"""
+read_contact_chunks：按文件类型分块读取联系人文件
+_split_tags：拆分单元格中的标签
+normalize_contact_chunk：向量化规范化并去重一个数据块
+main：导入命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactManager.import_contacts] --> B[read_contact_chunks]
+    B --> C{文件类型}
+    C -->|csv| D[read_csv chunksize]
+    C -->|jsonl| E[read_json lines chunksize]
+    C -->|xlsx| F[read_excel 后分块]
+    D --> G[normalize_contact_chunk]
+    E --> G
+    F --> G
+    G --> H[列名映射/去空/拆分标签/按姓名合并]
+    H --> I[ContactManager批量事务合并写入]
+    J[main] --> A
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# 导入文件中可识别的列名（统一映射为联系人字段）
+COLUMN_ALIASES = {
+    'name': 'name', '姓名': 'name', '名称': 'name', '联系人': 'name',
+    'type': 'type', '类型': 'type',
+    'tags': 'tags', 'tag': 'tags', '标签': 'tags',
+    'wxid': 'wxid', '微信号': 'wxid',
+    'remark': 'remark', '备注': 'remark',
+}
+
+# 标签分隔符：中英文逗号、分号、竖线、顿号
+TAG_SEPARATOR = r'[,，;；|、]'
+
+def read_contact_chunks(path: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    read_contact_chunks 功能说明:
+    按文件类型分块读取联系人文件，CSV和JSONL流式读取，XLSX整体读取后分块
+    输入: path (str) 文件路径, chunksize (int) 每块行数 | 输出: Iterator[DataFrame] 数据块
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix in ('.csv', '.txt'):
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, encoding='utf-8-sig',
+                               keep_default_na=False)
+    elif suffix in ('.jsonl', '.ndjson'):
+        yield from pd.read_json(path, lines=True, chunksize=chunksize, dtype=False, encoding='utf-8')
+    elif suffix in ('.xlsx', '.xls'):
+        # Excel无法流式读取，读取后按块处理以保持后续流程一致
+        frame = pd.read_excel(path, dtype=str, keep_default_na=False)
+        for start in range(0, len(frame), chunksize):
+            yield frame.iloc[start:start + chunksize]
+    else:
+        raise ValueError(f"不支持的导入文件类型: {suffix}（支持 csv/xlsx/jsonl）")
+
+def _split_tags(value) -> List[str]:
+    """
+    _split_tags 功能说明:
+    将单元格中的标签拆分为去重后的标签列表，兼容JSONL中已是列表的情况
+    输入: value 标签单元格 | 输出: List[str] 标签列表
+    """
+    if isinstance(value, (list, tuple)):
+        parts = value
+    elif value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    else:
+        parts = re.split(TAG_SEPARATOR, str(value))
+    return list(dict.fromkeys(str(tag).strip() for tag in parts if str(tag).strip()))
+
+def normalize_contact_chunk(frame: pd.DataFrame) -> Tuple[List[Dict], int]:
+    """
+    normalize_contact_chunk 功能说明:
+    向量化规范化一个数据块：映射列名、去除空姓名、拆分标签，并按姓名合并重复行
+    （标签取并集，其他字段取最后一个非空值）
+    输入: frame (DataFrame) 原始数据块 | 输出: Tuple[List[Dict], int] (规范化后的记录, 被跳过的行数)
+    """
+    frame = frame.rename(columns=lambda column: COLUMN_ALIASES.get(str(column).strip().lower(), str(column).strip()))
+    if 'name' not in frame.columns:
+        raise ValueError("导入文件缺少姓名列（name/姓名/名称/联系人）")
+
+    frame = frame.loc[:, ~frame.columns.duplicated()].copy()
+    total_rows = len(frame)
+    frame['name'] = frame['name'].astype('string').str.strip()
+    frame = frame[frame['name'].notna() & (frame['name'] != '')]
+
+    if 'tags' in frame.columns:
+        frame['tags'] = frame['tags'].map(_split_tags)
+        tag_rows = frame[['name', 'tags']].explode('tags').dropna(subset=['tags'])
+        tag_rows = tag_rows.drop_duplicates()
+        # groupby(...).agg(list) 会逐组调用Python函数，直接按列遍历更快
+        tags_by_name: Dict[str, List[str]] = {}
+        for name, tag in zip(tag_rows['name'].tolist(), tag_rows['tags'].tolist()):
+            tags_by_name.setdefault(name, []).append(tag)
+    else:
+        tags_by_name = {}
+
+    field_columns = [column for column in frame.columns if column not in ('name', 'tags')]
+    fields = frame[['name'] + field_columns].replace('', pd.NA)
+    merged = fields.groupby('name', sort=False).last().to_dict('index') if field_columns else {}
+
+    records = []
+    for name in frame['name'].drop_duplicates():
+        record = {'name': str(name), 'tags': tags_by_name.get(name, [])}
+        for column, value in merged.get(name, {}).items():
+            if not pd.isna(value):
+                record[str(column)] = value.item() if hasattr(value, 'item') else value
+        records.append(record)
+
+    return records, total_rows - len(records)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    main 功能说明:
+    命令行入口: python -m utils.contact_importer 文件 [--tag 标签] [--type 类型] [--data-file 联系人文件]
+    输入: argv (List[str], 可选) 命令行参数 | 输出: int 退出码
+    """
+    from .contact_manager import ContactManager
+
+    parser = argparse.ArgumentParser(description='从CSV/XLSX/JSONL批量导入联系人')
+    parser.add_argument('path', help='导入文件路径')
+    parser.add_argument('--tag', action='append', default=[], help='为所有导入的联系人追加的标签，可重复')
+    parser.add_argument('--type', default='friend', help='新联系人的默认类型')
+    parser.add_argument('--chunksize', type=int, default=10000, help='每块读取的行数')
+    parser.add_argument('--data-file', default='data/contacts.json', help='联系人数据文件')
+    args = parser.parse_args(argv)
+
+    manager = ContactManager(args.data_file)
+    result = manager.import_contacts(args.path, default_type=args.type, extra_tags=args.tag,
+                                     chunksize=args.chunksize)
+    if not result['success']:
+        print(f"❌ 导入失败: {result['error']}")
+        return 1
+
+    print(f"✅ 导入完成: 新增 {result['inserted']}, 更新 {result['updated']}, "
+          f"跳过 {result['skipped']}, 耗时 {result['duration']:.1f}秒")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,28 +1,89 @@
 ##########contact_manager.py: [联系人管理模块] ##################
 # 变更记录: [2024-12-19 14:30] @李祥光 [初始创建]########
 # 变更记录: [2024-12-19 19:15] @李祥光 [修复wxauto V2 API兼容性，移除GetAllFriends方法，添加手动添加联系人功能]########
+# 变更记录: [2026-10-17 09:10] @李祥光 [新增姓名索引和标签倒排索引，标签查询不再全表扫描]########
+# 变更记录: [2026-10-17 10:20] @李祥光 [新增批量事务、批量打标签接口和延迟合并写入]########
+# 变更记录: [2026-10-17 11:00] @李祥光 [修改操作统一为可重放的操作记录，支持追加日志存储后端]########
+# 变更记录: [2026-10-17 11:45] @李祥光 [支持SQLite存储后端]########
+# 变更记录: [2026-10-17 12:30] @李祥光 [备份改为后台、内容去重并按保留策略清理]########
+# 变更记录: [2026-10-17 13:10] @李祥光 [新增从CSV/XLSX/JSONL批量导入联系人]########
+# 变更记录: [2026-10-17 13:50] @李祥光 [搜索改用n-gram/拼音搜索索引，结果按相关度排序]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [数据目录进程锁，数据文件损坏时从最新有效备份恢复]########
+# 变更记录: [2026-10-17 15:10] @李祥光 [新增列式联系人表和向量化筛选接口]########
+# 变更记录: [2026-10-17 15:40] @李祥光 [新增按稳定标识批量合并联系人的upsert_contacts]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [快照格式和压缩方式可配置（contacts.format/compression），备份校验自动识别格式]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [移除未使用的wxauto导入，微信调用统一通过utils.transport传输层]########
+# 变更记录: [2026-10-18 10:10] @李祥光 [数据目录锁只在加载和写入期间持有，其他进程（定时发送、续发任务）运行时主程序仍可使用]########
+# 变更记录: [2026-10-18 11:50] @李祥光 [修改联系人时增量更新列式表，不再在下次筛选时整表重建]########
+# 变更记录: [2026-10-18 12:30] @李祥光 [SQLite后端不再整体加载联系人，姓名/标签查询和筛选直接查询数据库]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [写入前比较数据文件版本，其他进程写过时重新加载并重放本进程未写入的修改，避免互相覆盖]########
+# 变更记录: [2026-10-18 14:40] @李祥光 [标签表达式恰好是已存在的标签时按字面匹配]########
+# 变更记录: [2026-10-18 16:40] @李祥光 [按需查询的后端不再修改只读视图，新增联系人通过store.cache_contact显式缓存]########
+# 变更记录: [2026-10-18 18:00] @李祥光 [新增contacts.columnar：列式表作为唯一的联系人数据，不再同时保存全部联系人字典]########
+# 变更记录: [2026-10-18 18:40] @李祥光 [后台备份读取数据文件时不再持有管理器的锁]########
 # 输入: 联系人信息和标签操作 | 输出: 联系人数据管理结果###############
 
 import json
 import os
+import atexit
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Set
-from wxauto import WeChat
+from typing import List, Dict, Optional, Set, Iterable, Iterator
 from .logger import Logger
+from .tag_query import TagQuery
+from .contact_search import ContactSearchIndex
+from .contact_table import ContactTable
+from .contact_store import create_contact_store
+from .backup_manager import BackupManager
+from .atomic_file import atomic_write_bytes, data_dir_lock
+from .serializer import loads_document
+from config.settings import config
 
 ###########################文件下的所有函数###########################
 """
 ContactManager.__init__：初始化联系人管理器
-ContactManager.load_contacts：加载联系人数据
+ContactManager.load_contacts：加载联系人数据（快照 + 重放日志）
+ContactManager._load_contacts：持有数据目录锁时加载联系人数据
+ContactManager._recover_from_backup：数据文件损坏时从最新有效备份恢复
+ContactManager.close：写入未保存的修改并等待后台备份完成
+ContactManager._dir_locked：加载或写入数据文件期间持有数据目录锁
+ContactManager._reload_if_changed：写入前发现其他进程修改过数据文件时重新加载并重放未写入的修改
+ContactManager._apply_op：在内存中执行一条修改操作
+ContactManager._record：持久化一条修改操作
+ContactManager._rebuild_index：重建姓名索引和标签倒排索引（SQLite后端改为按需查询的视图）
+ContactManager._index_contact：将单个联系人加入索引
+ContactManager._sort_names：按原始顺序排序联系人姓名
+ContactManager._index_tag：将联系人加入标签倒排索引
+ContactManager._unindex_tag：从标签倒排索引移除联系人
 ContactManager.save_contacts：保存联系人数据
+ContactManager._mark_dirty：标记数据已修改，按需立即写入或延迟合并写入
+ContactManager.flush：将未保存的修改写入文件
+ContactManager.batch：批量事务，事务结束时只写入一次
+ContactManager.enable_autosave：开启延迟合并写入模式
+ContactManager.add_tags：为多个联系人批量添加标签
+ContactManager.remove_tags：为多个联系人批量移除标签
+ContactManager._apply_add_tag：在内存中添加标签并更新索引
+ContactManager._apply_remove_tag：在内存中移除标签并更新索引
+ContactManager._autosave：延迟写入定时器回调
 ContactManager.sync_from_wechat：从微信同步联系人
 ContactManager.add_tag：为联系人添加标签
 ContactManager.remove_tag：移除联系人标签
 ContactManager.get_contacts_by_tag：根据标签获取联系人
+ContactManager.query_contacts：根据标签布尔表达式获取联系人
 ContactManager.list_contacts：列出所有联系人
 ContactManager.get_all_tags：获取所有标签
 ContactManager.backup_data：备份联系人数据
+ContactManager.get_contact：根据姓名获取联系人
+ContactManager.update_contact：更新联系人字段
+ContactManager.has_tag：判断联系人是否带有标签
+ContactManager.import_contacts：从CSV/XLSX/JSONL批量导入联系人
+ContactManager.upsert_contacts：按稳定标识批量新增或更新联系人
+ContactManager.search_contacts：按姓名/标签/拼音搜索联系人
+ContactManager._update_search_index：增量更新搜索索引和列式表
+ContactManager.get_table：获取列式联系人表
+ContactManager.filter_contacts：按标签、类型、时间范围向量化筛选联系人（SQLite后端用SQL筛选）
 """
 ###########################文件下的所有函数###########################
 
@@ -31,13 +92,44 @@ ContactManager.backup_data：备份联系人数据
 flowchart TD
     A[ContactManager初始化] --> B[load_contacts]
     B --> C{数据文件存在?}
-    C -->|是| D[读取JSON数据]
+    B --> LK[_dir_locked 加载和写入期间持有数据目录锁]
+    F --> LK
+    LK --> RC2[_reload_if_changed 版本变化时重新加载并重放未写入的操作]
+    C -->|是| D[store.load 读取快照和日志]
+    C -->|SQLite后端| OD[store.views 按需查询视图，不整体加载]
+    R -->|contacts.columnar| CT[ContactTable.views 列式表为唯一数据，字典按需生成]
+    D -->|文件损坏| RB[_recover_from_backup]
+    RB --> RC[损坏文件改名保留并从最新有效备份恢复]
+    RC --> D
+    D --> R[_rebuild_index]
+    R --> R2[_apply_op 重放日志]
+    R --> S[_index_contact]
     C -->|否| E[sync_from_wechat]
     E --> F[save_contacts]
-    G[add_tag] --> H[更新联系人标签]
-    H --> F
-    I[get_contacts_by_tag] --> J[筛选标签联系人]
-    K[backup_data] --> L[创建备份文件]
+    G[add_tag/add_tags] --> H[更新联系人标签]
+    H --> T[_index_tag/_unindex_tag 更新标签倒排索引，按需查询的后端由store.record维护]
+    T --> W0[_record]
+    W0 --> W[_mark_dirty]
+    W --> X{批量事务或延迟写入?}
+    X -->|否| F
+    X -->|批量事务| Y[batch结束时flush]
+    X -->|延迟写入| Z[定时器/退出时flush]
+    Y --> F
+    Z --> F
+    I[get_contacts_by_tag] --> J[查询标签倒排索引]
+    IM[import_contacts] --> IN[contact_importer分块规范化]
+    IN --> IO[batch内合并写入]
+    UP[upsert_contacts] --> UK[按标识/姓名匹配已有联系人]
+    UK --> IO
+    U[query_contacts] --> V[TagQuery.evaluate]
+    V --> J
+    F --> K[backup_data]
+    SC[search_contacts] --> SI[ContactSearchIndex 首次搜索时构建]
+    R2 --> SU[_update_search_index]
+    FC[filter_contacts] --> GT[get_table 列式表 修改时增量更新]
+    FC -->|SQLite后端| SQ[store.filter_contacts SQL筛选]
+    GT --> FT[ContactTable.filter 向量化筛选]
+    K --> L[BackupManager.submit 后台去重备份]
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
 
@@ -48,15 +140,82 @@ class ContactManager:
     输入: 联系人操作请求 | 输出: 联系人数据管理结果
     """
     
-    def __init__(self, data_file: str = "data/contacts.json"):
+    def __init__(self, data_file: str = "data/contacts.json", autosave_delay: Optional[float] = None,
+                 storage: Optional[str] = None, columnar: Optional[bool] = None):
         """
         __init__ 功能说明:
         初始化联系人管理器
-        输入: data_file (str) 数据文件路径 | 输出: 无
+        输入: data_file (str) 数据文件路径, autosave_delay (float, 可选) 延迟合并写入的秒数，
+              默认读取配置 contacts.autosave_delay，0 表示每次修改立即写入,
+              storage (str, 可选) 存储后端 json/journal/sqlite，默认读取配置 contacts.storage,
+              columnar (bool, 可选) 内存中只保存列式表，默认读取配置 contacts.columnar（SQLite后端不适用） | 输出: 无
         """
         self.data_file = Path(data_file)
         self.contacts: List[Dict] = []
+        # 加载和写入数据文件期间持有数据目录锁，其他进程正在读写时最多等待该秒数
+        self._lock_timeout = float(config.get('contacts.lock_timeout', 30))
+        
+        storage = storage or config.get('contacts.storage', 'json')
+        store_options = {
+            'file_format': config.get('contacts.format', 'json'),
+            'compression': config.get('contacts.compression', 'none')
+        }
+        if storage == 'journal':
+            store_options['compact_threshold'] = config.get('contacts.journal_compact_threshold', 10000)
+        elif storage == 'sqlite':
+            store_options['db_file'] = config.get('contacts.sqlite_file') or None
+        self.store = create_contact_store(storage, self.data_file, **store_options)
+        # SQLite后端的联系人留在数据库中，姓名、标签查询和筛选直接查询数据库
+        self._on_demand = self.store.on_demand
+        # 列式模式：内存中只保存 ContactTable，联系人字典在访问时才生成
+        if columnar is None:
+            columnar = config.get('contacts.columnar', False)
+        self._columnar = bool(columnar) and not self._on_demand
+        
+        self.auto_backup = config.get('contacts.auto_backup', True)
+        self.backups = BackupManager(
+            self.data_file.parent / 'backups',
+            prefix='contacts_backup',
+            compress=config.get('contacts.backup.compress', False),
+            keep_last=config.get('contacts.backup.keep_last', 20),
+            keep_hourly=config.get('contacts.backup.keep_hourly', 24),
+            keep_daily=config.get('contacts.backup.keep_daily', 30)
+        )
+        # 写入控制：批量事务深度、未保存标记、延迟写入定时器
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._autosave_delay = 0.0
+        self._autosave_timer: Optional[threading.Timer] = None
+        # 姓名 -> 联系人字典，姓名 -> 在contacts中的位置（用于保持原有顺序）
+        self._by_name: Dict[str, Dict] = {}
+        self._positions: Dict[str, int] = {}
+        # 标签 -> 拥有该标签的联系人姓名集合
+        self._tag_index: Dict[str, Set[str]] = {}
+        # 搜索索引在首次搜索时构建，之后随修改增量更新
+        self._search_index: Optional[ContactSearchIndex] = None
+        # 列式联系人表在首次筛选时构建（列式模式下加载时构建），之后随联系人修改增量更新
+        self._table: Optional[ContactTable] = None
+        # 上次加载或写入后的数据文件版本，以及之后尚未写入文件的修改操作
+        self._generation: tuple = ()
+        self._pending_ops: List[Dict] = []
         self.load_contacts()
+        
+        if autosave_delay is None:
+            autosave_delay = config.get('contacts.autosave_delay', 0)
+        if autosave_delay:
+            self.enable_autosave(autosave_delay)
+    
+    @contextmanager
+    def _dir_locked(self) -> Iterator[None]:
+        """
+        _dir_locked 功能说明:
+        加载或写入数据文件期间持有数据目录锁（同一进程内可重入），防止与其他进程同时读写；
+        其他进程持有锁超过 contacts.lock_timeout 秒时抛出 FileLockError
+        输入: 无 | 输出: 上下文管理器
+        """
+        with data_dir_lock(self.data_file.parent, self._lock_timeout):
+            yield
     
     def load_contacts(self) -> None:
         """
@@ -64,47 +223,365 @@ class ContactManager:
         从文件加载联系人数据，如果文件不存在则尝试从微信同步
         输入: 无 | 输出: 无
         """
+        with self._dir_locked():
+            self._load_contacts()
+    
+    def _load_contacts(self) -> None:
+        """
+        _load_contacts 功能说明:
+        持有数据目录锁时加载联系人数据
+        输入: 无 | 输出: 无
+        """
         try:
-            if self.data_file.exists():
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.contacts = data.get('contacts', [])
+            self._pending_ops = []
+            self._generation = self.store.generation()
+            if self.store.exists():
+                if self._on_demand:
+                    ops = []
+                else:
+                    try:
+                        self.contacts, ops = self.store.load()
+                    except ValueError as e:
+                        # 快照解析失败（例如写入中途崩溃）时不能静默当作空数据，否则下次保存会覆盖原有数据
+                        Logger.error(f"联系人数据文件已损坏: {str(e)}")
+                        if not self._recover_from_backup():
+                            raise
+                        self.contacts, ops = self.store.load()
+                self._rebuild_index()
+                for op in ops:
+                    self._apply_op(op)
+                # 启动时备份一次已有数据（内容未变化时自动跳过）
+                self.backup_data()
                 Logger.info(f"成功加载 {len(self.contacts)} 个联系人数据")
             else:
                 Logger.info("联系人数据文件不存在，尝试从微信同步")
+                self._rebuild_index()
                 self.sync_from_wechat()
         except Exception as e:
             Logger.error(f"加载联系人数据失败: {str(e)}")
             self.contacts = []
+            self._rebuild_index()
+    
+    def _recover_from_backup(self) -> bool:
+        """
+        _recover_from_backup 功能说明:
+        将损坏的数据文件改名保留（contacts.json.corrupt_时间），然后用最新的有效备份恢复数据文件
+        输入: 无 | 输出: bool 是否恢复成功
+        """
+        if self.store.name == 'sqlite':
+            return False
+        
+        if self.data_file.exists():
+            corrupt_file = self.data_file.with_name(
+                f"{self.data_file.name}.corrupt_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            )
+            os.replace(self.data_file, corrupt_file)
+            Logger.warning(f"损坏的联系人数据文件已保留为: {corrupt_file}")
+        
+        def is_valid(data: bytes) -> bool:
+            return isinstance(loads_document(data).get('contacts'), list)
+        
+        found = self.backups.find_valid_backup(is_valid)
+        if found is None:
+            Logger.error("没有可用于恢复的联系人备份")
+            return False
+        
+        backup_file, data = found
+        atomic_write_bytes(self.data_file, data)
+        Logger.warning(f"已从备份恢复联系人数据: {backup_file}")
+        return True
+    
+    def _rebuild_index(self) -> None:
+        """
+        _rebuild_index 功能说明:
+        根据当前联系人列表重建姓名索引和标签倒排索引；
+        按需查询的后端改为使用查询数据库的联系人列表、姓名索引和标签索引视图；
+        列式模式把联系人转换为列式表后改为使用列式表的视图，加载得到的字典随即释放
+        输入: 无 | 输出: 无
+        """
+        self._search_index = None
+        self._table = None
+        if self._on_demand:
+            self.contacts, self._by_name, self._tag_index = self.store.views()
+            self._positions = {}
+            return
+        
+        duplicates = 0
+        if self._columnar:
+            # 与原有的顺序扫描保持一致：同名联系人以第一个为准
+            unique: Dict[str, Dict] = {}
+            for contact in self.contacts:
+                unique.setdefault(contact['name'], contact)
+            duplicates = len(self.contacts) - len(unique)
+            self._table = ContactTable.from_contacts(unique.values())
+            self.contacts, self._by_name, self._tag_index = self._table.views()
+            self._positions = {}
+        else:
+            self._by_name = {}
+            self._positions = {}
+            self._tag_index = {}
+            for position, contact in enumerate(self.contacts):
+                if contact['name'] in self._by_name:
+                    # 与原有的顺序扫描保持一致：同名联系人以第一个为准
+                    duplicates += 1
+                    continue
+                self._index_contact(contact, position)
+        
+        if duplicates:
+            Logger.warning(f"联系人数据中存在 {duplicates} 个重名联系人，仅索引第一个")
+    
+    def _index_contact(self, contact: Dict, position: int) -> None:
+        """
+        _index_contact 功能说明:
+        将单个联系人加入姓名索引和标签倒排索引
+        输入: contact (Dict) 联系人, position (int) 在contacts中的位置 | 输出: 无
+        """
+        name = contact['name']
+        self._by_name[name] = contact
+        self._positions[name] = position
+        for tag in contact.get('tags') or []:
+            self._index_tag(name, tag)
+    
+    def _sort_names(self, names) -> List[str]:
+        """
+        _sort_names 功能说明:
+        按联系人在contacts中的原始顺序排序姓名
+        输入: names (Iterable[str]) 姓名集合 | 输出: List[str] 排序后的姓名列表
+        """
+        if self._columnar:
+            return sorted(names, key=self._table.row_of)
+        return sorted(names, key=self._positions.__getitem__)
+    
+    def _reload_if_changed(self) -> None:
+        """
+        _reload_if_changed 功能说明:
+        持有数据目录锁、写入之前调用：数据文件版本与上次加载或写入后不同（其他进程写过）时，
+        重新加载文件并重放本进程尚未写入的修改操作，之后的写入同时包含双方的修改。
+        重新加载失败时抛出异常，不写入，避免覆盖其他进程的数据
+        输入: 无 | 输出: 无
+        """
+        if self.store.generation() == self._generation:
+            return
+        
+        Logger.warning(f"联系人数据文件已被其他进程修改，重新加载后写入本进程的 {len(self._pending_ops)} 条修改")
+        pending = self._pending_ops
+        self._generation = self.store.generation()
+        self.contacts, ops = self.store.load()
+        self._rebuild_index()
+        for op in ops:
+            self._apply_op(op)
+        self._pending_ops = []
+        for op in pending:
+            if self._apply_op(op):
+                contact = op['contact'] if op['op'] == 'add' else self._by_name.get(op['name'])
+                self.store.record(op, contact)
+                self._pending_ops.append(op)
     
     def save_contacts(self) -> bool:
         """
         save_contacts 功能说明:
-        保存联系人数据到文件
+        保存完整的联系人快照到文件（日志存储后端会同时清空日志）
         输入: 无 | 输出: bool 保存是否成功
         """
-        try:
-            # 确保目录存在
-            self.data_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 备份现有数据
-            if self.data_file.exists():
+        with self._lock:
+            try:
+                # 确保目录存在
+                self.data_file.parent.mkdir(parents=True, exist_ok=True)
+                
+                with self._dir_locked():
+                    self._reload_if_changed()
+                    if self._on_demand:
+                        # 联系人列表是数据库视图，重写快照会先清空数据库，直接提交即可
+                        self.store.commit()
+                    else:
+                        # 列式模式下 contacts 是视图，写入快照时逐个生成字典
+                        self.store.save_snapshot(self.contacts.copy())
+                    self._generation = self.store.generation()
+                    self._pending_ops = []
+                
+                # 备份新写入的数据：后台完成，内容与最新备份相同时跳过
                 self.backup_data()
+                
+                self._dirty = False
+                Logger.info(f"成功保存 {len(self.contacts)} 个联系人数据")
+                return True
+            except Exception as e:
+                Logger.error(f"保存联系人数据失败: {str(e)}")
+                return False
+    
+    def _mark_dirty(self) -> None:
+        """
+        _mark_dirty 功能说明:
+        标记联系人数据已修改。批量事务中只记录标记，事务结束时统一写入；
+        开启延迟写入时启动定时器合并写入；否则立即写入
+        输入: 无 | 输出: 无
+        """
+        with self._lock:
+            self._dirty = True
+            if self._batch_depth > 0:
+                return
             
-            data = {
-                'contacts': self.contacts,
-                'last_updated': datetime.now().isoformat(),
-                'version': '1.0.0'
-            }
-            
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            Logger.info(f"成功保存 {len(self.contacts)} 个联系人数据")
+            if self._autosave_delay > 0:
+                if self._autosave_timer is None:
+                    self._autosave_timer = threading.Timer(self._autosave_delay, self._autosave)
+                    self._autosave_timer.daemon = True
+                    self._autosave_timer.start()
+                return
+        
+        self.flush()
+    
+    def _autosave(self) -> None:
+        """
+        _autosave 功能说明:
+        延迟写入定时器回调
+        输入: 无 | 输出: 无
+        """
+        with self._lock:
+            self._autosave_timer = None
+            if self._batch_depth > 0:
+                # 事务进行中，由事务结束时写入
+                return
+        self.flush()
+    
+    def flush(self) -> bool:
+        """
+        flush 功能说明:
+        将未保存的修改写入文件，没有修改时不做任何事
+        输入: 无 | 输出: bool 写入是否成功
+        """
+        with self._lock:
+            if self._autosave_timer is not None:
+                self._autosave_timer.cancel()
+                self._autosave_timer = None
+            if not self._dirty:
+                return True
+            if self.store.needs_snapshot():
+                return self.save_contacts()
+            try:
+                with self._dir_locked():
+                    # 日志后端只追加本进程的操作；重新加载是为了让内存状态和序号包含其他进程的修改
+                    self._reload_if_changed()
+                    self.store.commit()
+                    self._generation = self.store.generation()
+                    self._pending_ops = []
+                self._dirty = False
+                return True
+            except Exception as e:
+                Logger.error(f"写入联系人修改日志失败: {str(e)}")
+                return False
+    
+    def _apply_op(self, op: Dict) -> bool:
+        """
+        _apply_op 功能说明:
+        在内存中执行一条修改操作并更新索引，不做持久化。加载时用于重放日志，
+        所有修改接口也通过它生效，保证内存状态与日志重放结果一致
+        支持的操作: add 添加联系人, tag 添加标签, untag 移除标签, set 更新字段
+        输入: op (Dict) 操作 | 输出: bool 是否发生修改
+        """
+        kind = op['op']
+        if kind == 'add':
+            contact = op['contact']
+            if contact['name'] in self._by_name:
+                return False
+            if self._on_demand:
+                # 视图只读：联系人和标签由随后的 store.record 写入数据库，这里只缓存本次修改的字典
+                self.store.cache_contact(contact)
+            elif self._columnar:
+                # 视图只读：新联系人由随后的 _update_search_index 追加到列式表，这里只缓存本次修改的字典
+                self._by_name.cache(contact)
+            else:
+                self.contacts.append(contact)
+                self._index_contact(contact, len(self.contacts) - 1)
+            self._update_search_index(contact)
             return True
-        except Exception as e:
-            Logger.error(f"保存联系人数据失败: {str(e)}")
+        
+        contact = self._by_name.get(op['name'])
+        if contact is None:
             return False
+        if kind == 'tag':
+            changed = self._apply_add_tag(contact, op['tag'], op.get('at'))
+        elif kind == 'untag':
+            changed = self._apply_remove_tag(contact, op['tag'], op.get('at'))
+        elif kind == 'set':
+            fields = op['fields']
+            if 'tags' in fields:
+                for tag in contact.get('tags') or []:
+                    self._unindex_tag(contact['name'], tag)
+                for tag in fields['tags'] or []:
+                    self._index_tag(contact['name'], tag)
+            contact.update(fields)
+            changed = True
+        else:
+            raise ValueError(f"未知的联系人操作: {kind}")
+        
+        if changed:
+            self._update_search_index(contact)
+        return changed
+    
+    def _update_search_index(self, contact: Dict) -> None:
+        """
+        _update_search_index 功能说明:
+        搜索索引和列式表已构建时增量更新单个联系人，未构建时无需处理
+        输入: contact (Dict) 联系人 | 输出: 无
+        """
+        if self._table is not None:
+            self._table.upsert(contact)
+        if self._search_index is not None:
+            self._search_index.update(contact)
+    
+    def _record(self, op: Dict) -> None:
+        """
+        _record 功能说明:
+        将已生效的修改操作交给存储后端，并按写入策略触发保存
+        输入: op (Dict) 操作 | 输出: 无
+        """
+        contact = op['contact'] if op['op'] == 'add' else self._by_name.get(op['name'])
+        self.store.record(op, contact)
+        self._pending_ops.append(op)
+        self._mark_dirty()
+    
+    @contextmanager
+    def batch(self) -> Iterator['ContactManager']:
+        """
+        batch 功能说明:
+        批量事务，事务内的所有修改只在内存中生效，最外层事务结束时写入一次文件。
+        事务内发生异常时已生效的修改同样会写入，保证内存与文件一致（不做回滚）
+        用法: with manager.batch(): manager.add_tag(...)
+        输入: 无 | 输出: ContactManager 自身
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._mark_dirty()
+    
+    def enable_autosave(self, delay: float) -> None:
+        """
+        enable_autosave 功能说明:
+        开启延迟合并写入：修改后等待 delay 秒再统一写入，期间的修改合并为一次写入；
+        程序退出时自动写入未保存的修改。delay 为 0 时恢复立即写入
+        输入: delay (float) 延迟秒数 | 输出: 无
+        """
+        with self._lock:
+            self._autosave_delay = float(delay)
+        if self._autosave_delay > 0:
+            atexit.register(self.flush)
+            Logger.info(f"联系人数据已开启延迟写入，间隔 {self._autosave_delay} 秒")
+        else:
+            atexit.unregister(self.flush)
+            self.flush()
+    
+    def close(self) -> None:
+        """
+        close 功能说明:
+        写入未保存的修改并等待后台备份完成（数据目录锁只在读写期间持有，此时已释放）
+        输入: 无 | 输出: 无
+        """
+        self.flush()
+        self.backups.wait()
     
     def sync_from_wechat(self) -> bool:
         """
@@ -124,7 +601,7 @@ class ContactManager:
             Logger.info("建议使用以下替代方案:")
             Logger.info("1. 手动添加联系人: 使用 add_contact() 方法")
             Logger.info("2. 从聊天记录中提取: 通过聊天窗口获取联系人")
-            Logger.info("3. 导入联系人列表: 从外部文件导入")
+            Logger.info("3. 导入联系人列表: 使用 import_contacts() 或 python -m utils.contact_importer 从CSV/XLSX/JSONL导入")
             
             # 如果没有现有联系人，创建一个示例联系人
             if not self.contacts:
@@ -136,8 +613,10 @@ class ContactManager:
                     'created_at': datetime.now().isoformat(),
                     'updated_at': datetime.now().isoformat()
                 }
-                self.contacts.append(sample_contact)
-                self.save_contacts()
+                with self._lock:
+                    op = {'op': 'add', 'contact': sample_contact}
+                    self._apply_op(op)
+                    self._record(op)
                 Logger.info("已添加示例联系人: 文件传输助手")
             
             return True
@@ -154,23 +633,19 @@ class ContactManager:
         输入: contact_name (str) 联系人姓名, tag (str) 标签名 | 输出: bool 添加是否成功
         """
         try:
-            for contact in self.contacts:
-                if contact['name'] == contact_name:
-                    if 'tags' not in contact:
-                        contact['tags'] = []
-                    
-                    if tag not in contact['tags']:
-                        contact['tags'].append(tag)
-                        contact['updated_at'] = datetime.now().isoformat()
-                        self.save_contacts()
-                        Logger.info(f"为联系人 '{contact_name}' 添加标签 '{tag}'")
-                        return True
-                    else:
-                        Logger.warning(f"联系人 '{contact_name}' 已有标签 '{tag}'")
-                        return True
-            
-            Logger.warning(f"未找到联系人 '{contact_name}'")
-            return False
+            with self._lock:
+                contact = self._by_name.get(contact_name)
+                if contact is None:
+                    Logger.warning(f"未找到联系人 '{contact_name}'")
+                    return False
+                
+                op = {'op': 'tag', 'name': contact_name, 'tag': tag, 'at': datetime.now().isoformat()}
+                if self._apply_op(op):
+                    self._record(op)
+                    Logger.info(f"为联系人 '{contact_name}' 添加标签 '{tag}'")
+                else:
+                    Logger.warning(f"联系人 '{contact_name}' 已有标签 '{tag}'")
+                return True
             
         except Exception as e:
             Logger.error(f"添加标签失败: {str(e)}")
@@ -183,25 +658,109 @@ class ContactManager:
         输入: contact_name (str) 联系人姓名, tag (str) 标签名 | 输出: bool 移除是否成功
         """
         try:
-            for contact in self.contacts:
-                if contact['name'] == contact_name:
-                    if 'tags' in contact and tag in contact['tags']:
-                        contact['tags'].remove(tag)
-                        contact['updated_at'] = datetime.now().isoformat()
-                        self.save_contacts()
-                        Logger.info(f"为联系人 '{contact_name}' 移除标签 '{tag}'")
-                        return True
-                    else:
-                        Logger.warning(f"联系人 '{contact_name}' 没有标签 '{tag}'")
-                        return False
-            
-            Logger.warning(f"未找到联系人 '{contact_name}'")
-            return False
+            with self._lock:
+                contact = self._by_name.get(contact_name)
+                if contact is None:
+                    Logger.warning(f"未找到联系人 '{contact_name}'")
+                    return False
+                
+                op = {'op': 'untag', 'name': contact_name, 'tag': tag, 'at': datetime.now().isoformat()}
+                if self._apply_op(op):
+                    self._record(op)
+                    Logger.info(f"为联系人 '{contact_name}' 移除标签 '{tag}'")
+                    return True
+                else:
+                    Logger.warning(f"联系人 '{contact_name}' 没有标签 '{tag}'")
+                    return False
             
         except Exception as e:
             Logger.error(f"移除标签失败: {str(e)}")
             return False
     
+    def _apply_add_tag(self, contact: Dict, tag: str, at: Optional[str] = None) -> bool:
+        """
+        _apply_add_tag 功能说明:
+        在内存中为联系人添加标签并更新索引，不写入文件
+        输入: contact (Dict) 联系人, tag (str) 标签名, at (str, 可选) 修改时间 | 输出: bool 是否发生修改
+        """
+        if 'tags' not in contact:
+            contact['tags'] = []
+        if tag in contact['tags']:
+            return False
+        
+        contact['tags'].append(tag)
+        contact['updated_at'] = at or datetime.now().isoformat()
+        self._index_tag(contact['name'], tag)
+        return True
+    
+    def _apply_remove_tag(self, contact: Dict, tag: str, at: Optional[str] = None) -> bool:
+        """
+        _apply_remove_tag 功能说明:
+        在内存中移除联系人标签并更新索引，不写入文件
+        输入: contact (Dict) 联系人, tag (str) 标签名, at (str, 可选) 修改时间 | 输出: bool 是否发生修改
+        """
+        if 'tags' not in contact or tag not in contact['tags']:
+            return False
+        
+        contact['tags'].remove(tag)
+        contact['updated_at'] = at or datetime.now().isoformat()
+        # 标签列表中可能存在重复标签，只有完全移除后才更新索引
+        if tag not in contact['tags']:
+            self._unindex_tag(contact['name'], tag)
+        return True
+    
+    def add_tags(self, contact_names: Iterable[str], tag: str) -> Dict[str, int]:
+        """
+        add_tags 功能说明:
+        为多个联系人批量添加同一个标签，只写入一次文件
+        输入: contact_names (Iterable[str]) 联系人姓名列表, tag (str) 标签名 | 输出: Dict[str, int] 新增/已有/未找到的数量
+        """
+        result = {'added': 0, 'existing': 0, 'missing': 0}
+        try:
+            with self.batch():
+                now = datetime.now().isoformat()
+                for name in contact_names:
+                    if name not in self._by_name:
+                        result['missing'] += 1
+                        continue
+                    op = {'op': 'tag', 'name': name, 'tag': tag, 'at': now}
+                    if self._apply_op(op):
+                        self._record(op)
+                        result['added'] += 1
+                    else:
+                        result['existing'] += 1
+            
+            Logger.info(f"批量添加标签 '{tag}' - 新增: {result['added']}, 已有: {result['existing']}, 未找到: {result['missing']}")
+        except Exception as e:
+            Logger.error(f"批量添加标签失败: {str(e)}")
+        return result
+    
+    def remove_tags(self, contact_names: Iterable[str], tag: str) -> Dict[str, int]:
+        """
+        remove_tags 功能说明:
+        为多个联系人批量移除同一个标签，只写入一次文件
+        输入: contact_names (Iterable[str]) 联系人姓名列表, tag (str) 标签名 | 输出: Dict[str, int] 移除/无此标签/未找到的数量
+        """
+        result = {'removed': 0, 'absent': 0, 'missing': 0}
+        try:
+            with self.batch():
+                now = datetime.now().isoformat()
+                for name in contact_names:
+                    if name not in self._by_name:
+                        result['missing'] += 1
+                        continue
+                    op = {'op': 'untag', 'name': name, 'tag': tag, 'at': now}
+                    if self._apply_op(op):
+                        self._record(op)
+                        result['removed'] += 1
+                    else:
+                        result['absent'] += 1
+            
+            Logger.info(f"批量移除标签 '{tag}' - 移除: {result['removed']}, 无此标签: {result['absent']}, 未找到: {result['missing']}")
+        except Exception as e:
+            Logger.error(f"批量移除标签失败: {str(e)}")
+        return result
+    
     def get_contacts_by_tag(self, tag: str) -> List[Dict]:
         """
         get_contacts_by_tag 功能说明:
@@ -209,10 +768,11 @@ class ContactManager:
         输入: tag (str) 标签名 | 输出: List[Dict] 联系人列表
         """
         try:
-            result = []
-            for contact in self.contacts:
-                if 'tags' in contact and tag in contact['tags']:
-                    result.append(contact)
+            if self._on_demand:
+                result = self.store.contacts_by_tag(tag)
+            else:
+                names = self._tag_index.get(tag, ())
+                result = [self._by_name[name] for name in self._sort_names(names)]
             
             Logger.info(f"标签 '{tag}' 匹配到 {len(result)} 个联系人")
             return result
@@ -221,6 +781,30 @@ class ContactManager:
             Logger.error(f"根据标签获取联系人失败: {str(e)}")
             return []
     
+    def query_contacts(self, expression: str) -> List[Dict]:
+        """
+        query_contacts 功能说明:
+        根据标签布尔表达式（如 "VIP AND 上海 AND NOT 已退订"）获取联系人，
+        结果去重并保持联系人原有顺序；整个表达式恰好是已存在的标签时按字面匹配；
+        表达式语法错误时抛出 TagQueryError
+        输入: expression (str) 标签表达式 | 输出: List[Dict] 联系人列表
+        """
+        query = TagQuery(expression, known_tags=self._tag_index)
+        if query.is_simple():
+            return self.get_contacts_by_tag(query.tree[1])
+        
+        names = query.evaluate(
+            lambda tag: self._tag_index.get(tag, set()),
+            lambda: set(self._by_name)
+        )
+        if self._on_demand:
+            result = self.store.get_contacts(names)
+        else:
+            result = [self._by_name[name] for name in self._sort_names(names)]
+        
+        Logger.info(f"标签表达式 '{expression}' 匹配到 {len(result)} 个联系人")
+        return result
+    
     def list_contacts(self) -> List[Dict]:
         """
         list_contacts 功能说明:
@@ -235,33 +819,87 @@ class ContactManager:
         获取所有使用过的标签
         输入: 无 | 输出: Set[str] 标签集合
         """
-        tags = set()
-        for contact in self.contacts:
-            if 'tags' in contact:
-                tags.update(contact['tags'])
-        return tags
+        return set(self._tag_index)
+    
+    def get_contact(self, name: str) -> Optional[Dict]:
+        """
+        get_contact 功能说明:
+        根据姓名获取联系人
+        输入: name (str) 联系人姓名 | 输出: Optional[Dict] 联系人，不存在时返回None
+        """
+        return self._by_name.get(name)
+    
+    def update_contact(self, name: str, **fields) -> bool:
+        """
+        update_contact 功能说明:
+        更新联系人字段（如 last_contact、type），自动刷新 updated_at；姓名不可修改
+        输入: name (str) 联系人姓名, fields 要更新的字段 | 输出: bool 更新是否成功
+        """
+        try:
+            if 'name' in fields:
+                raise ValueError("联系人姓名不可修改")
+            with self._lock:
+                if name not in self._by_name:
+                    Logger.warning(f"未找到联系人 '{name}'")
+                    return False
+                fields.setdefault('updated_at', datetime.now().isoformat())
+                op = {'op': 'set', 'name': name, 'fields': fields}
+                self._apply_op(op)
+                self._record(op)
+            return True
+        except Exception as e:
+            Logger.error(f"更新联系人失败: {str(e)}")
+            return False
+    
+    def has_tag(self, name: str, tag: str) -> bool:
+        """
+        has_tag 功能说明:
+        判断联系人是否带有指定标签
+        输入: name (str) 联系人姓名, tag (str) 标签名 | 输出: bool 是否带有该标签
+        """
+        if self._on_demand:
+            return self.store.has_tag(name, tag)
+        return name in self._tag_index.get(tag, ())
+    
+    def _index_tag(self, name: str, tag: str) -> None:
+        """
+        _index_tag 功能说明:
+        将联系人加入标签倒排索引；按需查询的后端由 store.record 维护数据库中的标签索引，
+        列式模式由 ContactTable.upsert 更新标签编码，都不需要处理
+        输入: name (str) 联系人姓名, tag (str) 标签名 | 输出: 无
+        """
+        if self._on_demand or self._columnar:
+            return
+        self._tag_index.setdefault(tag, set()).add(name)
+    
+    def _unindex_tag(self, name: str, tag: str) -> None:
+        """
+        _unindex_tag 功能说明:
+        从标签倒排索引中移除联系人，标签不再被使用时一并删除；按需查询的后端和列式模式不需要处理
+        输入: name (str) 联系人姓名, tag (str) 标签名 | 输出: 无
+        """
+        if self._on_demand or self._columnar:
+            return
+        names = self._tag_index.get(tag)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del self._tag_index[tag]
     
     def backup_data(self) -> bool:
         """
         backup_data 功能说明:
-        备份当前联系人数据
-        输入: 无 | 输出: bool 备份是否成功
+        提交联系人数据文件的后台备份任务。备份按内容哈希去重，
+        并按 contacts.backup 配置的保留策略清理旧备份；auto_backup 关闭时不备份
+        输入: 无 | 输出: bool 提交是否成功
         """
         try:
-            if not self.data_file.exists():
+            if not self.auto_backup or not self.data_file.exists():
                 return True
             
-            backup_dir = self.data_file.parent / 'backups'
-            backup_dir.mkdir(exist_ok=True)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_file = backup_dir / f"contacts_backup_{timestamp}.json"
-            
-            # 复制当前文件到备份目录
-            import shutil
-            shutil.copy2(self.data_file, backup_file)
-            
-            Logger.info(f"联系人数据已备份到: {backup_file}")
+            # 数据文件通过原子替换写入，后台备份不加锁读取，不会阻塞修改联系人的线程
+            self.backups.submit(self.data_file)
             return True
             
         except Exception as e:
@@ -283,24 +921,25 @@ class ContactManager:
         输入: name(联系人姓名), contact_type(联系人类型), tags(标签列表) | 输出: bool 添加是否成功
         """
         try:
-            # 检查联系人是否已存在
-            for contact in self.contacts:
-                if contact['name'] == name:
+            with self._lock:
+                # 检查联系人是否已存在
+                if name in self._by_name:
                     Logger.warning(f"联系人 {name} 已存在")
                     return False
-            
-            # 创建新联系人
-            new_contact = {
-                'name': name,
-                'type': contact_type,
-                'tags': tags or [],
-                'last_contact': None,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            self.contacts.append(new_contact)
-            self.save_contacts()
+                
+                # 创建新联系人
+                new_contact = {
+                    'name': name,
+                    'type': contact_type,
+                    'tags': tags or [],
+                    'last_contact': None,
+                    'created_at': datetime.now().isoformat(),
+                    'updated_at': datetime.now().isoformat()
+                }
+                
+                op = {'op': 'add', 'contact': new_contact}
+                self._apply_op(op)
+                self._record(op)
             
             Logger.info(f"成功添加联系人: {name}")
             return True
@@ -309,32 +948,218 @@ class ContactManager:
             Logger.error(f"添加联系人失败: {str(e)}")
             return False
     
-    def search_contacts(self, keyword: str) -> List[Dict]:
+    def import_contacts(self, path: str, default_type: str = 'friend', extra_tags: Optional[List[str]] = None,
+                        chunksize: int = 10000) -> Dict:
         """
-        search_contacts 功能说明:
-        根据关键词搜索联系人
-        输入: keyword (str) 搜索关键词 | 输出: List[Dict] 匹配的联系人列表
+        import_contacts 功能说明:
+        从CSV/XLSX/JSONL文件批量导入联系人。文件分块读取并用pandas向量化规范化和去重，
+        全部修改在一个批量事务中完成，只写入一次。已存在的联系人只合并新标签，
+        不覆盖类型等已有字段；空姓名、重复行和没有新标签的已有联系人计入跳过
+        输入: path (str) 文件路径, default_type (str) 新联系人默认类型, extra_tags (List[str], 可选) 追加给所有联系人的标签,
+              chunksize (int) 每块行数 | 输出: Dict 导入结果统计（inserted/updated/skipped）
         """
+        from .contact_importer import read_contact_chunks, normalize_contact_chunk
+        
+        result = {'success': True, 'inserted': 0, 'updated': 0, 'skipped': 0, 'duration': 0.0}
+        started = datetime.now()
+        extra_tags = extra_tags or []
+        
         try:
-            result = []
-            keyword_lower = keyword.lower()
+            Logger.info(f"开始导入联系人: {path}")
+            with self.batch():
+                for chunk in read_contact_chunks(path, chunksize):
+                    records, skipped = normalize_contact_chunk(chunk)
+                    result['skipped'] += skipped
+                    now = datetime.now().isoformat()
+                    
+                    for record in records:
+                        tags = list(dict.fromkeys(record.pop('tags') + extra_tags))
+                        name = record['name']
+                        
+                        if name not in self._by_name:
+                            contact = {
+                                'name': name,
+                                'type': record.pop('type', None) or default_type,
+                                'tags': tags,
+                                'last_contact': None,
+                                'created_at': now,
+                                'updated_at': now
+                            }
+                            for field, value in record.items():
+                                contact.setdefault(field, value)
+                            op = {'op': 'add', 'contact': contact}
+                            self._apply_op(op)
+                            self._record(op)
+                            result['inserted'] += 1
+                            continue
+                        
+                        changed = False
+                        for tag in tags:
+                            op = {'op': 'tag', 'name': name, 'tag': tag, 'at': now}
+                            if self._apply_op(op):
+                                self._record(op)
+                                changed = True
+                        if changed:
+                            result['updated'] += 1
+                        else:
+                            result['skipped'] += 1
             
-            for contact in self.contacts:
-                # 搜索姓名
-                if keyword_lower in contact['name'].lower():
-                    result.append(contact)
-                    continue
+            result['duration'] = (datetime.now() - started).total_seconds()
+            Logger.info(f"联系人导入完成 - 新增: {result['inserted']}, 更新: {result['updated']}, "
+                        f"跳过: {result['skipped']}, 耗时: {result['duration']:.1f}秒")
+            return result
+            
+        except Exception as e:
+            Logger.error(f"导入联系人失败: {str(e)}")
+            result['success'] = False
+            result['error'] = str(e)
+            return result
+    
+    def upsert_contacts(self, records: Iterable[Dict], key: str = 'wxid', default_type: str = 'friend') -> Dict:
+        """
+        upsert_contacts 功能说明:
+        按稳定标识批量新增或更新联系人，全部修改在一个批量事务中完成，只写入一次。
+        先按 key 字段匹配已有联系人，没有标识时按姓名匹配；已有联系人保留原有标签并合并新标签，
+        其他字段有变化时才更新，姓名保持不变。姓名已被另一个标识的联系人占用时跳过
+        输入: records (Iterable[Dict]) 联系人记录（必须有 name，可带 tags 和其他字段）,
+              key (str) 稳定标识字段名, default_type (str) 新联系人默认类型
+        输出: Dict 结果统计（inserted/updated/unchanged/skipped）
+        """
+        result = {'success': True, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        
+        try:
+            with self.batch():
+                # 一次遍历建立 标识 -> 姓名 的映射，之后每条记录都是O(1)查找
+                by_key = {contact[key]: name for name, contact in self._by_name.items() if contact.get(key)}
+                now = datetime.now().isoformat()
                 
-                # 搜索标签
-                if 'tags' in contact:
-                    for tag in contact['tags']:
-                        if keyword_lower in tag.lower():
-                            result.append(contact)
-                            break
+                for record in records:
+                    record = dict(record)
+                    name = record.pop('name', None)
+                    tags = record.pop('tags', None) or []
+                    key_value = record.get(key)
+                    if not name:
+                        result['skipped'] += 1
+                        continue
+                    
+                    existing = by_key.get(key_value) if key_value else None
+                    if existing is None and name in self._by_name:
+                        other_key = self._by_name[name].get(key)
+                        if key_value and other_key and other_key != key_value:
+                            Logger.warning(f"联系人 {name} 已被标识 {other_key} 占用，跳过 {key_value}")
+                            result['skipped'] += 1
+                            continue
+                        existing = name
+                    
+                    if existing is None:
+                        contact = {
+                            'name': name,
+                            'type': record.pop('type', None) or default_type,
+                            'tags': list(dict.fromkeys(tags)),
+                            'last_contact': None,
+                            'created_at': now,
+                            'updated_at': now
+                        }
+                        contact.update(record)
+                        op = {'op': 'add', 'contact': contact}
+                        self._apply_op(op)
+                        self._record(op)
+                        if key_value:
+                            by_key[key_value] = name
+                        result['inserted'] += 1
+                        continue
+                    
+                    contact = self._by_name[existing]
+                    fields = {field: value for field, value in record.items() if contact.get(field) != value}
+                    old_tags = contact.get('tags') or []
+                    new_tags = [tag for tag in dict.fromkeys(tags) if tag not in old_tags]
+                    if new_tags:
+                        fields['tags'] = old_tags + new_tags
+                    if not fields:
+                        result['unchanged'] += 1
+                        continue
+                    
+                    fields['updated_at'] = now
+                    op = {'op': 'set', 'name': existing, 'fields': fields}
+                    self._apply_op(op)
+                    self._record(op)
+                    if key_value:
+                        by_key[key_value] = existing
+                    result['updated'] += 1
+            
+            Logger.info(f"批量合并联系人完成 - 新增: {result['inserted']}, 更新: {result['updated']}, "
+                        f"未变化: {result['unchanged']}, 跳过: {result['skipped']}")
+            return result
+            
+        except Exception as e:
+            Logger.error(f"批量合并联系人失败: {str(e)}")
+            result['success'] = False
+            result['error'] = str(e)
+            return result
+    
+    def search_contacts(self, keyword: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        search_contacts 功能说明:
+        根据关键词搜索联系人，匹配姓名、标签以及姓名拼音（全拼或首字母，需要安装pypinyin），
+        结果按相关度排序：姓名完全匹配 > 姓名前缀 > 姓名包含 > 拼音 > 标签
+        输入: keyword (str) 搜索关键词, limit (int, 可选) 最多返回数量 | 输出: List[Dict] 匹配的联系人列表
+        """
+        try:
+            with self._lock:
+                if self._search_index is None:
+                    self._search_index = ContactSearchIndex()
+                    self._search_index.build(self._by_name.values())
+                names = self._search_index.search(keyword, limit)
+                result = [self._by_name[name] for name in names]
             
             Logger.info(f"关键词 '{keyword}' 搜索到 {len(result)} 个联系人")
             return result
             
         except Exception as e:
             Logger.error(f"搜索联系人失败: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def get_table(self) -> ContactTable:
+        """
+        get_table 功能说明:
+        获取列式联系人表（标签和类型编码为整数、时间为整数微秒），
+        首次使用时构建，之后随联系人修改增量更新；列式模式下加载时构建，是唯一的联系人数据
+        输入: 无 | 输出: ContactTable 列式联系人表
+        """
+        with self._lock:
+            if self._table is None:
+                self._table = ContactTable.from_contacts(self._by_name.values())
+            return self._table
+    
+    def filter_contacts(self, tags: Optional[Iterable[str]] = None, any_tags: Optional[Iterable[str]] = None,
+                        exclude_tags: Optional[Iterable[str]] = None, types: Optional[Iterable[str]] = None,
+                        since=None, until=None, date_field: str = 'updated_at') -> List[Dict]:
+        """
+        filter_contacts 功能说明:
+        在列式联系人表上向量化筛选联系人，各条件之间为 AND 关系，结果保持原有顺序
+        输入: tags (可选) 必须全部带有的标签, any_tags (可选) 至少带有一个的标签,
+              exclude_tags (可选) 不能带有的标签, types (可选) 联系人类型,
+              since/until (datetime/str, 可选) 时间范围 [since, until),
+              date_field (str) 时间字段 created_at/updated_at/last_contact | 输出: List[Dict] 联系人列表
+        """
+        try:
+            if self._on_demand:
+                # SQLite后端直接用SQL筛选，不需要把全部联系人读入列式表
+                with self._lock:
+                    result = self.store.filter_contacts(tags=tags, any_tags=any_tags, exclude_tags=exclude_tags,
+                                                        types=types, since=since, until=until, date_field=date_field)
+                Logger.info(f"筛选到 {len(result)} 个联系人")
+                return result
+            
+            with self._lock:
+                table = self.get_table()
+                rows = table.filter(tags=tags, any_tags=any_tags, exclude_tags=exclude_tags, types=types,
+                                    since=since, until=until, date_field=date_field)
+                result = [self._by_name[name] for name in table.names[rows]]
+            
+            Logger.info(f"筛选到 {len(result)} 个联系人")
+            return result
+            
+        except Exception as e:
+            Logger.error(f"筛选联系人失败: {str(e)}")
+            return []
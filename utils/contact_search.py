@@ -0,0 +1,218 @@
+##########contact_search.py: [联系人搜索索引模块] ##################
+# 变更记录: [2026-10-17 13:50] @李祥光 [初始创建，n-gram子串索引、拼音全拼/首字母匹配和结果排序]########
+# 输入: 联系人数据和搜索关键词 | 输出: 排序后的匹配联系人姓名###############
+
+import heapq
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+from .logger import Logger
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 拼音匹配为可选功能，未安装 pypinyin 时只做子串匹配
+    lazy_pinyin = None
+
+###########################文件下的所有函数###########################
+"""
+ContactSearchIndex.__init__：初始化搜索索引
+ContactSearchIndex.build：根据联系人列表构建索引
+ContactSearchIndex.update：增量更新单个联系人
+ContactSearchIndex.remove：从索引中移除联系人
+ContactSearchIndex.search：搜索并按相关度排序
+ContactSearchIndex._keys_for：生成联系人的可搜索字段
+ContactSearchIndex._grams：生成字符串的1-gram和2-gram
+ContactSearchIndex._candidates：通过n-gram倒排索引求候选集合
+ContactSearchIndex._score：计算联系人与关键词的相关度
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactManager.search_contacts] --> B{索引已构建?}
+    B -->|否| C[build]
+    C --> D[_keys_for 姓名/标签/拼音全拼/拼音首字母]
+    D --> E[_grams 写入倒排索引]
+    B -->|是| F[search]
+    C --> F
+    F --> G[_candidates 求n-gram交集]
+    G --> H[_score 校验子串并打分]
+    H --> I[按分数和原始顺序排序]
+    J[ContactManager修改联系人] --> K[update 增量更新]
+    K --> D
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# 各类匹配的得分，分数越高越靠前
+_SCORES = {
+    ('name', 'exact'): 100, ('name', 'prefix'): 90, ('name', 'substring'): 80,
+    ('initials', 'exact'): 75, ('initials', 'prefix'): 70,
+    ('pinyin', 'exact'): 68, ('pinyin', 'prefix'): 65, ('pinyin', 'substring'): 55,
+    ('initials', 'substring'): 50,
+    ('tag', 'exact'): 45, ('tag', 'prefix'): 42, ('tag', 'substring'): 40,
+}
+
+class ContactSearchIndex:
+    """
+    ContactSearchIndex 功能说明:
+    联系人搜索索引。对姓名、标签以及姓名的拼音全拼和首字母建立 1-gram/2-gram 倒排索引，
+    搜索时先用 n-gram 交集缩小候选范围再校验子串，结果按匹配类型打分排序
+    （例如输入 zs 可以匹配 张三）。拼音匹配依赖可选的 pypinyin 包
+    输入: 无 | 输出: 搜索索引对象
+    """
+
+    def __init__(self):
+        """
+        __init__ 功能说明:
+        初始化空索引
+        输入: 无 | 输出: 无
+        """
+        self._postings: Dict[str, Set[str]] = {}
+        self._keys: Dict[str, List[Tuple[str, str]]] = {}
+        self._order: Dict[str, int] = {}
+
+    def build(self, contacts: Iterable[Dict]) -> None:
+        """
+        build 功能说明:
+        根据联系人列表构建索引
+        输入: contacts (Iterable[Dict]) 联系人列表 | 输出: 无
+        """
+        self._postings = {}
+        self._keys = {}
+        self._order = {}
+        for contact in contacts:
+            if contact['name'] not in self._keys:
+                self.update(contact)
+
+        if lazy_pinyin is None:
+            Logger.info("未安装 pypinyin，联系人搜索不支持拼音匹配")
+        Logger.info(f"联系人搜索索引构建完成，共 {len(self._keys)} 个联系人")
+
+    def _keys_for(self, contact: Dict) -> List[Tuple[str, str]]:
+        """
+        _keys_for 功能说明:
+        生成联系人的可搜索字段：姓名、各标签，以及姓名的拼音全拼和首字母（均为小写）
+        输入: contact (Dict) 联系人 | 输出: List[Tuple[str, str]] (字段类型, 文本) 列表
+        """
+        name = contact['name']
+        keys = [('name', name.lower())]
+        if lazy_pinyin is not None:
+            syllables = [s.lower() for s in lazy_pinyin(name) if s.strip()]
+            full = ''.join(syllables).replace(' ', '')
+            if full and full != keys[0][1]:
+                keys.append(('pinyin', full))
+                keys.append(('initials', ''.join(s[0] for s in syllables)))
+        for tag in contact.get('tags') or []:
+            keys.append(('tag', str(tag).lower()))
+        return keys
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        """
+        _grams 功能说明:
+        生成字符串的所有 1-gram 和 2-gram
+        输入: text (str) 文本 | 输出: Set[str] n-gram集合
+        """
+        grams = set(text)
+        grams.update(text[i:i + 2] for i in range(len(text) - 1))
+        return grams
+
+    def update(self, contact: Dict) -> None:
+        """
+        update 功能说明:
+        增量更新单个联系人（新增联系人或标签变化时调用）
+        输入: contact (Dict) 联系人 | 输出: 无
+        """
+        name = contact['name']
+        if name in self._keys:
+            self.remove(name, keep_order=True)
+        else:
+            self._order[name] = len(self._order)
+
+        keys = self._keys_for(contact)
+        self._keys[name] = keys
+        for _, text in keys:
+            for gram in self._grams(text):
+                self._postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str, keep_order: bool = False) -> None:
+        """
+        remove 功能说明:
+        从索引中移除联系人
+        输入: name (str) 联系人姓名, keep_order (bool) 是否保留原始顺序号 | 输出: 无
+        """
+        keys = self._keys.pop(name, None)
+        if keys is None:
+            return
+        for _, text in keys:
+            for gram in self._grams(text):
+                names = self._postings.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self._postings[gram]
+        if not keep_order:
+            self._order.pop(name, None)
+
+    def _candidates(self, query: str) -> Set[str]:
+        """
+        _candidates 功能说明:
+        通过 n-gram 倒排索引求候选集合：关键词的所有 2-gram（单字时为 1-gram）的交集
+        输入: query (str) 小写关键词 | 输出: Set[str] 候选联系人姓名
+        """
+        if len(query) == 1:
+            return set(self._postings.get(query, ()))
+
+        postings = []
+        for i in range(len(query) - 1):
+            names = self._postings.get(query[i:i + 2])
+            if not names:
+                return set()
+            postings.append(names)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for names in postings[1:]:
+            result &= names
+            if not result:
+                break
+        return result
+
+    def _score(self, name: str, query: str) -> int:
+        """
+        _score 功能说明:
+        计算联系人与关键词的相关度，取所有字段中最好的匹配；不匹配时返回0
+        输入: name (str) 联系人姓名, query (str) 小写关键词 | 输出: int 相关度分数
+        """
+        best = 0
+        for kind, text in self._keys[name]:
+            if text == query:
+                match = 'exact'
+            elif text.startswith(query):
+                match = 'prefix'
+            elif query in text:
+                match = 'substring'
+            else:
+                continue
+            best = max(best, _SCORES.get((kind, match), 0))
+        return best
+
+    def search(self, keyword: str, limit: Optional[int] = None) -> List[str]:
+        """
+        search 功能说明:
+        搜索联系人，按相关度从高到低排序，相关度相同时保持联系人原有顺序
+        输入: keyword (str) 关键词, limit (int, 可选) 最多返回数量 | 输出: List[str] 联系人姓名列表
+        """
+        query = keyword.strip().lower()
+        if not query:
+            return []
+
+        scored = []
+        for name in self._candidates(query):
+            score = self._score(name, query)
+            if score:
+                scored.append((-score, self._order[name], name))
+
+        if limit is not None:
+            scored = heapq.nsmallest(limit, scored)
+        else:
+            scored.sort()
+        return [name for _, _, name in scored]
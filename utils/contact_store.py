@@ -0,0 +1,353 @@
+##########contact_store.py: [联系人数据存储后端模块] ##################
+# 变更记录: [2026-10-17 11:00] @李祥光 [初始创建，提供JSON快照和追加日志两种存储后端]########
+# 变更记录: [2026-10-17 11:45] @李祥光 [record传入修改后的联系人，新增sqlite存储类型]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [快照统一通过原子写入，避免崩溃后留下写了一半的文件]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [快照读写改用serializer，支持紧凑二进制格式和gzip/zstd压缩，加载时自动识别]########
+# 变更记录: [2026-10-18 12:30] @李祥光 [新增 on_demand 标记，按需查询的后端不整体加载联系人]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [新增generation数据文件版本，日志后端重新加载时丢弃未写入的缓冲]########
+# 输入: 联系人快照和修改操作 | 输出: 持久化的联系人数据###############
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+from .logger import Logger
+from .serializer import read_document, write_document
+from .atomic_file import file_generation
+
+###########################文件下的所有函数###########################
+"""
+ContactStore.exists：判断是否已有持久化数据
+ContactStore.load：加载快照和待重放的修改操作
+ContactStore.generation：获取数据文件版本，判断是否被其他进程修改
+ContactStore.record：记录一次修改操作
+ContactStore.needs_snapshot：判断提交时是否需要写入完整快照
+ContactStore.commit：提交已记录的修改操作
+ContactStore.save_snapshot：写入完整快照
+JsonContactStore：JSON快照存储（原有行为）
+JournalContactStore：快照 + 追加日志存储
+JournalContactStore._read_journal：读取日志并截断末尾不完整的行
+JournalContactStore.generation：快照和日志的版本
+create_contact_store：根据存储类型创建存储后端
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[create_contact_store] --> B{storage类型}
+    B -->|json| C[JsonContactStore]
+    B -->|journal| D[JournalContactStore]
+    B -->|sqlite| D2[SQLiteContactStore]
+    E[ContactManager修改联系人] --> F[record]
+    F --> G[commit]
+    G --> H{needs_snapshot?}
+    H -->|是| I[save_snapshot 写快照并清空日志]
+    H -->|否| J[追加日志行并fsync]
+    K[load] --> L[读取快照]
+    L --> M[_read_journal]
+    M --> N[ContactManager重放操作]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class ContactStore:
+    """
+    ContactStore 功能说明:
+    联系人存储后端基类。ContactManager 在内存中维护联系人和索引，
+    每次修改以 (操作名, 参数) 的形式交给存储后端持久化
+    输入: data_file (Path) 快照文件路径 | 输出: 存储后端对象
+    """
+
+    name = 'base'
+    # 为 True 时联系人不整体加载，ContactManager 通过 views() 返回的视图按需查询
+    on_demand = False
+
+    def __init__(self, data_file: Path, file_format: str = 'json', compression: str = 'none'):
+        """
+        __init__ 功能说明:
+        初始化存储后端
+        输入: data_file (Path) 快照文件路径, file_format (str) 快照写入格式 json/binary,
+              compression (str) 快照压缩方式 none/gzip/zstd | 输出: 无
+        """
+        self.data_file = Path(data_file)
+        self.file_format = file_format
+        self.compression = compression
+
+    def exists(self) -> bool:
+        """
+        exists 功能说明:
+        判断是否已有持久化数据
+        输入: 无 | 输出: bool 是否存在数据
+        """
+        return self.data_file.exists()
+
+    def load(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        load 功能说明:
+        加载联系人快照以及快照之后需要重放的修改操作
+        输入: 无 | 输出: Tuple[List[Dict], List[Dict]] (联系人列表, 操作列表)
+        """
+        raise NotImplementedError
+
+    def generation(self) -> tuple:
+        """
+        generation 功能说明:
+        获取数据文件的版本标识，ContactManager 写入前与加载时的值比较，判断是否有其他进程写过
+        输入: 无 | 输出: tuple 版本标识
+        """
+        return file_generation(self.data_file)
+
+    def record(self, op: Dict, contact: Optional[Dict] = None) -> None:
+        """
+        record 功能说明:
+        记录一次修改操作，在 commit 时持久化
+        输入: op (Dict) 操作，包含 op 字段和操作参数, contact (Dict, 可选) 操作生效后的联系人 | 输出: 无
+        """
+
+    def needs_snapshot(self) -> bool:
+        """
+        needs_snapshot 功能说明:
+        判断提交修改时是否需要写入完整快照
+        输入: 无 | 输出: bool 是否需要写快照
+        """
+        return True
+
+    def commit(self) -> bool:
+        """
+        commit 功能说明:
+        持久化已记录的修改操作
+        输入: 无 | 输出: bool 是否成功
+        """
+        return True
+
+    def save_snapshot(self, contacts: List[Dict]) -> bool:
+        """
+        save_snapshot 功能说明:
+        写入完整的联系人快照
+        输入: contacts (List[Dict]) 联系人列表 | 输出: bool 是否成功
+        """
+        raise NotImplementedError
+
+    def _read_snapshot(self) -> Dict:
+        """
+        _read_snapshot 功能说明:
+        读取快照文件，自动识别JSON/二进制格式和压缩方式
+        输入: 无 | 输出: Dict 快照内容，文件不存在时返回空字典
+        """
+        if not self.data_file.exists():
+            return {}
+        return read_document(self.data_file)
+
+    def _write_snapshot(self, contacts: List[Dict], extra: Optional[Dict] = None,
+                        target: Optional[Path] = None) -> None:
+        """
+        _write_snapshot 功能说明:
+        按配置的格式原子写入快照文件，json 格式与原有 contacts.json 保持一致
+        输入: contacts (List[Dict]) 联系人列表, extra (Dict, 可选) 额外字段, target (Path, 可选) 写入路径 | 输出: 无
+        """
+        target = Path(target or self.data_file)
+        data = {
+            'contacts': contacts,
+            'last_updated': datetime.now().isoformat(),
+            'version': '1.0.0'
+        }
+        if extra:
+            data.update(extra)
+        write_document(target, data, 'contacts', self.file_format, self.compression)
+
+class JsonContactStore(ContactStore):
+    """
+    JsonContactStore 功能说明:
+    JSON快照存储，每次提交都重写完整的 contacts.json（原有行为）
+    输入: data_file (Path) 快照文件路径 | 输出: 存储后端对象
+    """
+
+    name = 'json'
+
+    def load(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        load 功能说明:
+        读取 contacts.json 快照，没有需要重放的操作
+        输入: 无 | 输出: Tuple[List[Dict], List[Dict]] (联系人列表, 空操作列表)
+        """
+        return self._read_snapshot().get('contacts', []), []
+
+    def save_snapshot(self, contacts: List[Dict]) -> bool:
+        """
+        save_snapshot 功能说明:
+        重写完整的 contacts.json
+        输入: contacts (List[Dict]) 联系人列表 | 输出: bool 是否成功
+        """
+        self._write_snapshot(contacts)
+        return True
+
+class JournalContactStore(ContactStore):
+    """
+    JournalContactStore 功能说明:
+    快照 + 追加日志存储。每次修改追加一行JSON到日志文件，写入成本与联系人总数无关；
+    日志行数超过阈值时写入新快照并清空日志。加载时读取快照后按序号重放日志，
+    进程崩溃最多丢失最后一行未写完整的日志
+    输入: data_file (Path) 快照文件路径, compact_threshold (int) 触发压缩的日志行数 | 输出: 存储后端对象
+    """
+
+    name = 'journal'
+
+    def __init__(self, data_file: Path, compact_threshold: int = 10000, **options):
+        """
+        __init__ 功能说明:
+        初始化日志存储，日志文件与快照位于同一目录，例如 contacts.journal
+        输入: data_file (Path) 快照文件路径, compact_threshold (int) 触发压缩的日志行数,
+              options 快照格式参数 file_format/compression | 输出: 无
+        """
+        super().__init__(data_file, **options)
+        self.journal_file = self.data_file.with_suffix('.journal')
+        self.compact_threshold = max(1, int(compact_threshold))
+        self._pending: List[str] = []
+        self._journal_lines = 0
+        self._seq = 0
+
+    def exists(self) -> bool:
+        """
+        exists 功能说明:
+        快照或日志任一存在即视为已有数据
+        输入: 无 | 输出: bool 是否存在数据
+        """
+        return self.data_file.exists() or self.journal_file.exists()
+
+    def generation(self) -> tuple:
+        """
+        generation 功能说明:
+        快照和日志的版本标识，其他进程追加日志或压缩为快照都会改变
+        输入: 无 | 输出: tuple 版本标识
+        """
+        return file_generation(self.data_file, self.journal_file)
+
+    def load(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        load 功能说明:
+        读取快照，并返回日志中序号大于快照序号的操作供重放
+        输入: 无 | 输出: Tuple[List[Dict], List[Dict]] (联系人列表, 操作列表)
+        """
+        snapshot = self._read_snapshot()
+        contacts = snapshot.get('contacts', [])
+        snapshot_seq = snapshot.get('journal_seq', 0)
+        self._seq = snapshot_seq
+        # 重新加载时丢弃尚未写入的缓冲，调用方重放后按新的序号重新记录
+        self._pending = []
+
+        ops = []
+        self._journal_lines = 0
+        for op in self._read_journal():
+            self._journal_lines += 1
+            seq = op.get('seq', 0)
+            # 快照写入后、清空日志前崩溃时，日志中会残留已包含在快照中的操作
+            if seq <= snapshot_seq:
+                continue
+            ops.append(op)
+            self._seq = max(self._seq, seq)
+
+        if ops:
+            Logger.info(f"从日志 {self.journal_file} 重放 {len(ops)} 条联系人修改")
+        return contacts, ops
+
+    def _read_journal(self) -> List[Dict]:
+        """
+        _read_journal 功能说明:
+        逐行读取日志。末尾未写完整的行（崩溃导致）会被截断丢弃，中间损坏的行记录错误后跳过
+        输入: 无 | 输出: List[Dict] 操作列表
+        """
+        if not self.journal_file.exists():
+            return []
+
+        ops = []
+        valid_end = 0
+        truncated = False
+        with open(self.journal_file, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    truncated = True
+                    break
+                try:
+                    ops.append(json.loads(raw.decode('utf-8')))
+                except ValueError:
+                    Logger.error(f"联系人日志存在损坏的行，已跳过: {raw[:80]!r}")
+                valid_end += len(raw)
+
+        if truncated:
+            Logger.warning(f"联系人日志末尾存在不完整的记录，已截断: {self.journal_file}")
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_end)
+        return ops
+
+    def record(self, op: Dict, contact: Optional[Dict] = None) -> None:
+        """
+        record 功能说明:
+        为操作分配递增序号并放入待写入缓冲区
+        输入: op (Dict) 操作, contact (Dict, 可选) 未使用 | 输出: 无
+        """
+        self._seq += 1
+        line = dict(op, seq=self._seq)
+        self._pending.append(json.dumps(line, ensure_ascii=False, separators=(',', ':')))
+
+    def needs_snapshot(self) -> bool:
+        """
+        needs_snapshot 功能说明:
+        日志行数达到压缩阈值时需要写入快照
+        输入: 无 | 输出: bool 是否需要写快照
+        """
+        return self._journal_lines + len(self._pending) >= self.compact_threshold
+
+    def commit(self) -> bool:
+        """
+        commit 功能说明:
+        将缓冲区中的操作一次性追加到日志并fsync，批量事务只产生一次磁盘同步
+        输入: 无 | 输出: bool 是否成功
+        """
+        if not self._pending:
+            return True
+
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        payload = ('\n'.join(self._pending) + '\n').encode('utf-8')
+        with open(self.journal_file, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._journal_lines += len(self._pending)
+        self._pending = []
+        return True
+
+    def save_snapshot(self, contacts: List[Dict]) -> bool:
+        """
+        save_snapshot 功能说明:
+        写入包含当前日志序号的新快照，然后清空日志
+        输入: contacts (List[Dict]) 联系人列表 | 输出: bool 是否成功
+        """
+        # 快照原子写入完成后才清空日志
+        self._write_snapshot(contacts, {'journal_seq': self._seq})
+
+        with open(self.journal_file, 'wb') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+        self._journal_lines = 0
+        Logger.info(f"联系人日志已压缩为快照: {self.data_file}")
+        return True
+
+def create_contact_store(storage: str, data_file: Path, **options) -> ContactStore:
+    """
+    create_contact_store 功能说明:
+    根据存储类型创建联系人存储后端
+    输入: storage (str) 存储类型 json/journal/sqlite, data_file (Path) 快照文件路径, options 后端参数 | 输出: ContactStore 存储后端
+    """
+    if storage == 'journal':
+        return JournalContactStore(data_file, **options)
+    if storage == 'json':
+        return JsonContactStore(data_file, **options)
+    if storage == 'sqlite':
+        from .sqlite_store import SQLiteContactStore
+        options.pop('file_format', None)
+        options.pop('compression', None)
+        return SQLiteContactStore(data_file, **options)
+    raise ValueError(f"不支持的联系人存储类型: {storage}")
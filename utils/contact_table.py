@@ -0,0 +1,602 @@
+##########contact_table.py: [联系人列式存储模块] ##################
+# 变更记录: [2026-10-17 15:10] @李祥光 [初始创建，列式数组、标签编码、整数时间戳和向量化筛选]########
+# 变更记录: [2026-10-18 11:50] @李祥光 [支持增量更新：已有行原地更新，标签变化和新增行在下次读取时批量合并]########
+# 变更记录: [2026-10-18 18:00] @李祥光 [新增只读视图，列式表可作为ContactManager唯一的联系人数据，字典按需生成]########
+# 输入: 联系人字典列表 | 输出: 紧凑的列式联系人表和筛选结果###############
+
+import re
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence as SequenceABC
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+###########################文件下的所有函数###########################
+"""
+ContactTable.from_contacts：由联系人字典列表构建列式表
+ContactTable.upsert：增量更新或追加单个联系人
+ContactTable._extend：在表尾批量追加联系人
+ContactTable._merge_tags：将暂存的标签修改合并回CSR标签数组
+ContactTable._sync：读取前合并暂存的修改
+ContactTable.row：获取单行视图
+ContactTable.row_of：按姓名获取行号
+ContactTable.views：创建只读的联系人列表、姓名索引和标签索引视图
+ContactTable.to_dict：将单行还原为联系人字典
+ContactTable.to_contacts：还原为联系人字典列表
+ContactTable.tag_mask：计算带有指定标签的行掩码
+ContactTable.filter：按标签、类型、时间范围向量化筛选
+ContactTable.tag_counts：统计每个标签的联系人数
+ContactTable.memory_usage：估算数组占用的内存
+ContactRow：带 __slots__ 的单行只读视图
+TableContactList：只读联系人列表视图，遍历时逐个生成字典
+TableContactMap：只读姓名 -> 联系人视图，带最近使用缓存
+TableContactMap.cache：把联系人字典放入最近使用缓存
+TableTagMap：只读标签 -> 联系人姓名视图
+_parse_times：将ISO时间字符串批量转换为整数微秒
+_parse_rows：批量解析时间字符串，失败时二分定位非法值
+_format_time：将整数微秒还原为ISO时间字符串
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactManager.get_table] --> B[from_contacts]
+    B --> C[姓名数组/类型编码/标签CSR编码]
+    B --> D[_parse_times 时间转整数微秒]
+    B --> EX[_extend 批量追加行]
+    U[ContactManager._update_search_index] --> UP[upsert]
+    UP -->|已有行| UR[原地更新类型/时间/稀疏字段，标签暂存]
+    UP -->|新联系人| UA[暂存为待追加行]
+    F --> SY[_sync 读取前合并]
+    SY --> MT[_merge_tags 重排CSR标签数组]
+    SY --> EX
+    E[ContactManager.filter_contacts] --> F[filter]
+    F --> G[tag_mask 标签掩码]
+    F --> H[类型掩码 np.isin]
+    F --> I[时间范围掩码]
+    G --> J[行号数组]
+    H --> J
+    I --> J
+    J --> K[row / to_dict 兼容字典输出]
+    K --> L[_format_time]
+    V[ContactManager contacts.columnar] --> VW[views 只读视图]
+    VW --> VL[TableContactList]
+    VW --> VM[TableContactMap 按需 to_dict]
+    VW --> VT[TableTagMap tag_mask]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# 时间列中的特殊值：字段不存在 / 字段值为None
+TIME_MISSING = np.iinfo(np.int64).min
+TIME_NONE = TIME_MISSING + 1
+TIME_FIELDS = ('created_at', 'updated_at', 'last_contact')
+_EPOCH = datetime(1970, 1, 1)
+_ABSENT = object()
+_COLUMN_FIELDS = frozenset(('name', 'type', 'tags') + TIME_FIELDS)
+# 只有 datetime.isoformat() 产生的不带时区格式才转为整数，保证还原后字符串完全一致
+_ISO_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.(?!000000)\d{6})?$')
+
+def _parse_times(values: List[Any], extras: Dict[int, Any]) -> np.ndarray:
+    """
+    _parse_times 功能说明:
+    将ISO时间字符串批量转换为自1970年起的整数微秒（按本地时间，不做时区换算）。
+    其他格式的值（例如带时区的字符串或非字符串）原样放入 extras，保证还原为字典时不丢失
+    输入: values (List[Any]) 时间值列表（字符串、None 或字段缺失标记 _ABSENT）,
+          extras (Dict[int, Any]) 用于保存无法解析的原始值 | 输出: np.ndarray int64 微秒数组
+    """
+    result = np.full(len(values), TIME_MISSING, dtype=np.int64)
+    rows = []
+    for i, value in enumerate(values):
+        if isinstance(value, str) and _ISO_PATTERN.match(value):
+            rows.append(i)
+        elif value is None:
+            result[i] = TIME_NONE
+        elif value is not _ABSENT:
+            extras[i] = value
+    if not rows:
+        return result
+
+    _parse_rows(rows, [values[i] for i in rows], result, extras)
+    return result
+
+def _parse_rows(rows: List[int], strings: List[str], result: np.ndarray, extras: Dict[int, Any]) -> None:
+    """
+    _parse_rows 功能说明:
+    批量解析时间字符串；格式正确但日期非法（如2月30日）导致整批失败时二分重试，
+    只有非法的个别值会落入 extras
+    输入: rows (List[int]) 行号, strings (List[str]) 时间字符串, result (np.ndarray) 结果数组,
+          extras (Dict[int, Any]) 无法解析的原始值 | 输出: 无
+    """
+    try:
+        result[rows] = np.array(strings, dtype='datetime64[us]').astype(np.int64)
+    except ValueError:
+        if len(rows) == 1:
+            extras[rows[0]] = strings[0]
+            return
+        middle = len(rows) // 2
+        _parse_rows(rows[:middle], strings[:middle], result, extras)
+        _parse_rows(rows[middle:], strings[middle:], result, extras)
+
+def _format_time(value: int) -> Optional[str]:
+    """
+    _format_time 功能说明:
+    将整数微秒还原为与 datetime.isoformat() 相同格式的字符串
+    输入: value (int) 微秒 | 输出: Optional[str] ISO时间字符串，值为None时返回None
+    """
+    if value == TIME_NONE:
+        return None
+    return (_EPOCH + timedelta(microseconds=int(value))).isoformat()
+
+def _to_micros(value) -> int:
+    """
+    _to_micros 功能说明:
+    将筛选条件中的时间（datetime 或 ISO 字符串）转换为整数微秒
+    输入: value (datetime/str) 时间 | 输出: int 微秒
+    """
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None).isoformat()
+    return int(np.datetime64(value, 'us').astype(np.int64))
+
+class ContactRow:
+    """
+    ContactRow 功能说明:
+    联系人表的单行只读视图，使用 __slots__ 避免为每行创建字典
+    输入: table (ContactTable) 所属表, index (int) 行号 | 输出: 行视图对象
+    """
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'ContactTable', index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def name(self) -> str:
+        return self._table.names[self._index]
+
+    @property
+    def type(self) -> Optional[str]:
+        code = self._table.type_codes[self._index]
+        return self._table.types[code] if code >= 0 else None
+
+    @property
+    def tags(self) -> List[str]:
+        return self._table.row_tags(self._index)
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return self.get('created_at')
+
+    @property
+    def updated_at(self) -> Optional[str]:
+        return self.get('updated_at')
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """
+        get 功能说明:
+        按字段名取值，兼容字典的 get 用法
+        输入: field (str) 字段名, default (Any) 默认值 | 输出: Any 字段值
+        """
+        return self._table.to_dict(self._index).get(field, default)
+
+    def to_dict(self) -> Dict:
+        return self._table.to_dict(self._index)
+
+    def __repr__(self) -> str:
+        return f"ContactRow({self.name!r})"
+
+class ContactTable:
+    """
+    ContactTable 功能说明:
+    列式联系人表。姓名为数组，类型和标签编码为整数（标签以 CSR 方式存放：
+    所有联系人的标签编码拼接为一个数组，offsets 记录每行的起止位置），
+    时间字段为 int64 微秒，其余字段稀疏存放。标签、类型和时间范围筛选
+    都用 NumPy 向量化完成，避免逐个联系人的 Python 循环。
+    联系人修改后通过 upsert 增量更新，不需要重建整张表
+    输入: 由 from_contacts 构建 | 输出: 列式表对象
+    """
+
+    def __init__(self):
+        """
+        __init__ 功能说明:
+        初始化空表，通常通过 from_contacts 构建
+        输入: 无 | 输出: 无
+        """
+        self.names = np.empty(0, dtype=object)
+        self.types: List[str] = []
+        self.type_codes = np.empty(0, dtype=np.int16)
+        self.tag_names: List[str] = []
+        self.tag_codes = np.empty(0, dtype=np.int32)
+        self.tag_offsets = np.zeros(1, dtype=np.int64)
+        self.tag_rows = np.empty(0, dtype=np.int64)
+        self.has_tags = np.empty(0, dtype=bool)
+        self.times: Dict[str, np.ndarray] = {field: np.empty(0, dtype=np.int64) for field in TIME_FIELDS}
+        self.extras: Dict[str, Dict[int, Any]] = {}
+        self._tag_lookup: Dict[str, int] = {}
+        self._type_lookup: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+        # 暂存的修改：行号 -> 新的标签编码，姓名 -> 待追加的联系人
+        self._tag_overlay: Dict[int, List[int]] = {}
+        self._pending: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self.names)
+
+    def _type_code(self, contact_type: Optional[str]) -> int:
+        if contact_type is None:
+            return -1
+        code = self._type_lookup.get(contact_type)
+        if code is None:
+            code = self._type_lookup[contact_type] = len(self.types)
+            self.types.append(contact_type)
+        return code
+
+    def _tag_code(self, tag: str) -> int:
+        code = self._tag_lookup.get(tag)
+        if code is None:
+            code = self._tag_lookup[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        return code
+
+    @classmethod
+    def from_contacts(cls, contacts: Iterable[Dict]) -> 'ContactTable':
+        """
+        from_contacts 功能说明:
+        由联系人字典列表构建列式表，相同的标签和类型字符串只保存一份
+        输入: contacts (Iterable[Dict]) 联系人列表 | 输出: ContactTable 列式表
+        """
+        table = cls()
+        table._extend(contacts)
+        return table
+
+    def _extend(self, contacts: Iterable[Dict]) -> None:
+        """
+        _extend 功能说明:
+        在表尾批量追加联系人，新行的数组一次性拼接到已有数组之后
+        输入: contacts (Iterable[Dict]) 联系人列表 | 输出: 无
+        """
+        start = len(self.names)
+        names: List[str] = []
+        type_codes: List[int] = []
+        tag_codes: List[int] = []
+        counts: List[int] = []
+        has_tags: List[bool] = []
+        raw_times: Dict[str, List[Any]] = {field: [] for field in TIME_FIELDS}
+
+        for index, contact in enumerate(contacts, start):
+            names.append(contact['name'])
+            self._rows.setdefault(contact['name'], index)
+            type_codes.append(self._type_code(contact.get('type')))
+
+            has_tags.append('tags' in contact)
+            tags = contact.get('tags') or []
+            tag_codes.extend(self._tag_code(tag) for tag in tags)
+            counts.append(len(tags))
+
+            for field in TIME_FIELDS:
+                raw_times[field].append(contact.get(field, _ABSENT))
+            if not _COLUMN_FIELDS.issuperset(contact):
+                for field in contact.keys() - _COLUMN_FIELDS:
+                    self.extras.setdefault(field, {})[index] = contact[field]
+
+        rows = np.repeat(np.arange(start, start + len(names), dtype=np.int64), counts)
+        self.names = np.concatenate([self.names, np.array(names, dtype=object)])
+        self.type_codes = np.concatenate([self.type_codes, np.array(type_codes, dtype=np.int16)])
+        self.tag_codes = np.concatenate([self.tag_codes, np.array(tag_codes, dtype=np.int32)])
+        self.tag_offsets = np.concatenate([self.tag_offsets, self.tag_offsets[-1] + np.cumsum(counts, dtype=np.int64)])
+        self.tag_rows = np.concatenate([self.tag_rows, rows])
+        self.has_tags = np.concatenate([self.has_tags, np.array(has_tags, dtype=bool)])
+        for field, values in raw_times.items():
+            unparsed: Dict[int, Any] = {}
+            self.times[field] = np.concatenate([self.times[field], _parse_times(values, unparsed)])
+            if unparsed:
+                self.extras.setdefault(field, {}).update((start + i, value) for i, value in unparsed.items())
+
+    def upsert(self, contact: Dict) -> None:
+        """
+        upsert 功能说明:
+        增量更新单个联系人。已有的行原地更新类型、时间和稀疏字段，标签变化暂存；
+        新联系人暂存为待追加行。暂存的修改在下次读取时批量合并
+        输入: contact (Dict) 修改后的联系人 | 输出: 无
+        """
+        index = self._rows.get(contact['name'])
+        if index is None:
+            self._pending[contact['name']] = contact
+            return
+
+        self.type_codes[index] = self._type_code(contact.get('type'))
+        self.has_tags[index] = 'tags' in contact
+        self._tag_overlay[index] = [self._tag_code(tag) for tag in contact.get('tags') or []]
+        for field in TIME_FIELDS:
+            unparsed: Dict[int, Any] = {}
+            self.times[field][index] = _parse_times([contact.get(field, _ABSENT)], unparsed)[0]
+            if unparsed:
+                self.extras.setdefault(field, {})[index] = unparsed[0]
+            elif field in self.extras:
+                self.extras[field].pop(index, None)
+        for field, values in self.extras.items():
+            if field not in TIME_FIELDS and field not in contact:
+                values.pop(index, None)
+        for field in contact.keys() - _COLUMN_FIELDS:
+            self.extras.setdefault(field, {})[index] = contact[field]
+
+    def _merge_tags(self) -> None:
+        """
+        _merge_tags 功能说明:
+        将暂存的标签修改合并回CSR标签数组：去掉被修改行的旧编码，拼接新编码后按行号稳定排序
+        输入: 无 | 输出: 无
+        """
+        rows = np.fromiter(self._tag_overlay, dtype=np.int64, count=len(self._tag_overlay))
+        codes = list(self._tag_overlay.values())
+        changed = np.zeros(len(self.names), dtype=bool)
+        changed[rows] = True
+        keep = ~changed[self.tag_rows]
+
+        new_codes = np.fromiter((code for row_codes in codes for code in row_codes), dtype=np.int32)
+        owners = np.concatenate([self.tag_rows[keep], np.repeat(rows, [len(row_codes) for row_codes in codes])])
+        order = np.argsort(owners, kind='stable')
+        self.tag_codes = np.concatenate([self.tag_codes[keep], new_codes])[order]
+        self.tag_rows = owners[order]
+        self.tag_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.tag_rows, minlength=len(self.names)))])
+        self._tag_overlay.clear()
+
+    def _sync(self) -> None:
+        """
+        _sync 功能说明:
+        读取前合并暂存的标签修改和待追加的联系人，没有暂存修改时不做任何事
+        输入: 无 | 输出: 无
+        """
+        if self._tag_overlay:
+            self._merge_tags()
+        if self._pending:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._extend(pending)
+
+    def row(self, index: int) -> ContactRow:
+        """
+        row 功能说明:
+        获取单行视图
+        输入: index (int) 行号 | 输出: ContactRow 行视图
+        """
+        self._sync()
+        return ContactRow(self, int(index))
+
+    def row_of(self, name: str) -> Optional[int]:
+        """
+        row_of 功能说明:
+        按姓名获取行号（包括尚未合并的新增联系人）
+        输入: name (str) 姓名 | 输出: Optional[int] 行号，不存在时为 None
+        """
+        self._sync()
+        return self._rows.get(name)
+
+    def views(self) -> Tuple['TableContactList', 'TableContactMap', 'TableTagMap']:
+        """
+        views 功能说明:
+        创建只读视图，替代 ContactManager 内存中的联系人列表、姓名索引和标签倒排索引，
+        表是唯一的数据副本，联系人字典在访问时才由 to_dict 生成
+        输入: 无 | 输出: Tuple (联系人列表视图, 姓名 -> 联系人视图, 标签 -> 姓名视图)
+        """
+        contact_map = TableContactMap(self)
+        return TableContactList(contact_map), contact_map, TableTagMap(self)
+
+    def row_tags(self, index: int) -> List[str]:
+        """
+        row_tags 功能说明:
+        获取单行的标签列表
+        输入: index (int) 行号 | 输出: List[str] 标签列表
+        """
+        self._sync()
+        start, end = self.tag_offsets[index], self.tag_offsets[index + 1]
+        return [self.tag_names[code] for code in self.tag_codes[start:end]]
+
+    def to_dict(self, index: int) -> Dict:
+        """
+        to_dict 功能说明:
+        将单行还原为联系人字典，与原有的联系人字典格式一致
+        输入: index (int) 行号 | 输出: Dict 联系人
+        """
+        self._sync()
+        contact: Dict[str, Any] = {'name': self.names[index]}
+        code = self.type_codes[index]
+        if code >= 0:
+            contact['type'] = self.types[code]
+        if self.has_tags[index]:
+            contact['tags'] = self.row_tags(index)
+        for field, values in self.times.items():
+            value = values[index]
+            if value != TIME_MISSING:
+                contact[field] = _format_time(value)
+        for field, values in self.extras.items():
+            if index in values:
+                contact[field] = values[index]
+        return contact
+
+    def to_contacts(self, rows: Optional[Sequence[int]] = None) -> List[Dict]:
+        """
+        to_contacts 功能说明:
+        还原为联系人字典列表
+        输入: rows (Sequence[int], 可选) 行号，默认全部 | 输出: List[Dict] 联系人列表
+        """
+        if rows is None:
+            rows = range(len(self))
+        return [self.to_dict(int(index)) for index in rows]
+
+    def _codes(self, tags: Iterable[str]) -> np.ndarray:
+        return np.array([self._tag_lookup[tag] for tag in tags if tag in self._tag_lookup], dtype=np.int32)
+
+    def tag_mask(self, tags: Iterable[str]) -> np.ndarray:
+        """
+        tag_mask 功能说明:
+        计算带有任一指定标签的行掩码
+        输入: tags (Iterable[str]) 标签 | 输出: np.ndarray bool 行掩码
+        """
+        self._sync()
+        mask = np.zeros(len(self), dtype=bool)
+        codes = self._codes(tags)
+        if len(codes):
+            mask[self.tag_rows[np.isin(self.tag_codes, codes)]] = True
+        return mask
+
+    def filter(self, tags: Optional[Iterable[str]] = None, any_tags: Optional[Iterable[str]] = None,
+               exclude_tags: Optional[Iterable[str]] = None, types: Optional[Iterable[str]] = None,
+               since=None, until=None, date_field: str = 'updated_at') -> np.ndarray:
+        """
+        filter 功能说明:
+        按条件向量化筛选，各条件之间为 AND 关系
+        输入: tags (可选) 必须全部带有的标签, any_tags (可选) 至少带有一个的标签,
+              exclude_tags (可选) 不能带有的标签, types (可选) 联系人类型,
+              since/until (datetime/str, 可选) 时间范围 [since, until), date_field (str) 时间字段
+        输出: np.ndarray 满足条件的行号（升序）
+        """
+        self._sync()
+        mask = np.ones(len(self), dtype=bool)
+        for tag in tags or []:
+            mask &= self.tag_mask([tag])
+        if any_tags is not None:
+            mask &= self.tag_mask(any_tags)
+        if exclude_tags is not None:
+            mask &= ~self.tag_mask(exclude_tags)
+        if types is not None:
+            codes = [self._type_lookup[t] for t in types if t in self._type_lookup]
+            mask &= np.isin(self.type_codes, np.array(codes, dtype=np.int16))
+        if since is not None or until is not None:
+            if date_field not in self.times:
+                raise ValueError(f"不支持按字段 {date_field} 筛选时间，可选: {', '.join(TIME_FIELDS)}")
+            values = self.times[date_field]
+            mask &= values > TIME_NONE
+            if since is not None:
+                mask &= values >= _to_micros(since)
+            if until is not None:
+                mask &= values < _to_micros(until)
+        return np.flatnonzero(mask)
+
+    def tag_counts(self) -> Dict[str, int]:
+        """
+        tag_counts 功能说明:
+        统计每个标签的联系人数
+        输入: 无 | 输出: Dict[str, int] 标签 -> 联系人数
+        """
+        self._sync()
+        counts = np.bincount(self.tag_codes, minlength=len(self.tag_names))
+        # 所有联系人都已移除的标签编码仍保留，不计入统计
+        return {tag: int(count) for tag, count in zip(self.tag_names, counts) if count}
+
+    def memory_usage(self) -> int:
+        """
+        memory_usage 功能说明:
+        估算各数组占用的字节数（不含姓名字符串本身和稀疏字段）
+        输入: 无 | 输出: int 字节数
+        """
+        self._sync()
+        arrays = [self.names, self.type_codes, self.tag_codes, self.tag_offsets, self.tag_rows, self.has_tags]
+        arrays.extend(self.times.values())
+        return int(sum(array.nbytes for array in arrays))
+
+class TableContactMap(Mapping):
+    """
+    TableContactMap 功能说明:
+    只读姓名 -> 联系人视图，替代 ContactManager._by_name。按姓名取值时由列式表生成字典，
+    最近使用的联系人放在有上限的缓存中，保证修改操作和随后的 upsert 使用同一个字典；
+    新增的联系人通过 cache 放入缓存
+    输入: table (ContactTable) 列式表, cache_size (int) 缓存的联系人数 | 输出: 映射视图
+    """
+
+    def __init__(self, table: ContactTable, cache_size: int = 1024):
+        self._table = table
+        self._cache: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._cache_size = cache_size
+
+    def __getitem__(self, name: str) -> Dict:
+        contact = self._cache.get(name)
+        if contact is None:
+            index = self._table.row_of(name)
+            if index is None:
+                raise KeyError(name)
+            contact = self._table.to_dict(index)
+        self.cache(contact)
+        return contact
+
+    def cache(self, contact: Dict) -> None:
+        name = contact['name']
+        self._cache[name] = contact
+        self._cache.move_to_end(name)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._cache or self._table.row_of(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        self._table._sync()
+        return iter(self._table.names.tolist())
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def values(self) -> Iterator[Dict]:
+        # 遍历全部联系人时不放入缓存，任何时刻只有当前一个字典
+        for index in range(len(self._table)):
+            contact = self._cache.get(self._table.names[index])
+            yield contact if contact is not None else self._table.to_dict(index)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        for contact in self.values():
+            yield contact['name'], contact
+
+class TableContactList(SequenceABC):
+    """
+    TableContactList 功能说明:
+    只读联系人列表视图，替代 ContactManager.contacts：按行顺序逐个生成字典，copy 得到普通列表；
+    新增联系人由 ContactTable.upsert 追加，视图不提供 append 等修改方法
+    输入: contacts (TableContactMap) 姓名视图 | 输出: 列表视图
+    """
+
+    def __init__(self, contacts: TableContactMap):
+        self._contacts = contacts
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._contacts.values()
+
+    def __getitem__(self, index: int) -> Dict:
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError(index)
+        return self._contacts[self._contacts._table.names[index]]
+
+    def copy(self) -> List[Dict]:
+        return list(self)
+
+class TableTagMap(Mapping):
+    """
+    TableTagMap 功能说明:
+    只读标签 -> 联系人姓名集合视图，替代 ContactManager._tag_index，由标签编码向量化计算；
+    标签随 ContactTable.upsert 更新，视图不提供 setdefault、删除等修改方法
+    输入: table (ContactTable) 列式表 | 输出: 映射视图
+    """
+
+    def __init__(self, table: ContactTable):
+        self._table = table
+
+    def __getitem__(self, tag: str) -> Set[str]:
+        names = set(self._table.names[self._table.tag_mask([tag])])
+        if not names:
+            raise KeyError(tag)
+        return names
+
+    def __contains__(self, tag: object) -> bool:
+        return bool(self._table.tag_mask([tag]).any())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.tag_counts())
+
+    def __len__(self) -> int:
+        return len(self._table.tag_counts())
@@ -1,24 +1,55 @@
 ##########friend_details.py: [微信好友详细信息获取模块] ##################
 # 变更记录: [2025-06-30 10:15] @李祥光 [初始创建]########
+# 变更记录: [2026-10-17 11:45] @李祥光 [支持SQLite存储后端]########
+# 变更记录: [2026-10-17 14:30] @李祥光 [JSON文件改为原子写入，并持有数据目录进程锁]########
+# 变更记录: [2026-10-17 15:40] @李祥光 [同步联系人改为按微信号批量合并，修复对bool返回值取下标的错误]########
+# 变更记录: [2026-10-17 16:20] @李祥光 [获取好友详细信息改为按标识增量合并，新增变更日志和diff_since]########
+# 变更记录: [2026-10-17 16:50] @李祥光 [新增分块断点续传采集harvest_friend_details]########
+# 变更记录: [2026-10-17 17:20] @李祥光 [新增昵称/备注/微信号哈希索引和批量查询get_friends]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [数据文件格式和压缩方式可配置（friend_details.format/compression），加载时自动识别]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [微信调用改为通过传输层，不再直接导入wxautox]########
+# 变更记录: [2026-10-18 10:10] @李祥光 [数据目录锁只在加载和写入期间持有，新增close]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [合并在数据目录锁内进行，其他进程写过数据文件时先重新加载，避免互相覆盖]########
+# 变更记录: [2026-10-18 15:20] @李祥光 [说明微信数据源续传仍需从列表开头读取的限制]########
 # 输入: 无 | 输出: 好友详细信息列表###############
 
 import json
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
-from wxautox import WeChat
+from typing import List, Dict, Optional, Iterable
 from .logger import Logger
 from .contact_manager import ContactManager
+from .sqlite_store import (SQLiteFriendStore, first_field, friend_key, FRIEND_ID_FIELDS,
+                           FRIEND_NICKNAME_FIELDS, FRIEND_REMARK_FIELDS)
+from .atomic_file import data_dir_lock, file_generation
+from .serializer import read_document, write_document
+from .friend_harvester import FriendHarvester, WeChatFriendSource
+from .transport import create_transport
+from config.settings import config
 
 ###########################文件下的所有函数###########################
 """
 FriendDetailsManager.__init__：初始化好友详细信息管理器
+FriendDetailsManager.close：关闭存储连接
 FriendDetailsManager.get_friend_details：获取好友详细信息
+FriendDetailsManager.refresh_friend_details：从微信获取好友并增量合并
+FriendDetailsManager.merge_friend_details：持有数据目录锁，按需重新加载后合并快照
+FriendDetailsManager._merge：按好友标识合并快照并记录变化
+FriendDetailsManager._read_file：持有数据目录锁时读取数据文件并记录文件版本
+FriendDetailsManager._append_changes：追加变更日志
+FriendDetailsManager.diff_since：获取指定时间之后的好友变化
+FriendDetailsManager.harvest_friend_details：分块断点续传采集好友并合并
+FriendDetailsManager._get_wechat：获取微信客户端（支持注入）
 FriendDetailsManager.save_friend_details：保存好友详细信息到文件
 FriendDetailsManager.load_friend_details：从文件加载好友详细信息
 FriendDetailsManager.sync_to_contacts：将好友详细信息同步到联系人管理器
 FriendDetailsManager.get_friend_by_name：根据名称获取好友详细信息
+FriendDetailsManager.find_friends_by_name：根据名称获取所有匹配的好友（处理重名）
+FriendDetailsManager.get_friends：批量根据名称获取好友详细信息
+FriendDetailsManager._rebuild_lookup：重建标识/昵称/备注/微信号索引
+FriendDetailsManager._index_friend：将单个好友加入索引
+FriendDetailsManager._unindex_friend：从索引中移除单个好友
 """
 ###########################文件下的所有函数###########################
 
@@ -27,11 +58,23 @@ FriendDetailsManager.get_friend_by_name：根据名称获取好友详细信息
 flowchart TD
     A[FriendDetailsManager初始化] --> B[load_friend_details]
     B --> C{数据文件存在?}
-    C -->|是| D[读取JSON数据]
+    C -->|是| D[读取JSON数据或SQLite]
     C -->|否| E[get_friend_details]
-    E --> F[save_friend_details]
-    G[sync_to_contacts] --> H[更新联系人数据]
-    H --> I[ContactManager.add_contact]
+    E --> E1[refresh_friend_details]
+    E1 --> E2[merge_friend_details 按friend_key比较字段]
+    E2 --> RF[_read_file 文件版本变化时先重新加载]
+    E2 --> F[save_friend_details / store.apply_changes]
+    E2 --> E3[_append_changes 写入friend_changes.jsonl]
+    DS[diff_since] --> E4[读取变更日志]
+    B --> RL[_rebuild_lookup 重建索引]
+    B --> LK[data_dir_lock 加载和写入期间持有数据目录锁]
+    F --> LK
+    E2 --> IX[_index_friend/_unindex_friend 增量维护索引]
+    GF[get_friends/get_friend_by_name] --> FN[find_friends_by_name 按昵称/备注/微信号查索引]
+    HV[harvest_friend_details] --> HF[FriendHarvester.run 分块采集/断点续传]
+    HF --> E2
+    G[sync_to_contacts] --> H[好友转换为联系人记录]
+    H --> I[ContactManager.upsert_contacts 按微信号批量合并]
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
 
@@ -42,48 +85,263 @@ class FriendDetailsManager:
     输入: 无 | 输出: 好友详细信息列表
     """
     
-    def __init__(self, data_file: str = "data/friend_details.json"):
+    def __init__(self, data_file: str = "data/friend_details.json", storage: Optional[str] = None, wechat=None):
         """
         __init__ 功能说明:
         初始化好友详细信息管理器
-        输入: data_file (str) 数据文件路径 | 输出: 无
+        输入: data_file (str) 数据文件路径, storage (str, 可选) 存储后端 json/sqlite，
+              默认读取配置 friend_details.storage, wechat (可选) 微信客户端，默认在首次获取时创建 | 输出: 无
         """
         self.data_file = Path(data_file)
         self.friend_details: List[Dict] = []
+        self.wechat = wechat
+        # 好友标识 -> 好友，以及 昵称/备注/微信号 -> 好友列表（允许重名）
+        self._by_key: Dict[str, Dict] = {}
+        self._by_nickname: Dict[str, List[Dict]] = {}
+        self._by_remark: Dict[str, List[Dict]] = {}
+        self._by_id: Dict[str, List[Dict]] = {}
+        # 好友变化明细（每行一条JSON），与数据文件位于同一目录
+        self.changes_file = self.data_file.with_name('friend_changes.jsonl')
+        # 与 ContactManager 共用数据目录锁，只在加载和写入期间持有，防止两个进程同时读写；
+        # 记录上次读取或写入后的文件版本，合并前发现其他进程写过时重新加载
+        self._lock_timeout = float(config.get('contacts.lock_timeout', 30))
+        self._generation: tuple = ()
+        
+        self.store: Optional[SQLiteFriendStore] = None
+        # JSON存储时数据文件的写入格式和压缩方式，读取时自动识别
+        self.file_format = 'json'
+        self.compression = 'none'
+        storage = storage or config.get('friend_details.storage', 'json')
+        if storage == 'sqlite':
+            db_file = config.get('friend_details.sqlite_file') or self.data_file.parent / 'biaoqian.db'
+            self.store = SQLiteFriendStore(Path(db_file))
+        elif storage == 'json':
+            self.file_format = config.get('friend_details.format', 'json')
+            self.compression = config.get('friend_details.compression', 'none')
+        else:
+            raise ValueError(f"不支持的好友详细信息存储类型: {storage}")
+        
         self.load_friend_details()
     
+    def close(self) -> None:
+        """
+        close 功能说明:
+        关闭SQLite存储连接（数据目录锁只在读写期间持有，此时已释放）
+        输入: 无 | 输出: 无
+        """
+        if self.store is not None:
+            self.store.conn.close()
+            self.store = None
+    
+    def _get_wechat(self):
+        """
+        _get_wechat 功能说明:
+        获取微信客户端，未注入时按配置 wechat.transport 创建传输层并连接
+        输入: 无 | 输出: 微信客户端
+        """
+        if self.wechat is None:
+            transport = create_transport()
+            transport.connect()
+            self.wechat = transport
+        return self.wechat
+    
     def get_friend_details(self, max_count: int = None, timeout: int = 0xFFFFF) -> List[Dict]:
         """
         get_friend_details 功能说明:
-        从微信客户端获取好友详细信息
-        输入: max_count (int) 最大获取数量, timeout (int) 超时时间 | 输出: List[Dict] 好友详细信息列表
+        从微信客户端获取好友详细信息并增量合并到已有数据（见 refresh_friend_details）
+        输入: max_count (int) 最大获取数量, timeout (int) 超时时间 | 输出: List[Dict] 合并后的好友详细信息列表
+        """
+        result = self.refresh_friend_details(max_count=max_count, timeout=timeout)
+        return self.friend_details if result['success'] else []
+    
+    def refresh_friend_details(self, max_count: int = None, timeout: int = 0xFFFFF) -> Dict:
+        """
+        refresh_friend_details 功能说明:
+        从微信客户端获取好友详细信息，按好友标识增量合并：只有新增和字段变化的好友会更新 updated_at
+        并写入存储，变化明细追加到变更日志。只获取部分好友（max_count）时不判定删除
+        输入: max_count (int) 最大获取数量, timeout (int) 超时时间 | 输出: Dict 合并结果统计（added/changed/removed/unchanged）
         """
         try:
             Logger.info("开始从微信获取好友详细信息...")
             
-            # 初始化微信客户端
-            wx = WeChat()
-            
-            # 调用wxauto的GetFriendDetails方法获取好友详细信息
-            friend_details = wx.GetFriendDetails(n=max_count, timeout=timeout)
+            # 通过传输层调用GetFriendDetails获取好友详细信息
+            fetched = self._get_wechat().GetFriendDetails(n=max_count, timeout=timeout)
             
-            if not friend_details:
+            if not fetched:
                 Logger.warning("未获取到好友详细信息")
-                return []
-            
-            # 添加时间戳
-            for friend in friend_details:
-                friend['updated_at'] = datetime.now().isoformat()
+                return {'success': False, 'error': '未获取到好友详细信息'}
             
-            self.friend_details = friend_details
-            self.save_friend_details()
-            
-            Logger.info(f"成功获取 {len(friend_details)} 个好友详细信息")
-            return friend_details
+            result = self.merge_friend_details(fetched, full=max_count is None)
+            Logger.info(f"成功获取 {len(fetched)} 个好友详细信息")
+            return result
             
         except Exception as e:
             Logger.error(f"获取好友详细信息失败: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def harvest_friend_details(self, max_count: Optional[int] = None, chunk_size: Optional[int] = None,
+                               source=None, total: Optional[int] = None, progress=None) -> Dict:
+        """
+        harvest_friend_details 功能说明:
+        分块采集好友详细信息，每块完成后保存断点（friend_harvest.json），中断后再次调用会从断点继续；
+        采集完成后增量合并到已有数据并删除断点。默认的微信数据源只能从好友列表开头读取，
+        中断后续传仍需重新读到断点位置（见 WeChatFriendSource）
+        输入: max_count (int, 可选) 最多采集数量, chunk_size (int, 可选) 每块数量，默认读取配置 friend_details.harvest_chunk_size,
+              source (可选) 提供 fetch(offset, limit) 的数据源，默认使用微信客户端,
+              total (int, 可选) 好友总数，用于显示ETA, progress (Callable, 可选) 进度回调
+        输出: Dict 合并结果统计，另含 harvested/resumed_from；中断时 success 为 False
+        """
+        if source is None:
+            source = WeChatFriendSource(self._get_wechat())
+        harvester = FriendHarvester(
+            source.fetch,
+            self.data_file.with_name('friend_harvest.json'),
+            chunk_size=chunk_size or config.get('friend_details.harvest_chunk_size', 200),
+            max_retries=config.get('friend_details.harvest_max_retries', 3),
+            total=total,
+            progress=progress
+        )
+        
+        harvest = harvester.run(max_count=max_count)
+        if not harvest['success']:
+            return {'success': False, 'error': harvest['error'], 'harvested': len(harvest['friends']),
+                    'resumed_from': harvest['resumed_from']}
+        
+        result = self.merge_friend_details(harvest['friends'], full=max_count is None)
+        harvester.clear()
+        result.update(harvested=len(harvest['friends']), resumed_from=harvest['resumed_from'])
+        return result
+    
+    def merge_friend_details(self, fetched: List[Dict], full: bool = True) -> Dict:
+        """
+        merge_friend_details 功能说明:
+        将获取到的好友快照按 friend_key 合并到当前数据，记录每个好友新增、移除和变化的字段（旧值/新值）。
+        full 为 True 时，快照中没有的已有好友视为已删除；无法识别标识的好友跳过
+        输入: fetched (List[Dict]) 好友快照, full (bool) 是否为完整快照 | 输出: Dict 合并结果统计
+        """
+        # 比较和写入都在锁内完成：其他进程在本进程加载之后写过数据文件时，先重新加载再比较，
+        # 写入的数据同时包含双方的修改；重新加载失败时抛出异常，不写入
+        with data_dir_lock(self.data_file.parent, self._lock_timeout):
+            if self.store is None and file_generation(self.data_file) != self._generation:
+                Logger.warning("好友详细信息文件已被其他进程修改，重新加载后再合并")
+                self._read_file()
+            return self._merge(fetched, full)
+    
+    def _merge(self, fetched: List[Dict], full: bool) -> Dict:
+        """
+        _merge 功能说明:
+        持有数据目录锁时按 friend_key 合并好友快照并写入存储和变更日志
+        输入: fetched (List[Dict]) 好友快照, full (bool) 是否为完整快照 | 输出: Dict 合并结果统计
+        """
+        now = datetime.now().isoformat()
+        result = {'success': True, 'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0, 'skipped': 0}
+        current = dict(self._by_key)
+        
+        changes: List[Dict] = []
+        upserts: List[Dict] = []
+        seen = set()
+        for friend in fetched:
+            key = friend_key(friend)
+            if key is None or key in seen:
+                result['skipped'] += 1
+                continue
+            seen.add(key)
+            
+            incoming = {field: value for field, value in friend.items() if field != 'updated_at'}
+            existing = current.get(key)
+            if existing is None:
+                record = dict(incoming, updated_at=now)
+                self.friend_details.append(record)
+                self._index_friend(record)
+                upserts.append(record)
+                changes.append({'ts': now, 'key': key, 'change': 'added', 'friend': incoming})
+                result['added'] += 1
+                continue
+            
+            fields = {}
+            for field in set(existing) | set(incoming):
+                if field == 'updated_at':
+                    continue
+                old, new = existing.get(field), incoming.get(field)
+                if old != new:
+                    fields[field] = [old, new]
+            if not fields:
+                result['unchanged'] += 1
+                continue
+            
+            self._unindex_friend(existing)
+            existing.clear()
+            existing.update(incoming, updated_at=now)
+            self._index_friend(existing)
+            upserts.append(existing)
+            changes.append({'ts': now, 'key': key, 'change': 'changed', 'fields': fields})
+            result['changed'] += 1
+        
+        removed_keys = [key for key in current if key not in seen] if full else []
+        if removed_keys:
+            removed = set(removed_keys)
+            for key in removed_keys:
+                old = {field: value for field, value in current[key].items() if field != 'updated_at'}
+                changes.append({'ts': now, 'key': key, 'change': 'removed', 'friend': old})
+            kept = []
+            for friend in self.friend_details:
+                if friend_key(friend) in removed:
+                    self._unindex_friend(friend)
+                else:
+                    kept.append(friend)
+            self.friend_details = kept
+            result['removed'] = len(removed_keys)
+        
+        if changes:
+            if self.store is not None:
+                self.store.apply_changes(upserts, removed_keys)
+            elif not self.save_friend_details():
+                raise RuntimeError("保存好友详细信息失败，未记录变更日志")
+            self._append_changes(changes)
+        
+        Logger.info(f"好友详细信息合并完成 - 新增: {result['added']}, 变化: {result['changed']}, "
+                    f"删除: {result['removed']}, 未变化: {result['unchanged']}")
+        return result
+    
+    def _append_changes(self, changes: List[Dict]) -> None:
+        """
+        _append_changes 功能说明:
+        将变化明细一次性追加到变更日志（每行一条JSON）并fsync
+        输入: changes (List[Dict]) 变化明细 | 输出: 无
+        """
+        self.changes_file.parent.mkdir(parents=True, exist_ok=True)
+        payload = ''.join(json.dumps(change, ensure_ascii=False) + '\n' for change in changes)
+        with open(self.changes_file, 'a', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def diff_since(self, since) -> List[Dict]:
+        """
+        diff_since 功能说明:
+        返回指定时间之后的好友变化明细（按发生顺序），供标签规则、联系人同步等下游只处理增量。
+        每条明细包含 ts、key、change（added/changed/removed），
+        added/removed 带 friend 完整记录，changed 带 fields {字段: [旧值, 新值]}
+        输入: since (datetime/str) 起始时间（不含） | 输出: List[Dict] 变化明细
+        """
+        if isinstance(since, str):
+            since = datetime.fromisoformat(since)
+        if not self.changes_file.exists():
             return []
+        
+        result = []
+        with open(self.changes_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    Logger.warning(f"好友变更日志存在损坏的行，已跳过: {line[:80]!r}")
+                    continue
+                if datetime.fromisoformat(change['ts']) > since:
+                    result.append(change)
+        return result
     
     def save_friend_details(self) -> bool:
         """
@@ -92,8 +350,11 @@ class FriendDetailsManager:
         输入: 无 | 输出: bool 保存是否成功
         """
         try:
-            # 确保目录存在
-            self.data_file.parent.mkdir(parents=True, exist_ok=True)
+            if self.store is not None:
+                with data_dir_lock(self.data_file.parent, self._lock_timeout):
+                    self.store.save_all(self.friend_details)
+                Logger.info(f"好友详细信息已保存到 {self.store.db_file}")
+                return True
             
             data = {
                 'friend_details': self.friend_details,
@@ -101,9 +362,12 @@ class FriendDetailsManager:
                 'count': len(self.friend_details)
             }
             
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
+            with data_dir_lock(self.data_file.parent, self._lock_timeout):
+                if file_generation(self.data_file) != self._generation:
+                    # 其他进程在本进程加载之后写过，直接写入会覆盖对方的修改
+                    raise RuntimeError("好友详细信息文件已被其他进程修改，请重新加载后再保存")
+                write_document(self.data_file, data, 'friend_details', self.file_format, self.compression)
+                self._generation = file_generation(self.data_file)
             Logger.info(f"好友详细信息已保存到 {self.data_file}")
             return True
             
@@ -118,14 +382,18 @@ class FriendDetailsManager:
         输入: 无 | 输出: List[Dict] 好友详细信息列表
         """
         try:
+            if self.store is not None:
+                with data_dir_lock(self.data_file.parent, self._lock_timeout):
+                    self.friend_details = self.store.load()
+                self._rebuild_lookup()
+                Logger.info(f"已从 {self.store.db_file} 加载 {len(self.friend_details)} 个好友详细信息")
+                return self.friend_details
+            
+            with data_dir_lock(self.data_file.parent, self._lock_timeout):
+                self._read_file()
             if not self.data_file.exists():
                 Logger.warning(f"好友详细信息文件不存在: {self.data_file}")
                 return []
-                
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            self.friend_details = data.get('friend_details', [])
             Logger.info(f"已从 {self.data_file} 加载 {len(self.friend_details)} 个好友详细信息")
             return self.friend_details
             
@@ -133,49 +401,132 @@ class FriendDetailsManager:
             Logger.error(f"加载好友详细信息失败: {str(e)}")
             return []
     
-    def sync_to_contacts(self) -> Dict:
+    def _read_file(self) -> None:
+        """
+        _read_file 功能说明:
+        持有数据目录锁时读取数据文件（不存在时为空）、重建索引并记录文件版本
+        输入: 无 | 输出: 无
+        """
+        generation = file_generation(self.data_file)
+        data = read_document(self.data_file) if self.data_file.exists() else {}
+        self.friend_details = data.get('friend_details', [])
+        self._rebuild_lookup()
+        self._generation = generation
+    
+    def sync_to_contacts(self, contact_manager: Optional[ContactManager] = None) -> Dict:
         """
         sync_to_contacts 功能说明:
-        将好友详细信息同步到联系人管理器
-        输入: 无 | 输出: Dict 同步结果统计
+        将好友详细信息按微信号批量合并到联系人管理器：新好友新增为带“微信好友”标签的联系人，
+        已有联系人保留原有标签，只更新有变化的昵称/备注，整个同步只写入一次
+        输入: contact_manager (ContactManager, 可选) 联系人管理器，默认新建 | 输出: Dict 同步结果统计
         """
         try:
             if not self.friend_details:
                 Logger.warning("没有好友详细信息可同步")
                 return {'success': False, 'error': '没有好友详细信息可同步'}
                 
-            contact_manager = ContactManager()
-            count = 0
+            contact_manager = contact_manager or ContactManager()
+            records = []
             
             for friend in self.friend_details:
                 # 提取必要信息
-                name = friend.get('NickName', '')
+                name = first_field(friend, FRIEND_NICKNAME_FIELDS)
                 if not name:
                     continue
-                    
-                # 添加到联系人管理器
-                result = contact_manager.add_contact(name, tags=['微信好友'])
-                if result['success']:
-                    count += 1
-                    
-            Logger.info(f"已将 {count} 个好友详细信息同步到联系人管理器")
-            return {'success': True, 'count': count}
+                
+                record = {'name': name, 'nickname': name, 'tags': ['微信好友']}
+                wxid = first_field(friend, FRIEND_ID_FIELDS)
+                if wxid:
+                    record['wxid'] = wxid
+                remark = first_field(friend, FRIEND_REMARK_FIELDS)
+                if remark:
+                    record['remark'] = remark
+                records.append(record)
+            
+            result = contact_manager.upsert_contacts(records, key='wxid')
+            if result['success']:
+                result['count'] = result['inserted'] + result['updated']
+                Logger.info(f"已将 {result['count']} 个好友详细信息同步到联系人管理器")
+            return result
             
         except Exception as e:
             Logger.error(f"同步好友详细信息失败: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def _rebuild_lookup(self) -> None:
+        """
+        _rebuild_lookup 功能说明:
+        根据当前好友列表重建标识、昵称、备注和微信号索引
+        输入: 无 | 输出: 无
+        """
+        self._by_key = {}
+        self._by_nickname = {}
+        self._by_remark = {}
+        self._by_id = {}
+        for friend in self.friend_details:
+            self._index_friend(friend)
+    
+    def _index_friend(self, friend: Dict) -> None:
+        """
+        _index_friend 功能说明:
+        将单个好友加入各索引，同一好友的多个别名字段（如 NickName/昵称）取值相同时只加入一次
+        输入: friend (Dict) 好友详细信息 | 输出: 无
+        """
+        key = friend_key(friend)
+        if key is not None:
+            self._by_key.setdefault(key, friend)
+        for index, fields in ((self._by_nickname, FRIEND_NICKNAME_FIELDS),
+                              (self._by_remark, FRIEND_REMARK_FIELDS),
+                              (self._by_id, FRIEND_ID_FIELDS)):
+            for value in {str(friend[field]) for field in fields if friend.get(field)}:
+                index.setdefault(value, []).append(friend)
+    
+    def _unindex_friend(self, friend: Dict) -> None:
+        """
+        _unindex_friend 功能说明:
+        从各索引中移除单个好友（按对象身份移除，不影响重名的其他好友）
+        输入: friend (Dict) 好友详细信息 | 输出: 无
+        """
+        key = friend_key(friend)
+        if key is not None and self._by_key.get(key) is friend:
+            del self._by_key[key]
+        for index, fields in ((self._by_nickname, FRIEND_NICKNAME_FIELDS),
+                              (self._by_remark, FRIEND_REMARK_FIELDS),
+                              (self._by_id, FRIEND_ID_FIELDS)):
+            for value in {str(friend[field]) for field in fields if friend.get(field)}:
+                friends = index.get(value, [])
+                friends[:] = [item for item in friends if item is not friend]
+                if not friends:
+                    index.pop(value, None)
+    
+    def find_friends_by_name(self, name: str) -> List[Dict]:
+        """
+        find_friends_by_name 功能说明:
+        通过索引获取所有匹配的好友，依次匹配昵称、备注、微信号，重名时全部返回
+        输入: name (str) 昵称/备注/微信号 | 输出: List[Dict] 匹配的好友详细信息
+        """
+        result = []
+        seen = set()
+        for index in (self._by_nickname, self._by_remark, self._by_id):
+            for friend in index.get(name, []):
+                if id(friend) not in seen:
+                    seen.add(id(friend))
+                    result.append(friend)
+        return result
+    
     def get_friend_by_name(self, name: str) -> Optional[Dict]:
         """
         get_friend_by_name 功能说明:
-        根据名称获取好友详细信息
+        根据名称获取好友详细信息，依次匹配昵称、备注、微信号；重名时返回第一个
         输入: name (str) 好友名称 | 输出: Optional[Dict] 好友详细信息
         """
-        if not self.friend_details:
-            return None
-            
-        for friend in self.friend_details:
-            if friend.get('NickName') == name:
-                return friend
-                
-        return None
\ No newline at end of file
+        friends = self.find_friends_by_name(name)
+        return friends[0] if friends else None
+    
+    def get_friends(self, names: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        get_friends 功能说明:
+        批量根据名称获取好友详细信息（每个名称一次哈希查找），用于联系人与好友详细信息的关联
+        输入: names (Iterable[str]) 名称列表 | 输出: Dict[str, Optional[Dict]] 名称 -> 好友详细信息，未找到为None
+        """
+        return {name: self.get_friend_by_name(name) for name in names}
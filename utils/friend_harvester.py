@@ -0,0 +1,251 @@
+##########friend_harvester.py: [好友详细信息分块采集模块] ##################
+# 变更记录: [2026-10-17 16:50] @李祥光 [初始创建，分块获取、断点续传、失败重试和进度/ETA显示]########
+# 变更记录: [2026-10-18 15:20] @李祥光 [微信数据源按翻倍数量读取并缓存，整次采集的读取量与好友数成线性关系]########
+# 输入: 按偏移量分块获取好友的数据源 | 输出: 完整的好友详细信息列表和断点文件###############
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from .logger import Logger
+from .atomic_file import atomic_write_json
+
+###########################文件下的所有函数###########################
+"""
+WeChatFriendSource.__init__：初始化微信数据源
+WeChatFriendSource.fetch：从缓存返回一块好友详细信息，缓存不足时按翻倍数量重新读取
+FriendHarvester.__init__：初始化采集器
+FriendHarvester.run：分块采集，每块完成后保存断点，失败后可从断点继续
+FriendHarvester.clear：删除断点文件
+FriendHarvester._load_checkpoint：读取断点及已采集的好友
+FriendHarvester._save_chunk：追加一块好友并更新断点
+FriendHarvester._fetch_with_retry：带指数退避重试的分块获取
+FriendHarvester._report：输出吞吐量和预计剩余时间
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[FriendDetailsManager.harvest_friend_details] --> B[FriendHarvester.run]
+    B --> C[_load_checkpoint 从断点偏移量继续]
+    C --> D[_fetch_with_retry 获取一块]
+    D -->|失败且重试用尽| E[返回失败，断点保留]
+    D -->|成功| F[_save_chunk 追加好友并fsync后更新断点]
+    F --> G[_report 吞吐量/ETA]
+    D --> W[WeChatFriendSource.fetch]
+    W -->|缓存不足| X[GetFriendDetails 读取 max(offset+limit, 2×已缓存) 个并缓存]
+    G --> H{本块不足chunk_size?}
+    H -->|否| D
+    H -->|是| I[采集完成]
+    I --> J[merge_friend_details]
+    J --> K[clear 删除断点]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class WeChatFriendSource:
+    """
+    WeChatFriendSource 功能说明:
+    将微信客户端的 GetFriendDetails 适配为按偏移量分块获取的数据源。
+    GetFriendDetails 只能从好友列表开头获取前 n 个，没有滚动位置可以接着读；这里每次读取时
+    把数量至少翻倍并缓存结果，后面的块直接从缓存返回，整次采集的读取总量不超过好友数的4倍，
+    而不是每块都从头读取（块数的平方）。
+    限制：断点只能省去重新合并和重复写入，中断后重新运行仍需从列表开头读到断点位置，
+    因此断点续传对真实客户端并不能省去已读部分的耗时；客户端提供按偏移量获取的方法时应直接实现 fetch(offset, limit)
+    输入: wechat 微信客户端, timeout (int) 单次获取超时时间 | 输出: 数据源对象
+    """
+
+    def __init__(self, wechat, timeout: int = 0xFFFFF):
+        """
+        __init__ 功能说明:
+        初始化微信数据源
+        输入: wechat 微信客户端, timeout (int) 单次获取超时时间 | 输出: 无
+        """
+        self.wechat = wechat
+        self.timeout = timeout
+        self._cache: List[Dict] = []
+        self._exhausted = False
+
+    def fetch(self, offset: int, limit: int) -> List[Dict]:
+        """
+        fetch 功能说明:
+        获取第 offset 个开始的 limit 个好友详细信息。缓存不足时读取 max(offset+limit, 2×已缓存数量) 个，
+        读取结果少于请求数量说明已到列表末尾，之后不再访问客户端
+        输入: offset (int) 起始位置, limit (int) 数量 | 输出: List[Dict] 好友详细信息
+        """
+        end = offset + limit
+        if end > len(self._cache) and not self._exhausted:
+            count = max(end, 2 * len(self._cache))
+            friends = list(self.wechat.GetFriendDetails(n=count, timeout=self.timeout) or [])
+            self._exhausted = len(friends) < count
+            self._cache = friends
+        return self._cache[offset:end]
+
+class FriendHarvester:
+    """
+    FriendHarvester 功能说明:
+    好友详细信息分块采集器。每获取一块就把好友追加到断点数据文件（.jsonl）并fsync，
+    再原子更新断点文件中的偏移量；程序崩溃或获取超时后重新运行会从断点继续，已完成的块不会重复写入。
+    数据源只能从开头读取时（WeChatFriendSource），续传仍要重新读到断点位置，见该类的说明
+    输入: fetch 分块获取函数 fetch(offset, limit), checkpoint_file 断点文件路径 | 输出: 采集器对象
+    """
+
+    def __init__(self, fetch: Callable[[int, int], List[Dict]], checkpoint_file: Path, chunk_size: int = 200,
+                 max_retries: int = 3, retry_delay: float = 2.0, total: Optional[int] = None,
+                 progress: Optional[Callable[[Dict], None]] = None,
+                 sleep: Optional[Callable[[float], None]] = None, clock: Optional[Callable[[], float]] = None):
+        """
+        __init__ 功能说明:
+        初始化采集器
+        输入: fetch (Callable) 分块获取函数, checkpoint_file (Path) 断点文件, chunk_size (int) 每块数量,
+              max_retries (int) 每块最多重试次数, retry_delay (float) 首次重试等待秒数（之后翻倍）,
+              total (int, 可选) 好友总数，用于计算ETA, progress (Callable, 可选) 进度回调,
+              sleep/clock (可选) 等待和计时函数，测试时可替换 | 输出: 无
+        """
+        self.fetch = fetch
+        self.checkpoint_file = Path(checkpoint_file)
+        self.data_file = self.checkpoint_file.with_suffix('.jsonl')
+        self.chunk_size = max(1, int(chunk_size))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.total = total
+        self.progress = progress
+        self.sleep = sleep or time.sleep
+        self.clock = clock or time.monotonic
+
+    def _load_checkpoint(self) -> Tuple[List[Dict], bool]:
+        """
+        _load_checkpoint 功能说明:
+        读取断点和已采集的好友。数据文件中超出断点偏移量的行（写入后、更新断点前崩溃）会被截断；
+        上次采集已完成但尚未合并（未调用 clear）时直接返回已采集的结果
+        输入: 无 | 输出: Tuple[List[Dict], bool] (已采集的好友, 是否已完成)
+        """
+        if not self.checkpoint_file.exists():
+            self.clear()
+            return [], False
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+
+        offset = checkpoint.get('offset', 0)
+        friends: List[Dict] = []
+        valid_end = 0
+        if self.data_file.exists():
+            with open(self.data_file, 'rb') as f:
+                for raw in f:
+                    if len(friends) >= offset or not raw.endswith(b'\n'):
+                        break
+                    friends.append(json.loads(raw.decode('utf-8')))
+                    valid_end += len(raw)
+            with open(self.data_file, 'r+b') as f:
+                f.truncate(valid_end)
+
+        if len(friends) < offset:
+            # 数据文件比断点少（文件被删除或损坏），只能从已有数据的位置继续
+            Logger.warning(f"断点数据不完整，从第 {len(friends)} 个好友继续采集")
+            return friends, False
+        return friends, bool(checkpoint.get('complete'))
+
+    def _save_chunk(self, chunk: List[Dict], offset: int, complete: bool) -> None:
+        """
+        _save_chunk 功能说明:
+        先把本块好友追加到数据文件并fsync，再原子更新断点，保证断点记录的偏移量对应的数据已落盘
+        输入: chunk (List[Dict]) 本块好友, offset (int) 本块之后的偏移量, complete (bool) 是否采集完成 | 输出: 无
+        """
+        if chunk:
+            self.data_file.parent.mkdir(parents=True, exist_ok=True)
+            payload = ''.join(json.dumps(friend, ensure_ascii=False) + '\n' for friend in chunk)
+            with open(self.data_file, 'a', encoding='utf-8') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        atomic_write_json(self.checkpoint_file, {'offset': offset, 'complete': complete}, indent=None)
+
+    def _fetch_with_retry(self, offset: int, limit: int) -> List[Dict]:
+        """
+        _fetch_with_retry 功能说明:
+        获取一块好友，失败时按 retry_delay、2*retry_delay... 等待后重试，重试用尽后抛出最后一次的异常
+        输入: offset (int) 起始位置, limit (int) 数量 | 输出: List[Dict] 本块好友
+        """
+        attempt = 0
+        while True:
+            try:
+                return list(self.fetch(offset, limit) or [])
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                attempt += 1
+                Logger.warning(f"获取第 {offset} 个开始的好友失败: {str(e)}，{delay:.1f}秒后第 {attempt} 次重试")
+                self.sleep(delay)
+
+    def _report(self, offset: int, fetched: int, started: float) -> Dict:
+        """
+        _report 功能说明:
+        计算并输出本次运行的吞吐量和预计剩余时间（已知总数时）
+        输入: offset (int) 当前偏移量, fetched (int) 本次运行已获取数量, started (float) 开始时间 | 输出: Dict 进度信息
+        """
+        elapsed = max(self.clock() - started, 1e-9)
+        rate = fetched / elapsed
+        eta = None
+        if self.total and rate > 0:
+            eta = max(self.total - offset, 0) / rate
+        info = {'offset': offset, 'total': self.total, 'rate': rate, 'eta': eta}
+
+        message = f"已采集 {offset}" + (f"/{self.total}" if self.total else '') + f" 个好友，{rate:.1f} 个/秒"
+        if eta is not None:
+            message += f"，预计剩余 {eta:.0f} 秒"
+        Logger.info(message)
+        if self.progress:
+            self.progress(info)
+        return info
+
+    def run(self, max_count: Optional[int] = None) -> Dict:
+        """
+        run 功能说明:
+        分块采集好友，从断点继续。获取失败且重试用尽时返回失败，断点保留，再次运行即可继续
+        输入: max_count (int, 可选) 最多采集数量 | 输出: Dict 采集结果（friends/resumed_from/complete）
+        """
+        friends, complete = self._load_checkpoint()
+        resumed_from = len(friends)
+        result = {'success': True, 'friends': friends, 'resumed_from': resumed_from, 'complete': complete}
+        if complete:
+            Logger.info(f"上次采集已完成但尚未合并，直接使用断点中的 {resumed_from} 个好友")
+            return result
+        if resumed_from:
+            Logger.info(f"从断点继续采集好友详细信息，已完成 {resumed_from} 个")
+
+        started = self.clock()
+        fetched = 0
+        while max_count is None or len(friends) < max_count:
+            offset = len(friends)
+            limit = self.chunk_size if max_count is None else min(self.chunk_size, max_count - offset)
+            try:
+                chunk = self._fetch_with_retry(offset, limit)
+            except Exception as e:
+                Logger.error(f"采集好友详细信息中断（已保存断点，重新运行可继续）: {str(e)}")
+                result.update(success=False, error=str(e))
+                return result
+
+            friends.extend(chunk)
+            fetched += len(chunk)
+            complete = len(chunk) < limit or (max_count is not None and len(friends) >= max_count)
+            self._save_chunk(chunk, len(friends), complete)
+            self._report(len(friends), fetched, started)
+            if complete:
+                break
+
+        result['complete'] = True
+        return result
+
+    def clear(self) -> None:
+        """
+        clear 功能说明:
+        删除断点文件和断点数据文件
+        输入: 无 | 输出: 无
+        """
+        for path in (self.checkpoint_file, self.data_file):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,40 +1,97 @@
 ##########message_sender.py: [消息发送管理器] ##################
 # 变更记录: [2024-12-19 14:30] @李祥光 [初始创建]########
 # 变更记录: [2025-06-29 09:47] @李祥光 [修复wxauto V2 API兼容性，移除SendTypingText方法]########
+# 变更记录: [2026-10-17 09:40] @李祥光 [send_by_tag支持标签布尔表达式，收件人去重]########
+# 变更记录: [2026-10-17 18:30] @李祥光 [按标签发送保存为持久化发送任务，逐个记录发送状态，新增断点续发resume_job]########
+# 变更记录: [2026-10-17 19:10] @李祥光 [固定间隔sleep改为自适应限速器，修复发送间隔读取wechat.send_interval而默认配置为message.send_interval的问题]########
+# 变更记录: [2026-10-17 19:50] @李祥光 [实现失败重试：失败分类、指数退避并与主流程交替重试，失败记录保存消息内容；修复重试次数配置键不一致]########
+# 变更记录: [2026-10-17 20:30] @李祥光 [新增持久化发送账本，按收件人+内容哈希+活动ID去重，重复运行时跳过已成功的收件人]########
+# 变更记录: [2026-10-17 21:10] @李祥光 [支持消息模板（联系人/好友详细信息字段和条件块），发送前校验所有收件人字段，发送时逐个渲染]########
+# 变更记录: [2026-10-17 21:50] @李祥光 [批量发送支持stop回调暂停（定时发送窗口关闭时），send_by_tag支持跳过确认]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [微信调用改为通过传输层，不再直接导入wxauto；收到限流响应时限速器立即降速，发送耗时使用限速器时钟]########
+# 变更记录: [2026-10-17 23:10] @李祥光 [配置wechat.accounts多个账号时通过AccountDispatcher分发到多个账号并行发送；批量发送结果返回暂停时剩余的收件人]########
+# 变更记录: [2026-10-17 23:50] @李祥光 [批量发送支持进度回调和可打断的等待；send_by_tag的收件人查询和校验拆分为prepare_send，供异步接口复用]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [send_by_tag新增dry_run预估模式：渲染并检查所有消息，在虚拟时钟上模拟发送节奏，预估耗时、每小时发送量和完成时间]########
+# 变更记录: [2026-10-18 10:50] @李祥光 [纯文本消息按处理 {{ }} 转义后的文本发送，续发和预估与首次发送一致]########
+# 变更记录: [2026-10-18 11:20] @李祥光 [模板发送的失败记录保存模板原文，手动重试时重新渲染，不再把未渲染的模板发给联系人；失败记录分组改为一次遍历]########
+# 变更记录: [2026-10-18 13:10] @李祥光 [发送账本首次使用时才打开，打开时按message.ledger_keep_days清理过期记录]########
+# 变更记录: [2026-10-18 17:20] @李祥光 [账本清理保留活动记录，同一活动重复运行不重发的保证不受保留期影响]########
 # 输入: 标签和消息内容 | 输出: 发送结果状态###############
 
-import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Optional, Any
-from wxauto import WeChat
+from typing import List, Dict, Optional, Any, Union, Callable
 from .logger import Logger
 from .contact_manager import ContactManager
+from .tag_query import TagQueryError
+from .outbox import Outbox, OutboxJob, SENT, FAILED, SKIPPED
+from .rate_limiter import create_rate_limiter, SendInterrupted
+from .retry_scheduler import RetryScheduler, RateLimitedError, classify_error
+from .send_ledger import SendLedger, content_hash
+from .message_template import MessageTemplate, TemplateError, build_context, CONTACT_FIELDS
+from .transport import create_transport
+from .account_dispatcher import AccountDispatcher
+from .campaign_simulator import CampaignSimulator
 from config.settings import config
 
 ###########################文件下的所有函数###########################
 """
 MessageSender.__init__：初始化消息发送器
 MessageSender.send_by_tag：按标签发送消息
+MessageSender.prepare_send：发送前查询收件人、编译模板并校验所有收件人的字段
+MessageSender.job_meta：生成发送任务的附加信息（活动ID、是否为模板）
+MessageSender.simulate_send：预估发送（不连接微信）：渲染检查所有消息并模拟发送节奏
 MessageSender.send_to_contact：发送消息给指定联系人
 MessageSender.send_batch_messages：批量发送消息
+MessageSender._send_batch：配置多个账号时分发到多个账号发送，否则由当前账号批量发送
 MessageSender.validate_message：验证消息内容
+MessageSender.validate_template：发送前检查所有收件人的模板字段
+MessageSender._template_context：生成单个收件人的模板字段
+MessageSender._get_friend_details：模板引用好友详细信息字段时加载好友详细信息
+MessageSender.ledger：首次使用时打开发送账本并清理过期记录
 MessageSender.get_send_statistics：获取发送统计
-MessageSender.retry_failed_sends：重试失败的发送
+MessageSender.retry_failed_sends：用保存的消息内容重发失败的收件人（模板发送重新渲染）
+MessageSender._create_retry_scheduler：根据配置创建重试调度器
+MessageSender.resume_job：从断点继续发送未完成的发送任务
 """
 ###########################文件下的所有函数###########################
 
 #########mermaid格式说明所有函数的调用关系说明开始#########
 """
 flowchart TD
-    A[send_by_tag/按标签发送消息] --> B[get_contacts_by_tag/获取标签下的联系人列表]
+    A[send_by_tag/按标签发送消息] --> P[prepare_send/发送前准备]
+    A -->|dry_run| DR[simulate_send/预估发送]
+    DR --> P
+    DR --> DR2[SendLedger.sent_recipients/统计会跳过的收件人]
+    DR --> DR3[CampaignSimulator.run/虚拟时钟模拟限速、重试和发送时段]
+    P --> B[query_contacts/按标签表达式获取去重后的联系人列表]
     B --> C[validate_message/验证消息内容格式]
-    C --> D[send_batch_messages/批量发送消息]
-    D --> E[send_to_contact/发送消息给单个联系人]
-    E --> F[SendMsg/调用微信发送接口]
+    C --> T[MessageTemplate/编译消息模板]
+    T --> T2[validate_template/检查所有收件人的模板字段]
+    T2 --> C2[Outbox.create_job/保存发送任务]
+    C2 --> SB[_send_batch]
+    SB -->|配置了多个账号| AD[AccountDispatcher.dispatch/按账号分组并行发送]
+    AD --> D
+    SB -->|单账号| D[send_batch_messages/批量发送消息]
+    R[resume_job/断点续发] --> R2[Outbox.load_job/恢复收件人状态]
+    R2 --> SB
+    D --> L[SendLedger.already_sent/同一活动或去重窗口内已发送则跳过]
+    L --> LO[ledger 首次使用时打开账本并清理过期记录 prune]
+    D --> PG[progress/每个收件人有结果时回调进度，未传入时打印进度]
+    L --> D2[RateLimiter.acquire/按自适应限速等待]
+    D2 --> T3[MessageTemplate.render/渲染该收件人的消息]
+    D2 --> E[send_to_contact/发送消息给单个联系人]
+    E --> E2[OutboxJob.mark/追加记录发送状态]
+    E --> E3[RateLimiter.record/按失败率和耗时调整间隔]
+    E --> F[WeChatTransport.SendMsg/通过传输层调用微信发送接口]
+    F -->|限流响应| F2[RateLimiter.penalize/立即降速]
     F --> G{发送成功?}
-    G -->|是| H[Logger.info/记录成功日志]
-    G -->|否| I[retry_failed_sends/重试失败的发送]
-    I --> E
+    G -->|是| H[SendLedger.record/写入发送账本]
+    G -->|否| I[RetryScheduler.schedule/暂时性失败按指数退避排队]
+    I -->|到期| D
+    I -->|永久失败或次数用尽| J[failed_contacts/记录失败及消息内容或模板原文]
+    J --> K[retry_failed_sends/手动重发，模板按联系人重新渲染]
+    K --> D
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
 
@@ -51,10 +108,26 @@ class MessageSender:
         初始化消息发送器
         输入: 无 | 输出: 无
         """
+        # 微信传输层（wechat.transport 配置），首次发送时创建，测试时可直接注入
         self.wx = None
         self.contact_manager = ContactManager()
-        self.send_interval = config.get('wechat.send_interval', 1.0)
-        self.max_retry = config.get('wechat.max_retry', 3)
+        # 默认配置中发送间隔位于 message.send_interval，旧配置文件可能写在 wechat.send_interval
+        self.send_interval = config.get('message.send_interval', config.get('wechat.send_interval', 2.0))
+        self.rate_limiter = create_rate_limiter(config, self.send_interval)
+        # 默认配置中重试次数位于 message.retry_count，兼容旧配置 wechat.max_retry
+        self.max_retry = config.get('message.retry_count', config.get('wechat.max_retry', 3))
+        self.retry_base_delay = config.get('message.retry.base_delay', 5.0)
+        self.retry_max_delay = config.get('message.retry.max_delay', 300.0)
+        self.retry_jitter = config.get('message.retry.jitter', 0.5)
+        # 发送任务和每个收件人的发送状态保存在数据目录，崩溃后可从断点继续
+        self.outbox = Outbox(config.get('message.outbox_dir', 'data/outbox'))
+        # 发送账本跨运行记录已成功发送的收件人，重复运行同一活动或窗口内重复发送相同内容时跳过；
+        # 首次使用时才打开，只创建发送器（如查看配置、运行测试）时不会创建数据库文件
+        self._ledger: Optional[SendLedger] = None
+        # 好友详细信息只在消息模板引用其字段时才加载
+        self.friend_details = None
+        # 配置了多个已登录账号时，每个活动的收件人分发到各账号并行发送，每个账号独立限速
+        self.dispatcher = AccountDispatcher.from_config(self, config) if config.get('wechat.accounts') else None
         self.send_statistics = {
             'total': 0,
             'success': 0,
@@ -64,16 +137,36 @@ class MessageSender:
             'failed_contacts': []
         }
     
+    @property
+    def ledger(self) -> SendLedger:
+        """
+        ledger 功能说明:
+        首次使用时在 message.ledger_file 打开发送账本，并清理超过 message.ledger_keep_days 且不属于任何活动的记录；
+        测试时可直接赋值替换
+        输入: 无 | 输出: SendLedger 发送账本
+        """
+        if self._ledger is None:
+            self._ledger = SendLedger(config.get('message.ledger_file', 'data/send_ledger.db'),
+                                      config.get('message.dedupe_window_hours', 24))
+            self._ledger.prune(config.get('message.ledger_keep_days', 90))
+        return self._ledger
+    
+    @ledger.setter
+    def ledger(self, ledger: SendLedger) -> None:
+        self._ledger = ledger
+    
     def _init_wechat(self) -> bool:
         """
         _init_wechat 功能说明:
-        初始化微信客户端连接
+        初始化微信传输层并连接客户端
         输入: 无 | 输出: bool 初始化是否成功
         """
         try:
             if self.wx is None:
                 Logger.info("正在连接微信客户端...")
-                self.wx = WeChat()
+                transport = create_transport()
+                transport.connect()
+                self.wx = transport
                 Logger.info("微信客户端连接成功")
             return True
         except Exception as e:
@@ -108,6 +201,43 @@ class MessageSender:
         
         return result
     
+    def _get_friend_details(self):
+        """
+        _get_friend_details 功能说明:
+        获取好友详细信息管理器，首次使用时从数据文件加载
+        输入: 无 | 输出: FriendDetailsManager 好友详细信息管理器
+        """
+        if self.friend_details is None:
+            # 延迟导入：只有模板用到好友详细信息字段时才需要加载好友数据
+            from .friend_details import FriendDetailsManager
+            self.friend_details = FriendDetailsManager(config.get('friend_details.data_file', 'data/friend_details.json'))
+        return self.friend_details
+    
+    def _template_context(self, template: MessageTemplate, contact: Dict) -> Dict:
+        """
+        _template_context 功能说明:
+        生成单个收件人的模板字段，模板只引用联系人字段时不查询好友详细信息
+        输入: template (MessageTemplate) 消息模板, contact (Dict) 联系人 | 输出: Dict 模板字段
+        """
+        friend = None
+        if not template.fields <= CONTACT_FIELDS:
+            friend = self._get_friend_details().get_friend_by_name(contact['name'])
+        return build_context(contact, friend)
+    
+    def validate_template(self, template: MessageTemplate, contacts: List[Dict]) -> Dict[str, Any]:
+        """
+        validate_template 功能说明:
+        发送前检查所有收件人是否都有模板的必填字段（无默认值且不在对应条件块内的占位符）
+        输入: template (MessageTemplate) 消息模板, contacts (List[Dict]) 联系人列表 | 输出: Dict[str, Any] 验证结果
+        """
+        missing = template.validate((contact['name'], self._template_context(template, contact))
+                                    for contact in contacts)
+        result = {'valid': not missing, 'message': '', 'missing': missing}
+        if missing:
+            details = [f"{field}（{len(names)}人，如 {'、'.join(names[:3])}）" for field, names in sorted(missing.items())]
+            result['message'] = '模板字段缺失: ' + '; '.join(details) + '。可使用 {字段|默认值} 或 {#if 字段}...{/if}'
+        return result
+    
     def send_to_contact(self, contact_name: str, message: str) -> Dict[str, Any]:
         """
         send_to_contact 功能说明:
@@ -118,6 +248,8 @@ class MessageSender:
             'success': False,
             'contact': contact_name,
             'message': '',
+            'retryable': True,
+            'rate_limited': False,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -149,121 +281,320 @@ class MessageSender:
             
         except Exception as e:
             result['message'] = f'发送异常: {str(e)}'
+            result['retryable'] = classify_error(e)
+            result['rate_limited'] = isinstance(e, RateLimitedError)
             Logger.error(f"发送消息给 {contact_name} 时出现异常: {str(e)}")
         
         return result
     
-    def send_batch_messages(self, contacts: List[Dict], message: str) -> Dict[str, Any]:
+    def _create_retry_scheduler(self) -> RetryScheduler:
+        """
+        _create_retry_scheduler 功能说明:
+        根据配置创建重试调度器，与限速器共用计时和等待函数
+        输入: 无 | 输出: RetryScheduler 重试调度器
+        """
+        return RetryScheduler(
+            max_retries=self.max_retry,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay,
+            jitter=self.retry_jitter,
+            clock=self.rate_limiter.clock,
+            sleep=self.rate_limiter.sleep
+        )
+    
+    def send_batch_messages(self, contacts: List[Dict], message: Union[str, MessageTemplate],
+                            job: Optional[OutboxJob] = None, campaign_id: Optional[str] = None,
+                            stop: Optional[Callable[[], bool]] = None,
+                            progress: Optional[Callable[[Dict], None]] = None,
+                            sleep: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
         """
         send_batch_messages 功能说明:
-        批量发送消息给联系人列表
-        输入: contacts (List[Dict]) 联系人列表, message (str) 消息内容 | 输出: Dict[str, Any] 批量发送结果
+        批量发送消息给联系人列表。message 为 MessageTemplate 时发送到每个收件人时才渲染该收件人的消息；
+        发送账本中同一活动已成功、或去重窗口内已收到相同内容的收件人直接跳过；
+        暂时性失败按指数退避排队，到期后优先于新收件人重发，永久失败或重试次数用尽后才记为失败；
+        传入发送任务时每个收件人有最终结果后记录一次状态；每个收件人发送前 stop 返回 True 时暂停，
+        未发送和等待重试的收件人在发送任务中保持待发送状态，可通过 resume_job 续发。
+        传入 progress 时每个收件人发送成功、失败、跳过或排队重试后回调一次进度事件（不再打印进度）；
+        传入的 sleep 在等待中抛出 SendInterrupted 时，正在等待的收件人放回队列并立即按 stop 暂停
+        输入: contacts (List[Dict]) 联系人列表, message (str/MessageTemplate) 消息内容或已编译的模板,
+              job (OutboxJob, 可选) 发送任务, campaign_id (str, 可选) 活动ID,
+              stop (Callable, 可选) 暂停判断, progress (Callable, 可选) 进度回调,
+              sleep (Callable, 可选) 替换限速和重试的等待函数 | 输出: Dict[str, Any] 批量发送结果
         """
         self.send_statistics = {
             'total': len(contacts),
             'success': 0,
             'failed': 0,
+            'skipped': 0,
+            'retries': 0,
             'start_time': datetime.now(),
             'end_time': None,
             'failed_contacts': []
         }
         
         Logger.info(f"开始批量发送消息，目标联系人数: {len(contacts)}")
+        job_index = {name: index for index, name in enumerate(job.recipients)} if job else {}
+        retries = self._create_retry_scheduler()
+        queue = deque(contact['name'] for contact in contacts)
+        # 模板按模板原文去重，收件人字段变化（如修改备注）不会导致重复发送
+        template = message if isinstance(message, MessageTemplate) else None
+        by_name = {contact['name']: contact for contact in contacts} if template else {}
+        digest = content_hash(template.source if template else message)
+        done = 0
+        paused = False
+        
+        def notify(kind: str, contact_name: str, **extra) -> None:
+            if progress is not None:
+                progress({'type': kind, 'contact': contact_name, 'done': done, 'total': len(contacts), **extra})
         
-        for i, contact in enumerate(contacts, 1):
-            contact_name = contact['name']
+        while queue or len(retries):
+            if stop is not None and stop():
+                paused = True
+                Logger.info(f"批量发送已暂停，剩余 {len(contacts) - done} 个收件人待发送")
+                break
+            
+            # 下一个发送时机已到期的重试优先，其次是新收件人，都没有时等待最早的重试到期
+            contact_name = retries.pop_due(self.rate_limiter.next_delay())
+            is_retry = contact_name is not None
+            if contact_name is None:
+                if not queue:
+                    try:
+                        retries.wait_next(sleep)
+                    except SendInterrupted:
+                        pass
+                    continue
+                contact_name = queue.popleft()
+                if self.ledger.already_sent(contact_name, digest, campaign_id):
+                    done += 1
+                    self.send_statistics['skipped'] += 1
+                    Logger.info(f"{contact_name} 已收到过相同消息，跳过")
+                    if job is not None and contact_name in job_index:
+                        job.mark(job_index[contact_name], SKIPPED)
+                    notify('skipped', contact_name)
+                    continue
             
             # 显示进度
-            print(f"\r📤 发送进度: {i}/{len(contacts)} - {contact_name}", end='', flush=True)
+            if progress is None:
+                print(f"\r📤 发送进度: {done + 1}/{len(contacts)} - {contact_name}", end='', flush=True)
             
-            # 发送消息
-            send_result = self.send_to_contact(contact_name, message)
+            # 模板在发送到该收件人时才渲染；渲染失败（发送前校验后字段又被修改）视为永久失败
+            text, send_result = message, None
+            if template is not None:
+                try:
+                    text = template.render(self._template_context(template, by_name[contact_name]))
+                except TemplateError as e:
+                    text = None
+                    send_result = {'success': False, 'contact': contact_name, 'message': f'模板渲染失败: {str(e)}',
+                                   'retryable': False, 'timestamp': datetime.now().isoformat()}
+            
+            if send_result is None:
+                # 按限速器等待，等待时间已扣除上一次发送本身的耗时；等待中被打断时放回该收件人后暂停
+                try:
+                    self.rate_limiter.acquire(sleep)
+                except SendInterrupted:
+                    if is_retry:
+                        retries.requeue(contact_name)
+                    else:
+                        queue.appendleft(contact_name)
+                    continue
+                if is_retry:
+                    self.send_statistics['retries'] += 1
+                started = self.rate_limiter.clock()
+                send_result = self.send_to_contact(contact_name, text)
+                self.rate_limiter.record(send_result['success'], self.rate_limiter.clock() - started)
+                if send_result.get('rate_limited'):
+                    self.rate_limiter.penalize('微信返回发送过于频繁')
+            
+            # 暂时性失败且未用尽重试次数时排队重试，暂不记录最终结果
+            if not send_result['success'] and send_result.get('retryable', True) and \
+                    retries.schedule(contact_name, send_result['message']):
+                notify('retry', contact_name, error=send_result['message'], attempt=retries.attempts[contact_name])
+                continue
+            
+            done += 1
+            if job is not None and contact_name in job_index:
+                job.mark(job_index[contact_name], SENT if send_result['success'] else FAILED,
+                         '' if send_result['success'] else send_result['message'])
             
             if send_result['success']:
                 self.send_statistics['success'] += 1
+                self.ledger.record(contact_name, digest, campaign_id)
             else:
                 self.send_statistics['failed'] += 1
-                self.send_statistics['failed_contacts'].append({
+                # message 为发送的文本（模板渲染失败时为 None），模板发送另存模板原文，重试时重新渲染
+                failure = {
                     'name': contact_name,
                     'error': send_result['message'],
+                    'message': text,
+                    'attempts': retries.attempts.get(contact_name, 0) + 1,
+                    'retryable': send_result.get('retryable', True),
                     'timestamp': send_result['timestamp']
-                })
-            
-            # 发送间隔
-            if i < len(contacts):  # 最后一个不需要等待
-                time.sleep(self.send_interval)
+                }
+                if template is not None:
+                    failure['template'] = template.source
+                self.send_statistics['failed_contacts'].append(failure)
+            notify('sent' if send_result['success'] else 'failed', contact_name,
+                   error='' if send_result['success'] else send_result['message'])
         
-        print()  # 换行
+        if progress is None:
+            print()  # 换行
+        # 暂停时尚未发送和等待重试的收件人，多账号分发时转交给其他账号
+        remaining = list(queue) + retries.pending() if paused else []
         self.send_statistics['end_time'] = datetime.now()
+        if job is not None:
+            job.finish()
+            job.close()
         
         # 记录统计信息
         duration = (self.send_statistics['end_time'] - self.send_statistics['start_time']).total_seconds()
-        Logger.info(f"批量发送完成 - 成功: {self.send_statistics['success']}, 失败: {self.send_statistics['failed']}, 耗时: {duration:.1f}秒")
+        Logger.info(f"批量发送完成 - 成功: {self.send_statistics['success']}, 失败: {self.send_statistics['failed']}, "
+                    f"跳过: {self.send_statistics['skipped']}, 重试: {self.send_statistics['retries']}, 耗时: {duration:.1f}秒")
         
         return {
-            'success': self.send_statistics['failed'] == 0,
+            'success': self.send_statistics['failed'] == 0 and not paused,
+            'paused': paused,
             'total': self.send_statistics['total'],
             'success_count': self.send_statistics['success'],
             'failed_count': self.send_statistics['failed'],
+            'skipped_count': self.send_statistics['skipped'],
+            'retry_count': self.send_statistics['retries'],
             'failed_contacts': self.send_statistics['failed_contacts'],
+            'remaining': remaining,
             'duration': duration
         }
     
-    def send_by_tag(self, tag: str, message: str) -> Dict[str, Any]:
+    def _send_batch(self, contacts: List[Dict], message: Union[str, MessageTemplate], **kwargs) -> Dict[str, Any]:
         """
-        send_by_tag 功能说明:
-        按标签发送消息给所有匹配的联系人
-        输入: tag (str) 标签名, message (str) 消息内容 | 输出: Dict[str, Any] 发送结果
+        _send_batch 功能说明:
+        配置了多个账号时分发到多个账号并行发送，否则由当前账号批量发送，参数和返回值与 send_batch_messages 一致
+        输入: contacts (List[Dict]) 联系人列表, message (str/MessageTemplate) 消息内容或模板,
+              kwargs job/campaign_id/stop | 输出: Dict[str, Any] 批量发送结果
+        """
+        if self.dispatcher is not None:
+            return self.dispatcher.dispatch(contacts, message, **kwargs)
+        return self.send_batch_messages(contacts, message, **kwargs)
+    
+    def prepare_send(self, tag: str, message: str, confirm: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        prepare_send 功能说明:
+        发送前准备：验证消息内容、编译模板、按标签表达式查询收件人并检查所有收件人的模板字段，
+        需要时显示收件人和示例消息并等待确认。不连接微信、不创建发送任务
+        输入: tag (str) 标签名或标签表达式, message (str) 消息内容或模板,
+              confirm (bool, 可选) 是否发送前确认，默认读取 message.confirm_before_send |
+              输出: Dict[str, Any] 成功时包含 contacts 收件人、template 编译后的模板和 payload 发送内容，失败时包含 error
         """
+        # 验证消息内容
+        validation = self.validate_message(message)
+        if not validation['valid']:
+            return {
+                'success': False,
+                'error': validation['message'],
+                'count': 0
+            }
+        
+        # 显示警告信息
+        for warning in validation['warnings']:
+            Logger.warning(warning)
+        
+        # 编译消息模板，语法错误在查询联系人之前返回
         try:
-            # 验证消息内容
-            validation = self.validate_message(message)
-            if not validation['valid']:
+            template = MessageTemplate(message)
+        except TemplateError as e:
+            return {
+                'success': False,
+                'error': f'消息模板错误: {str(e)}',
+                'count': 0
+            }
+        
+        # 获取标签表达式对应的联系人（已去重，保持联系人原有顺序）
+        try:
+            contacts = self.contact_manager.query_contacts(tag)
+        except TagQueryError as e:
+            return {
+                'success': False,
+                'error': f'标签表达式错误: {str(e)}',
+                'count': 0
+            }
+        
+        if not contacts:
+            return {
+                'success': False,
+                'error': f'标签 "{tag}" 没有匹配的联系人',
+                'count': 0
+            }
+        
+        # 发送第一条消息前检查所有收件人的模板字段
+        if not template.is_static:
+            template_check = self.validate_template(template, contacts)
+            if not template_check['valid']:
                 return {
                     'success': False,
-                    'error': validation['message'],
+                    'error': template_check['message'],
+                    'missing_fields': template_check['missing'],
                     'count': 0
                 }
+        
+        # 确认发送（如果配置启用）
+        if confirm if confirm is not None else config.get('message.confirm_before_send', True):
+            print(f"\n📋 即将发送消息给标签 '{tag}' 的 {len(contacts)} 个联系人:")
+            for contact in contacts:
+                print(f"  • {contact['name']}")
             
-            # 显示警告信息
-            for warning in validation['warnings']:
-                Logger.warning(warning)
-            
-            # 获取标签对应的联系人
-            contacts = self.contact_manager.get_contacts_by_tag(tag)
+            print(f"\n📝 消息内容:\n{message}\n")
+            if not template.is_static:
+                sample = template.render(self._template_context(template, contacts[0]))
+                print(f"👀 {contacts[0]['name']} 将收到:\n{sample}\n")
             
-            if not contacts:
+            confirm = input("确认发送吗？(y/N): ").strip().lower()
+            if confirm not in ['y', 'yes', '是']:
+                Logger.info("用户取消发送操作")
                 return {
                     'success': False,
-                    'error': f'标签 "{tag}" 没有匹配的联系人',
+                    'error': '用户取消发送',
                     'count': 0
                 }
+        
+        return {
+            'success': True,
+            'contacts': contacts,
+            'template': template,
+            'payload': template.render({}) if template.is_static else template
+        }
+    
+    def send_by_tag(self, tag: str, message: str, campaign_id: Optional[str] = None, confirm: Optional[bool] = None,
+                    stop: Optional[Callable[[], bool]] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        send_by_tag 功能说明:
+        按标签发送消息给所有匹配的联系人，tag 可以是单个标签名，
+        也可以是标签布尔表达式（如 "VIP AND 上海 AND NOT 已退订"），每个联系人只发送一次。
+        message 可以是消息模板（如 "{remark|朋友}您好"），模板只编译一次，发送前检查所有收件人的字段。
+        指定 campaign_id 时，重复运行同一活动永远不会向已成功的收件人重复发送；
+        未指定时按去重窗口（message.dedupe_window_hours）去重。dry_run 为 True 时只预估不发送（见 simulate_send）
+        输入: tag (str) 标签名或标签表达式, message (str) 消息内容或模板, campaign_id (str, 可选) 活动ID,
+              confirm (bool, 可选) 是否发送前确认，默认读取 message.confirm_before_send（定时发送传入 False）,
+              stop (Callable, 可选) 暂停判断, dry_run (bool) 是否只预估 | 输出: Dict[str, Any] 发送结果
+        """
+        if dry_run:
+            return self.simulate_send(tag, message, campaign_id)
+        try:
+            prepared = self.prepare_send(tag, message, confirm)
+            if not prepared['success']:
+                return prepared
+            contacts, template = prepared['contacts'], prepared['template']
             
-            # 确认发送（如果配置启用）
-            if config.get('message.confirm_before_send', True):
-                print(f"\n📋 即将发送消息给标签 '{tag}' 的 {len(contacts)} 个联系人:")
-                for contact in contacts:
-                    print(f"  • {contact['name']}")
-                
-                print(f"\n📝 消息内容:\n{message}\n")
-                
-                confirm = input("确认发送吗？(y/N): ").strip().lower()
-                if confirm not in ['y', 'yes', '是']:
-                    Logger.info("用户取消发送操作")
-                    return {
-                        'success': False,
-                        'error': '用户取消发送',
-                        'count': 0
-                    }
-            
-            # 批量发送
-            result = self.send_batch_messages(contacts, message)
+            # 先保存发送任务再开始发送，中途崩溃后可用 resume_job 继续
+            job = self.outbox.create_job([contact['name'] for contact in contacts], message, tag,
+                                         meta=self.job_meta(template, campaign_id))
+            result = self._send_batch(contacts, prepared['payload'], job=job, campaign_id=campaign_id, stop=stop)
             
             return {
                 'success': result['success'],
+                'paused': result['paused'],
+                'job_id': job.job_id,
                 'count': result['success_count'],
                 'total': result['total'],
                 'failed_count': result['failed_count'],
+                'skipped_count': result['skipped_count'],
                 'failed_contacts': result['failed_contacts'],
                 'duration': result['duration']
             }
@@ -276,39 +607,209 @@ class MessageSender:
                 'count': 0
             }
     
-    def retry_failed_sends(self) -> Dict[str, Any]:
+    def simulate_send(self, tag: str, message: str, campaign_id: Optional[str] = None,
+                      start: Optional[datetime] = None, windows=None, latency: Optional[float] = None,
+                      failure_rate: Optional[float] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        simulate_send 功能说明:
+        预估发送，不连接微信、不创建发送任务：查询收件人并检查模板字段，渲染每个收件人的消息，
+        扣除发送账本中会跳过的收件人，按多账号分配规则分组，再用 CampaignSimulator 在虚拟时钟上模拟
+        当前的限速、重试和发送时段，返回预计耗时、每小时发送量和完成时间。
+        单条发送耗时和失败率默认读取 message.dry_run.latency 和 message.dry_run.failure_rate
+        输入: tag (str) 标签名或标签表达式, message (str) 消息内容或模板, campaign_id (str, 可选) 活动ID,
+              start (datetime, 可选) 开始发送时间，默认当前时间, windows (SendingWindows, 可选) 发送时段，为空表示全天,
+              latency/failure_rate (float, 可选) 假定的单条发送耗时和失败率, seed (int, 可选) 随机数种子 |
+              输出: Dict[str, Any] 预估结果
+        """
+        try:
+            prepared = self.prepare_send(tag, message, confirm=False)
+            if not prepared['success']:
+                return prepared
+            contacts, template = prepared['contacts'], prepared['template']
+            # 与 send_batch_messages 相同的去重内容：模板按模板原文，纯文本按实际发送的文本
+            payload = prepared['payload']
+            skip = self.ledger.sent_recipients(content_hash(payload if template.is_static else template.source),
+                                               campaign_id)
+            
+            # 渲染每个收件人的消息并检查内容，纯文本消息只检查一次
+            to_send: List[Dict] = []
+            render_errors: Dict[str, str] = {}
+            samples: List[Dict[str, str]] = []
+            lengths = {'min': None, 'max': 0, 'total': 0, 'long': 0, 'empty': 0}
+            for contact in contacts:
+                if contact['name'] in skip:
+                    continue
+                if template.is_static:
+                    text = payload
+                else:
+                    try:
+                        text = template.render(self._template_context(template, contact))
+                    except TemplateError as e:
+                        render_errors[contact['name']] = str(e)
+                        continue
+                size = len(text)
+                lengths['min'] = size if lengths['min'] is None else min(lengths['min'], size)
+                lengths['max'] = max(lengths['max'], size)
+                lengths['total'] += size
+                lengths['long'] += size > 1000
+                lengths['empty'] += not text.strip()
+                if len(samples) < 3:
+                    samples.append({'name': contact['name'], 'message': text})
+                to_send.append(contact)
+            
+            # 多账号时按实际的分配规则统计每个账号的收件人数
+            if self.dispatcher is not None:
+                load: Dict[str, int] = {}
+                for contact in to_send:
+                    owner = self.dispatcher.owner(contact, load=load)
+                    load[owner] = load.get(owner, 0) + 1
+                counts = [load.get(name, 0) for name in self.dispatcher.accounts]
+            else:
+                counts = [len(to_send)]
+            
+            simulator = CampaignSimulator.from_sender(
+                self, windows,
+                latency=latency if latency is not None else config.get('message.dry_run.latency', 1.0),
+                failure_rate=failure_rate if failure_rate is not None else config.get('message.dry_run.failure_rate', 0.0),
+                seed=seed
+            )
+            estimate = simulator.run(counts, start)
+            if not estimate['success']:
+                return {'success': False, 'dry_run': True, 'error': estimate['error'], 'count': 0}
+            Logger.info(f"预估发送 {len(to_send)} 个收件人，预计耗时 {estimate['duration'] / 3600:.1f} 小时，"
+                        f"完成时间 {estimate['finish_at']}")
+            return {
+                'success': not render_errors and not lengths['empty'],
+                'dry_run': True,
+                'count': 0,
+                'total': len(contacts),
+                'to_send': len(to_send),
+                'skipped_count': len(contacts) - len(to_send) - len(render_errors),
+                'render_errors': render_errors,
+                'message_length': {'min': lengths['min'] or 0, 'max': lengths['max'],
+                                   'avg': lengths['total'] / len(to_send) if to_send else 0.0},
+                'long_messages': lengths['long'],
+                'empty_messages': lengths['empty'],
+                'samples': samples,
+                'estimate': estimate
+            }
+            
+        except Exception as e:
+            Logger.error(f"预估发送失败: {str(e)}")
+            return {
+                'success': False,
+                'dry_run': True,
+                'error': str(e),
+                'count': 0
+            }
+    
+    @staticmethod
+    def job_meta(template: MessageTemplate, campaign_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        job_meta 功能说明:
+        生成发送任务的附加信息：活动ID，以及消息是否为模板（续发时需要重新渲染）
+        输入: template (MessageTemplate) 编译后的消息, campaign_id (str, 可选) 活动ID | 输出: Optional[Dict] 附加信息
+        """
+        meta = {'campaign_id': campaign_id} if campaign_id else {}
+        if not template.is_static:
+            meta['template'] = True
+        return meta or None
+    
+    def retry_failed_sends(self, include_permanent: bool = False) -> Dict[str, Any]:
         """
         retry_failed_sends 功能说明:
-        重试失败的消息发送
-        输入: 无 | 输出: Dict[str, Any] 重试结果
+        用失败记录中保存的消息内容重发上一批发送中最终失败的收件人（同样按退避重试），
+        模板发送按模板原文和联系人当前字段重新渲染（字段仍缺失时再次记为失败，不会发出未渲染的模板）；
+        默认跳过联系人不存在等永久失败
+        输入: include_permanent (bool) 是否同时重发永久失败的收件人 | 输出: Dict[str, Any] 重试结果
         """
-        if not self.send_statistics['failed_contacts']:
+        failed: List[Dict] = []
+        still_failed: List[Dict] = []
+        for item in self.send_statistics['failed_contacts']:
+            (failed if include_permanent or item.get('retryable', True) else still_failed).append(item)
+        if not failed:
             return {
-                'success': True,
+                'success': not still_failed,
                 'message': '没有需要重试的失败发送',
-                'retry_count': 0
+                'retry_count': 0,
+                'still_failed': still_failed
             }
         
-        Logger.info(f"开始重试 {len(self.send_statistics['failed_contacts'])} 个失败的发送")
+        Logger.info(f"开始重试 {len(failed)} 个失败的发送")
+        
+        # 按消息内容分组重发，模板按模板原文分组
+        groups: Dict[tuple, List[Dict]] = {}
+        for item in failed:
+            if item.get('template') is not None:
+                contact = self.contact_manager.get_contact(item['name']) or {'name': item['name']}
+                groups.setdefault(('template', item['template']), []).append(contact)
+            else:
+                groups.setdefault(('text', item['message']), []).append({'name': item['name']})
         
         retry_success = 0
-        still_failed = []
+        for (kind, message), contacts in groups.items():
+            payload = MessageTemplate(message) if kind == 'template' else message
+            result = self._send_batch(contacts, payload)
+            retry_success += result['success_count']
+            still_failed.extend(result['failed_contacts'])
         
-        for failed_contact in self.send_statistics['failed_contacts']:
-            contact_name = failed_contact['name']
-            
-            # 这里需要重新获取消息内容，实际使用时可能需要传入参数
-            # 暂时跳过重试逻辑的具体实现
-            Logger.info(f"重试发送给: {contact_name}")
-            
-            # TODO: 实现具体的重试逻辑
-            
+        self.send_statistics['failed_contacts'] = still_failed
         return {
             'success': len(still_failed) == 0,
             'retry_count': retry_success,
             'still_failed': still_failed
         }
     
+    def resume_job(self, job_id: str, include_failed: bool = False,
+                   stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """
+        resume_job 功能说明:
+        从断点继续发送任务：只发送状态仍为待发送的收件人，已发送的收件人不会重复发送
+        输入: job_id (str) 任务ID, include_failed (bool) 是否同时重发失败的收件人,
+              stop (Callable, 可选) 暂停判断 | 输出: Dict[str, Any] 发送结果
+        """
+        try:
+            job = self.outbox.load_job(job_id)
+        except Exception as e:
+            Logger.error(f"加载发送任务 {job_id} 失败: {str(e)}")
+            return {'success': False, 'error': str(e), 'count': 0}
+        
+        pending = job.pending(include_failed=include_failed)
+        before = job.summary()
+        Logger.info(f"续发任务 {job_id}: 已发送 {before['sent']}/{before['total']}，本次发送 {len(pending)} 个")
+        meta = job.header.get('meta', {})
+        if pending:
+            message: Union[str, MessageTemplate] = MessageTemplate(job.message)
+            contacts = [{'name': name} for _, name in pending]
+            if not meta.get('template'):
+                # 纯文本任务与首次发送相同，发送处理 {{ }} 转义后的文本
+                message = message.render({})
+            else:
+                # 模板任务需要联系人字段才能渲染，续发前同样先检查字段
+                contacts = [self.contact_manager.get_contact(name) or {'name': name} for _, name in pending]
+                template_check = self.validate_template(message, contacts)
+                if not template_check['valid']:
+                    job.close()
+                    return {'success': False, 'job_id': job_id, 'error': template_check['message'],
+                            'missing_fields': template_check['missing'], 'count': 0}
+            result = self._send_batch(contacts, message, job=job, campaign_id=meta.get('campaign_id'), stop=stop)
+        else:
+            job.finish()
+            result = {'paused': False, 'success_count': 0, 'failed_count': 0, 'skipped_count': 0, 'failed_contacts': [], 'duration': 0.0}
+        
+        summary = job.summary()
+        return {
+            'success': summary['pending'] == 0 and summary['failed'] == 0,
+            'paused': result['paused'],
+            'job_id': job_id,
+            'count': result['success_count'],
+            'failed_count': result['failed_count'],
+            'skipped_count': result['skipped_count'],
+            'failed_contacts': result['failed_contacts'],
+            'duration': result['duration'],
+            'job': summary
+        }
+    
     def get_send_statistics(self) -> Dict[str, Any]:
         """
         get_send_statistics 功能说明:
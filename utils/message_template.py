@@ -0,0 +1,257 @@
+##########message_template.py: [消息模板模块] ##################
+# 变更记录: [2026-10-17 21:10] @李祥光 [初始创建，支持占位符、默认值和条件块，模板编译一次后逐个收件人渲染]########
+# 变更记录: [2026-10-18 10:50] @李祥光 [只有已知的联系人/好友字段或带默认值的花括号才是占位符，其他花括号原样保留，兼容含花括号的纯文本消息]########
+# 输入: 模板文本和收件人字段 | 输出: 每个收件人的消息内容###############
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .sqlite_store import first_field, FRIEND_ID_FIELDS, FRIEND_NICKNAME_FIELDS, FRIEND_REMARK_FIELDS
+
+###########################文件下的所有函数###########################
+"""
+TemplateError：模板语法错误或渲染时缺少字段
+MessageTemplate.__init__：编译模板为片段列表
+MessageTemplate._tokenize：将模板切分为文本和标记
+MessageTemplate._parse：解析模板文本，处理条件块嵌套
+MessageTemplate._collect_fields：收集模板引用的字段和必填字段
+MessageTemplate.missing_fields：检查单个收件人缺少的必填字段
+MessageTemplate.validate：发送前检查所有收件人缺少的必填字段
+MessageTemplate.render：渲染单个收件人的消息（纯文本消息返回处理转义后的文本）
+MessageTemplate._render：递归渲染片段列表
+build_context：由联系人和好友详细信息生成模板字段
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[send_by_tag] --> B[MessageTemplate 编译一次]
+    B --> T[_tokenize 已知字段或带默认值的花括号为占位符，其他花括号按原文]
+    T --> C[_parse 文本/占位符/条件块]
+    C --> D[_collect_fields 必填字段]
+    A --> E[validate 所有收件人]
+    E --> F[build_context]
+    E --> G[missing_fields]
+    G -->|有缺失| H[发送前返回错误]
+    G -->|全部通过| I[send_batch_messages]
+    I --> J[render 发送到该收件人时渲染]
+    J --> K[_render]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# {{ 和 }} 输出花括号本身；{字段} 或 {字段|默认值} 为占位符；{#if 字段}...{#else}...{/if} 为条件块，{#if !字段} 表示字段为空时。
+# 没有默认值的 {字段} 只有字段在 TEMPLATE_FIELDS 中时才是占位符，其他如 {ABC123}、{"a":1} 按原文输出
+_TOKEN_PATTERN = re.compile(
+    r'\{\{|\}\}|\{(?:'
+    r'#if\s+(?P<negate>!)?\s*(?P<cond>[^{}\s]+)\s*'
+    r'|(?P<else>#else)'
+    r'|(?P<end>/if)'
+    r'|\s*(?P<field>[^{}|#/\s][^{}|]*?)\s*(?:\|(?P<default>[^{}]*))?'
+    r')\}'
+)
+
+# 联系人本身带有的字段，模板只用到这些字段时不需要加载好友详细信息
+CONTACT_FIELDS = frozenset({'name', 'nickname', 'remark', 'wxid', 'type', 'tags'})
+
+# 可以直接写成 {字段} 的已知字段：联系人字段和微信好友详细信息的常见字段；
+# 其他好友详细信息字段需要写默认值，如 {职位|} 表示为空时不输出
+TEMPLATE_FIELDS = CONTACT_FIELDS | frozenset(
+    FRIEND_NICKNAME_FIELDS + FRIEND_REMARK_FIELDS + FRIEND_ID_FIELDS
+    + ('地区', '性别', '个性签名', '来源', '标签', '电话', '描述', '共同群聊')
+)
+
+class TemplateError(ValueError):
+    """
+    TemplateError 功能说明:
+    模板语法错误，或渲染时缺少必填字段
+    输入: 错误描述 | 输出: 异常对象
+    """
+
+def build_context(contact: Dict, friend: Optional[Dict] = None) -> Dict:
+    """
+    build_context 功能说明:
+    生成模板可用的字段：好友详细信息的原始字段（如 地区、性别）在前，联系人字段覆盖同名字段；
+    name/nickname/remark/wxid 联系人中没有时从好友详细信息的候选字段补全，tags 以顿号连接
+    输入: contact (Dict) 联系人, friend (Dict, 可选) 好友详细信息 | 输出: Dict 模板字段
+    """
+    context = dict(friend) if friend else {}
+    context.update(contact)
+    if friend:
+        for field, candidates in (('nickname', FRIEND_NICKNAME_FIELDS), ('remark', FRIEND_REMARK_FIELDS),
+                                  ('wxid', FRIEND_ID_FIELDS)):
+            if not context.get(field):
+                value = first_field(friend, candidates)
+                if value:
+                    context[field] = value
+    if isinstance(context.get('tags'), (list, tuple, set)):
+        context['tags'] = '、'.join(str(tag) for tag in context['tags'])
+    return context
+
+class MessageTemplate:
+    """
+    MessageTemplate 功能说明:
+    消息模板，例如 "{remark|朋友}您好，{#if 地区}{地区}的{/if}新品已到店"。
+    每个活动只编译一次为片段列表，之后每个收件人渲染只是一次顺序拼接；
+    发送前用 validate 检查所有收件人的必填字段，缺失字段不会在发送中途才暴露。
+    不构成占位符的花括号（单个花括号、未知字段如优惠码 {ABC123}、JSON 文本）按原样输出，与原有的纯文本消息保持兼容
+    输入: source (str) 模板文本 | 输出: 编译后的模板对象
+    """
+
+    def __init__(self, source: str):
+        """
+        __init__ 功能说明:
+        编译模板，条件块不匹配时抛出 TemplateError
+        输入: source (str) 模板文本 | 输出: 无
+        """
+        self.source = source
+        self._tokens = list(self._tokenize(source))
+        self._pos = 0
+        self.parts = self._parse(top=True)
+        self._tokens = []
+
+        # fields 为模板引用的所有字段；required 为没有默认值、也不在对应条件块内的字段
+        self.fields: Set[str] = set()
+        self.required: Set[str] = set()
+        self._collect_fields(self.parts, frozenset())
+        self.is_static = not self.fields
+
+    @staticmethod
+    def _tokenize(source: str) -> Iterable[Tuple]:
+        """
+        _tokenize 功能说明:
+        将模板切分为文本和标记，相邻文本合并；不在 TEMPLATE_FIELDS 中且没有默认值的 {字段} 作为文本原样保留
+        输入: source (str) 模板文本 | 输出: Iterable[Tuple] (类型, 值...)
+        """
+        text = []
+        pos = 0
+        for match in _TOKEN_PATTERN.finditer(source):
+            text.append(source[pos:match.start()])
+            pos = match.end()
+            token = match.group(0)
+            if token in ('{{', '}}'):
+                text.append(token[0])
+                continue
+            field = match.group('field')
+            if field is not None and match.group('default') is None and field not in TEMPLATE_FIELDS:
+                text.append(token)
+                continue
+            if ''.join(text):
+                yield ('text', ''.join(text))
+            text = []
+            if match.group('cond'):
+                yield ('if', match.group('cond'), bool(match.group('negate')))
+            elif match.group('else'):
+                yield ('else',)
+            elif match.group('end'):
+                yield ('end',)
+            else:
+                yield ('field', match.group('field'), match.group('default'))
+        text.append(source[pos:])
+        if ''.join(text):
+            yield ('text', ''.join(text))
+
+    def _parse(self, top: bool = False) -> List:
+        """
+        _parse 功能说明:
+        解析到 {#else}/{/if} 或模板末尾为止的片段列表，遇到 {#if} 时递归解析条件块
+        输入: top (bool) 是否为最外层 | 输出: List 片段列表（str 或 tuple）
+        """
+        parts: List = []
+        while self._pos < len(self._tokens):
+            token = self._tokens[self._pos]
+            kind = token[0]
+            if kind in ('else', 'end'):
+                if top:
+                    raise TemplateError(f'{{{"#else" if kind == "else" else "/if"}}} 没有对应的 {{#if}}')
+                return parts
+            self._pos += 1
+            if kind == 'text':
+                parts.append(token[1])
+            elif kind == 'field':
+                parts.append(('field', token[1], token[2]))
+            else:
+                then_parts = self._parse()
+                else_parts: List = []
+                if self._pos < len(self._tokens) and self._tokens[self._pos][0] == 'else':
+                    self._pos += 1
+                    else_parts = self._parse()
+                if self._pos >= len(self._tokens) or self._tokens[self._pos][0] != 'end':
+                    raise TemplateError(f'条件块 {{#if {token[1]}}} 缺少 {{/if}}')
+                self._pos += 1
+                parts.append(('if', token[1], token[2], then_parts, else_parts))
+        return parts
+
+    def _collect_fields(self, parts: List, guarded: frozenset) -> None:
+        """
+        _collect_fields 功能说明:
+        收集引用的字段；{#if 字段} 块内的同名占位符只有字段非空时才会渲染，因此不是必填字段
+        输入: parts (List) 片段列表, guarded (frozenset) 当前已确认非空的字段 | 输出: 无
+        """
+        for part in parts:
+            if isinstance(part, str):
+                continue
+            if part[0] == 'field':
+                self.fields.add(part[1])
+                if part[2] is None and part[1] not in guarded:
+                    self.required.add(part[1])
+            else:
+                _, cond, negate, then_parts, else_parts = part
+                self.fields.add(cond)
+                self._collect_fields(then_parts, guarded if negate else guarded | {cond})
+                self._collect_fields(else_parts, guarded | {cond} if negate else guarded)
+
+    def missing_fields(self, context: Dict) -> List[str]:
+        """
+        missing_fields 功能说明:
+        检查收件人缺少（不存在或为空）的必填字段
+        输入: context (Dict) 模板字段 | 输出: List[str] 缺少的字段，按名称排序
+        """
+        return sorted(field for field in self.required if context.get(field) in (None, ''))
+
+    def validate(self, contexts: Iterable[Tuple[str, Dict]]) -> Dict[str, List[str]]:
+        """
+        validate 功能说明:
+        发送前检查所有收件人的必填字段
+        输入: contexts (Iterable[Tuple[str, Dict]]) (收件人, 模板字段) | 输出: Dict[str, List[str]] 字段 -> 缺少该字段的收件人，全部通过时为空
+        """
+        missing: Dict[str, List[str]] = {}
+        if not self.required:
+            return missing
+        for name, context in contexts:
+            for field in self.missing_fields(context):
+                missing.setdefault(field, []).append(name)
+        return missing
+
+    def render(self, context: Dict) -> str:
+        """
+        render 功能说明:
+        渲染单个收件人的消息，缺少必填字段时抛出 TemplateError；纯文本消息返回处理 {{ }} 转义后的文本
+        输入: context (Dict) 模板字段 | 输出: str 消息内容
+        """
+        if self.is_static:
+            return self.parts[0] if self.parts else ''
+        out: List[str] = []
+        self._render(self.parts, context, out)
+        return ''.join(out)
+
+    def _render(self, parts: List, context: Dict, out: List[str]) -> None:
+        """
+        _render 功能说明:
+        按顺序把片段写入输出列表，条件块按字段是否非空选择分支
+        输入: parts (List) 片段列表, context (Dict) 模板字段, out (List[str]) 输出 | 输出: 无
+        """
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] == 'field':
+                value = context.get(part[1])
+                if value in (None, ''):
+                    if part[2] is None:
+                        raise TemplateError(f'缺少模板字段: {part[1]}')
+                    out.append(part[2])
+                else:
+                    out.append(value if isinstance(value, str) else str(value))
+            else:
+                _, cond, negate, then_parts, else_parts = part
+                present = context.get(cond) not in (None, '')
+                self._render(then_parts if present != negate else else_parts, context, out)
@@ -0,0 +1,333 @@
+##########outbox.py: [持久化发送任务队列模块] ##################
+# 变更记录: [2026-10-17 18:30] @李祥光 [初始创建，发送任务落盘、逐个收件人状态追加记录和断点续发]########
+# 变更记录: [2026-10-17 20:30] @李祥光 [新增skipped状态，记录因发送账本去重而跳过的收件人]########
+# 输入: 收件人列表和消息内容 | 输出: 数据目录中可恢复的发送任务###############
+
+import argparse
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from .logger import Logger
+from .atomic_file import atomic_write_json
+
+###########################文件下的所有函数###########################
+"""
+OutboxJob.pending：获取待发送的收件人
+OutboxJob.mark：记录一个收件人的发送状态（追加一行日志并fsync）
+OutboxJob.status：任务状态
+OutboxJob.summary：统计各状态的收件人数量
+OutboxJob.failed_contacts：获取发送失败的收件人及原因
+OutboxJob.finish：所有收件人处理完后标记任务完成
+OutboxJob.close：关闭状态日志文件
+OutboxJob._replay：重放状态日志并截断末尾不完整的行
+Outbox.create_job：创建发送任务并写入任务头
+Outbox.load_job：加载发送任务并恢复每个收件人的状态
+Outbox._iter_jobs：按创建时间遍历所有发送任务
+Outbox.list_jobs：列出所有发送任务及进度
+Outbox.unfinished_jobs：列出未完成的发送任务
+main：查看任务和断点续发的命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender.send_by_tag] --> B[Outbox.create_job]
+    B --> C[atomic_write_json 写入任务头 任务ID.job.json]
+    A --> D[send_batch_messages]
+    D --> E[OutboxJob.pending 跳过已处理的收件人]
+    D --> F[send_to_contact]
+    F --> G[OutboxJob.mark 追加状态行 任务ID.log 并fsync]
+    D --> H[OutboxJob.finish]
+    I[程序崩溃后 main resume / MessageSender.resume_job] --> J[Outbox.load_job]
+    J --> K[_replay 重放状态日志]
+    K --> D
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+class OutboxJob:
+    """
+    OutboxJob 功能说明:
+    一个发送任务。任务头（收件人列表、消息、状态）只在创建和完成时原子写入一次，
+    每个收件人的发送结果追加一行到状态日志，写入成本与收件人总数无关；
+    崩溃后重新加载时重放日志即可知道谁已经收到消息
+    输入: directory (Path) 任务目录, header (Dict) 任务头 | 输出: 任务对象
+    """
+
+    def __init__(self, directory: Path, header: Dict):
+        """
+        __init__ 功能说明:
+        初始化任务对象，所有收件人初始状态为 pending
+        输入: directory (Path) 任务目录, header (Dict) 任务头 | 输出: 无
+        """
+        self.directory = Path(directory)
+        self.header = header
+        self.job_id: str = header['job_id']
+        self.message: str = header.get('message', '')
+        self.recipients: List[str] = list(header.get('recipients', []))
+        self.header_file = self.directory / f'{self.job_id}.job.json'
+        self.log_file = self.directory / f'{self.job_id}.log'
+        self.states: List[str] = [PENDING] * len(self.recipients)
+        self.errors: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    @property
+    def status(self) -> str:
+        """
+        status 功能说明:
+        任务状态 active/completed
+        输入: 无 | 输出: str 任务状态
+        """
+        return self.header.get('status', 'active')
+
+    def _replay(self) -> None:
+        """
+        _replay 功能说明:
+        重放状态日志恢复每个收件人的状态，同一收件人以最后一行为准；
+        末尾未写完整的行（崩溃导致）会被截断，该收件人仍视为待发送
+        输入: 无 | 输出: 无
+        """
+        if not self.log_file.exists():
+            return
+        valid_end = 0
+        truncated = False
+        with open(self.log_file, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    truncated = True
+                    break
+                valid_end += len(raw)
+                try:
+                    entry = json.loads(raw.decode('utf-8'))
+                    index = entry['i']
+                    self.states[index] = entry['state']
+                except (ValueError, KeyError, IndexError, TypeError):
+                    Logger.error(f"发送任务日志存在损坏的行，已跳过: {raw[:80]!r}")
+                    continue
+                if entry['state'] == FAILED:
+                    self.errors[index] = entry.get('error', '')
+                else:
+                    self.errors.pop(index, None)
+        if truncated:
+            Logger.warning(f"发送任务日志末尾存在不完整的记录，已截断: {self.log_file}")
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(valid_end)
+
+    def pending(self, include_failed: bool = False) -> List[Tuple[int, str]]:
+        """
+        pending 功能说明:
+        获取待发送的收件人，按原有顺序返回
+        输入: include_failed (bool) 是否包含发送失败的收件人 | 输出: List[Tuple[int, str]] (序号, 收件人)
+        """
+        wanted = (PENDING, FAILED) if include_failed else (PENDING,)
+        return [(i, name) for i, name in enumerate(self.recipients) if self.states[i] in wanted]
+
+    def mark(self, index: int, state: str, error: str = '') -> None:
+        """
+        mark 功能说明:
+        记录一个收件人的发送结果：追加一行JSON到状态日志并fsync，保证返回后即使崩溃也不会重复发送
+        输入: index (int) 收件人序号, state (str) sent/failed/skipped, error (str) 失败原因 | 输出: 无
+        """
+        if state not in (SENT, FAILED, SKIPPED):
+            raise ValueError(f"不支持的发送状态: {state}")
+        entry = {'i': index, 'name': self.recipients[index], 'state': state, 'ts': datetime.now().isoformat()}
+        if error:
+            entry['error'] = error
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._log is None:
+                self._log = open(self.log_file, 'ab')
+            self._log.write(line)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self.states[index] = state
+            if state == FAILED:
+                self.errors[index] = error
+            else:
+                self.errors.pop(index, None)
+
+    def summary(self) -> Dict:
+        """
+        summary 功能说明:
+        统计各状态的收件人数量
+        输入: 无 | 输出: Dict 任务进度（total/pending/sent/failed/skipped）
+        """
+        counts = {PENDING: 0, SENT: 0, FAILED: 0, SKIPPED: 0}
+        for state in self.states:
+            counts[state] = counts.get(state, 0) + 1
+        return {
+            'job_id': self.job_id,
+            'tag': self.header.get('tag', ''),
+            'created_at': self.header.get('created_at'),
+            'status': self.status,
+            'total': len(self.recipients),
+            'pending': counts[PENDING],
+            'sent': counts[SENT],
+            'failed': counts[FAILED],
+            'skipped': counts[SKIPPED]
+        }
+
+    def failed_contacts(self) -> List[Dict]:
+        """
+        failed_contacts 功能说明:
+        获取发送失败的收件人及失败原因
+        输入: 无 | 输出: List[Dict] 失败的收件人
+        """
+        return [{'name': self.recipients[i], 'error': error} for i, error in sorted(self.errors.items())]
+
+    def finish(self) -> None:
+        """
+        finish 功能说明:
+        没有待发送的收件人时把任务头标记为已完成（失败的收件人仍可通过 include_failed 重发）
+        输入: 无 | 输出: 无
+        """
+        if any(state == PENDING for state in self.states):
+            return
+        self.header['status'] = 'completed'
+        self.header['finished_at'] = datetime.now().isoformat()
+        atomic_write_json(self.header_file, self.header)
+
+    def close(self) -> None:
+        """
+        close 功能说明:
+        关闭状态日志文件
+        输入: 无 | 输出: 无
+        """
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+class Outbox:
+    """
+    Outbox 功能说明:
+    持久化发送任务队列，每个任务由任务头文件（任务ID.job.json）和状态日志（任务ID.log）组成
+    输入: directory (str/Path) 任务目录 | 输出: 任务队列对象
+    """
+
+    def __init__(self, directory):
+        """
+        __init__ 功能说明:
+        初始化任务队列
+        输入: directory (str/Path) 任务目录 | 输出: 无
+        """
+        self.directory = Path(directory)
+
+    def create_job(self, recipients: List[str], message: str, tag: str = '',
+                   meta: Optional[Dict] = None) -> OutboxJob:
+        """
+        create_job 功能说明:
+        创建发送任务，在第一条消息发送前原子写入任务头
+        输入: recipients (List[str]) 收件人列表, message (str) 消息内容, tag (str) 标签表达式,
+              meta (Dict, 可选) 附加信息 | 输出: OutboxJob 发送任务
+        """
+        job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        header = {
+            'job_id': job_id,
+            'created_at': datetime.now().isoformat(),
+            'tag': tag,
+            'message': message,
+            'status': 'active',
+            'recipients': list(recipients)
+        }
+        if meta:
+            header['meta'] = meta
+        job = OutboxJob(self.directory, header)
+        atomic_write_json(job.header_file, header)
+        Logger.info(f"已创建发送任务 {job_id}，收件人: {len(recipients)}")
+        return job
+
+    def load_job(self, job_id: str) -> OutboxJob:
+        """
+        load_job 功能说明:
+        加载发送任务并重放状态日志
+        输入: job_id (str) 任务ID | 输出: OutboxJob 发送任务
+        """
+        header_file = self.directory / f'{job_id}.job.json'
+        if not header_file.exists():
+            raise KeyError(f"发送任务不存在: {job_id}")
+        with open(header_file, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        job = OutboxJob(self.directory, header)
+        job._replay()
+        return job
+
+    def _iter_jobs(self) -> Iterator[OutboxJob]:
+        """
+        _iter_jobs 功能说明:
+        按创建时间顺序遍历所有发送任务，无法读取的任务记录错误后跳过
+        输入: 无 | 输出: Iterator[OutboxJob] 发送任务
+        """
+        if not self.directory.exists():
+            return
+        for header_file in sorted(self.directory.glob('*.job.json')):
+            job_id = header_file.name[:-len('.job.json')]
+            try:
+                yield self.load_job(job_id)
+            except Exception as e:
+                Logger.error(f"读取发送任务 {job_id} 失败: {str(e)}")
+
+    def list_jobs(self) -> List[Dict]:
+        """
+        list_jobs 功能说明:
+        列出所有发送任务及进度
+        输入: 无 | 输出: List[Dict] 任务进度列表
+        """
+        return [job.summary() for job in self._iter_jobs()]
+
+    def unfinished_jobs(self) -> List[Dict]:
+        """
+        unfinished_jobs 功能说明:
+        列出仍有待发送收件人的任务
+        输入: 无 | 输出: List[Dict] 任务进度列表
+        """
+        return [summary for summary in self.list_jobs() if summary['pending']]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    main 功能说明:
+    命令行入口:
+    python -m utils.outbox list                      查看所有发送任务
+    python -m utils.outbox resume 任务ID [--include-failed]  从断点继续发送
+    输入: argv (List[str], 可选) 命令行参数 | 输出: int 退出码
+    """
+    from config.settings import config
+
+    parser = argparse.ArgumentParser(description='发送任务查看和断点续发工具')
+    parser.add_argument('--dir', default=config.get('message.outbox_dir', 'data/outbox'), help='发送任务目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='查看所有发送任务')
+    resume = subparsers.add_parser('resume', help='从断点继续发送任务')
+    resume.add_argument('job_id', help='任务ID')
+    resume.add_argument('--include-failed', action='store_true', help='同时重发失败的收件人')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for summary in Outbox(args.dir).list_jobs():
+            print(f"{summary['job_id']}  [{summary['status']}]  标签: {summary['tag']}  "
+                  f"已发送 {summary['sent']}/{summary['total']}，失败 {summary['failed']}，待发送 {summary['pending']}")
+        return 0
+
+    from .message_sender import MessageSender
+    sender = MessageSender()
+    sender.outbox = Outbox(args.dir)
+    result = sender.resume_job(args.job_id, include_failed=args.include_failed)
+    if not result['success'] and 'error' in result:
+        print(f"❌ 续发失败: {result['error']}")
+        return 1
+    print(f"✅ 任务 {args.job_id} 续发完成 - 成功: {result['count']}, 失败: {result.get('failed_count', 0)}")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+##########rate_limiter.py: [自适应发送限速模块] ##################
+# 变更记录: [2026-10-17 19:10] @李祥光 [初始创建，令牌桶+随机抖动+每分钟/每小时上限+失败率/延迟自适应降速]########
+# 变更记录: [2026-10-17 23:50] @李祥光 [acquire支持传入可打断的等待函数，新增SendInterrupted]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [新增clone，按相同限速参数创建使用虚拟时钟的限速器，用于发送预估；record改为累计失败数和耗时，不再每次重新求和]########
+# 输入: 每次发送的结果和耗时 | 输出: 下一次发送前需要等待的时间###############
+
+import random
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+from .logger import Logger
+
+###########################文件下的所有函数###########################
+"""
+SendInterrupted：等待被暂停或取消打断
+RateLimiter.next_delay：计算当前距离允许下一次发送还需等待的秒数（不等待）
+RateLimiter.acquire：等待到允许发送并占用一次发送额度
+RateLimiter.record：记录一次发送的结果和耗时，据此自适应调整发送间隔
+RateLimiter.penalize：收到明确的限流信号时立即降速
+RateLimiter.stats：获取当前发送间隔和最近发送数量
+RateLimiter.clone：按相同的限速参数创建新的限速器（可替换时钟）
+RateLimiter._refill：按经过的时间补充令牌
+RateLimiter._window_delay：计算滚动窗口上限需要等待的时间
+create_rate_limiter：根据配置创建限速器
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender.send_batch_messages] --> B[acquire]
+    B --> C[next_delay]
+    C --> D[_refill 令牌桶按当前间隔补充]
+    C --> E[_window_delay 每分钟/每小时上限]
+    B --> F[sleep 等待时间 + 随机抖动]
+    A --> G[SendMsg]
+    G --> H[record 成功与否和耗时]
+    H --> I{最近失败率或平均耗时超过阈值?}
+    I -->|是| J[发送间隔乘以降速倍数]
+    I -->|否| K[发送间隔逐步恢复到基础间隔]
+    L[限流响应] --> M[penalize]
+    M --> J
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class SendInterrupted(Exception):
+    """
+    SendInterrupted 功能说明:
+    可打断的等待函数在等待中收到暂停或取消时抛出，发送循环据此立即暂停而不必等到下一个发送时机
+    输入: 打断原因 | 输出: 异常对象
+    """
+
+class RateLimiter:
+    """
+    RateLimiter 功能说明:
+    自适应发送限速器。令牌桶按当前发送间隔补充令牌，等待时间从上一次发送开始计算，
+    因此 SendMsg 本身的耗时会自动从等待中扣除；另有每分钟/每小时滚动上限和随机抖动。
+    最近一段发送的失败率或平均耗时超过阈值时发送间隔成倍增加，恢复正常后逐步回到基础间隔
+    输入: interval (float) 基础发送间隔秒数等限速参数 | 输出: 限速器对象
+    """
+
+    def __init__(self, interval: float = 2.0, burst: int = 1, per_minute: int = 0, per_hour: int = 0,
+                 jitter: float = 0.0, max_interval: float = 60.0, slowdown_factor: float = 2.0,
+                 recovery_factor: float = 0.9, failure_threshold: float = 0.3, latency_threshold: float = 0.0,
+                 window: int = 20, min_samples: int = 5, clock: Optional[Callable[[], float]] = None,
+                 sleep: Optional[Callable[[float], None]] = None, rng: Optional[random.Random] = None):
+        """
+        __init__ 功能说明:
+        初始化限速器
+        输入: interval (float) 基础发送间隔秒数, burst (int) 令牌桶容量（允许连续发送的条数）,
+              per_minute/per_hour (int) 滚动窗口内最多发送条数，0 表示不限制,
+              jitter (float) 随机抖动比例（等待时额外增加 0~jitter*间隔 秒）,
+              max_interval (float) 降速后的最大间隔, slowdown_factor (float) 每次降速的倍数,
+              recovery_factor (float) 每次成功后间隔向基础间隔恢复的倍数,
+              failure_threshold (float) 触发降速的失败率, latency_threshold (float) 触发降速的平均发送耗时，0 表示不按耗时降速,
+              window (int) 统计最近多少次发送, min_samples (int) 至少多少次发送后才判断是否降速,
+              clock/sleep/rng (可选) 计时、等待和随机数，测试和模拟时可替换 | 输出: 无
+        """
+        self.base_interval = max(0.0, float(interval))
+        self.interval = self.base_interval
+        self.burst = max(1, int(burst))
+        self.per_minute = int(per_minute or 0)
+        self.per_hour = int(per_hour or 0)
+        self.jitter = max(0.0, float(jitter))
+        self.max_interval = max(self.base_interval, float(max_interval))
+        self.slowdown_factor = max(1.0, float(slowdown_factor))
+        self.recovery_factor = min(1.0, max(0.0, float(recovery_factor)))
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.min_samples = max(1, int(min_samples))
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.rng = rng or random.Random()
+
+        self._tokens = float(self.burst)
+        self._last = self.clock()
+        # 最近发送的时间点（滚动窗口上限）和最近发送的 (是否成功, 耗时)
+        self._minute: Deque[float] = deque()
+        self._hour: Deque[float] = deque()
+        self._results: Deque[Tuple[bool, float]] = deque(maxlen=max(1, int(window)))
+        # 最近发送中的失败次数和耗时合计，随 _results 增减，record 不必每次重新求和
+        self._failures = 0
+        self._latency_total = 0.0
+
+    def _refill(self, now: float) -> None:
+        """
+        _refill 功能说明:
+        按距上次补充经过的时间和当前发送间隔补充令牌，不超过令牌桶容量
+        输入: now (float) 当前时间 | 输出: 无
+        """
+        elapsed = max(0.0, now - self._last)
+        self._last = now
+        if self.interval <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(float(self.burst), self._tokens + elapsed / self.interval)
+
+    @staticmethod
+    def _window_delay(times: Deque[float], limit: int, span: float, now: float) -> float:
+        """
+        _window_delay 功能说明:
+        丢弃滚动窗口外的发送记录，窗口内已达上限时返回最早一条移出窗口还需等待的时间
+        输入: times (Deque[float]) 发送时间点, limit (int) 窗口内上限, span (float) 窗口秒数, now (float) 当前时间 | 输出: float 等待秒数
+        """
+        while times and times[0] <= now - span:
+            times.popleft()
+        if not limit or len(times) < limit:
+            return 0.0
+        return times[len(times) - limit] + span - now
+
+    def next_delay(self) -> float:
+        """
+        next_delay 功能说明:
+        计算距离允许下一次发送还需等待的秒数（不含随机抖动，不等待也不占用额度）
+        输入: 无 | 输出: float 等待秒数
+        """
+        now = self.clock()
+        self._refill(now)
+        delay = 0.0 if self._tokens >= 1.0 - 1e-9 else (1.0 - self._tokens) * self.interval
+        # 未设置滚动上限时不记录发送时间，也不需要检查
+        if self.per_minute:
+            delay = max(delay, self._window_delay(self._minute, self.per_minute, 60.0, now))
+        if self.per_hour:
+            delay = max(delay, self._window_delay(self._hour, self.per_hour, 3600.0, now))
+        return max(0.0, delay)
+
+    def acquire(self, sleep: Optional[Callable[[float], None]] = None) -> float:
+        """
+        acquire 功能说明:
+        等待到允许发送后占用一次发送额度。需要等待时额外增加随机抖动，避免固定节奏；
+        等待函数抛出 SendInterrupted 时不占用额度
+        输入: sleep (Callable, 可选) 替换本次使用的等待函数 | 输出: float 实际等待的秒数
+        """
+        sleep = sleep or self.sleep
+        waited = 0.0
+        delay = self.next_delay()
+        while delay > 0:
+            if self.jitter and self.interval > 0:
+                delay += self.rng.uniform(0.0, self.jitter * self.interval)
+            sleep(delay)
+            waited += delay
+            delay = self.next_delay()
+
+        now = self.clock()
+        self._tokens -= 1.0
+        if self.per_minute:
+            self._minute.append(now)
+        if self.per_hour:
+            self._hour.append(now)
+        return waited
+
+    def record(self, success: bool, latency: float = 0.0) -> None:
+        """
+        record 功能说明:
+        记录一次发送的结果和耗时。最近的失败率或平均耗时超过阈值时降速并重新开始统计，
+        否则每次成功后发送间隔按 recovery_factor 向基础间隔恢复
+        输入: success (bool) 是否发送成功, latency (float) SendMsg 耗时秒数 | 输出: 无
+        """
+        latency = max(0.0, float(latency))
+        if len(self._results) == self._results.maxlen:
+            dropped_ok, dropped_latency = self._results[0]
+            self._failures -= not dropped_ok
+            self._latency_total -= dropped_latency
+        self._results.append((bool(success), latency))
+        self._failures += not success
+        self._latency_total += latency
+        if len(self._results) >= self.min_samples:
+            failure_rate = self._failures / len(self._results)
+            avg_latency = self._latency_total / len(self._results)
+            if failure_rate > self.failure_threshold:
+                self.penalize(f"最近 {len(self._results)} 次发送失败率 {failure_rate:.0%}")
+                return
+            if self.latency_threshold and avg_latency > self.latency_threshold:
+                self.penalize(f"最近 {len(self._results)} 次发送平均耗时 {avg_latency:.1f} 秒")
+                return
+        if success and self.interval > self.base_interval:
+            self.interval = max(self.base_interval, self.interval * self.recovery_factor)
+
+    def penalize(self, reason: str = '收到限流响应') -> None:
+        """
+        penalize 功能说明:
+        立即把发送间隔乘以降速倍数（不超过最大间隔），并清空统计重新观察
+        输入: reason (str) 降速原因 | 输出: 无
+        """
+        previous = self.interval
+        self.interval = min(self.max_interval, max(self.interval, self.base_interval, 0.1) * self.slowdown_factor)
+        self._results.clear()
+        self._failures = 0
+        self._latency_total = 0.0
+        if self.interval != previous:
+            Logger.warning(f"{reason}，发送间隔由 {previous:.1f} 秒调整为 {self.interval:.1f} 秒")
+
+    def clone(self, clock: Optional[Callable[[], float]] = None, sleep: Optional[Callable[[float], None]] = None,
+              rng: Optional[random.Random] = None) -> 'RateLimiter':
+        """
+        clone 功能说明:
+        按相同的限速参数创建新的限速器，发送间隔从基础间隔重新开始，用于在虚拟时钟上模拟发送节奏
+        输入: clock/sleep/rng (可选) 新限速器的计时、等待和随机数 | 输出: RateLimiter 限速器
+        """
+        return RateLimiter(
+            interval=self.base_interval, burst=self.burst, per_minute=self.per_minute, per_hour=self.per_hour,
+            jitter=self.jitter, max_interval=self.max_interval, slowdown_factor=self.slowdown_factor,
+            recovery_factor=self.recovery_factor, failure_threshold=self.failure_threshold,
+            latency_threshold=self.latency_threshold, window=self._results.maxlen, min_samples=self.min_samples,
+            clock=clock, sleep=sleep, rng=rng
+        )
+
+    def stats(self) -> Dict:
+        """
+        stats 功能说明:
+        获取当前发送间隔和滚动窗口内的发送数量
+        输入: 无 | 输出: Dict 限速状态
+        """
+        now = self.clock()
+        self._window_delay(self._minute, 0, 60.0, now)
+        self._window_delay(self._hour, 0, 3600.0, now)
+        return {
+            'interval': self.interval,
+            'base_interval': self.base_interval,
+            'sent_last_minute': len(self._minute) if self.per_minute else None,
+            'sent_last_hour': len(self._hour) if self.per_hour else None
+        }
+
+def create_rate_limiter(settings, interval: Optional[float] = None, **overrides) -> RateLimiter:
+    """
+    create_rate_limiter 功能说明:
+    根据配置创建限速器：基础间隔读取 message.send_interval（兼容旧配置 wechat.send_interval），
+    其余参数读取 message.rate_limit 下的同名配置项
+    输入: settings 配置对象, interval (float, 可选) 覆盖基础间隔, overrides 覆盖其他参数 | 输出: RateLimiter 限速器
+    """
+    if interval is None:
+        interval = settings.get('message.send_interval', settings.get('wechat.send_interval', 2.0))
+    options = {}
+    for name in ('burst', 'per_minute', 'per_hour', 'jitter', 'max_interval', 'slowdown_factor',
+                 'recovery_factor', 'failure_threshold', 'latency_threshold', 'window'):
+        value = settings.get(f'message.rate_limit.{name}')
+        if value is not None:
+            options[name] = value
+    options.update(overrides)
+    return RateLimiter(interval=interval, **options)
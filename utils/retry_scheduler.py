@@ -0,0 +1,191 @@
+##########retry_scheduler.py: [发送失败重试调度模块] ##################
+# 变更记录: [2026-10-17 19:50] @李祥光 [初始创建，失败分类、指数退避+随机抖动和到期重试队列]########
+# 变更记录: [2026-10-17 22:30] @李祥光 [新增RateLimitedError限流异常]########
+# 变更记录: [2026-10-17 23:10] @李祥光 [新增pending获取等待重试的收件人，多账号分发时转交给其他账号]########
+# 变更记录: [2026-10-17 23:50] @李祥光 [新增requeue放回被打断的重试，wait_next支持传入可打断的等待函数]########
+# 输入: 发送失败的收件人和失败原因 | 输出: 到期需要重试的收件人###############
+
+import heapq
+import itertools
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .logger import Logger
+
+###########################文件下的所有函数###########################
+"""
+TransientSendError：可重试的发送异常（超时、窗口未响应等）
+PermanentSendError：重试也不会成功的发送异常（联系人不存在等）
+RateLimitedError：微信返回发送过于频繁（可重试，同时触发限速器降速）
+classify_error：判断发送失败是否值得重试
+RetryScheduler.delay：计算第 N 次重试前的退避时间
+RetryScheduler.schedule：安排一次重试，重试次数用尽或永久失败时返回 False
+RetryScheduler.pop_due：取出一个已到期的重试
+RetryScheduler.pending：获取等待重试的收件人
+RetryScheduler.requeue：放回一个已取出但未发送的重试（不计入重试次数）
+RetryScheduler.next_due_in：距离最早一个重试到期的秒数
+RetryScheduler.wait_next：等待到最早一个重试到期
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[send_batch_messages] --> B{pop_due 有到期的重试?}
+    B -->|有| C[重发该收件人]
+    B -->|没有| D{还有新收件人?}
+    D -->|有| E[发送下一个新收件人]
+    D -->|没有| F[wait_next 等待最早的重试到期]
+    F --> B
+    C --> G{发送失败?}
+    E --> G
+    G -->|是| H[classify_error]
+    H --> I[schedule]
+    I -->|可重试| J[delay 指数退避+抖动后放入到期队列]
+    I -->|永久失败或次数用尽| K[记录最终失败及消息内容]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class TransientSendError(Exception):
+    """
+    TransientSendError 功能说明:
+    可重试的发送异常，发送客户端可以抛出该异常表示稍后重试可能成功
+    输入: 错误信息 | 输出: 异常对象
+    """
+
+class PermanentSendError(Exception):
+    """
+    PermanentSendError 功能说明:
+    不可重试的发送异常，发送客户端可以抛出该异常表示重试也不会成功
+    输入: 错误信息 | 输出: 异常对象
+    """
+
+class RateLimitedError(TransientSendError):
+    """
+    RateLimitedError 功能说明:
+    微信返回发送过于频繁，稍后重试可能成功；发送器收到该异常时限速器立即降速
+    输入: 错误信息 | 输出: 异常对象
+    """
+
+# 出现这些关键字的失败重试也不会成功（联系人不存在、被拉黑等）
+PERMANENT_PATTERNS = ('未找到', '找不到', '不存在', '非好友', '不是好友', '拉黑', '已删除', 'not found', 'no such')
+
+def classify_error(error) -> bool:
+    """
+    classify_error 功能说明:
+    判断一次发送失败是否可以重试：PermanentSendError 和包含联系人不存在等关键字的失败不重试，
+    超时、连接错误、接口返回失败等其他情况视为暂时性失败
+    输入: error (Exception/str) 发送异常或失败原因 | 输出: bool 是否可以重试
+    """
+    if isinstance(error, PermanentSendError):
+        return False
+    if isinstance(error, (TransientSendError, TimeoutError, ConnectionError)):
+        return True
+    text = str(error).lower()
+    return not any(pattern in text for pattern in PERMANENT_PATTERNS)
+
+class RetryScheduler:
+    """
+    RetryScheduler 功能说明:
+    发送失败重试调度器。失败的收件人按指数退避加随机抖动计算到期时间后放入最小堆，
+    批量发送时优先发送已到期的重试，没有到期的重试时继续发送新的收件人，
+    因此重试与主流程交替进行，不需要等整批发完再手动重试
+    输入: max_retries (int) 每个收件人最多重试次数等参数 | 输出: 调度器对象
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 5.0, max_delay: float = 300.0,
+                 jitter: float = 0.5, clock: Optional[Callable[[], float]] = None,
+                 sleep: Optional[Callable[[float], None]] = None, rng: Optional[random.Random] = None):
+        """
+        __init__ 功能说明:
+        初始化重试调度器
+        输入: max_retries (int) 每个收件人最多重试次数, base_delay (float) 第一次重试前等待秒数（之后翻倍）,
+              max_delay (float) 最长退避秒数, jitter (float) 随机抖动比例,
+              clock/sleep/rng (可选) 计时、等待和随机数，测试时可替换 | 输出: 无
+        """
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.jitter = max(0.0, float(jitter))
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.rng = rng or random.Random()
+        self.attempts: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def delay(self, attempt: int) -> float:
+        """
+        delay 功能说明:
+        计算第 attempt 次重试前的退避时间：base_delay * 2^(attempt-1)，不超过 max_delay，再增加 0~jitter 比例的随机抖动
+        输入: attempt (int) 第几次重试（从1开始） | 输出: float 等待秒数
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return delay * (1.0 + self.rng.uniform(0.0, self.jitter)) if self.jitter else delay
+
+    def schedule(self, key: str, error) -> bool:
+        """
+        schedule 功能说明:
+        安排一次重试。永久失败或重试次数用尽时不再安排
+        输入: key (str) 收件人, error (Exception/str) 失败原因 | 输出: bool 是否已安排重试
+        """
+        if not classify_error(error):
+            return False
+        attempt = self.attempts.get(key, 0) + 1
+        if attempt > self.max_retries:
+            return False
+        self.attempts[key] = attempt
+        delay = self.delay(attempt)
+        heapq.heappush(self._heap, (self.clock() + delay, next(self._seq), key))
+        Logger.info(f"发送给 {key} 失败（{error}），{delay:.1f}秒后第 {attempt} 次重试")
+        return True
+
+    def pop_due(self, horizon: float = 0.0) -> Optional[str]:
+        """
+        pop_due 功能说明:
+        取出一个在 horizon 秒内到期的重试（通常传入限速器距下一个发送时机的等待时间，
+        这样到期的重试能赶上下一个发送时机），没有时返回 None
+        输入: horizon (float) 提前量秒数 | 输出: Optional[str] 收件人
+        """
+        if self._heap and self._heap[0][0] <= self.clock() + horizon:
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def requeue(self, key: str) -> None:
+        """
+        requeue 功能说明:
+        放回一个已取出但因暂停未发送的重试，立即到期且不计入重试次数
+        输入: key (str) 收件人 | 输出: 无
+        """
+        heapq.heappush(self._heap, (self.clock(), next(self._seq), key))
+
+    def pending(self) -> List[str]:
+        """
+        pending 功能说明:
+        获取等待重试的收件人，按到期时间排序
+        输入: 无 | 输出: List[str] 收件人
+        """
+        return [key for _, _, key in sorted(self._heap)]
+
+    def next_due_in(self) -> Optional[float]:
+        """
+        next_due_in 功能说明:
+        距离最早一个重试到期还有多少秒，没有待重试时返回 None
+        输入: 无 | 输出: Optional[float] 秒数
+        """
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def wait_next(self, sleep: Optional[Callable[[float], None]] = None) -> None:
+        """
+        wait_next 功能说明:
+        没有新收件人可发送时，等待到最早一个重试到期
+        输入: sleep (Callable, 可选) 替换本次使用的等待函数 | 输出: 无
+        """
+        remaining = self.next_due_in()
+        if remaining:
+            (sleep or self.sleep)(remaining)
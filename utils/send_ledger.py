@@ -0,0 +1,156 @@
+##########send_ledger.py: [发送记录去重账本模块] ##################
+# 变更记录: [2026-10-17 20:30] @李祥光 [初始创建，按收件人+内容哈希+活动ID记录已发送消息，支持去重时间窗口]########
+# 变更记录: [2026-10-18 00:30] @李祥光 [新增sent_recipients一次查询所有已收到相同内容的收件人，用于发送预估]########
+# 变更记录: [2026-10-18 17:20] @李祥光 [按保留期清理时保留带活动ID的记录，同一活动重复运行永不重发]########
+# 输入: 发送成功的收件人和消息内容 | 输出: 是否已发送过的判断###############
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Set
+from .logger import Logger
+
+###########################文件下的所有函数###########################
+"""
+content_hash：计算消息内容的哈希
+SendLedger.already_sent：判断收件人是否已收到过相同内容（同一活动或去重窗口内）
+SendLedger.sent_recipients：一次查询所有会被跳过的收件人
+SendLedger.record：记录一次成功发送
+SendLedger.prune：删除超出保留期且不属于任何活动的发送记录
+SendLedger.close：关闭数据库连接
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender.send_batch_messages] --> B[content_hash]
+    A --> C[already_sent]
+    C --> D{同一活动已发送?}
+    D -->|是| E[跳过该收件人]
+    D -->|否| F{去重窗口内发送过相同内容?}
+    F -->|是| E
+    F -->|否| G[发送]
+    G -->|成功| H[record 写入账本]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sends (
+    id INTEGER PRIMARY KEY,
+    recipient TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    campaign TEXT NOT NULL DEFAULT '',
+    sent_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sends_campaign ON sends(campaign, recipient, content_hash);
+CREATE INDEX IF NOT EXISTS idx_sends_recipient ON sends(recipient, content_hash, sent_at);
+"""
+
+def content_hash(message: str) -> str:
+    """
+    content_hash 功能说明:
+    计算消息内容的哈希（忽略首尾空白），用于判断是否为相同内容
+    输入: message (str) 消息内容 | 输出: str 哈希值
+    """
+    return hashlib.sha256(message.strip().encode('utf-8')).hexdigest()[:32]
+
+class SendLedger:
+    """
+    SendLedger 功能说明:
+    持久化发送账本（SQLite）。每次发送成功记录 收件人+内容哈希+活动ID，
+    按 (活动ID, 收件人, 内容哈希) 和 (收件人, 内容哈希, 发送时间) 建立索引，去重查询耗时与记录数量无关。
+    重新运行同一活动时跳过已成功的收件人；不同活动在去重窗口内也不会向同一人重复发送相同内容
+    输入: db_file (str/Path) 数据库文件, window_hours (float) 去重窗口小时数 | 输出: 账本对象
+    """
+
+    def __init__(self, db_file, window_hours: float = 24.0, clock: Optional[Callable[[], float]] = None):
+        """
+        __init__ 功能说明:
+        打开（或创建）发送账本
+        输入: db_file (str/Path) 数据库文件, window_hours (float) 去重窗口小时数，0 表示只按活动去重,
+              clock (可选) 返回当前时间戳的函数，测试时可替换 | 输出: 无
+        """
+        self.db_file = Path(db_file)
+        self.window = max(0.0, float(window_hours)) * 3600.0
+        self.clock = clock or time.time
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def already_sent(self, recipient: str, digest: str, campaign: Optional[str] = None) -> bool:
+        """
+        already_sent 功能说明:
+        判断收件人是否已收到过相同内容：同一活动中已发送过，或去重窗口内任何活动发送过
+        输入: recipient (str) 收件人, digest (str) 内容哈希, campaign (str, 可选) 活动ID | 输出: bool 是否已发送
+        """
+        with self._lock:
+            if campaign and self.conn.execute(
+                'SELECT 1 FROM sends WHERE campaign = ? AND recipient = ? AND content_hash = ?',
+                (campaign, recipient, digest)
+            ).fetchone():
+                return True
+            if not self.window:
+                return False
+            return self.conn.execute(
+                'SELECT 1 FROM sends WHERE recipient = ? AND content_hash = ? AND sent_at >= ? LIMIT 1',
+                (recipient, digest, self.clock() - self.window)
+            ).fetchone() is not None
+
+    def sent_recipients(self, digest: str, campaign: Optional[str] = None) -> Set[str]:
+        """
+        sent_recipients 功能说明:
+        一次查询所有会被 already_sent 判断为已发送的收件人，大批量预估时不必逐个查询
+        输入: digest (str) 内容哈希, campaign (str, 可选) 活动ID | 输出: Set[str] 收件人
+        """
+        since = self.clock() - self.window if self.window else float('inf')
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT DISTINCT recipient FROM sends WHERE content_hash = ? AND (campaign = ? OR sent_at >= ?)',
+                (digest, campaign or None, since)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record(self, recipient: str, digest: str, campaign: Optional[str] = None) -> None:
+        """
+        record 功能说明:
+        记录一次成功发送，同一活动重复记录时只更新发送时间
+        输入: recipient (str) 收件人, digest (str) 内容哈希, campaign (str, 可选) 活动ID | 输出: 无
+        """
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO sends (recipient, content_hash, campaign, sent_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(campaign, recipient, content_hash) DO UPDATE SET sent_at = excluded.sent_at',
+                (recipient, digest, campaign or '', self.clock())
+            )
+            self.conn.commit()
+
+    def prune(self, keep_days: float = 90.0) -> int:
+        """
+        prune 功能说明:
+        删除早于保留期且不在去重窗口内的发送记录。带活动ID的记录不按时间清理，
+        保证同一活动无论隔多久重新运行都不会向已成功的收件人重复发送
+        输入: keep_days (float) 保留天数 | 输出: int 删除的记录数
+        """
+        cutoff = self.clock() - max(keep_days * 86400.0, self.window)
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM sends WHERE sent_at < ? AND campaign = ''", (cutoff,)).rowcount
+            self.conn.commit()
+        if deleted:
+            Logger.info(f"已清理 {deleted} 条过期发送记录")
+        return deleted
+
+    def close(self) -> None:
+        """
+        close 功能说明:
+        关闭数据库连接
+        输入: 无 | 输出: 无
+        """
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,322 @@
+##########serializer.py: [数据文件序列化模块] ##################
+# 变更记录: [2026-10-17 17:50] @李祥光 [初始创建，可插拔的JSON/紧凑二进制格式、可选gzip/zstd压缩和格式自动识别]########
+# 输入: 数据文档（头部字段 + 记录列表） | 输出: 文件字节内容###############
+
+import argparse
+import gzip
+import json
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from .atomic_file import atomic_write_bytes
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时二进制格式内部使用紧凑JSON编码
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstd 压缩为可选功能
+    zstandard = None
+
+###########################文件下的所有函数###########################
+"""
+dumps_document：将数据文档序列化为指定格式的字节
+loads_document：自动识别格式并解析字节为数据文档，损坏时抛出 ValueError
+_loads_document：按魔数解压并解析数据文档
+read_document：读取并解析数据文件
+write_document：按指定格式原子写入数据文件
+detect_format：识别字节内容的格式和压缩方式
+_encode/_decode：按编码方式编码/解码单个数据段
+_compress/_decompress：按压缩方式压缩/解压
+benchmark：对比各格式的保存/加载耗时和文件大小
+_sample_contacts：生成基准测试用的联系人数据
+main：格式转换、导出JSON和基准测试的命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactStore/FriendDetailsManager保存] --> B[write_document]
+    B --> C[dumps_document]
+    C --> D{format}
+    D -->|json| E[json.dumps 原有带缩进格式]
+    D -->|binary| F[魔数 + 编码方式 + 长度前缀的头部段和记录段]
+    E --> G[_compress 可选gzip/zstd]
+    F --> G
+    G --> H[atomic_write_bytes]
+    I[加载] --> J[read_document]
+    J --> K[loads_document]
+    K --> L[_loads_document]
+    L --> M[_decompress 魔数识别]
+    M --> N[_decode 解析头部和记录]
+    O[main convert] --> J
+    O --> P[write_document 默认format=json]
+    Q[main benchmark] --> R[benchmark]
+    R --> S[_sample_contacts]
+    R --> B
+    R --> J
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# 二进制格式: MAGIC(4) + 编码方式(1) + [头部段长度(4) + 头部段] + [记录段长度(8) + 记录段]
+MAGIC = b'BQS1'
+CODECS = {'json': 0, 'msgpack': 1}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+FORMATS = ('json', 'binary')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+def _compress(data: bytes, compression: str) -> bytes:
+    """
+    _compress 功能说明:
+    按压缩方式压缩数据
+    输入: data (bytes) 原始数据, compression (str) none/gzip/zstd | 输出: bytes 压缩后的数据
+    """
+    if compression == 'none':
+        return data
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("使用zstd压缩需要安装 zstandard 包（pip install zstandard）")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"不支持的压缩方式: {compression}（可选: {', '.join(COMPRESSIONS)}）")
+
+def _decompress(data: bytes) -> Tuple[bytes, str]:
+    """
+    _decompress 功能说明:
+    根据魔数自动解压数据，未压缩时原样返回
+    输入: data (bytes) 文件内容 | 输出: Tuple[bytes, str] (解压后的数据, 压缩方式)
+    """
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data), 'gzip'
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("读取zstd压缩的数据文件需要安装 zstandard 包（pip install zstandard）")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data), 'zstd'
+    return data, 'none'
+
+def _encode(value, codec: str) -> bytes:
+    """
+    _encode 功能说明:
+    编码单个数据段，msgpack 编码更紧凑，JSON 编码去掉缩进和空白
+    输入: value 数据, codec (str) json/msgpack | 输出: bytes 编码结果
+    """
+    if codec == 'msgpack':
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _decode(data: bytes, codec: str):
+    """
+    _decode 功能说明:
+    解码单个数据段
+    输入: data (bytes) 编码数据, codec (str) json/msgpack | 输出: 数据
+    """
+    if codec == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("读取msgpack编码的数据文件需要安装 msgpack 包（pip install msgpack）")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode('utf-8'))
+
+def detect_format(data: bytes) -> Tuple[str, str]:
+    """
+    detect_format 功能说明:
+    根据魔数识别数据的格式和压缩方式
+    输入: data (bytes) 文件内容 | 输出: Tuple[str, str] (格式 json/binary, 压缩方式 none/gzip/zstd)
+    """
+    raw, compression = _decompress(data)
+    return ('binary' if raw.startswith(MAGIC) else 'json'), compression
+
+def dumps_document(document: Dict, records_key: str, fmt: str = 'json', compression: str = 'none') -> bytes:
+    """
+    dumps_document 功能说明:
+    将数据文档序列化为字节。json 格式与原有文件完全一致（indent=2、保留中文）；
+    binary 格式由魔数、编码方式和两个带长度前缀的数据段组成：头部字段段和记录列表段，
+    有 msgpack 时用 msgpack 编码，否则用紧凑JSON编码
+    输入: document (Dict) 数据文档, records_key (str) 记录列表字段名（如 contacts）,
+          fmt (str) json/binary, compression (str) none/gzip/zstd | 输出: bytes 序列化结果
+    """
+    if fmt == 'json':
+        raw = json.dumps(document, ensure_ascii=False, indent=2).encode('utf-8')
+    elif fmt == 'binary':
+        codec = 'msgpack' if msgpack is not None else 'json'
+        header = {key: value for key, value in document.items() if key != records_key}
+        header['records_key'] = records_key
+        header_bytes = _encode(header, codec)
+        records_bytes = _encode(document.get(records_key, []), codec)
+        raw = b''.join((
+            MAGIC, bytes([CODECS[codec]]),
+            struct.pack('>I', len(header_bytes)), header_bytes,
+            struct.pack('>Q', len(records_bytes)), records_bytes
+        ))
+    else:
+        raise ValueError(f"不支持的数据文件格式: {fmt}（可选: {', '.join(FORMATS)}）")
+    return _compress(raw, compression)
+
+def loads_document(data: bytes) -> Dict:
+    """
+    loads_document 功能说明:
+    自动识别格式和压缩方式并解析为数据文档，旧的JSON文件无需转换即可读取。
+    文件内容损坏（截断、解压失败等）统一抛出 ValueError，与JSON解析失败的处理方式一致
+    输入: data (bytes) 文件内容 | 输出: Dict 数据文档
+    """
+    try:
+        return _loads_document(data)
+    except (struct.error, EOFError, OSError, KeyError, IndexError) as e:
+        raise ValueError(f"数据文件已损坏: {str(e)}") from e
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise ValueError(f"数据文件已损坏: {str(e)}") from e
+        raise
+
+def _loads_document(data: bytes) -> Dict:
+    """
+    _loads_document 功能说明:
+    按魔数解压并解析数据文档
+    输入: data (bytes) 文件内容 | 输出: Dict 数据文档
+    """
+    raw, _ = _decompress(data)
+    if not raw.startswith(MAGIC):
+        return json.loads(raw.decode('utf-8-sig'))
+
+    codes = {code: name for name, code in CODECS.items()}
+    codec = codes.get(raw[4])
+    if codec is None:
+        raise ValueError(f"未知的数据编码方式: {raw[4]}")
+    pos = 5
+    (header_length,) = struct.unpack_from('>I', raw, pos)
+    pos += 4
+    header = _decode(raw[pos:pos + header_length], codec)
+    pos += header_length
+    (records_length,) = struct.unpack_from('>Q', raw, pos)
+    pos += 8
+    if pos + records_length > len(raw):
+        raise ValueError("数据文件不完整：记录段长度超出文件大小")
+    records = _decode(raw[pos:pos + records_length], codec)
+
+    records_key = header.pop('records_key')
+    document = dict(header)
+    document[records_key] = records
+    return document
+
+def read_document(path) -> Dict:
+    """
+    read_document 功能说明:
+    读取并解析数据文件，自动识别格式
+    输入: path (str/Path) 文件路径 | 输出: Dict 数据文档
+    """
+    return loads_document(Path(path).read_bytes())
+
+def write_document(path, document: Dict, records_key: str, fmt: str = 'json', compression: str = 'none') -> None:
+    """
+    write_document 功能说明:
+    按指定格式序列化并原子写入数据文件
+    输入: path (str/Path) 文件路径, document (Dict) 数据文档, records_key (str) 记录列表字段名,
+          fmt (str) json/binary, compression (str) none/gzip/zstd | 输出: 无
+    """
+    atomic_write_bytes(path, dumps_document(document, records_key, fmt, compression))
+
+def _sample_contacts(count: int) -> List[Dict]:
+    """
+    _sample_contacts 功能说明:
+    生成与同步微信好友后结构一致的联系人数据
+    输入: count (int) 联系人数量 | 输出: List[Dict] 联系人列表
+    """
+    tags = ['微信好友', '客户', '同事', '家人', 'VIP', '供应商', '同学', '朋友']
+    contacts = []
+    for i in range(count):
+        contacts.append({
+            'name': f'联系人{i:07d}',
+            'type': 'friend',
+            'tags': [tags[i % len(tags)], tags[(i * 7 + 3) % len(tags)]],
+            'created_at': '2026-10-17T09:00:00.000000',
+            'updated_at': '2026-10-17T09:30:00.000000',
+            'last_contact': None,
+            'wxid': f'wxid_{i:010d}',
+            'nickname': f'昵称{i}',
+            'remark': f'备注{i}' if i % 3 else ''
+        })
+    return contacts
+
+def benchmark(count: int = 100000, repeat: int = 3) -> List[Dict]:
+    """
+    benchmark 功能说明:
+    用 count 个联系人对比各格式/压缩方式的保存耗时、加载耗时和文件大小，
+    第一行是现有的 indent=2 JSON，作为对比基准；未安装的可选依赖对应的组合会被跳过
+    输入: count (int) 联系人数量, repeat (int) 重复次数（取最小值） | 输出: List[Dict] 每种组合的结果
+    """
+    document = {'contacts': _sample_contacts(count), 'last_updated': '2026-10-17T09:30:00', 'version': '1.0.0'}
+    combinations = [('json', 'none'), ('json', 'gzip'), ('binary', 'none'), ('binary', 'gzip')]
+    if zstandard is not None:
+        combinations += [('json', 'zstd'), ('binary', 'zstd')]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, compression in combinations:
+            path = Path(tmp) / f'contacts_{fmt}_{compression}.dat'
+            save_times, load_times = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                write_document(path, document, 'contacts', fmt, compression)
+                save_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                loaded = read_document(path)
+                load_times.append(time.perf_counter() - started)
+            if len(loaded['contacts']) != count:
+                raise ValueError(f"{fmt}/{compression} 读回的联系人数量不一致")
+            results.append({
+                'format': fmt,
+                'compression': compression,
+                'codec': ('msgpack' if msgpack is not None else 'json') if fmt == 'binary' else 'json',
+                'save_seconds': min(save_times),
+                'load_seconds': min(load_times),
+                'size': path.stat().st_size
+            })
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    main 功能说明:
+    命令行入口:
+    python -m utils.serializer convert 源文件 目标文件 [--format json|binary] [--compression none|gzip|zstd]
+    python -m utils.serializer benchmark [--count 100000] [--repeat 3]
+    convert 不指定格式时导出为原有的JSON格式
+    输入: argv (List[str], 可选) 命令行参数 | 输出: int 退出码
+    """
+    parser = argparse.ArgumentParser(description='数据文件格式转换（contacts.json / friend_details.json）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help='转换数据文件格式，默认导出为JSON')
+    convert.add_argument('source', help='源数据文件（任意支持的格式）')
+    convert.add_argument('target', help='目标文件')
+    convert.add_argument('--format', choices=FORMATS, default='json', help='目标格式')
+    convert.add_argument('--compression', choices=COMPRESSIONS, default='none', help='压缩方式')
+    bench = subparsers.add_parser('benchmark', help='对比各格式的保存/加载耗时和文件大小')
+    bench.add_argument('--count', type=int, default=100000, help='联系人数量')
+    bench.add_argument('--repeat', type=int, default=3, help='重复次数（取最小值）')
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        results = benchmark(args.count, args.repeat)
+        baseline = results[0]
+        print(f"{args.count} 个联系人（基准: 现有indent=2 JSON）")
+        print(f"{'格式':<8}{'压缩':<6}{'编码':<9}{'保存(秒)':>10}{'加载(秒)':>10}{'大小(KB)':>12}{'相对大小':>10}")
+        for item in results:
+            print(f"{item['format']:<8}{item['compression']:<6}{item['codec']:<9}"
+                  f"{item['save_seconds']:>10.3f}{item['load_seconds']:>10.3f}"
+                  f"{item['size'] / 1024:>12.1f}{item['size'] / baseline['size']:>10.1%}")
+        return 0
+
+    document = read_document(args.source)
+    records_key = 'contacts' if 'contacts' in document else 'friend_details'
+    write_document(args.target, document, records_key, args.format, args.compression)
+    print(f"✅ 已将 {args.source} 转换为 {args.format}/{args.compression}: {args.target} "
+          f"({len(document.get(records_key, []))} 条记录)")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,821 @@
+##########sqlite_store.py: [SQLite存储后端模块] ##################
+# 变更记录: [2026-10-17 11:45] @李祥光 [初始创建，联系人和好友详细信息的SQLite存储及JSON迁移工具]########
+# 变更记录: [2026-10-17 16:20] @李祥光 [新增好友增量写入apply_changes，只改动有变化的行]########
+# 变更记录: [2026-10-17 17:50] @李祥光 [迁移时自动识别数据文件格式]########
+# 变更记录: [2026-10-18 12:30] @李祥光 [联系人按需查询：姓名、标签和筛选条件直接查询数据库，不再把全部联系人读入内存]########
+# 变更记录: [2026-10-18 14:00] @李祥光 [联系人数据库版本固定，写入前不需要重新加载]########
+# 变更记录: [2026-10-18 16:40] @李祥光 [联系人视图改为只读，新增cache_contact供ContactManager显式缓存修改中的联系人]########
+# 输入: 联系人/好友详细信息及修改操作 | 输出: SQLite数据库中的持久化数据###############
+
+import argparse
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Dict, Optional, Tuple, Iterator, Iterable, Set
+from .logger import Logger
+from .contact_store import ContactStore
+from .contact_table import TIME_FIELDS
+from .serializer import read_document
+
+###########################文件下的所有函数###########################
+"""
+connect_sqlite：打开数据库连接（WAL模式）并创建表结构
+SQLiteContactStore.load：流式读取联系人及标签
+SQLiteContactStore.generation：数据库按行写入，版本固定不变
+SQLiteContactStore.record：将单条修改操作写入数据库
+SQLiteContactStore.commit：提交事务
+SQLiteContactStore.save_snapshot：整体重写联系人数据
+SQLiteContactStore.names_by_tag：通过索引查询带有标签的联系人姓名
+SQLiteContactStore.views：创建按需查询数据库的联系人列表、姓名索引和标签索引视图
+SQLiteContactStore.cache_contact：缓存正在修改的联系人字典，随后的 record 写入同一个字典
+SQLiteContactStore.get_contact：按姓名查询单个联系人
+SQLiteContactStore.get_contacts：按姓名批量查询联系人（按添加顺序）
+SQLiteContactStore.iter_contacts：分批流式读取全部联系人
+SQLiteContactStore.contacts_by_tag：查询带有标签的联系人
+SQLiteContactStore.filter_contacts：按标签、类型、时间范围用SQL筛选联系人
+SQLiteContactStore.has_tag：判断联系人是否带有标签
+SQLiteContactStore._select：查询联系人行并附加标签
+SQLiteContactList：只读联系人列表视图（len/遍历/copy 查询数据库）
+SQLiteContactMap：只读姓名 -> 联系人视图，带最近使用缓存
+SQLiteContactMap.cache：把联系人字典放入最近使用缓存
+SQLiteTagMap：只读标签 -> 联系人姓名视图，contact_tags 表即倒排索引
+SQLiteContactStore._tag_id：获取或创建标签ID
+SQLiteContactStore._write_contact_row：写入单个联系人行
+SQLiteFriendStore.load：流式读取好友详细信息
+SQLiteFriendStore.save_all：整体重写好友详细信息
+SQLiteFriendStore.apply_changes：增量写入新增/变化的好友并删除已移除的好友
+SQLiteFriendStore._friend_row：生成好友表的一行数据
+SQLiteFriendStore.find_by_name：通过索引按昵称/备注/微信号查询好友
+friend_key：获取好友记录的稳定标识
+migrate_json_to_sqlite：将JSON数据文件迁移到SQLite
+main：迁移命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ContactManager storage=sqlite] --> B[SQLiteContactStore]
+    B --> C[connect_sqlite]
+    D[FriendDetailsManager storage=sqlite] --> E[SQLiteFriendStore]
+    E --> C
+    F[ContactManager._record] --> G[SQLiteContactStore.record]
+    G --> H[_write_contact_row / contact_tags增删]
+    I[ContactManager.flush] --> J[SQLiteContactStore.commit]
+    J --> JC[清空姓名视图缓存]
+    V[ContactManager加载 sqlite] --> VW[views 按需查询视图]
+    VW --> VL[SQLiteContactList]
+    VW --> VM[SQLiteContactMap]
+    VW --> VT[SQLiteTagMap]
+    CC[ContactManager添加/修改联系人] --> CM[cache_contact]
+    CM --> VM
+    VM --> GC[get_contact]
+    VT --> NT[names_by_tag]
+    Q[get_contacts_by_tag / query_contacts / filter_contacts] --> S[contacts_by_tag / get_contacts / filter_contacts]
+    GC --> SE[_select 联系人行 + 标签]
+    S --> SE
+    K[main migrate] --> L[migrate_json_to_sqlite]
+    L --> M[SQLiteContactStore.save_snapshot]
+    L --> N[SQLiteFriendStore.save_all]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    type TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS contact_tags (
+    contact_id INTEGER NOT NULL REFERENCES contacts(id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tags(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (contact_id, tag_id)
+);
+CREATE INDEX IF NOT EXISTS idx_contact_tags_tag ON contact_tags(tag_id, contact_id);
+CREATE INDEX IF NOT EXISTS idx_contacts_type ON contacts(type);
+CREATE INDEX IF NOT EXISTS idx_contacts_updated_at ON contacts(updated_at);
+CREATE TABLE IF NOT EXISTS friends (
+    id INTEGER PRIMARY KEY,
+    friend_key TEXT NOT NULL UNIQUE,
+    nickname TEXT,
+    remark TEXT,
+    wxid TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_friends_nickname ON friends(nickname);
+CREATE INDEX IF NOT EXISTS idx_friends_remark ON friends(remark);
+CREATE INDEX IF NOT EXISTS idx_friends_wxid ON friends(wxid);
+"""
+
+# 好友详细信息中可能出现的字段名（兼容 wxauto 英文字段和 wxautox 中文字段）
+FRIEND_NICKNAME_FIELDS = ('NickName', '昵称')
+FRIEND_REMARK_FIELDS = ('Remark', '备注')
+FRIEND_ID_FIELDS = ('wxid', 'UserName', '微信号')
+
+# 单条SQL中 IN (...) 的参数个数上限（低于SQLite默认的999）
+_CHUNK = 500
+# 与列式表一致，只有 datetime.isoformat() 格式（不带时区）的时间参与时间范围筛选
+_ISO_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T[0-9][0-9]:[0-9][0-9]:[0-9][0-9]*'
+_TAGGED = ('SELECT ct.contact_id FROM contact_tags ct JOIN tags t ON t.id = ct.tag_id '
+           'WHERE t.name IN ({})')
+
+def connect_sqlite(db_file: Path) -> sqlite3.Connection:
+    """
+    connect_sqlite 功能说明:
+    打开SQLite连接，开启WAL模式并创建表结构。连接允许跨线程使用，由调用方加锁保护
+    输入: db_file (Path) 数据库文件路径 | 输出: sqlite3.Connection 数据库连接
+    """
+    db_file = Path(db_file)
+    db_file.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_file), check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(_SCHEMA)
+    conn.commit()
+    return conn
+
+def first_field(record: Dict, fields: Tuple[str, ...]) -> Optional[str]:
+    """
+    first_field 功能说明:
+    返回记录中第一个非空的候选字段值
+    输入: record (Dict) 记录, fields (Tuple[str]) 候选字段名 | 输出: Optional[str] 字段值
+    """
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return str(value)
+    return None
+
+def friend_key(friend: Dict) -> Optional[str]:
+    """
+    friend_key 功能说明:
+    获取好友记录的稳定标识：优先使用微信号，其次使用昵称
+    输入: friend (Dict) 好友详细信息 | 输出: Optional[str] 标识，无法识别时返回None
+    """
+    wxid = first_field(friend, FRIEND_ID_FIELDS)
+    if wxid:
+        return f'id:{wxid}'
+    nickname = first_field(friend, FRIEND_NICKNAME_FIELDS)
+    if nickname:
+        return f'name:{nickname}'
+    return None
+
+class SQLiteContactStore(ContactStore):
+    """
+    SQLiteContactStore 功能说明:
+    联系人SQLite存储后端。contacts/tags/contact_tags 三张表分别按姓名和标签建立索引，
+    每次修改只更新涉及的行，提交时只需一次事务提交，写入成本与联系人总数无关。
+    联系人不整体读入内存：ContactManager 通过 views 返回的视图按需查询姓名和标签
+    输入: data_file (Path) JSON快照路径（用于定位数据目录）, db_file (Path, 可选) 数据库路径 | 输出: 存储后端对象
+    """
+
+    name = 'sqlite'
+    on_demand = True
+
+    def __init__(self, data_file: Path, db_file: Optional[Path] = None):
+        """
+        __init__ 功能说明:
+        初始化SQLite存储，默认数据库文件为数据目录下的 biaoqian.db
+        输入: data_file (Path) JSON快照路径, db_file (Path, 可选) 数据库路径 | 输出: 无
+        """
+        super().__init__(data_file)
+        self.db_file = Path(db_file) if db_file else self.data_file.parent / 'biaoqian.db'
+        self.conn = connect_sqlite(self.db_file)
+        self._lock = threading.RLock()
+        self._tag_ids: Dict[str, int] = {}
+        self._contact_map: Optional['SQLiteContactMap'] = None
+
+    def exists(self) -> bool:
+        """
+        exists 功能说明:
+        数据库中已有联系人时视为已有数据
+        输入: 无 | 输出: bool 是否存在数据
+        """
+        with self._lock:
+            return self.conn.execute('SELECT 1 FROM contacts LIMIT 1').fetchone() is not None
+
+    def generation(self) -> tuple:
+        """
+        generation 功能说明:
+        按行写入，并发修改由数据库事务处理，不需要在写入前重新加载
+        输入: 无 | 输出: tuple 固定为空
+        """
+        return ()
+
+    def load(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        load 功能说明:
+        按联系人ID顺序流式读取联系人和标签，不需要解析完整的JSON文件
+        输入: 无 | 输出: Tuple[List[Dict], List[Dict]] (联系人列表, 空操作列表)
+        """
+        with self._lock:
+            self._tag_ids = {name: tag_id for tag_id, name in self.conn.execute('SELECT id, name FROM tags')}
+            contacts = []
+            by_id = {}
+            for contact_id, data in self.conn.execute('SELECT id, data FROM contacts ORDER BY id'):
+                contact = json.loads(data)
+                contact['tags'] = []
+                by_id[contact_id] = contact
+                contacts.append(contact)
+
+            rows = self.conn.execute(
+                'SELECT ct.contact_id, t.name FROM contact_tags ct JOIN tags t ON t.id = ct.tag_id '
+                'ORDER BY ct.contact_id, ct.position'
+            )
+            for contact_id, tag in rows:
+                by_id[contact_id]['tags'].append(tag)
+        return contacts, []
+
+    def _tag_id(self, tag: str) -> int:
+        """
+        _tag_id 功能说明:
+        获取标签ID，标签不存在时创建
+        输入: tag (str) 标签名 | 输出: int 标签ID
+        """
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO tags(name) VALUES (?)', (tag,))
+            tag_id = self.conn.execute('SELECT id FROM tags WHERE name = ?', (tag,)).fetchone()[0]
+            self._tag_ids[tag] = tag_id
+        return tag_id
+
+    def _write_contact_row(self, contact: Dict) -> int:
+        """
+        _write_contact_row 功能说明:
+        插入或更新单个联系人行（标签单独存放在 contact_tags 表）
+        输入: contact (Dict) 联系人 | 输出: int 联系人ID
+        """
+        data = {key: value for key, value in contact.items() if key != 'tags'}
+        self.conn.execute(
+            'INSERT INTO contacts(name, type, updated_at, data) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET type = excluded.type, '
+            'updated_at = excluded.updated_at, data = excluded.data',
+            (contact['name'], contact.get('type'), contact.get('updated_at'),
+             json.dumps(data, ensure_ascii=False))
+        )
+        return self.conn.execute('SELECT id FROM contacts WHERE name = ?', (contact['name'],)).fetchone()[0]
+
+    def _replace_tags(self, contact_id: int, tags: List[str]) -> None:
+        """
+        _replace_tags 功能说明:
+        整体替换联系人的标签
+        输入: contact_id (int) 联系人ID, tags (List[str]) 标签列表 | 输出: 无
+        """
+        self.conn.execute('DELETE FROM contact_tags WHERE contact_id = ?', (contact_id,))
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO contact_tags(contact_id, tag_id, position) VALUES (?, ?, ?)',
+            [(contact_id, self._tag_id(tag), position) for position, tag in enumerate(tags)]
+        )
+
+    def record(self, op: Dict, contact: Optional[Dict] = None) -> None:
+        """
+        record 功能说明:
+        在当前事务中执行单条修改：更新联系人行，并增删对应的 contact_tags 行
+        输入: op (Dict) 操作, contact (Dict) 操作生效后的联系人 | 输出: 无
+        """
+        if contact is None:
+            return
+        with self._lock:
+            contact_id = self._write_contact_row(contact)
+            kind = op['op']
+            if kind == 'tag':
+                position = len(contact.get('tags') or [])
+                self.conn.execute(
+                    'INSERT OR IGNORE INTO contact_tags(contact_id, tag_id, position) VALUES (?, ?, ?)',
+                    (contact_id, self._tag_id(op['tag']), position)
+                )
+            elif kind == 'untag':
+                if op['tag'] not in (contact.get('tags') or []):
+                    self.conn.execute(
+                        'DELETE FROM contact_tags WHERE contact_id = ? AND tag_id = ?',
+                        (contact_id, self._tag_id(op['tag']))
+                    )
+            elif kind == 'add' or 'tags' in op.get('fields', {}):
+                self._replace_tags(contact_id, contact.get('tags') or [])
+
+    def needs_snapshot(self) -> bool:
+        """
+        needs_snapshot 功能说明:
+        SQLite按行更新，不需要写入完整快照
+        输入: 无 | 输出: bool 始终为False
+        """
+        return False
+
+    def commit(self) -> bool:
+        """
+        commit 功能说明:
+        提交当前事务，批量事务中的所有修改在一次提交中落盘
+        输入: 无 | 输出: bool 是否成功
+        """
+        with self._lock:
+            self.conn.commit()
+            if self._contact_map is not None:
+                # 其他进程可能在两次提交之间修改数据库，提交后重新从数据库读取
+                self._contact_map.clear_cache()
+        return True
+
+    def save_snapshot(self, contacts: List[Dict]) -> bool:
+        """
+        save_snapshot 功能说明:
+        在一个事务中整体重写联系人数据（迁移或显式保存时使用）
+        输入: contacts (List[Dict]) 联系人列表 | 输出: bool 是否成功
+        """
+        with self._lock:
+            try:
+                self.conn.execute('DELETE FROM contact_tags')
+                self.conn.execute('DELETE FROM contacts')
+                for contact in contacts:
+                    contact_id = self._write_contact_row(contact)
+                    self._replace_tags(contact_id, contact.get('tags') or [])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return True
+
+    def names_by_tag(self, tag: str) -> List[str]:
+        """
+        names_by_tag 功能说明:
+        通过 contact_tags 的标签索引查询带有标签的联系人姓名，不需要加载全部联系人
+        输入: tag (str) 标签名 | 输出: List[str] 联系人姓名（按添加顺序）
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT c.name FROM contact_tags ct '
+                'JOIN tags t ON t.id = ct.tag_id JOIN contacts c ON c.id = ct.contact_id '
+                'WHERE t.name = ? ORDER BY c.id', (tag,)
+            )
+            return [name for (name,) in rows]
+
+    def views(self) -> Tuple['SQLiteContactList', 'SQLiteContactMap', 'SQLiteTagMap']:
+        """
+        views 功能说明:
+        创建按需查询数据库的视图，替代 ContactManager 内存中的联系人列表、姓名索引和标签倒排索引
+        输入: 无 | 输出: Tuple (联系人列表视图, 姓名 -> 联系人视图, 标签 -> 姓名视图)
+        """
+        with self._lock:
+            self._tag_ids = {name: tag_id for tag_id, name in self.conn.execute('SELECT id, name FROM tags')}
+        self._contact_map = SQLiteContactMap(self)
+        return SQLiteContactList(self), self._contact_map, SQLiteTagMap(self)
+
+    def cache_contact(self, contact: Dict) -> None:
+        """
+        cache_contact 功能说明:
+        把 ContactManager 正在修改的联系人字典放入姓名视图的缓存，之后按姓名取到的是同一个字典，
+        随后的 record 写入数据库的就是修改后的内容；标签索引由 record 维护，视图本身只读
+        输入: contact (Dict) 联系人 | 输出: 无
+        """
+        if self._contact_map is not None:
+            self._contact_map.cache(contact)
+
+    def _select(self, where: str = '', params: Iterable[Any] = ()) -> List[Dict]:
+        """
+        _select 功能说明:
+        按条件查询联系人行（按添加顺序），并分批查询这些联系人的标签
+        输入: where (str) WHERE 子句（联系人表别名为 c）, params (Iterable) 参数 | 输出: List[Dict] 联系人列表
+        """
+        with self._lock:
+            by_id: Dict[int, Dict] = {}
+            for contact_id, data in self.conn.execute(f'SELECT c.id, c.data FROM contacts c {where} ORDER BY c.id',
+                                                      tuple(params)):
+                contact = json.loads(data)
+                contact['tags'] = []
+                by_id[contact_id] = contact
+            ids = list(by_id)
+            for start in range(0, len(ids), _CHUNK):
+                chunk = ids[start:start + _CHUNK]
+                rows = self.conn.execute(
+                    'SELECT ct.contact_id, t.name FROM contact_tags ct JOIN tags t ON t.id = ct.tag_id '
+                    f'WHERE ct.contact_id IN ({",".join("?" * len(chunk))}) '
+                    'ORDER BY ct.contact_id, ct.position', chunk
+                )
+                for contact_id, tag in rows:
+                    by_id[contact_id]['tags'].append(tag)
+        return list(by_id.values())
+
+    def get_contact(self, name: str) -> Optional[Dict]:
+        """
+        get_contact 功能说明:
+        通过姓名的唯一索引查询单个联系人
+        输入: name (str) 联系人姓名 | 输出: Optional[Dict] 联系人，不存在时返回None
+        """
+        found = self._select('WHERE c.name = ?', (name,))
+        return found[0] if found else None
+
+    def get_contacts(self, names: Iterable[str]) -> List[Dict]:
+        """
+        get_contacts 功能说明:
+        按姓名分批查询联系人，结果按添加顺序排列，不存在的姓名忽略
+        输入: names (Iterable[str]) 姓名 | 输出: List[Dict] 联系人列表
+        """
+        names = list(names)
+        found: List[Tuple[int, Dict]] = []
+        for start in range(0, len(names), _CHUNK):
+            chunk = names[start:start + _CHUNK]
+            with self._lock:
+                ids = dict(self.conn.execute(
+                    f'SELECT name, id FROM contacts WHERE name IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall())
+            contacts = self._select(f'WHERE c.name IN ({",".join("?" * len(chunk))})', chunk)
+            found.extend((ids[contact['name']], contact) for contact in contacts)
+        found.sort(key=lambda item: item[0])
+        return [contact for _, contact in found]
+
+    def iter_contacts(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        iter_contacts 功能说明:
+        按添加顺序分批读取全部联系人，同一时间只有一批联系人在内存中，批与批之间不持有锁
+        输入: batch_size (int) 每批行数 | 输出: Iterator[Dict] 联系人
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                ids = [contact_id for (contact_id,) in self.conn.execute(
+                    'SELECT id FROM contacts WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size))]
+            if not ids:
+                return
+            yield from self._select('WHERE c.id BETWEEN ? AND ?', (ids[0], ids[-1]))
+            last_id = ids[-1]
+
+    def contacts_by_tag(self, tag: str) -> List[Dict]:
+        """
+        contacts_by_tag 功能说明:
+        通过 contact_tags 的标签索引查询带有标签的联系人（按添加顺序）
+        输入: tag (str) 标签名 | 输出: List[Dict] 联系人列表
+        """
+        return self._select(f'WHERE c.id IN ({_TAGGED.format("?")})', (tag,))
+
+    def has_tag(self, name: str, tag: str) -> bool:
+        """
+        has_tag 功能说明:
+        通过主键查询联系人是否带有标签
+        输入: name (str) 联系人姓名, tag (str) 标签名 | 输出: bool 是否带有该标签
+        """
+        with self._lock:
+            return self.conn.execute(
+                'SELECT 1 FROM contact_tags ct JOIN contacts c ON c.id = ct.contact_id '
+                'JOIN tags t ON t.id = ct.tag_id WHERE c.name = ? AND t.name = ?', (name, tag)
+            ).fetchone() is not None
+
+    def filter_contacts(self, tags: Optional[Iterable[str]] = None, any_tags: Optional[Iterable[str]] = None,
+                        exclude_tags: Optional[Iterable[str]] = None, types: Optional[Iterable[str]] = None,
+                        since=None, until=None, date_field: str = 'updated_at') -> List[Dict]:
+        """
+        filter_contacts 功能说明:
+        用SQL完成与 ContactTable.filter 相同的筛选，各条件之间为 AND 关系，结果按添加顺序排列
+        输入: tags (可选) 必须全部带有的标签, any_tags (可选) 至少带有一个的标签,
+              exclude_tags (可选) 不能带有的标签, types (可选) 联系人类型,
+              since/until (datetime/str, 可选) 时间范围 [since, until), date_field (str) 时间字段
+        输出: List[Dict] 联系人列表
+        """
+        where: List[str] = []
+        params: List[Any] = []
+
+        def tagged(names: List[str]) -> str:
+            params.extend(names)
+            return _TAGGED.format(','.join('?' * len(names)))
+
+        for tag in tags or []:
+            where.append(f'c.id IN ({tagged([tag])})')
+        if any_tags is not None:
+            any_tags = list(any_tags)
+            where.append(f'c.id IN ({tagged(any_tags)})' if any_tags else '0')
+        if exclude_tags:
+            where.append(f'c.id NOT IN ({tagged(list(exclude_tags))})')
+        if types is not None:
+            types = list(types)
+            params.extend(types)
+            where.append(f'c.type IN ({",".join("?" * len(types))})' if types else '0')
+        if since is not None or until is not None:
+            if date_field not in TIME_FIELDS:
+                raise ValueError(f"不支持按字段 {date_field} 筛选时间，可选: {', '.join(TIME_FIELDS)}")
+            column = 'c.updated_at' if date_field == 'updated_at' else f"json_extract(c.data, '$.{date_field}')"
+            where.append(f"{column} GLOB '{_ISO_GLOB}' AND length({column}) IN (19, 26)")
+            if since is not None:
+                where.append(f'{column} >= ?')
+                params.append(_iso_bound(since))
+            if until is not None:
+                where.append(f'{column} < ?')
+                params.append(_iso_bound(until))
+        return self._select('WHERE ' + ' AND '.join(where) if where else '', params)
+
+def _iso_bound(value) -> str:
+    """
+    _iso_bound 功能说明:
+    将筛选条件中的时间（datetime 或 ISO 字符串）转换为与 datetime.isoformat() 相同格式的字符串，
+    保证与数据库中的时间字符串按字典序比较的结果和按时间比较一致
+    输入: value (datetime/str) 时间 | 输出: str ISO时间字符串
+    """
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=None).isoformat()
+
+class SQLiteContactList(Sequence):
+    """
+    SQLiteContactList 功能说明:
+    只读联系人列表视图，替代 ContactManager.contacts：长度、遍历和 copy 直接查询数据库。
+    新增联系人由 SQLiteContactStore.record 写入数据库，视图不提供 append 等修改方法
+    输入: store (SQLiteContactStore) 存储后端 | 输出: 列表视图
+    """
+
+    def __init__(self, store: SQLiteContactStore):
+        self._store = store
+
+    def __len__(self) -> int:
+        with self._store._lock:
+            return self._store.conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._store.iter_contacts()
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        found = self._store._select('WHERE c.id = (SELECT id FROM contacts ORDER BY id LIMIT 1 OFFSET ?)', (index,))
+        if not found:
+            raise IndexError(index)
+        return found[0]
+
+    def copy(self) -> List[Dict]:
+        return list(self)
+
+class SQLiteContactMap(Mapping):
+    """
+    SQLiteContactMap 功能说明:
+    只读姓名 -> 联系人视图，替代 ContactManager._by_name。按姓名的唯一索引查询，
+    最近使用的联系人放在有上限的缓存中，保证修改操作和随后的 record 使用同一个字典；
+    新增的联系人通过 SQLiteContactStore.cache_contact 放入缓存，缓存在每次提交后清空
+    输入: store (SQLiteContactStore) 存储后端, cache_size (int) 缓存的联系人数 | 输出: 映射视图
+    """
+
+    def __init__(self, store: SQLiteContactStore, cache_size: int = 1024):
+        self._store = store
+        self._cache: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._cache_size = cache_size
+
+    def __getitem__(self, name: str) -> Dict:
+        contact = self._cache.get(name)
+        if contact is None:
+            contact = self._store.get_contact(name)
+            if contact is None:
+                raise KeyError(name)
+        self.cache(contact)
+        return contact
+
+    def cache(self, contact: Dict) -> None:
+        name = contact['name']
+        self._cache[name] = contact
+        self._cache.move_to_end(name)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def __contains__(self, name: object) -> bool:
+        if name in self._cache:
+            return True
+        with self._store._lock:
+            return self._store.conn.execute('SELECT 1 FROM contacts WHERE name = ?', (name,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._store._lock:
+            names = [name for (name,) in self._store.conn.execute('SELECT name FROM contacts ORDER BY id')]
+        return iter(names)
+
+    def __len__(self) -> int:
+        with self._store._lock:
+            return self._store.conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def values(self) -> Iterator[Dict]:
+        for contact in self._store.iter_contacts():
+            yield self._cache.get(contact['name'], contact)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        for contact in self.values():
+            yield contact['name'], contact
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+class SQLiteTagMap(Mapping):
+    """
+    SQLiteTagMap 功能说明:
+    只读标签 -> 联系人姓名集合视图，替代 ContactManager._tag_index。contact_tags 表本身就是倒排索引，
+    由 SQLiteContactStore.record 维护，视图不提供 setdefault、删除等修改方法
+    输入: store (SQLiteContactStore) 存储后端 | 输出: 映射视图
+    """
+
+    def __init__(self, store: SQLiteContactStore):
+        self._store = store
+
+    def __getitem__(self, tag: str) -> Set[str]:
+        names = set(self._store.names_by_tag(tag))
+        if not names:
+            raise KeyError(tag)
+        return names
+
+    def __contains__(self, tag: object) -> bool:
+        with self._store._lock:
+            return self._store.conn.execute(
+                'SELECT 1 FROM contact_tags ct JOIN tags t ON t.id = ct.tag_id WHERE t.name = ? LIMIT 1', (tag,)
+            ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._store._lock:
+            tags = [tag for (tag,) in self._store.conn.execute(
+                'SELECT t.name FROM tags t WHERE EXISTS (SELECT 1 FROM contact_tags ct WHERE ct.tag_id = t.id) '
+                'ORDER BY t.id')]
+        return iter(tags)
+
+    def __len__(self) -> int:
+        with self._store._lock:
+            return self._store.conn.execute('SELECT COUNT(DISTINCT tag_id) FROM contact_tags').fetchone()[0]
+
+class SQLiteFriendStore:
+    """
+    SQLiteFriendStore 功能说明:
+    好友详细信息SQLite存储，按昵称、备注、微信号建立索引
+    输入: db_file (Path) 数据库路径 | 输出: 存储对象
+    """
+
+    def __init__(self, db_file: Path):
+        """
+        __init__ 功能说明:
+        初始化好友详细信息存储
+        输入: db_file (Path) 数据库路径 | 输出: 无
+        """
+        self.db_file = Path(db_file)
+        self.conn = connect_sqlite(self.db_file)
+        self._lock = threading.RLock()
+
+    def exists(self) -> bool:
+        """
+        exists 功能说明:
+        数据库中已有好友记录时视为已有数据
+        输入: 无 | 输出: bool 是否存在数据
+        """
+        with self._lock:
+            return self.conn.execute('SELECT 1 FROM friends LIMIT 1').fetchone() is not None
+
+    def iter_friends(self) -> Iterator[Dict]:
+        """
+        iter_friends 功能说明:
+        按写入顺序逐条读取好友详细信息
+        输入: 无 | 输出: Iterator[Dict] 好友详细信息
+        """
+        with self._lock:
+            rows = self.conn.execute('SELECT data FROM friends ORDER BY id').fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def load(self) -> List[Dict]:
+        """
+        load 功能说明:
+        读取全部好友详细信息
+        输入: 无 | 输出: List[Dict] 好友详细信息列表
+        """
+        return list(self.iter_friends())
+
+    def save_all(self, friends: List[Dict]) -> int:
+        """
+        save_all 功能说明:
+        在一个事务中整体重写好友详细信息，无法识别标识的记录使用序号作为标识
+        输入: friends (List[Dict]) 好友详细信息列表 | 输出: int 写入的记录数
+        """
+        rows = []
+        seen = set()
+        for position, friend in enumerate(friends):
+            key = friend_key(friend) or f'row:{position}'
+            if key in seen:
+                key = f'{key}#{position}'
+            seen.add(key)
+            rows.append(self._friend_row(key, friend))
+
+        with self._lock:
+            try:
+                self.conn.execute('DELETE FROM friends')
+                self.conn.executemany(
+                    'INSERT INTO friends(friend_key, nickname, remark, wxid, updated_at, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return len(rows)
+
+    @staticmethod
+    def _friend_row(key: str, friend: Dict) -> Tuple:
+        """
+        _friend_row 功能说明:
+        生成好友表的一行数据，昵称/备注/微信号单独成列以便建立索引
+        输入: key (str) 好友标识, friend (Dict) 好友详细信息 | 输出: Tuple 行数据
+        """
+        return (
+            key,
+            first_field(friend, FRIEND_NICKNAME_FIELDS),
+            first_field(friend, FRIEND_REMARK_FIELDS),
+            first_field(friend, FRIEND_ID_FIELDS),
+            friend.get('updated_at'),
+            json.dumps(friend, ensure_ascii=False)
+        )
+
+    def apply_changes(self, upserts: List[Dict], removed_keys: List[str]) -> None:
+        """
+        apply_changes 功能说明:
+        在一个事务中增量写入：新增或更新有变化的好友（已有行保留原有顺序），删除已移除的好友
+        输入: upserts (List[Dict]) 新增或变化的好友, removed_keys (List[str]) 已移除好友的标识 | 输出: 无
+        """
+        rows = [self._friend_row(friend_key(friend), friend) for friend in upserts]
+        with self._lock:
+            try:
+                self.conn.executemany(
+                    'INSERT INTO friends(friend_key, nickname, remark, wxid, updated_at, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(friend_key) DO UPDATE SET '
+                    'nickname = excluded.nickname, remark = excluded.remark, wxid = excluded.wxid, '
+                    'updated_at = excluded.updated_at, data = excluded.data', rows
+                )
+                self.conn.executemany('DELETE FROM friends WHERE friend_key = ?',
+                                      [(key,) for key in removed_keys])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def find_by_name(self, name: str) -> List[Dict]:
+        """
+        find_by_name 功能说明:
+        通过索引按备注、昵称或微信号查询好友
+        输入: name (str) 备注/昵称/微信号 | 输出: List[Dict] 匹配的好友详细信息
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT data FROM friends WHERE remark = ? UNION '
+                'SELECT data FROM friends WHERE nickname = ? UNION '
+                'SELECT data FROM friends WHERE wxid = ?', (name, name, name)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+def migrate_json_to_sqlite(contacts_file: Optional[str], friends_file: Optional[str], db_file: str) -> Dict[str, int]:
+    """
+    migrate_json_to_sqlite 功能说明:
+    将 contacts.json 和 friend_details.json 迁移到SQLite数据库，已有数据会被覆盖
+    输入: contacts_file (str) 联系人JSON路径, friends_file (str) 好友详细信息JSON路径, db_file (str) 数据库路径 | 输出: Dict[str, int] 迁移数量
+    """
+    result = {'contacts': 0, 'friends': 0}
+
+    if contacts_file and Path(contacts_file).exists():
+        contacts = read_document(contacts_file).get('contacts', [])
+        store = SQLiteContactStore(Path(contacts_file), db_file=Path(db_file))
+        store.save_snapshot(contacts)
+        store.conn.close()
+        result['contacts'] = len(contacts)
+        Logger.info(f"已迁移 {len(contacts)} 个联系人到 {db_file}")
+
+    if friends_file and Path(friends_file).exists():
+        friends = read_document(friends_file).get('friend_details', [])
+        friend_store = SQLiteFriendStore(Path(db_file))
+        result['friends'] = friend_store.save_all(friends)
+        friend_store.conn.close()
+        Logger.info(f"已迁移 {result['friends']} 个好友详细信息到 {db_file}")
+
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    main 功能说明:
+    命令行入口: python -m utils.sqlite_store migrate [--contacts ...] [--friends ...] [--db ...]
+    输入: argv (List[str], 可选) 命令行参数 | 输出: int 退出码
+    """
+    parser = argparse.ArgumentParser(description='联系人数据SQLite迁移工具')
+    subparsers = parser.add_subparsers(dest='command')
+    migrate = subparsers.add_parser('migrate', help='将JSON数据文件迁移到SQLite')
+    migrate.add_argument('--contacts', default='data/contacts.json', help='联系人JSON文件')
+    migrate.add_argument('--friends', default='data/friend_details.json', help='好友详细信息JSON文件')
+    migrate.add_argument('--db', default='data/biaoqian.db', help='SQLite数据库文件')
+    args = parser.parse_args(argv)
+
+    if args.command != 'migrate':
+        parser.print_help()
+        return 1
+
+    started = datetime.now()
+    result = migrate_json_to_sqlite(args.contacts, args.friends, args.db)
+    duration = (datetime.now() - started).total_seconds()
+    print(f"✅ 迁移完成: 联系人 {result['contacts']} 个, 好友详细信息 {result['friends']} 个, 耗时 {duration:.1f}秒")
+    print("请在配置中设置 contacts.storage 和 friend_details.storage 为 \"sqlite\" 以启用")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
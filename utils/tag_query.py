@@ -0,0 +1,279 @@
+##########tag_query.py: [标签布尔查询表达式模块] ##################
+# 变更记录: [2026-10-17 09:40] @李祥光 [初始创建]########
+# 变更记录: [2026-10-18 14:40] @李祥光 [已存在的标签按字面匹配；运算符只认大写关键字和独立的符号]########
+# 输入: 标签查询表达式 | 输出: 匹配的联系人姓名集合###############
+
+import re
+from typing import Callable, Container, List, Optional, Set, Tuple
+
+###########################文件下的所有函数###########################
+"""
+TagQueryError：标签表达式语法错误
+TagQuery.__init__：编译标签查询表达式
+TagQuery._tokenize：将表达式切分为词法单元
+TagQuery._parse_or：解析OR表达式
+TagQuery._parse_and：解析AND表达式
+TagQuery._parse_not：解析NOT表达式
+TagQuery._parse_atom：解析标签或括号表达式
+TagQuery.evaluate：基于标签倒排索引计算匹配的联系人集合
+TagQuery._eval：递归计算语法树节点
+TagQuery.is_simple：判断表达式是否为单个标签
+TagQuery._collect_tags：收集表达式引用的标签
+TagQuery._peek：查看当前词法单元类型
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[TagQuery初始化] --> L{整个表达式是已存在的标签?}
+    L -->|是| D
+    L -->|否| B[_tokenize]
+    B --> C{包含运算符?}
+    C -->|否| D[整个表达式作为单个标签]
+    C -->|是| E[_parse_or]
+    E --> F[_parse_and]
+    F --> G[_parse_not]
+    G --> H[_parse_atom]
+    H -->|括号| E
+    I[evaluate] --> J[_eval]
+    J --> K[集合交/并/差运算]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+# 运算符关键字区分大小写（只认大写），符号必须是独立的词，
+# 这样 "R&D"、"VIP!"、"Not interested" 之类的普通标签不会被当成运算符
+_OPERATORS = {
+    'AND': 'AND', '&': 'AND', '&&': 'AND',
+    'OR': 'OR', '|': 'OR', '||': 'OR',
+    'NOT': 'NOT', '!': 'NOT',
+}
+
+_TOKEN_PATTERN = re.compile(
+    r'\s*(?:'
+    r'(?P<paren>[()])'
+    r'|(?P<quoted>"[^"]*"|\'[^\']*\')'
+    r'|(?P<word>[^\s()"\']+)'
+    r')'
+)
+
+_OPERATOR_HINT = re.compile(r'(?:^|\s)(?:AND|OR|NOT|&&?|\|\|?|!)(?:\s|$)')
+
+class TagQueryError(ValueError):
+    """
+    TagQueryError 功能说明:
+    标签查询表达式语法错误
+    输入: 错误描述 | 输出: 异常对象
+    """
+
+class TagQuery:
+    """
+    TagQuery 功能说明:
+    标签布尔查询表达式，支持 AND / OR / NOT 与括号，例如 "VIP AND 上海 AND NOT 已退订"。
+    运算符只认大写的 AND / OR / NOT 以及用空白隔开的 & && | || ! 符号；
+    整个表达式恰好是已存在的标签、或不包含运算符时视为单个标签名，与原有的按单标签发送保持兼容；
+    包含空格或运算符的标签名在组合查询中可以用引号括起来。
+    输入: expression (str) 查询表达式, known_tags (Container) 已存在的标签 | 输出: 编译后的查询对象
+    """
+
+    def __init__(self, expression: str, known_tags: Optional[Container[str]] = None):
+        """
+        __init__ 功能说明:
+        编译查询表达式为语法树，语法错误时抛出 TagQueryError
+        输入: expression (str) 查询表达式, known_tags (Container) 已存在的标签 | 输出: 无
+        """
+        self.expression = (expression or '').strip()
+        if not self.expression:
+            raise TagQueryError('标签表达式不能为空')
+
+        if known_tags is not None and self.expression in known_tags:
+            # 已存在的标签永远按字面匹配，即使标签名里恰好含有运算符
+            self.tree = ('tag', self.expression)
+            self.tags: Set[str] = {self.expression}
+            return
+
+        tokenize_error = None
+        try:
+            tokens = self._tokenize(self.expression)
+        except TagQueryError as e:
+            tokens = None
+            tokenize_error = e
+
+        if tokens is None:
+            has_operator = bool(_OPERATOR_HINT.search(self.expression))
+        else:
+            has_operator = any(kind in ('AND', 'OR', 'NOT') for kind, _ in tokens)
+
+        if not has_operator:
+            # 没有任何运算符：保持旧行为，整个字符串就是一个标签名（允许空格、括号等字符）
+            self.tree = ('tag', self.expression)
+        else:
+            if tokenize_error is not None:
+                raise tokenize_error
+            self._tokens = tokens
+            self._pos = 0
+            self.tree = self._parse_or()
+            if self._pos != len(self._tokens):
+                raise TagQueryError(f'表达式在 "{self._tokens[self._pos][1]}" 附近缺少运算符')
+
+        self.tags = set()
+        self._collect_tags(self.tree)
+
+    def _tokenize(self, expression: str) -> List[Tuple[str, str]]:
+        """
+        _tokenize 功能说明:
+        将表达式切分为 (类型, 值) 形式的词法单元
+        输入: expression (str) 查询表达式 | 输出: List[Tuple[str, str]] 词法单元列表
+        """
+        tokens = []
+        pos = 0
+        length = len(expression)
+        while pos < length:
+            if expression[pos:].strip() == '':
+                break
+            match = _TOKEN_PATTERN.match(expression, pos)
+            if not match or match.end() == pos:
+                raise TagQueryError(f'无法解析的字符: {expression[pos:]}')
+            pos = match.end()
+
+            if match.group('paren'):
+                tokens.append((match.group('paren'), match.group('paren')))
+            elif match.group('quoted'):
+                tokens.append(('tag', match.group('quoted')[1:-1]))
+            else:
+                word = match.group('word')
+                operator = _OPERATORS.get(word)
+                tokens.append((operator, word) if operator else ('tag', word))
+        return tokens
+
+    def _peek(self) -> str:
+        """
+        _peek 功能说明:
+        查看当前词法单元类型
+        输入: 无 | 输出: str 词法单元类型，结束时返回空字符串
+        """
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos][0]
+        return ''
+
+    def _parse_or(self):
+        """
+        _parse_or 功能说明:
+        解析 OR 表达式（优先级最低）
+        输入: 无 | 输出: tuple 语法树节点
+        """
+        nodes = [self._parse_and()]
+        while self._peek() == 'OR':
+            self._pos += 1
+            nodes.append(self._parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def _parse_and(self):
+        """
+        _parse_and 功能说明:
+        解析 AND 表达式
+        输入: 无 | 输出: tuple 语法树节点
+        """
+        nodes = [self._parse_not()]
+        while self._peek() == 'AND':
+            self._pos += 1
+            nodes.append(self._parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def _parse_not(self):
+        """
+        _parse_not 功能说明:
+        解析 NOT 表达式
+        输入: 无 | 输出: tuple 语法树节点
+        """
+        if self._peek() == 'NOT':
+            self._pos += 1
+            return ('not', self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        """
+        _parse_atom 功能说明:
+        解析标签名或括号中的子表达式
+        输入: 无 | 输出: tuple 语法树节点
+        """
+        kind = self._peek()
+        if kind == 'tag':
+            value = self._tokens[self._pos][1]
+            self._pos += 1
+            return ('tag', value)
+        if kind == '(':
+            self._pos += 1
+            node = self._parse_or()
+            if self._peek() != ')':
+                raise TagQueryError('括号不匹配，缺少 ")"')
+            self._pos += 1
+            return node
+        if not kind:
+            raise TagQueryError('表达式不完整，运算符后缺少标签')
+        raise TagQueryError(f'表达式在 "{self._tokens[self._pos][1]}" 处有语法错误')
+
+    def _collect_tags(self, node) -> None:
+        """
+        _collect_tags 功能说明:
+        收集表达式中引用的所有标签
+        输入: node (tuple) 语法树节点 | 输出: 无
+        """
+        if node[0] == 'tag':
+            self.tags.add(node[1])
+        elif node[0] == 'not':
+            self._collect_tags(node[1])
+        else:
+            for child in node[1]:
+                self._collect_tags(child)
+
+    def is_simple(self) -> bool:
+        """
+        is_simple 功能说明:
+        判断表达式是否只是单个标签
+        输入: 无 | 输出: bool 是否为单个标签
+        """
+        return self.tree[0] == 'tag'
+
+    def evaluate(self, lookup: Callable[[str], Set[str]], universe: Callable[[], Set[str]]) -> Set[str]:
+        """
+        evaluate 功能说明:
+        基于标签倒排索引计算匹配的联系人姓名集合，结果天然去重
+        输入: lookup (Callable) 标签 -> 姓名集合, universe (Callable) 返回全部联系人姓名 | 输出: Set[str] 姓名集合
+        """
+        return set(self._eval(self.tree, lookup, universe))
+
+    def _eval(self, node, lookup, universe) -> Set[str]:
+        """
+        _eval 功能说明:
+        递归计算语法树节点。AND 节点先对肯定条件按集合大小求交集，再减去否定条件，
+        只有全部为否定条件时才需要全集
+        输入: node (tuple) 语法树节点, lookup (Callable), universe (Callable) | 输出: Set[str] 姓名集合
+        """
+        kind = node[0]
+        if kind == 'tag':
+            return lookup(node[1])
+        if kind == 'not':
+            return universe() - self._eval(node[1], lookup, universe)
+        if kind == 'or':
+            result: Set[str] = set()
+            for child in node[1]:
+                result |= self._eval(child, lookup, universe)
+            return result
+
+        positives = [self._eval(child, lookup, universe) for child in node[1] if child[0] != 'not']
+        negatives = [self._eval(child[1], lookup, universe) for child in node[1] if child[0] == 'not']
+        if positives:
+            positives.sort(key=len)
+            result = set(positives[0])
+            for other in positives[1:]:
+                if not result:
+                    break
+                result &= other
+        else:
+            result = set(universe())
+        for other in negatives:
+            if not result:
+                break
+            result -= other
+        return result
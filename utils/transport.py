@@ -0,0 +1,344 @@
+##########transport.py: [微信客户端传输层模块] ##################
+# 变更记录: [2026-10-17 22:30] @李祥光 [初始创建，统一微信调用接口，wxauto/wxautox延迟导入适配器和可配置的模拟微信客户端]########
+# 变更记录: [2026-10-17 23:10] @李祥光 [WxautoTransport支持客户端参数（如nickname指定已登录的账号），用于多账号发送]########
+# 变更记录: [2026-10-18 16:00] @李祥光 [新增界面自动化专用线程UIThread，真实客户端的所有调用都在该线程串行执行]########
+# 输入: 发送消息、获取好友和会话列表的调用 | 输出: 真实或模拟微信客户端的返回结果###############
+
+import importlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+from .logger import Logger
+from .retry_scheduler import PermanentSendError, RateLimitedError
+from .sqlite_store import FRIEND_ID_FIELDS, FRIEND_NICKNAME_FIELDS, FRIEND_REMARK_FIELDS
+from config.settings import config
+
+###########################文件下的所有函数###########################
+"""
+WeChatTransport.connect：连接微信客户端（发送前调用，连接失败时抛出异常）
+WeChatTransport.SendMsg：发送消息给指定会话
+WeChatTransport.GetFriendDetails：获取好友详细信息
+WeChatTransport.GetSessionList：获取会话列表
+UIThread._initialize：在界面自动化线程中初始化 UI Automation（COM）
+UIThread.call：在界面自动化线程中执行调用并等待结果
+WxautoTransport.connect：在界面自动化线程中连接微信客户端
+WxautoTransport._connect：延迟导入 wxautox/wxauto 并创建 WeChat 客户端
+WxautoTransport._get_friend_details：获取好友详细信息（界面自动化线程中执行）
+WxautoTransport._get_session_list：获取会话列表（界面自动化线程中执行）
+FakeWeChatTransport._delay：模拟调用耗时
+FakeWeChatTransport.SendMsg：模拟发送，按配置注入延迟、失败、未知收件人和限流响应
+FakeWeChatTransport.GetFriendDetails：返回模拟好友详细信息
+FakeWeChatTransport.GetSessionList：返回模拟会话列表
+FakeWeChatTransport.stats：获取模拟发送统计
+create_transport：根据配置创建传输层
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[MessageSender/FriendDetailsManager] --> B[create_transport]
+    B -->|wechat.transport = wxauto| C[WxautoTransport]
+    B -->|wechat.transport = fake| D[FakeWeChatTransport]
+    C --> U[ui_thread.call 所有调用进入同一个界面自动化线程串行执行]
+    U --> E[_connect 首次使用时 import wxautox 或 wxauto]
+    E --> F[WeChat.SendMsg/GetFriendDetails/GetSessionList]
+    D --> G[SendMsg 模拟延迟]
+    G --> H{每分钟发送数超过上限?}
+    H -->|是| I[RateLimitedError]
+    H -->|否| J{收件人存在?}
+    J -->|否| K[按配置返回失败或 PermanentSendError]
+    J -->|是| L{按失败率随机失败?}
+    L -->|是| M[返回 False]
+    L -->|否| N[记录发送并返回 True]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+class WeChatTransport:
+    """
+    WeChatTransport 功能说明:
+    微信客户端接口，方法名与 wxauto 保持一致，任何提供这些方法的对象都可以作为传输层使用
+    输入: 无 | 输出: 传输层对象
+    """
+
+    name = 'base'
+
+    def connect(self) -> None:
+        """
+        connect 功能说明:
+        连接微信客户端，连接失败时抛出异常；默认不需要连接
+        输入: 无 | 输出: 无
+        """
+
+    def SendMsg(self, msg: str, who: str, exact: bool = True) -> bool:
+        """
+        SendMsg 功能说明:
+        发送消息给指定会话
+        输入: msg (str) 消息内容, who (str) 会话名称, exact (bool) 是否精确匹配 | 输出: bool 是否发送成功
+        """
+        raise NotImplementedError
+
+    def GetFriendDetails(self, n: Optional[int] = None, timeout: int = 0xFFFFF) -> List[Dict]:
+        """
+        GetFriendDetails 功能说明:
+        获取前 n 个好友的详细信息
+        输入: n (int, 可选) 数量, timeout (int) 超时时间 | 输出: List[Dict] 好友详细信息
+        """
+        raise NotImplementedError
+
+    def GetSessionList(self) -> List[str]:
+        """
+        GetSessionList 功能说明:
+        获取会话列表中的会话名称
+        输入: 无 | 输出: List[str] 会话名称
+        """
+        raise NotImplementedError
+
+class UIThread:
+    """
+    UIThread 功能说明:
+    微信界面自动化专用线程。wxauto 通过 UI Automation（COM）操作微信窗口：COM 需要在调用线程中初始化，
+    多个线程同时操作窗口还会互相抢占焦点和键盘输入。真实客户端的所有调用都提交到这一个线程串行执行，
+    调用方（异步发送的工作线程、多账号发送线程等）只等待结果，等待限速间隔等不涉及界面的工作仍可并行
+    输入: name (str) 线程名称 | 输出: 线程对象
+    """
+
+    def __init__(self, name: str = 'wechat-ui'):
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._ident: Optional[int] = None
+        self._com = None
+        self._lock = threading.Lock()
+
+    def _initialize(self) -> None:
+        """
+        _initialize 功能说明:
+        在界面自动化线程中初始化 UI Automation（COM），线程存续期间保持；未安装 uiautomation 时跳过
+        输入: 无 | 输出: 无
+        """
+        self._ident = threading.get_ident()
+        try:
+            uiautomation = importlib.import_module('uiautomation')
+        except ImportError:
+            return
+        self._com = uiautomation.UIAutomationInitializerInThread()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        call 功能说明:
+        在界面自动化线程中执行调用并等待结果，异常原样抛出；已在该线程中时直接调用
+        输入: func (Callable) 调用, args/kwargs 参数 | 输出: 调用的返回值
+        """
+        if threading.get_ident() == self._ident:
+            return func(*args, **kwargs)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name,
+                                                    initializer=self._initialize)
+        return self._executor.submit(func, *args, **kwargs).result()
+
+# 进程内唯一的界面自动化线程，所有真实微信客户端共用
+ui_thread = UIThread()
+
+class WxautoTransport(WeChatTransport):
+    """
+    WxautoTransport 功能说明:
+    真实微信客户端适配器。首次使用时才导入自动化库并连接客户端，没有安装微信的环境也可以导入本模块；
+    优先使用 wxautox（支持获取好友详细信息），未安装时使用 wxauto。
+    连接和所有客户端调用都在 ui_thread 中执行，无论从哪个线程调用、有几个账号
+    输入: modules (Iterable[str], 可选) 依次尝试导入的模块,
+          client_options 创建 WeChat 客户端的参数（如 wxautox 的 nickname 指定多开时的账号） | 输出: 适配器对象
+    """
+
+    name = 'wxauto'
+    MODULES = ('wxautox', 'wxauto')
+
+    def __init__(self, modules: Optional[Iterable[str]] = None, **client_options):
+        self.modules = tuple(modules or self.MODULES)
+        self.client_options = client_options
+        self.module_name: Optional[str] = None
+        self._client = None
+
+    def connect(self):
+        """
+        connect 功能说明:
+        在界面自动化线程中连接微信客户端，都未安装时抛出 ImportError
+        输入: 无 | 输出: WeChat 客户端
+        """
+        return ui_thread.call(self._connect)
+
+    def _connect(self):
+        """
+        _connect 功能说明:
+        依次尝试导入 wxautox/wxauto 并创建 WeChat 客户端，都未安装时抛出 ImportError
+        输入: 无 | 输出: WeChat 客户端
+        """
+        if self._client is None:
+            errors = []
+            for name in self.modules:
+                try:
+                    module = importlib.import_module(name)
+                except ImportError as e:
+                    errors.append(f"{name}: {str(e)}")
+                    continue
+                self._client = module.WeChat(**self.client_options)
+                self.module_name = name
+                Logger.info(f"已通过 {name} 连接微信客户端")
+                break
+            else:
+                raise ImportError(f"未安装微信自动化库（{'; '.join(errors)}）")
+        return self._client
+
+    def SendMsg(self, msg: str, who: str, exact: bool = True) -> bool:
+        return ui_thread.call(lambda: self._connect().SendMsg(msg, who, exact=exact))
+
+    def GetFriendDetails(self, n: Optional[int] = None, timeout: int = 0xFFFFF) -> List[Dict]:
+        return ui_thread.call(self._get_friend_details, n, timeout)
+
+    def GetSessionList(self) -> List[str]:
+        return ui_thread.call(self._get_session_list)
+
+    def _get_friend_details(self, n: Optional[int], timeout: int) -> List[Dict]:
+        """
+        _get_friend_details 功能说明:
+        获取好友详细信息，客户端不支持时抛出 NotImplementedError（界面自动化线程中执行）
+        输入: n (int, 可选) 数量, timeout (int) 超时时间 | 输出: List[Dict] 好友详细信息
+        """
+        client = self._connect()
+        if not hasattr(client, 'GetFriendDetails'):
+            raise NotImplementedError(f"{self.module_name} 不支持获取好友详细信息，请安装 wxautox")
+        return client.GetFriendDetails(n=n, timeout=timeout)
+
+    def _get_session_list(self) -> List[str]:
+        """
+        _get_session_list 功能说明:
+        获取会话列表中的会话名称（界面自动化线程中执行）
+        输入: 无 | 输出: List[str] 会话名称
+        """
+        client = self._connect()
+        if hasattr(client, 'GetSessionList'):
+            return list(client.GetSessionList())
+        # wxauto V2 的 GetSession 返回会话元素列表
+        return [getattr(session, 'name', str(session)) for session in client.GetSession()]
+
+class FakeWeChatTransport(WeChatTransport):
+    """
+    FakeWeChatTransport 功能说明:
+    进程内模拟微信客户端，用于在任何环境下压测发送吞吐量和调度逻辑。
+    可配置每次发送的延迟、随机失败率、未知收件人的处理方式和每分钟发送上限（超过时返回限流异常）；
+    时钟、等待和随机数可替换，配合虚拟时钟可以瞬间模拟长时间发送
+    输入: friends (List[Dict]) 好友详细信息等模拟参数 | 输出: 模拟客户端
+    """
+
+    name = 'fake'
+
+    def __init__(self, friends: Optional[List[Dict]] = None, friend_count: int = 0, sessions: Optional[List[str]] = None,
+                 latency: float = 0.0, latency_jitter: float = 0.0, failure_rate: float = 0.0,
+                 unknown_recipient: str = 'raise', rate_limit_per_minute: int = 0,
+                 clock: Optional[Callable[[], float]] = None, sleep: Optional[Callable[[float], None]] = None,
+                 seed: Optional[int] = None):
+        """
+        __init__ 功能说明:
+        初始化模拟客户端。friends 和 friend_count 都未指定时接受任何收件人
+        输入: friends (List[Dict], 可选) 好友详细信息, friend_count (int) 自动生成的好友数量,
+              sessions (List[str], 可选) 额外的会话名称（如群聊）, latency (float) 每次调用的延迟秒数,
+              latency_jitter (float) 延迟的随机增加秒数, failure_rate (float) 发送返回失败的概率,
+              unknown_recipient (str) 未知收件人的处理: raise 抛出 PermanentSendError, fail 返回 False, accept 正常发送,
+              rate_limit_per_minute (int) 每分钟最多发送条数，超过时抛出 RateLimitedError，0 表示不限制,
+              clock/sleep (可选) 计时和等待函数, seed (int, 可选) 随机数种子 | 输出: 无
+        """
+        if unknown_recipient not in ('raise', 'fail', 'accept'):
+            raise ValueError(f"不支持的未知收件人处理方式: {unknown_recipient}")
+        if friends is None and friend_count:
+            friends = [{'NickName': f'好友{i}', 'UserName': f'wxid_fake_{i}', 'Remark': ''} for i in range(friend_count)]
+        self.friends: List[Dict] = list(friends or [])
+        self.sessions: List[str] = list(sessions or [])
+        self.latency = max(0.0, float(latency))
+        self.latency_jitter = max(0.0, float(latency_jitter))
+        self.failure_rate = min(1.0, max(0.0, float(failure_rate)))
+        self.unknown_recipient = unknown_recipient
+        self.rate_limit_per_minute = int(rate_limit_per_minute or 0)
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.rng = random.Random(seed)
+
+        # 可接收消息的名称：好友的昵称/备注/微信号和额外会话，都未指定时为 None（接受任何收件人）
+        self.known: Optional[set] = None
+        if self.friends or self.sessions:
+            self.known = set(self.sessions)
+            fields = FRIEND_NICKNAME_FIELDS + FRIEND_REMARK_FIELDS + FRIEND_ID_FIELDS
+            for friend in self.friends:
+                self.known.update(str(friend[field]) for field in fields if friend.get(field))
+        self.sent: List[Dict] = []
+        self._recent: Deque[float] = deque()
+        self._counts = {'calls': 0, 'sent': 0, 'failed': 0, 'unknown': 0, 'rate_limited': 0}
+        self._lock = threading.Lock()
+
+    def _delay(self) -> None:
+        """
+        _delay 功能说明:
+        模拟一次调用的耗时
+        输入: 无 | 输出: 无
+        """
+        delay = self.latency + (self.rng.uniform(0.0, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay:
+            self.sleep(delay)
+
+    def SendMsg(self, msg: str, who: str, exact: bool = True) -> bool:
+        self._delay()
+        with self._lock:
+            self._counts['calls'] += 1
+            now = self.clock()
+            if self.rate_limit_per_minute:
+                while self._recent and self._recent[0] <= now - 60.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit_per_minute:
+                    self._counts['rate_limited'] += 1
+                    raise RateLimitedError('发送过于频繁，请稍后再试')
+                self._recent.append(now)
+            if self.known is not None and who not in self.known:
+                self._counts['unknown'] += 1
+                if self.unknown_recipient == 'raise':
+                    raise PermanentSendError(f'未找到联系人: {who}')
+                if self.unknown_recipient == 'fail':
+                    return False
+            if self.failure_rate and self.rng.random() < self.failure_rate:
+                self._counts['failed'] += 1
+                return False
+            self._counts['sent'] += 1
+            self.sent.append({'who': who, 'msg': msg, 'time': now})
+            return True
+
+    def GetFriendDetails(self, n: Optional[int] = None, timeout: int = 0xFFFFF) -> List[Dict]:
+        self._delay()
+        friends = self.friends if n is None else self.friends[:n]
+        return [dict(friend) for friend in friends]
+
+    def GetSessionList(self) -> List[str]:
+        names = [friend.get('Remark') or friend.get('NickName') for friend in self.friends]
+        return [name for name in names if name] + self.sessions
+
+    def stats(self) -> Dict:
+        """
+        stats 功能说明:
+        获取模拟发送统计
+        输入: 无 | 输出: Dict 调用次数、成功、随机失败、未知收件人和限流次数
+        """
+        with self._lock:
+            return dict(self._counts)
+
+def create_transport(name: Optional[str] = None, **options) -> WeChatTransport:
+    """
+    create_transport 功能说明:
+    根据配置 wechat.transport 创建传输层：wxauto 为真实微信客户端，fake 为模拟客户端（参数读取 wechat.fake）
+    输入: name (str, 可选) 传输层名称, options 模拟客户端参数（覆盖 wechat.fake）或真实客户端的 WeChat 参数 | 输出: WeChatTransport 传输层
+    """
+    name = name or config.get('wechat.transport', 'wxauto')
+    if name in ('wxauto', 'wxautox'):
+        return WxautoTransport(None if name == 'wxauto' else (name,), **options)
+    if name == 'fake':
+        return FakeWeChatTransport(**{**(config.get('wechat.fake') or {}), **options})
+    raise ValueError(f"不支持的微信传输层: {name}")